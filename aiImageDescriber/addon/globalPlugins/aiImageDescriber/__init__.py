@@ -6,11 +6,13 @@ Autor: jmortizsilva
 """
 
 import globalPluginHandler
+import globalVars
 import scriptHandler
 import api
 import config
 import gui
 import wx
+import asyncio
 import os
 import sys
 import subprocess
@@ -20,6 +22,23 @@ from logHandler import log
 # Importar ui de NVDA ANTES que nuestros módulos
 import ui as nvdaUI
 
+from .asyncCore import asyncCore, RequestRejected
+from .bulkJobs import BulkJobStore, BulkBatchProcessor, OpenAIBatchAPI, GeminiBatchAPI, STATE_FILE_NAME
+from .cancellation import CancellationToken, CANCELLED_ERRORS, raiseIfCancelled
+from .documentImages import collectDocumentImages, DocumentImageDescriber
+from .folderWatcher import FolderWatcher
+from .helperEngine import HelperEngine, IMAGE_PLACEHOLDER
+from .imageProcessor import isPublicURL
+from .iconLabels import collectUnlabeledIcons, objectKey, IconLabeler, IconLabelCache, CACHE_FILE_NAME as ICON_CACHE_FILE_NAME
+from .tiling import TiledDescriber, largeImageSize, planTiles
+from .frames import FrameDescriber, multiFrameInfo, mayBeAnimated, MAX_PAGES
+from .screenRegions import collectScreenRegions, ScreenRegionDescriber
+from .accessibleText import collectWindowText, ScreenTextDescriber
+from .complexity import resolveDetailAsync, ADAPTIVE
+from .screenWatcher import ScreenWatcher, ScreenChangeDescriber
+from .prefetcher import Prefetcher, imageSource, upcomingImageSources, POLL_INTERVAL as PREFETCH_INTERVAL
+from .jobScheduler import JobScheduler, QueueFullError, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND, PRIORITY_BATCH
+
 # Variable para controlar si ya se verificaron dependencias
 _dependenciesChecked = False
 _dependenciesOK = False
@@ -49,6 +68,14 @@ def checkAndInstallDependencies():
 	except ImportError:
 		missingDeps.append("requests")
 	
+	# Verificar aiohttp (peticiones que se abortan al cancelarlas y comparten pocas conexiones)
+	# Sin él las peticiones se hacen con requests y una petición cancelada sigue hasta terminar
+	try:
+		import aiohttp
+		log.info("aiohttp disponible")
+	except ImportError:
+		missingDeps.append("aiohttp")
+	
 	if not missingDeps:
 		_dependenciesOK = True
 		return True
@@ -59,7 +86,8 @@ def checkAndInstallDependencies():
 		+ "\n".join(f"â€¢ {dep}" for dep in missingDeps) + "\n\n"
 		"Estos son necesarios para:\n"
 		"â€¢ Pillow: Capturar y procesar imágenes\n"
-		"â€¢ requests: Comunicarse con las APIs de IA\n\n"
+		"â€¢ requests: Comunicarse con las APIs de IA\n"
+		"â€¢ aiohttp: Cancelar al instante las peticiones en curso\n\n"
 		"Â¿Deseas instalarlos automáticamente?\n"
 		"(Se descargará desde Internet, puede tardar 10-30 segundos)"
 	)
@@ -113,17 +141,22 @@ def checkAndInstallDependencies():
 				f"Error: {str(e)}\n\n"
 				"Solución manual:\n"
 				"1. Abre una terminal como administrador\n"
-				f"2. Ejecuta: {pythonExe} -m pip install Pillow requests\n"
+				f"2. Ejecuta: {pythonExe} -m pip install Pillow requests aiohttp\n"
 				"3. Reinicia NVDA",
 				"Error de instalación",
 				wx.OK | wx.ICON_ERROR
 			)
 			return False
+	elif missingDeps == ["aiohttp"]:
+		# Sin aiohttp el complemento funciona con requests, aunque cancelar no aborta la petición
+		log.warning("aiohttp no instalado: las peticiones canceladas seguirán hasta terminar")
+		_dependenciesOK = True
+		return True
 	else:
 		gui.messageBox(
 			"Sin estos componentes, AI Image Describer no puede funcionar.\n\n"
 			"Puedes instalarlos más tarde ejecutando:\n"
-			f"{sys.executable} -m pip install Pillow requests\n\n"
+			f"{sys.executable} -m pip install Pillow requests aiohttp\n\n"
 			"O desinstala el complemento si no deseas usarlo.",
 			"Instalación cancelada",
 			wx.OK | wx.ICON_WARNING
@@ -133,15 +166,23 @@ def checkAndInstallDependencies():
 # Intentar importar los módulos necesarios
 ImageCapture = None
 ImageProcessor = None
+BatchProcessor = None
 OpenAIClient = None
 GeminiClient = None
+HedgedClient = None
+LocalClient = None
+OpenAICompatibleClient = None
 AIImageDescriberSettingsPanel = None
 
 try:
 	from .imageCapture import ImageCapture
 	from .imageProcessor import ImageProcessor
+	from .batchProcessor import BatchProcessor
 	from .apiClients.openai_client import OpenAIClient
 	from .apiClients.gemini_client import GeminiClient
+	from .apiClients.hedged_client import HedgedClient
+	from .apiClients.local_client import LocalClient
+	from .apiClients.compatible_client import OpenAICompatibleClient
 	log.info("Importando AIImageDescriberSettingsPanel...")
 	from .ui.settingsDialog import AIImageDescriberSettingsPanel
 	log.info("AIImageDescriberSettingsPanel importado correctamente")
@@ -154,9 +195,43 @@ confspec = {
 	"apiProvider": "string(default='openai')",
 	"openaiApiKey": "string(default='')",
 	"geminiApiKey": "string(default='')",
+	"compatibleBaseUrl": "string(default='')",
+	"compatibleModel": "string(default='')",
+	"compatibleApiKey": "string(default='')",
+	"localModelPath": "string(default='')",
+	"localForLowDetail": "boolean(default=False)",
+	"localQuickAnswer": "boolean(default=False)",
 	"detailLevel": "string(default='auto')",
 	"language": "string(default='es')",
 	"announceProcessing": "boolean(default=True)",
+	"hedgeRequests": "boolean(default=False)",
+	"hedgeQuantile": "integer(default=90, min=50, max=99)",
+	"geminiThinkingLow": "integer(default=0, min=-1, max=24576)",
+	"geminiThinkingAuto": "integer(default=0, min=-1, max=24576)",
+	"geminiThinkingHigh": "integer(default=-1, min=-1, max=24576)",
+	"useHelperProcess": "boolean(default=False)",
+	"batchConcurrency": "integer(default=4, min=1, max=8)",
+	"batchRequestsPerMinute": "integer(default=30, min=1, max=600)",
+	"watchEnabled": "boolean(default=False)",
+	"watchFolders": "string(default='')",
+	"watchAnnounce": "boolean(default=True)",
+	"bulkPollInterval": "integer(default=300, min=5, max=3600)",
+	"bulkOpenaiUrl": "string(default='')",
+	"bulkGeminiUrl": "string(default='')",
+	"helperPythonPath": "string(default='')",
+	"tileLargeImages": "boolean(default=False)",
+	"describeFrames": "boolean(default=True)",
+	"sendImageURLs": "boolean(default=False)",
+	"decomposeScreen": "boolean(default=False)",
+	"screenAccessibleText": "boolean(default=False)",
+	"structuredOutput": "boolean(default=False)",
+	"screenWatchInterval": "integer(default=5, min=1, max=300)",
+	"screenWatchSensitivity": "string(default='medium')",
+	"screenWatchMaxRegions": "integer(default=3, min=1, max=8)",
+	"screenWatchBudget": "integer(default=60, min=1, max=1000)",
+	"prefetchEnabled": "boolean(default=False)",
+	"prefetchAhead": "integer(default=3, min=1, max=10)",
+	"prefetchBudget": "integer(default=30, min=0, max=1000)",
 	"firstRun": "boolean(default=True)",
 }
 
@@ -208,6 +283,12 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		"kb:NVDA+alt+s": "captureFullScreen",
 		"kb:NVDA+alt+c": "describeFromClipboard",
 		"kb:NVDA+alt+f": "loadImageFromFile",
+		"kb:NVDA+alt+b": "describeFolder",
+		"kb:NVDA+alt+w": "toggleFolderWatch",
+		"kb:NVDA+alt+v": "toggleScreenWatch",
+		"kb:NVDA+alt+shift+b": "submitFolderBulk",
+		"kb:NVDA+alt+d": "describeDocumentImages",
+		"kb:NVDA+alt+l": "labelIcons",
 		
 		# Comandos con ventana (añadir Shift)
 		"kb:NVDA+alt+shift+i": "describeImageAtFocusWindow",
@@ -216,20 +297,59 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		"kb:NVDA+alt+shift+f": "loadImageFromFileWindow",
 		
 		# Otros comandos
+		"kb:NVDA+alt+e": "announceJobStatus",
+		"kb:NVDA+alt+x": "cancelDescription",
 		"kb:NVDA+alt+o": "openSettings",
 		"kb:NVDA+alt+h": "showHelp",
 	}
 	
+	BATCH_PROGRESS_STEP = 10  # Imágenes entre anuncios de progreso del lote
+	
 	def __init__(self):
 		"""Inicializa el plugin global"""
 		super(GlobalPlugin, self).__init__()
 		
+		self._pendingRequests = set()  # Futuros de descripciones en curso
+		self._pendingRequestsLock = threading.Lock()
+		
+		# Proceso auxiliar para codificar y enviar imágenes (opcional)
+		self.helperEngine = None
+		
+		# Vigilancia de carpetas (opcional)
+		self.folderWatcher = None
+		
+		# Vigilancia de la pantalla (se activa con un atajo durante la sesión)
+		self.screenWatcher = None
+		self._screenWatchJob = None
+		
+		# Anticipación de imágenes en modo exploración (opcional)
+		self.prefetcher = None
+		self._prefetchTimer = None
+		self._lastCaretPosition = None
+		
+		# Trabajos por lotes del proveedor pendientes de recoger
+		self.bulkJobStore = BulkJobStore(os.path.join(globalVars.appArgs.configPath, STATE_FILE_NAME))
+		self._bulkPollFuture = None
+		
+		# Etiquetas de iconos: caché por hash de píxeles y objetos etiquetados mientras
+		# su ventana siga en primer plano
+		self.iconLabelCache = IconLabelCache(os.path.join(globalVars.appArgs.configPath, ICON_CACHE_FILE_NAME))
+		self.iconLabelMap = {}
+		self.iconLabelWindows = set()  # Ventanas que contienen iconos etiquetados
+		self.iconLabelForeground = None  # Ventana en primer plano al etiquetar
+		
+		# Grupo fijo de hilos para todas las descripciones
+		self.jobScheduler = JobScheduler()
+		self.jobScheduler.start()
+		
 		# Verificar e instalar dependencias en segundo plano
 		wx.CallAfter(self._initializePlugin)
 	
 	def _initializePlugin(self):
 		"""Inicialización real después de verificar dependencias"""
-		global ImageCapture, ImageProcessor, OpenAIClient, GeminiClient, AIImageDescriberSettingsPanel
+		global ImageCapture, ImageProcessor, BatchProcessor, OpenAIClient, GeminiClient, HedgedClient, LocalClient
+		global OpenAICompatibleClient
+		global AIImageDescriberSettingsPanel
 		
 		# Verificar e instalar dependencias si es necesario
 		if not checkAndInstallDependencies():
@@ -241,8 +361,12 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			try:
 				from .imageCapture import ImageCapture
 				from .imageProcessor import ImageProcessor
+				from .batchProcessor import BatchProcessor
 				from .apiClients.openai_client import OpenAIClient
 				from .apiClients.gemini_client import GeminiClient
+				from .apiClients.hedged_client import HedgedClient
+				from .apiClients.local_client import LocalClient
+				from .apiClients.compatible_client import OpenAICompatibleClient
 				from .ui.settingsDialog import AIImageDescriberSettingsPanel
 			except ImportError as e:
 				log.error(f"Error al importar módulos después de instalar dependencias: {e}")
@@ -252,6 +376,7 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		self.imageCapture = ImageCapture() if ImageCapture else None
 		self.imageProcessor = ImageProcessor() if ImageProcessor else None
 		self.currentClient = None
+		self.localClient = None  # Modelo local junto a un proveedor en la nube (opcional)
 		
 		# Almacenar instancia global
 		global _globalPluginInstance
@@ -260,6 +385,9 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		# Cargar configuración y cliente de API
 		self._loadAPIClient()
 		
+		# Seguir consultando los trabajos por lotes enviados en sesiones anteriores
+		self._startBulkPolling()
+		
 		# Agregar panel de configuración al menú de NVDA
 		if AIImageDescriberSettingsPanel:
 			try:
@@ -303,6 +431,21 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		except Exception:
 			pass
 		
+		# Cancelar tareas y peticiones en curso y detener el núcleo asíncrono
+		self.jobScheduler.stop()
+		self.cancelPendingRequests()
+		if self.folderWatcher:
+			self.folderWatcher.stop()
+		if self.screenWatcher:
+			self.screenWatcher.stop()
+		if self._prefetchTimer:
+			self._prefetchTimer.Stop()
+		if self.prefetcher:
+			self.prefetcher.cancelAll()
+		asyncCore.stop()
+		if self.helperEngine:
+			self.helperEngine.stop()
+		
 		super(GlobalPlugin, self).terminate()
 		log.info("AI Image Describer finalizado")
 	
@@ -348,8 +491,8 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			from .ui.resultDialog import ResultDialog
 			# Verbalizar también para accesibilidad inmediata
 			nvdaUI.message("Descripción obtenida. Abriendo ventana...")
-			# Obtener el proveedor actual
-			provider = config.conf["aiImageDescriber"]["apiProvider"]
+			# Obtener el proveedor que generó la respuesta (puede ser el de respaldo)
+			provider = getattr(self.currentClient, "lastProvider", None) or config.conf["aiImageDescriber"]["apiProvider"]
 			dlg = ResultDialog(gui.mainFrame, title, description, provider)
 			dlg.ShowModal()
 			dlg.Destroy()
@@ -358,30 +501,230 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			# Fallback: mostrar solo con voz
 			nvdaUI.message(description)
 	
+	def _createClient(self, provider):
+		"""
+		Crea el cliente de API de un proveedor si tiene API key (o modelo local) configurada
+		
+		Args:
+			provider (str): "openai", "gemini", "compatible" o "local"
+		
+		Returns:
+			Cliente de API, o None si no está disponible
+		"""
+		if provider == "openai" and OpenAIClient:
+			apiKey = config.conf["aiImageDescriber"]["openaiApiKey"]
+			if apiKey:
+				return OpenAIClient(apiKey)
+		elif provider == "gemini" and GeminiClient:
+			apiKey = config.conf["aiImageDescriber"]["geminiApiKey"]
+			if apiKey:
+				thinkingBudgets = {
+					"low": config.conf["aiImageDescriber"]["geminiThinkingLow"],
+					"auto": config.conf["aiImageDescriber"]["geminiThinkingAuto"],
+					"high": config.conf["aiImageDescriber"]["geminiThinkingHigh"],
+				}
+				return GeminiClient(apiKey, thinkingBudgets)
+		elif provider == "compatible" and OpenAICompatibleClient:
+			baseUrl = config.conf["aiImageDescriber"]["compatibleBaseUrl"]
+			if baseUrl:
+				return OpenAICompatibleClient(
+					baseUrl,
+					config.conf["aiImageDescriber"]["compatibleModel"],
+					config.conf["aiImageDescriber"]["compatibleApiKey"]
+				)
+		elif provider == "local" and LocalClient:
+			modelPath = config.conf["aiImageDescriber"]["localModelPath"]
+			if LocalClient.isModelPath(modelPath):
+				return LocalClient(modelPath)
+		return None
+	
 	def _loadAPIClient(self):
 		"""Carga el cliente de API según la configuración"""
 		# Reiniciar cliente actual
 		self.currentClient = None
+		self.localClient = None
+		self._loadHelperEngine()
+		self._loadFolderWatcher()
+		self._loadPrefetcher()
+		if self.screenWatcher:
+			# Aplicar las nuevas opciones a la vigilancia de pantalla en curso
+			self._startScreenWatcher()
 		
 		provider = config.conf["aiImageDescriber"]["apiProvider"]
 		log.info(f"Cargando proveedor de IA: {provider}")
 		
-		if provider == "openai" and OpenAIClient:
-			apiKey = config.conf["aiImageDescriber"]["openaiApiKey"]
-			if apiKey:
-				self.currentClient = OpenAIClient(apiKey)
-				log.info("Cliente OpenAI cargado exitosamente")
+		if provider not in ("openai", "gemini", "compatible", "local") or not (OpenAIClient and GeminiClient):
+			log.warning(f"Proveedor de API no reconocido o no disponible: {provider}")
+			return
+		
+		self.currentClient = self._createClient(provider)
+		if not self.currentClient:
+			if provider == "local":
+				log.warning("Modelo local seleccionado pero la carpeta del modelo no es válida")
+			elif provider == "compatible":
+				log.warning("Servidor compatible seleccionado pero no hay dirección configurada")
 			else:
-				log.warning("OpenAI seleccionado pero no hay API key configurada")
-		elif provider == "gemini" and GeminiClient:
-			apiKey = config.conf["aiImageDescriber"]["geminiApiKey"]
-			if apiKey:
-				self.currentClient = GeminiClient(apiKey)
-				log.info("Cliente Gemini cargado exitosamente")
+				log.warning(f"{provider} seleccionado pero no hay API key configurada")
+			return
+		log.info(f"Cliente {provider} cargado exitosamente")
+		if provider == "local":
+			return
+		
+		# Modelo local para el detalle bajo o como primera respuesta inmediata (opcional)
+		if config.conf["aiImageDescriber"]["localForLowDetail"] or config.conf["aiImageDescriber"]["localQuickAnswer"]:
+			self.localClient = self._createClient("local")
+			if not self.localClient:
+				log.warning("Modelo local activado pero la carpeta del modelo no es válida")
+		
+		# Peticiones de respaldo con el otro proveedor (opcional); un servidor propio o el modelo local
+		# no se respaldan con un proveedor de pago: la imagen saldría del equipo sin que el usuario lo pida
+		if config.conf["aiImageDescriber"]["hedgeRequests"] and provider not in ("openai", "gemini"):
+			log.info(f"Peticiones de respaldo desactivadas con el proveedor {provider}")
+		elif config.conf["aiImageDescriber"]["hedgeRequests"] and HedgedClient:
+			secondaryProvider = "gemini" if provider == "openai" else "openai"
+			secondary = self._createClient(secondaryProvider)
+			if secondary:
+				quantile = config.conf["aiImageDescriber"]["hedgeQuantile"] / 100.0
+				self.currentClient = HedgedClient(self.currentClient, secondary, quantile)
+				log.info(f"Peticiones de respaldo activadas con {secondaryProvider}")
 			else:
-				log.warning("Gemini seleccionado pero no hay API key configurada")
-		else:
-			log.warning(f"Proveedor de API no reconocido o no disponible: {provider}")
+				log.warning("Peticiones de respaldo activadas pero falta la API key del segundo proveedor")
+	
+	def _loadHelperEngine(self):
+		"""Crea o detiene el proceso auxiliar según la configuración (se arranca al primer uso)"""
+		if self.helperEngine:
+			self.helperEngine.stop()
+			self.helperEngine = None
+		
+		if not config.conf["aiImageDescriber"]["useHelperProcess"]:
+			return
+		if config.conf["aiImageDescriber"]["apiProvider"] == "local":
+			# El modelo local necesita la imagen dentro de NVDA
+			log.info("Proceso auxiliar desactivado con el modelo local")
+			return
+		
+		engine = HelperEngine(config.conf["aiImageDescriber"]["helperPythonPath"])
+		if not engine.isAvailable():
+			log.warning(f"Proceso auxiliar activado pero el intérprete no es válido: {engine.pythonPath}")
+			return
+		self.helperEngine = engine
+		log.info(f"Proceso auxiliar activado con {engine.pythonPath}")
+	
+	def _getWatchFolders(self):
+		"""Retorna las carpetas vigiladas configuradas (separadas por punto y coma)"""
+		folders = config.conf["aiImageDescriber"]["watchFolders"].split(";")
+		return [folder.strip() for folder in folders if folder.strip()]
+	
+	def _loadFolderWatcher(self):
+		"""Crea o detiene la vigilancia de carpetas según la configuración"""
+		if self.folderWatcher:
+			self.folderWatcher.stop()
+			self.folderWatcher = None
+		
+		if not config.conf["aiImageDescriber"]["watchEnabled"]:
+			return
+		
+		watcher = FolderWatcher(self._getWatchFolders(), self._onWatchedFile)
+		if not watcher.folders:
+			log.warning("Vigilancia de carpetas activada pero no hay carpetas válidas configuradas")
+			return
+		watcher.start()
+		self.folderWatcher = watcher
+	
+	def _startScreenWatcher(self):
+		"""
+		Inicia (o reinicia con las opciones actuales) la vigilancia de la pantalla
+		
+		Returns:
+			bool: True si la vigilancia quedó en marcha
+		"""
+		if self.screenWatcher:
+			self.screenWatcher.stop()
+			self.screenWatcher = None
+		
+		desktop = api.getDesktopObject().location
+		watcher = ScreenWatcher(
+			self.imageCapture,
+			(desktop.left, desktop.top, desktop.left + desktop.width, desktop.top + desktop.height),
+			self._onScreenChanged,
+			interval=config.conf["aiImageDescriber"]["screenWatchInterval"],
+			sensitivity=config.conf["aiImageDescriber"]["screenWatchSensitivity"],
+			maxRegions=config.conf["aiImageDescriber"]["screenWatchMaxRegions"],
+			budgetPerHour=config.conf["aiImageDescriber"]["screenWatchBudget"],
+			isBusy=self._isScreenWatchBusy
+		)
+		try:
+			watcher.start()
+		except Exception as e:
+			log.error(f"No se pudo iniciar la vigilancia de pantalla: {e}", exc_info=True)
+			return False
+		self.screenWatcher = watcher
+		return True
+	
+	def _loadPrefetcher(self):
+		"""Crea o detiene la anticipación de imágenes según la configuración"""
+		if self._prefetchTimer:
+			self._prefetchTimer.Stop()
+			self._prefetchTimer = None
+		if self.prefetcher:
+			self.prefetcher.cancelAll()
+			self.prefetcher = None
+		
+		if not config.conf["aiImageDescriber"]["prefetchEnabled"] or not self.imageProcessor:
+			return
+		
+		self.prefetcher = Prefetcher(self.imageProcessor, config.conf["aiImageDescriber"]["prefetchBudget"])
+		self._lastCaretPosition = None
+		self._prefetchTimer = wx.PyTimer(self._onPrefetchTimer)
+		self._prefetchTimer.Start(PREFETCH_INTERVAL)
+		log.info("Anticipación de imágenes activada")
+	
+	def _onPrefetchTimer(self):
+		"""Anticipa las próximas imágenes cuando el cursor de exploración se mueve"""
+		if not self.prefetcher or not self.currentClient:
+			return
+		try:
+			treeInterceptor = api.getFocusObject().treeInterceptor
+			if (
+				not treeInterceptor
+				or not treeInterceptor.isReady
+				or treeInterceptor.passThrough
+				or not hasattr(treeInterceptor, "_iterNodesByType")
+			):
+				return
+			position = (id(treeInterceptor), treeInterceptor.selection.bookmark)
+			if position == self._lastCaretPosition:
+				return
+			self._lastCaretPosition = position
+			sources = upcomingImageSources(treeInterceptor, config.conf["aiImageDescriber"]["prefetchAhead"])
+		except Exception as e:
+			log.debug(f"No se pudieron buscar imágenes por delante del cursor: {e}")
+			return
+		
+		if sources:
+			self.prefetcher.schedule(
+				sources,
+				self.currentClient,
+				config.conf["aiImageDescriber"]["detailLevel"],
+				config.conf["aiImageDescriber"]["language"]
+			)
+	
+	def _getImageObject(self):
+		"""
+		Objeto cuya imagen se describe
+		
+		En modo exploración, el gráfico bajo el cursor si lo hay; si no, el objeto con foco
+		"""
+		focus = api.getFocusObject()
+		treeInterceptor = focus.treeInterceptor
+		if treeInterceptor and not treeInterceptor.passThrough and hasattr(treeInterceptor, "_iterNodesByType"):
+			try:
+				obj = treeInterceptor.selection.NVDAObjectAtStart
+				if imageSource(obj):
+					return obj
+			except Exception as e:
+				log.debug(f"No se pudo obtener el objeto bajo el cursor de exploración: {e}")
+		return focus
 	
 	@scriptHandler.script(
 		description="Describe la imagen bajo el foco o cursor del navegador de objetos",
@@ -396,17 +739,13 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		# Verbalizar resultado
 		showWindow = False
 		
-		obj = api.getFocusObject()
+		obj = self._getImageObject()
 		
 		if config.conf["aiImageDescriber"]["announceProcessing"]:
 			nvdaUI.message("Analizando imagen en el foco...")
 		
 		# Ejecutar en segundo plano para no bloquear NVDA
-		threading.Thread(
-			target=self._analyzeObject,
-			args=(obj, showWindow),
-			daemon=True
-		).start()
+		self._submitJob(self._analyzeObject, (obj, showWindow), "imagen en el foco", showWindow)
 	
 	@scriptHandler.script(
 		description="Describe la imagen bajo el foco y muestra el resultado en una ventana",
@@ -421,17 +760,13 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		# Mostrar en ventana
 		showWindow = True
 		
-		obj = api.getFocusObject()
+		obj = self._getImageObject()
 		
 		if config.conf["aiImageDescriber"]["announceProcessing"]:
 			nvdaUI.message("Analizando imagen en el foco...")
 		
 		# Ejecutar en segundo plano para no bloquear NVDA
-		threading.Thread(
-			target=self._analyzeObject,
-			args=(obj, showWindow),
-			daemon=True
-		).start()
+		self._submitJob(self._analyzeObject, (obj, showWindow), "imagen en el foco", showWindow)
 	
 	@scriptHandler.script(
 		description="Captura y describe la pantalla completa",
@@ -449,11 +784,9 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		if config.conf["aiImageDescriber"]["announceProcessing"]:
 			nvdaUI.message("Capturando pantalla completa...")
 		
-		threading.Thread(
-			target=self._captureAndDescribe,
-			args=("full", showWindow),
-			daemon=True
-		).start()
+		screenRegions = self._collectScreenRegions()
+		windowText = None if screenRegions else self._collectWindowText()
+		self._submitJob(self._captureAndDescribe, ("full", showWindow, screenRegions, windowText), "pantalla completa", showWindow)
 	
 	@scriptHandler.script(
 		description="Captura y describe la pantalla completa mostrando el resultado en una ventana",
@@ -471,11 +804,9 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		if config.conf["aiImageDescriber"]["announceProcessing"]:
 			nvdaUI.message("Capturando pantalla completa...")
 		
-		threading.Thread(
-			target=self._captureAndDescribe,
-			args=("full", showWindow),
-			daemon=True
-		).start()
+		screenRegions = self._collectScreenRegions()
+		windowText = None if screenRegions else self._collectWindowText()
+		self._submitJob(self._captureAndDescribe, ("full", showWindow, screenRegions, windowText), "pantalla completa", showWindow)
 	
 	@scriptHandler.script(
 		description="Describe una imagen desde el portapapeles",
@@ -494,11 +825,7 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			nvdaUI.message("Analizando imagen desde el portapapeles...")
 		
 		# Ejecutar en segundo plano
-		threading.Thread(
-			target=self._captureAndDescribe,
-			args=("clipboard", showWindow),
-			daemon=True
-		).start()
+		self._submitJob(self._captureAndDescribe, ("clipboard", showWindow), "portapapeles", showWindow)
 	
 	@scriptHandler.script(
 		description="Describe una imagen desde el portapapeles y muestra el resultado en una ventana",
@@ -517,11 +844,7 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			nvdaUI.message("Analizando imagen desde el portapapeles...")
 		
 		# Ejecutar en segundo plano
-		threading.Thread(
-			target=self._captureAndDescribe,
-			args=("clipboard", showWindow),
-			daemon=True
-		).start()
+		self._submitJob(self._captureAndDescribe, ("clipboard", showWindow), "portapapeles", showWindow)
 	
 	@scriptHandler.script(
 		description="Abre un diálogo para cargar y describir una imagen desde archivo",
@@ -553,6 +876,164 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		# Crear diálogo de selección de archivo
 		wx.CallAfter(self._showFileDialog, showWindow)
 	
+	@scriptHandler.script(
+		description="Describe todas las imágenes de una carpeta y guarda los resultados junto a ellas",
+		category="AI Image Describer"
+	)
+	def script_describeFolder(self, gesture):
+		"""Describe una carpeta de imágenes por lotes"""
+		if not self._checkConfiguration():
+			return
+		
+		# Crear diálogo de selección de carpeta
+		wx.CallAfter(self._showFolderDialog)
+	
+	@scriptHandler.script(
+		description="Envía una carpeta al proveedor como trabajo por lotes (más barato, los resultados tardan minutos u horas)",
+		category="AI Image Describer"
+	)
+	def script_submitFolderBulk(self, gesture):
+		"""Envía una carpeta de imágenes como trabajo por lotes del proveedor"""
+		if not self._checkConfiguration():
+			return
+		
+		wx.CallAfter(self._showFolderDialog, True)
+	
+	@scriptHandler.script(
+		description="Describe todas las imágenes del documento actual y las muestra en una lista navegable",
+		category="AI Image Describer"
+	)
+	def script_describeDocumentImages(self, gesture):
+		"""Describe los gráficos del documento en modo exploración"""
+		if not self._checkConfiguration():
+			return
+		
+		treeInterceptor = api.getFocusObject().treeInterceptor
+		if not treeInterceptor or not hasattr(treeInterceptor, "_iterNodesByType"):
+			nvdaUI.message("Esta orden solo funciona en documentos en modo exploración")
+			return
+		
+		try:
+			images = collectDocumentImages(treeInterceptor)
+		except Exception as e:
+			log.error(f"Error al recorrer las imágenes del documento: {e}", exc_info=True)
+			nvdaUI.message("No se pudieron obtener las imágenes del documento")
+			return
+		if not images:
+			nvdaUI.message("No hay imágenes en el documento")
+			return
+		
+		nvdaUI.message(f"Describiendo {len(images)} imágenes...")
+		self._submitJob(self._describeDocumentImages, (images,), "imágenes del documento", True)
+	
+	@scriptHandler.script(
+		description="Etiqueta los iconos y botones sin nombre de la ventana actual con una sola petición",
+		category="AI Image Describer"
+	)
+	def script_labelIcons(self, gesture):
+		"""Etiqueta los iconos sin nombre de la ventana en primer plano"""
+		if not self._checkConfiguration():
+			return
+		
+		try:
+			foreground = api.getForegroundObject()
+			icons = collectUnlabeledIcons(foreground)
+		except Exception as e:
+			log.error(f"Error al recorrer los iconos de la ventana: {e}", exc_info=True)
+			nvdaUI.message("No se pudieron obtener los iconos de la ventana")
+			return
+		if not icons:
+			nvdaUI.message("No hay iconos sin etiqueta en esta ventana")
+			return
+		
+		nvdaUI.message(f"Etiquetando {len(icons)} iconos...")
+		self._submitJob(self._labelIcons, (icons, foreground.windowHandle), "iconos sin etiqueta", True)
+	
+	@scriptHandler.script(
+		description="Activa o desactiva la vigilancia de carpetas configuradas",
+		category="AI Image Describer"
+	)
+	def script_toggleFolderWatch(self, gesture):
+		"""Activa o desactiva la vigilancia de carpetas"""
+		if config.conf["aiImageDescriber"]["watchEnabled"]:
+			config.conf["aiImageDescriber"]["watchEnabled"] = False
+			self._loadFolderWatcher()
+			nvdaUI.message("Vigilancia de carpetas desactivada")
+			return
+		
+		if not self._getWatchFolders():
+			nvdaUI.message("No hay carpetas vigiladas. Configúralas en las opciones de AI Image Describer.")
+			return
+		
+		config.conf["aiImageDescriber"]["watchEnabled"] = True
+		self._loadFolderWatcher()
+		if self.folderWatcher:
+			nvdaUI.message(f"Vigilando {len(self.folderWatcher.folders)} carpetas")
+		else:
+			config.conf["aiImageDescriber"]["watchEnabled"] = False
+			nvdaUI.message("Ninguna de las carpetas vigiladas existe")
+	
+	@scriptHandler.script(
+		description="Activa o desactiva la vigilancia de la pantalla, que describe solo lo que cambia",
+		category="AI Image Describer"
+	)
+	def script_toggleScreenWatch(self, gesture):
+		"""Activa o desactiva la vigilancia de la pantalla"""
+		if self.screenWatcher:
+			self.screenWatcher.stop()
+			self.screenWatcher = None
+			nvdaUI.message("Vigilancia de pantalla desactivada")
+			return
+		
+		if not self._checkConfiguration():
+			return
+		if self._startScreenWatcher():
+			interval = config.conf["aiImageDescriber"]["screenWatchInterval"]
+			nvdaUI.message(f"Vigilando la pantalla cada {interval} segundos")
+		else:
+			nvdaUI.message("No se pudo iniciar la vigilancia de pantalla")
+	
+	@scriptHandler.script(
+		description="Anuncia las descripciones pendientes y en curso",
+		category="AI Image Describer"
+	)
+	def script_announceJobStatus(self, gesture):
+		"""Anuncia el estado de la cola de descripciones"""
+		pending, running = self.jobScheduler.getStatus()
+		running = [job for job in running if not job.isCancelled]
+		bulkJobs = self.bulkJobStore.jobs
+		if not pending and not running and not bulkJobs:
+			nvdaUI.message("No hay descripciones en curso")
+			return
+		
+		parts = []
+		if running:
+			names = ", ".join(job.description for job in running)
+			parts.append(f"{len(running)} en curso: {names}")
+		if pending:
+			names = ", ".join(job.description for job in pending)
+			parts.append(f"{len(pending)} en cola: {names}")
+		if bulkJobs:
+			images = sum(len(files) for job in bulkJobs for files in job["items"].values())
+			parts.append(f"{len(bulkJobs)} trabajos por lotes del proveedor con {images} imágenes")
+		nvdaUI.message(". ".join(parts))
+	
+	@scriptHandler.script(
+		description="Cancela las descripciones pendientes y en curso sin anunciar su resultado",
+		category="AI Image Describer"
+	)
+	def script_cancelDescription(self, gesture):
+		"""Cancela todas las descripciones"""
+		cancelled = self.jobScheduler.cancelAll()
+		self.cancelPendingRequests()
+		if self.prefetcher:
+			self.prefetcher.cancelAll()
+		if cancelled:
+			log.info(f"Canceladas {cancelled} descripciones por el usuario")
+			nvdaUI.message("Descripción cancelada")
+		else:
+			nvdaUI.message("No hay descripciones en curso")
+	
 	@scriptHandler.script(
 		description="Abre la configuración de AI Image Describer",
 		category="AI Image Describer"
@@ -588,55 +1069,554 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		
 		return True
 	
+	def _submitJob(self, func, args, description, showWindow, priority=PRIORITY_INTERACTIVE):
+		"""
+		Encola una descripción en el planificador de tareas
+		
+		Las descripciones verbalizadas comparten el grupo "speech": una nueva
+		sustituye a la anterior para no leer resultados obsoletos
+		
+		Args:
+			func: Función que realiza la descripción
+			args (tuple): Argumentos de la función
+			description (str): Nombre de la tarea al consultar el estado
+			showWindow (bool): Si el resultado se muestra en ventana
+			priority (int): Prioridad de la tarea
+		
+		Returns:
+			Job: Tarea encolada, o None si la cola está llena
+		"""
+		try:
+			return self.jobScheduler.submit(
+				func,
+				*args,
+				priority=priority,
+				description=description,
+				group=None if showWindow else "speech"
+			)
+		except QueueFullError as e:
+			log.warning(f"Cola de descripciones llena: {e}")
+			nvdaUI.message("Hay demasiadas descripciones en cola. Espera a que terminen.")
+			return None
+	
+	def _currentCancelToken(self):
+		"""
+		Retorna el token de cancelación de la tarea que se ejecuta en este hilo
+		
+		Returns:
+			CancellationToken: Token de la tarea actual, o uno nuevo fuera del planificador
+		"""
+		job = self.jobScheduler.currentJob()
+		return job.token if job else CancellationToken()
+	
+	def _ensureHelperEngine(self):
+		"""
+		Arranca el proceso auxiliar si está configurado
+		
+		Returns:
+			HelperEngine: Motor en marcha, o None para procesar dentro de NVDA
+		"""
+		if not self.helperEngine:
+			return None
+		
+		try:
+			self.helperEngine.start()
+		except Exception as e:
+			log.error(f"No se pudo iniciar el proceso auxiliar, se desactiva hasta guardar la configuración: {e}")
+			self.helperEngine = None
+			return None
+		return self.helperEngine
+	
+	def _openHelperTransport(self, captureType=None, filePath=None, cancelToken=None):
+		"""
+		Prepara una descripción en el proceso auxiliar
+		
+		Los píxeles capturados se copian a memoria compartida y se liberan en NVDA;
+		los archivos los abre directamente el proceso auxiliar
+		
+		Args:
+			captureType (str): "full" o "clipboard" para capturar, o None
+			filePath (str): Ruta de la imagen a describir, o None
+			cancelToken (CancellationToken): Token de cancelación de la tarea
+		
+		Returns:
+			HelperTransport: Transporte para _describe, o None para procesar dentro de NVDA
+		"""
+		if not self._ensureHelperEngine():
+			return None
+		
+		try:
+			if filePath:
+				return self.helperEngine.transportForFile(filePath)
+			if captureType == "full":
+				image = self.imageCapture.grabFullScreen(cancelToken)
+			else:
+				image = self.imageCapture.grabFromClipboard(cancelToken)
+			if image is None:
+				return None
+			try:
+				return self.helperEngine.transportForImage(image)
+			finally:
+				# Los píxeles ya están en memoria compartida
+				image.close()
+		except CANCELLED_ERRORS:
+			raise
+		except Exception as e:
+			log.warning(f"Error al preparar el proceso auxiliar, se procesa en NVDA: {e}")
+			return None
+	
+	def _describe(self, imageData, detailLevel, language, cancelToken=None, transport=None, announceSummary=False):
+		"""
+		Envía una imagen al núcleo asíncrono y espera su descripción
+		
+		La petición queda registrada como futuro cancelable: si se cancela
+		(directamente o a través del token), se cierra la conexión y se lanza una excepción de CANCELLED_ERRORS
+		
+		Con la respuesta estructurada activada se pide un resumen de una línea seguido del detalle;
+		si announceSummary es True el resumen se verbaliza en cuanto llega, sin esperar al resto
+		
+		Con el modelo local activado, el detalle bajo se describe sin conexión y, si announceSummary
+		es True, la descripción local se verbaliza mientras llega la del proveedor
+		
+		Args:
+			imageData (str): Imagen codificada en base64
+			detailLevel (str): Nivel de detalle
+			language (str): Idioma de la descripción
+			cancelToken (CancellationToken): Token de cancelación de la tarea, o None
+			transport (HelperTransport): Transporte del proceso auxiliar, o None
+				(en ese caso imageData es IMAGE_PLACEHOLDER)
+			announceSummary (bool): True para verbalizar el resumen de la respuesta estructurada
+				(o la descripción local inmediata) en cuanto llega
+		
+		Returns:
+			str: Descripción de la imagen (StructuredDescription si la respuesta es estructurada)
+		"""
+		raiseIfCancelled(cancelToken)
+		client = self.currentClient
+		localClient = self.localClient if transport is None else None
+		quickAnswer = (
+			localClient is not None
+			and announceSummary
+			and config.conf["aiImageDescriber"]["localQuickAnswer"]
+		)
+		structured = (
+			config.conf["aiImageDescriber"]["structuredOutput"]
+			and hasattr(client, "describeStructuredAsync")
+		)
+		spokenSummaries = []
+		
+		def onSummary(summary):
+			# Llega desde el bucle del núcleo asíncrono con la respuesta aún en curso
+			if announceSummary and not (cancelToken and cancelToken.isCancelled):
+				nvdaUI.message(summary)
+				spokenSummaries.append(summary)
+		
+		async def announceLocalAsync(data):
+			# Primera respuesta sin conexión; se descarta si el proveedor ya contestó
+			try:
+				caption = await localClient.describeImageAsync(data, detail="low", language=language, cancelToken=cancelToken)
+			except CANCELLED_ERRORS:
+				return
+			except Exception as e:
+				log.warning(f"Error en la descripción local inmediata: {e}")
+				return
+			if not spokenSummaries and not (cancelToken and cancelToken.isCancelled):
+				nvdaUI.message(caption)
+		
+		async def describeAsync():
+			if transport is None:
+				detail, data = await resolveDetailAsync(imageData, detailLevel, cancelToken)
+			else:
+				# La imagen se codifica en el proceso auxiliar: no se puede medir aquí
+				detail, data = ("auto" if detailLevel == ADAPTIVE else detailLevel), imageData
+			if localClient and detail == "low" and config.conf["aiImageDescriber"]["localForLowDetail"]:
+				return await localClient.describeImageAsync(data, detail=detail, language=language, cancelToken=cancelToken)
+			preview = asyncio.ensure_future(announceLocalAsync(data)) if quickAnswer else None
+			try:
+				return await describeRemoteAsync(detail, data)
+			finally:
+				if preview and not preview.done():
+					preview.cancel()
+		
+		async def describeRemoteAsync(detail, data):
+			if structured:
+				return await client.describeStructuredAsync(
+					data,
+					detail=detail,
+					language=language,
+					cancelToken=cancelToken,
+					transport=transport,
+					onSummary=onSummary
+				)
+			return await client.describeImageAsync(
+				data,
+				detail=detail,
+				language=language,
+				maxTokens=4000,  # Aumentado para Gemini thinking tokens
+				cancelToken=cancelToken,
+				transport=transport
+			)
+		
+		description = self._awaitFuture(describeAsync(), cancelToken)
+		if spokenSummaries:
+			description.summarySpoken = True
+		return description
+	
+	def _awaitFuture(self, coro, cancelToken=None):
+		"""
+		Ejecuta una corrutina en el núcleo asíncrono y espera su resultado
+		
+		El futuro queda registrado entre las peticiones pendientes (la cancelación global y el
+		cierre del complemento lo cancelan) y ligado al token de la tarea mientras dura la espera
+		
+		Args:
+			coro: Corrutina a ejecutar
+			cancelToken (CancellationToken): Token de cancelación de la tarea, o None
+		
+		Returns:
+			Resultado de la corrutina
+		
+		Raises:
+			CANCELLED_ERRORS: Si se canceló el futuro o el token
+		"""
+		future = asyncCore.submit(coro)
+		with self._pendingRequestsLock:
+			self._pendingRequests.add(future)
+		if cancelToken is not None:
+			cancelToken.addCallback(future.cancel)
+		try:
+			result = future.result()
+			raiseIfCancelled(cancelToken)
+			return result
+		finally:
+			with self._pendingRequestsLock:
+				self._pendingRequests.discard(future)
+			if cancelToken is not None:
+				cancelToken.removeCallback(future.cancel)
+	
+	def _describeTiled(self, filePath, size, detailLevel, language, cancelToken):
+		"""
+		Describe una imagen grande por secciones concurrentes y una petición de resumen
+		
+		Args:
+			filePath (str): Ruta de la imagen
+			size (tuple): (ancho, alto) de la imagen
+			detailLevel (str): Nivel de detalle
+			language (str): Idioma de la descripción
+			cancelToken (CancellationToken): Token de cancelación de la tarea
+		
+		Returns:
+			str: Descripción combinada
+		"""
+		rows, columns, tiles = planTiles(*size)
+		if config.conf["aiImageDescriber"]["announceProcessing"]:
+			nvdaUI.message(f"Imagen grande: describiendo {len(tiles)} secciones")
+		
+		describer = TiledDescriber(self.currentClient, detail=detailLevel, language=language)
+		return self._awaitFuture(describer.describeFileAsync(filePath, cancelToken), cancelToken)
+	
+	def _describeFrames(self, source, frameInfo, detailLevel, language, cancelToken):
+		"""
+		Describe una imagen animada por sus fotogramas clave o un documento por sus páginas
+		
+		Args:
+			source: Ruta del archivo o contenido descargado
+			frameInfo (tuple): ("animation" o "pages", número de fotogramas)
+			detailLevel (str): Nivel de detalle
+			language (str): Idioma de la descripción
+			cancelToken (CancellationToken): Token de cancelación de la tarea
+		
+		Returns:
+			str: Descripción
+		"""
+		kind, count = frameInfo
+		if config.conf["aiImageDescriber"]["announceProcessing"]:
+			if kind == "animation":
+				nvdaUI.message(f"Imagen animada de {count} fotogramas")
+			else:
+				nvdaUI.message(f"Documento de {count} páginas: describiendo {min(count, MAX_PAGES)}")
+		
+		describer = FrameDescriber(self.currentClient, detail=detailLevel, language=language)
+		return self._awaitFuture(describer.describeSourceAsync(source, cancelToken), cancelToken)
+	
+	def _outputDescription(self, title, description, showWindow, cancelToken, spokenPrefix=""):
+		"""
+		Etapa de salida: verbaliza o muestra la descripción salvo que se haya cancelado
+		
+		Args:
+			title (str): Título de la ventana de resultado
+			description (str): Descripción obtenida
+			showWindow (bool): True para mostrar en ventana, False para verbalizar
+			cancelToken (CancellationToken): Token de cancelación de la tarea
+			spokenPrefix (str): Texto que precede a la descripción verbalizada
+		"""
+		raiseIfCancelled(cancelToken)
+		if showWindow:
+			def show():
+				# La cancelación puede llegar mientras la llamada espera en la cola de wx
+				if not cancelToken.isCancelled:
+					self._showResultDialog(title, description)
+			wx.CallAfter(show)
+		else:
+			if getattr(description, "summarySpoken", False):
+				# El resumen ya se verbalizó al llegar: solo queda el detalle
+				details = stripMarkdown(description.details)
+				if details:
+					nvdaUI.message(details)
+				return
+			# Limpiar Markdown para verbalización
+			cleanText = stripMarkdown(description)
+			nvdaUI.message(f"{spokenPrefix}{cleanText}")
+	
+	def cancelPendingRequests(self):
+		"""Cancela todas las descripciones en curso sin anunciar su resultado"""
+		with self._pendingRequestsLock:
+			pending = list(self._pendingRequests)
+		for future in pending:
+			future.cancel()
+		if pending:
+			log.info(f"Canceladas {len(pending)} peticiones en curso")
+	
 	def _analyzeObject(self, obj, showWindow=True):
 		"""Analiza un objeto NVDA y describe su imagen"""
+		cancelToken = self._currentCancelToken()
 		try:
-			# Extraer imagen del objeto
-			imageData = self.imageProcessor.extractFromObject(obj)
-			
-			if not imageData:
-				nvdaUI.message("No se pudo extraer la imagen del objeto")
-				return
-			
 			# Obtener configuración
 			detailLevel = config.conf["aiImageDescriber"]["detailLevel"]
 			language = config.conf["aiImageDescriber"]["language"]
 			log.info(f"_analyzeObject: Usando detailLevel='{detailLevel}', language='{language}', showWindow={showWindow}")
 			
-			# Obtener descripción de la API
-			description = self.currentClient.describeImage(
-				imageData,
-				detail=detailLevel,
-				language=language,
-				maxTokens=4000  # Aumentado para Gemini thinking tokens
-			)
+			# La imagen pudo anticiparse al acercarse el cursor de exploración
+			description = imageData = None
+			src = imageSource(obj)
+			if src and self.prefetcher:
+				description, imageData = self.prefetcher.lookup(src, self.currentClient, detailLevel, language, cancelToken)
+			if description:
+				log.info("Descripción servida desde la anticipación")
+				self._outputDescription("Descripción de imagen en foco", description, showWindow, cancelToken)
+				return
+			
+			# Las imágenes web públicas las descarga el propio proveedor
+			if not imageData and self._sendsImageURL(src):
+				description = self._describeImageURL(src, detailLevel, language, cancelToken)
+				if description:
+					self._outputDescription("Descripción de imagen en foco", description, showWindow, cancelToken)
+					return
+			
+			# Las imágenes web animadas se descargan una vez y se describen por fotogramas clave
+			downloaded = False
+			if not imageData and src and not src.startswith("data:") and config.conf["aiImageDescriber"]["describeFrames"]:
+				downloaded = True
+				try:
+					content = self.imageProcessor.fetchURL(src, cancelToken)
+				except CANCELLED_ERRORS:
+					raise
+				except Exception as e:
+					log.warning(f"No se pudo descargar la imagen: {e}")
+					content = None
+				if content:
+					frameInfo = multiFrameInfo(content)
+					if frameInfo:
+						description = self._describeFrames(content, frameInfo, detailLevel, language, cancelToken)
+						self._outputDescription("Descripción de imagen en foco", description, showWindow, cancelToken)
+						return
+					imageData = self.imageProcessor.loadFromBytes(content, cancelToken=cancelToken)
+				content = None
+			
+			# Extraer imagen del objeto (sin repetir una descarga fallida o descartada)
+			if not imageData:
+				imageData = self.imageProcessor.extractFromObject(obj, cancelToken, useURL=not downloaded)
+			
+			if not imageData:
+				nvdaUI.message("No se pudo extraer la imagen del objeto")
+				return
+			
+			# Obtener descripción de la API (la imagen se libera en cuanto se envía)
+			description = self._describe(imageData, detailLevel, language, cancelToken, announceSummary=not showWindow)
+			imageData = None
 			
 			# Mostrar resultado según preferencia
-			if showWindow:
-				wx.CallAfter(self._showResultDialog, "Descripción de imagen en foco", description)
-			else:
-				# Limpiar Markdown para verbalización
-				cleanText = stripMarkdown(description)
-				nvdaUI.message(cleanText)
+			self._outputDescription("Descripción de imagen en foco", description, showWindow, cancelToken)
 			
+		except CANCELLED_ERRORS:
+			log.info("Descripción de objeto cancelada")
 		except Exception as e:
 			log.error(f"Error al analizar objeto: {e}", exc_info=True)
 			nvdaUI.message(f"Error al analizar imagen: {str(e)}")
 	
-	def _captureAndDescribe(self, captureType="full", showWindow=True):
-		"""Captura pantalla y la describe"""
+	def _sendsImageURL(self, src):
+		"""
+		Indica si una imagen web se describe enviando su dirección en lugar de descargarla
+		
+		Con la descripción por fotogramas activada, los formatos que pueden ser animados
+		se siguen descargando: el proveedor solo vería el primer fotograma
+		
+		Args:
+			src (str): Dirección de la imagen, o None
+		
+		Returns:
+			bool: True si se envía la dirección
+		"""
+		if not src or not config.conf["aiImageDescriber"]["sendImageURLs"] or not isPublicURL(src):
+			return False
+		if not hasattr(self.currentClient, "describeImageURLAsync"):
+			# El modelo local no puede descargar la imagen
+			return False
+		if self.currentClient.PROVIDER == "compatible":
+			# Los servidores compatibles (Ollama, llama.cpp, LM Studio...) suelen aceptar solo
+			# imágenes incrustadas: cada dirección costaría una petición fallida antes de descargarla
+			return False
+		return not (config.conf["aiImageDescriber"]["describeFrames"] and mayBeAnimated(src))
+	
+	def _describeImageURL(self, url, detailLevel, language, cancelToken):
+		"""
+		Describe una imagen web pública enviando solo su dirección
+		
+		Args:
+			url (str): Dirección pública de la imagen
+			detailLevel (str): Nivel de detalle
+			language (str): Idioma de la descripción
+			cancelToken (CancellationToken): Token de cancelación de la tarea
+		
+		Returns:
+			str: Descripción, o None si el proveedor no acepta la dirección
+				(la imagen se descarga entonces como siempre)
+		"""
+		raiseIfCancelled(cancelToken)
+		try:
+			description = self._awaitFuture(self.currentClient.describeImageURLAsync(
+				url,
+				detail=detailLevel,
+				language=language,
+				maxTokens=4000,
+				cancelToken=cancelToken
+			), cancelToken)
+		except RequestRejected as e:
+			log.info(f"El proveedor no aceptó la dirección de la imagen, se descarga: {e}")
+			return None
+		log.info("Imagen descrita por su dirección")
+		return description
+	
+	def _collectScreenRegions(self):
+		"""
+		Divide la pantalla en regiones según el árbol de objetos, si está activado
+		
+		Se llama desde el hilo principal, antes de encolar la captura
+		
+		Returns:
+			tuple: (rectángulo de la pantalla, regiones), o None para describirla entera
+		"""
+		if not config.conf["aiImageDescriber"]["decomposeScreen"]:
+			return None
+		try:
+			screen, regions = collectScreenRegions()
+		except Exception as e:
+			log.warning(f"No se pudo dividir la pantalla en regiones: {e}")
+			return None
+		# Con una sola región no hay nada que ganar frente a la captura completa
+		if len(regions) < 2:
+			return None
+		return screen, regions
+	
+	def _describeScreenRegions(self, screen, regions, detailLevel, language, cancelToken):
+		"""
+		Describe las regiones de la pantalla en paralelo y las une en orden de lectura
+		
+		Args:
+			screen (tuple): Rectángulo de la pantalla
+			regions (list): ScreenRegion a describir
+			detailLevel (str): Nivel de detalle
+			language (str): Idioma de la descripción
+			cancelToken (CancellationToken): Token de cancelación de la tarea
+		
+		Returns:
+			str: Descripción por regiones
+		"""
+		describer = ScreenRegionDescriber(self.currentClient, self.imageCapture, detail=detailLevel, language=language)
+		return self._awaitFuture(describer.describeAsync(screen, regions, cancelToken), cancelToken)
+	
+	def _collectWindowText(self):
+		"""
+		Recoge el texto accesible de la ventana activa, si está activado
+		
+		Se llama desde el hilo principal, antes de encolar la captura
+		
+		Returns:
+			WindowText: Texto de la ventana, o None para describir solo la imagen
+		"""
+		if not config.conf["aiImageDescriber"]["screenAccessibleText"]:
+			return None
+		try:
+			return collectWindowText()
+		except Exception as e:
+			log.warning(f"No se pudo recoger el texto accesible de la ventana: {e}")
+			return None
+	
+	def _describeScreenWithText(self, windowText, detailLevel, language, cancelToken):
+		"""
+		Describe la pantalla reducida junto con el texto accesible de la ventana activa
+		
+		Args:
+			windowText (WindowText): Texto de la ventana activa
+			detailLevel (str): Nivel de detalle
+			language (str): Idioma de la descripción
+			cancelToken (CancellationToken): Token de cancelación de la tarea
+		
+		Returns:
+			str: Descripción de la pantalla
+		"""
+		describer = ScreenTextDescriber(self.currentClient, self.imageCapture, detail=detailLevel, language=language)
+		return self._awaitFuture(describer.describeAsync(windowText, cancelToken), cancelToken)
+	
+	def _captureAndDescribe(self, captureType="full", showWindow=True, screenRegions=None, windowText=None):
+		"""
+		Captura pantalla y la describe
+		
+		Args:
+			captureType (str): "full" o "clipboard"
+			showWindow (bool): True para mostrar en ventana, False para verbalizar
+			screenRegions (tuple): (pantalla, regiones) para describir la pantalla por regiones, o None
+			windowText (WindowText): Texto accesible de la ventana activa para enviar la
+				pantalla a menor resolución, o None
+		"""
+		cancelToken = self._currentCancelToken()
+		transport = None
 		try:
+			if captureType == "full" and screenRegions:
+				detailLevel = config.conf["aiImageDescriber"]["detailLevel"]
+				language = config.conf["aiImageDescriber"]["language"]
+				screen, regions = screenRegions
+				log.info(f"_captureAndDescribe: pantalla en {len(regions)} regiones, detailLevel='{detailLevel}', language='{language}'")
+				description = self._describeScreenRegions(screen, regions, detailLevel, language, cancelToken)
+				self._outputDescription("Descripción de pantalla completa", description, showWindow, cancelToken)
+				return
+			
+			if captureType == "full" and windowText:
+				detailLevel = config.conf["aiImageDescriber"]["detailLevel"]
+				language = config.conf["aiImageDescriber"]["language"]
+				log.info(f"_captureAndDescribe: pantalla con texto accesible, detailLevel='{detailLevel}', language='{language}'")
+				description = self._describeScreenWithText(windowText, detailLevel, language, cancelToken)
+				self._outputDescription("Descripción de pantalla completa", description, showWindow, cancelToken)
+				return
+			
 			# Capturar imagen según tipo
 			if captureType == "full":
-				imageData = self.imageCapture.captureFullScreen()
 				title = "Descripción de pantalla completa"
 			elif captureType == "clipboard":
-				imageData = self.imageCapture.captureFromClipboard()
 				title = "Descripción de imagen del portapapeles"
 			else:
 				nvdaUI.message("Tipo de captura no soportado")
 				return
 		
+			# Con el proceso auxiliar la imagen se codifica fuera de NVDA
+			transport = self._openHelperTransport(captureType=captureType, cancelToken=cancelToken)
+			if transport:
+				imageData = IMAGE_PLACEHOLDER
+			elif captureType == "full":
+				imageData = self.imageCapture.captureFullScreen(cancelToken)
+			else:
+				imageData = self.imageCapture.captureFromClipboard(cancelToken)
+		
 			if not imageData:
 				if captureType == "clipboard":
 					nvdaUI.message("No hay ninguna imagen en el portapapeles")
@@ -650,25 +1630,21 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			log.info(f"_captureAndDescribe: captureType='{captureType}', detailLevel='{detailLevel}', language='{language}', showWindow={showWindow}")
 		
 			# Describir imagen
-			description = self.currentClient.describeImage(
-			imageData,
-			detail=detailLevel,
-			language=language,
-			maxTokens=4000  # Aumentado para Gemini thinking tokens
-		)
+			description = self._describe(imageData, detailLevel, language, cancelToken, transport, announceSummary=not showWindow)
+			imageData = None
 		
 			# Mostrar resultado según preferencia
-			if showWindow:
-				wx.CallAfter(self._showResultDialog, title, description)
-			else:
-				# Limpiar Markdown para verbalización
-				cleanText = stripMarkdown(description)
-				nvdaUI.message(cleanText)
+			self._outputDescription(title, description, showWindow, cancelToken)
 		
+		except CANCELLED_ERRORS:
+			log.info("Descripción de captura cancelada")
 		except Exception as e:
 			log.error(f"Error al capturar y describir: {e}", exc_info=True)
 			nvdaUI.message(f"Error: {str(e)}")
-
+		finally:
+			if transport:
+				transport.close()
+	
 	def _showFileDialog(self, showWindow=False):
 		"""Muestra diálogo para seleccionar archivo de imagen"""
 		try:
@@ -686,11 +1662,12 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 				nvdaUI.message("Analizando imagen desde archivo...")
 				
 				# Procesar en segundo plano
-				threading.Thread(
-					target=self._analyzeImageFile,
-					args=(filePath, showWindow),
-					daemon=True
-				).start()
+				self._submitJob(
+					self._analyzeImageFile,
+					(filePath, showWindow),
+					os.path.basename(filePath),
+					showWindow
+				)
 			
 			dlg.Destroy()
 			
@@ -700,37 +1677,475 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 	
 	def _analyzeImageFile(self, filePath, showWindow=False):
 		"""Analiza una imagen desde archivo"""
+		cancelToken = self._currentCancelToken()
+		transport = None
 		try:
-			# Leer imagen
-			imageData = self.imageProcessor.loadFromFile(filePath)
-			
-			if not imageData:
-				nvdaUI.message("No se pudo cargar la imagen")
-				return
-			
 			# Obtener configuración
 			detailLevel = config.conf["aiImageDescriber"]["detailLevel"]
 			language = config.conf["aiImageDescriber"]["language"]
 			log.info(f"_analyzeImageFile: filePath='{filePath}', detailLevel='{detailLevel}', language='{language}', showWindow={showWindow}")
 			
-			# Describir imagen
-			description = self.currentClient.describeImage(
-				imageData,
-				detail=detailLevel,
-				language=language,
-				maxTokens=4000  # Aumentado para Gemini thinking tokens
-			)
+			# Las animaciones y los documentos de varias páginas no se reducen a su primer fotograma
+			frameInfo = multiFrameInfo(filePath) if config.conf["aiImageDescriber"]["describeFrames"] else None
+			# Las imágenes muy grandes se describen por secciones para no perder detalle al reducirlas
+			largeSize = None
+			if not frameInfo and config.conf["aiImageDescriber"]["tileLargeImages"]:
+				largeSize = largeImageSize(filePath)
+			if frameInfo:
+				description = self._describeFrames(filePath, frameInfo, detailLevel, language, cancelToken)
+			elif largeSize:
+				description = self._describeTiled(filePath, largeSize, detailLevel, language, cancelToken)
+			else:
+				# Leer imagen (con el proceso auxiliar la abre y codifica él)
+				transport = self._openHelperTransport(filePath=filePath, cancelToken=cancelToken)
+				if transport:
+					imageData = IMAGE_PLACEHOLDER
+				else:
+					imageData = self.imageProcessor.loadFromFile(filePath, cancelToken)
+				
+				if not imageData:
+					nvdaUI.message("No se pudo cargar la imagen")
+					return
+				
+				# Describir imagen
+				description = self._describe(imageData, detailLevel, language, cancelToken, transport, announceSummary=not showWindow)
+				imageData = None
 			
 			fileName = os.path.basename(filePath)
 			
 			# Mostrar resultado según preferencia
-			if showWindow:
-				wx.CallAfter(self._showResultDialog, f"Descripción de {fileName}", description)
-			else:
-				# Limpiar Markdown para verbalización
-				cleanText = stripMarkdown(description)
-				nvdaUI.message(f"Descripción de {fileName}: {cleanText}")
+			self._outputDescription(
+				f"Descripción de {fileName}",
+				description,
+				showWindow,
+				cancelToken,
+				spokenPrefix=f"Descripción de {fileName}: "
+			)
 			
+		except CANCELLED_ERRORS:
+			log.info("Descripción de archivo cancelada")
 		except Exception as e:
 			log.error(f"Error al analizar archivo: {e}", exc_info=True)
 			nvdaUI.message(f"Error: {str(e)}")
+		finally:
+			if transport:
+				transport.close()
+	
+	def _showFolderDialog(self, bulk=False):
+		"""
+		Muestra diálogo para seleccionar la carpeta del lote
+		
+		Args:
+			bulk (bool): Si True, la carpeta se envía como trabajo por lotes del proveedor
+		"""
+		try:
+			dlg = wx.DirDialog(
+				gui.mainFrame,
+				message="Selecciona una carpeta de imágenes para describir",
+				style=wx.DD_DEFAULT_STYLE | wx.DD_DIR_MUST_EXIST
+			)
+			
+			if dlg.ShowModal() == wx.ID_OK:
+				folder = dlg.GetPath()
+				if bulk:
+					nvdaUI.message("Preparando trabajo por lotes en segundo plano...")
+				else:
+					nvdaUI.message("Describiendo carpeta en segundo plano...")
+				
+				# Los lotes van detrás de las descripciones interactivas
+				try:
+					self.jobScheduler.submit(
+						self._submitFolderBulk if bulk else self._describeFolder,
+						folder,
+						priority=PRIORITY_BATCH,
+						description=f"lote {os.path.basename(folder)}"
+					)
+				except QueueFullError as e:
+					log.warning(f"Cola de descripciones llena: {e}")
+					nvdaUI.message("Hay demasiadas descripciones en cola. Espera a que terminen.")
+			
+			dlg.Destroy()
+			
+		except Exception as e:
+			log.error(f"Error al mostrar diálogo de carpeta: {e}", exc_info=True)
+			nvdaUI.message(f"Error: {str(e)}")
+	
+	def _describeFolder(self, folder):
+		"""Describe todas las imágenes de una carpeta (reanuda si ya se empezó)"""
+		cancelToken = self._currentCancelToken()
+		try:
+			announce = config.conf["aiImageDescriber"]["announceProcessing"]
+			
+			def onProgress(completed, total):
+				if announce and completed < total and completed % self.BATCH_PROGRESS_STEP == 0:
+					nvdaUI.message(f"Lote: {completed} de {total}")
+			
+			processor = BatchProcessor(
+				self.currentClient,
+				self.imageProcessor,
+				detail=config.conf["aiImageDescriber"]["detailLevel"],
+				language=config.conf["aiImageDescriber"]["language"],
+				helperEngine=self._ensureHelperEngine(),
+				maxConcurrent=config.conf["aiImageDescriber"]["batchConcurrency"],
+				requestsPerMinute=config.conf["aiImageDescriber"]["batchRequestsPerMinute"],
+				progressCallback=onProgress
+			)
+			log.info(f"_describeFolder: folder='{folder}'")
+			
+			summary = self._awaitFuture(processor.runAsync(folder, cancelToken), cancelToken)
+			
+			if summary["total"] == 0:
+				nvdaUI.message("No se encontraron imágenes en la carpeta")
+				return
+			message = (
+				f"Lote terminado: {summary['described']} descritas, "
+				f"{summary['reused']} reutilizadas, {summary['skipped']} ya descritas"
+			)
+			if summary["failed"]:
+				message += f", {summary['failed']} con error (se reintentarán al repetir el lote)"
+			nvdaUI.message(message)
+			
+		except CANCELLED_ERRORS:
+			log.info("Lote cancelado; se reanudará desde el manifiesto")
+		except Exception as e:
+			log.error(f"Error al describir carpeta: {e}", exc_info=True)
+			nvdaUI.message(f"Error: {str(e)}")
+	
+	def _describeDocumentImages(self, images):
+		"""Describe los gráficos reunidos de un documento y muestra la lista de resultados"""
+		cancelToken = self._currentCancelToken()
+		try:
+			describer = DocumentImageDescriber(
+				self.currentClient,
+				self.imageProcessor,
+				self.imageCapture,
+				detail=config.conf["aiImageDescriber"]["detailLevel"],
+				language=config.conf["aiImageDescriber"]["language"]
+			)
+			self._awaitFuture(describer.describeAllAsync(images, cancelToken), cancelToken)
+			
+			if not any(image.description for image in images):
+				nvdaUI.message("No se pudo describir ninguna imagen del documento")
+				return
+			
+			def show():
+				if not cancelToken.isCancelled:
+					self._showImageListDialog(images, f"Imágenes del documento ({len(images)})")
+			wx.CallAfter(show)
+			
+		except CANCELLED_ERRORS:
+			log.info("Descripción de las imágenes del documento cancelada")
+		except Exception as e:
+			log.error(f"Error al describir las imágenes del documento: {e}", exc_info=True)
+			nvdaUI.message(f"Error: {str(e)}")
+	
+	def _labelIcons(self, icons, foregroundHandle):
+		"""Obtiene las etiquetas de los iconos, las aplica a sus objetos y muestra la lista"""
+		cancelToken = self._currentCancelToken()
+		try:
+			labeler = IconLabeler(self.currentClient, self.imageCapture, self.iconLabelCache)
+			self._awaitFuture(labeler.labelAsync(
+				icons,
+				language=config.conf["aiImageDescriber"]["language"],
+				cancelToken=cancelToken
+			), cancelToken)
+			
+			labeled = [icon for icon in icons if icon.description]
+			if not labeled:
+				nvdaUI.message("No se pudo etiquetar ningún icono")
+				return
+			
+			# NVDA anunciará la etiqueta al llegar a cada objeto mientras no cambie de posición
+			# y su ventana siga en primer plano
+			if api.getForegroundObject().windowHandle == foregroundHandle:
+				if self.iconLabelForeground != foregroundHandle:
+					self._clearIconLabels()
+				self.iconLabelForeground = foregroundHandle
+				self.iconLabelWindows.update(icon.windowHandle for icon in labeled)
+				self.iconLabelMap.update((icon.key, icon.description) for icon in labeled)
+			cached = sum(1 for icon in labeled if icon.fromCache)
+			nvdaUI.message(f"{len(labeled)} de {len(icons)} iconos etiquetados, {cached} desde la caché")
+			
+			def show():
+				if not cancelToken.isCancelled:
+					self._showImageListDialog(icons, f"Iconos sin etiqueta ({len(icons)})")
+			wx.CallAfter(show)
+			
+		except CANCELLED_ERRORS:
+			log.info("Etiquetado de iconos cancelado")
+		except Exception as e:
+			log.error(f"Error al etiquetar iconos: {e}", exc_info=True)
+			nvdaUI.message(f"Error: {str(e)}")
+	
+	def event_NVDAObject_init(self, obj):
+		"""Aplica las etiquetas obtenidas a los iconos sin nombre"""
+		# Se llama al crear cualquier objeto del sistema: primero las comprobaciones baratas,
+		# antes de pedir el nombre o la posición a la aplicación
+		if not self.iconLabelMap or obj.windowHandle not in self.iconLabelWindows:
+			return
+		try:
+			if obj.name:
+				return
+			label = self.iconLabelMap.get(objectKey(obj))
+		except Exception:
+			return
+		if label:
+			obj.name = label
+	
+	def event_foreground(self, obj, nextHandler):
+		"""Olvida las etiquetas de iconos al cambiar la ventana en primer plano"""
+		if self.iconLabelMap and obj.windowHandle != self.iconLabelForeground:
+			self._clearIconLabels()
+		nextHandler()
+	
+	def _clearIconLabels(self):
+		"""Descarta las etiquetas aplicadas a los objetos (la caché por píxeles se conserva)"""
+		self.iconLabelMap = {}
+		self.iconLabelWindows = set()
+		self.iconLabelForeground = None
+	
+	def _showImageListDialog(self, images, title):
+		"""
+		Muestra una lista de imágenes con sus descripciones
+		
+		Args:
+			images (list): Elementos con displayName, description, error y moveTo()
+			title (str): Título del diálogo
+		"""
+		try:
+			from .ui.resultDialog import ImageListDialog
+			dlg = ImageListDialog(gui.mainFrame, images, title)
+			dlg.ShowModal()
+			selected = dlg.selectedImage
+			dlg.Destroy()
+			if selected is not None:
+				# Ir al elemento cuando la ventana original recupere el foco
+				wx.CallLater(100, self._moveToListItem, selected)
+		except Exception as e:
+			log.error(f"Error al mostrar la lista de imágenes: {e}", exc_info=True)
+			nvdaUI.message(f"Error: {str(e)}")
+	
+	def _moveToListItem(self, image):
+		"""Lleva el cursor hasta un elemento elegido en la lista de imágenes"""
+		try:
+			image.moveTo()
+		except Exception as e:
+			log.warning(f"No se pudo ir a la imagen: {e}")
+			nvdaUI.message("La imagen ya no está disponible")
+	
+	def _createBatchAPI(self, provider):
+		"""
+		Crea el acceso a los lotes de un proveedor
+		
+		Reutiliza el cliente actual si es del mismo proveedor (conserva el modelo detectado)
+		
+		Args:
+			provider (str): "openai" o "gemini"
+		
+		Returns:
+			OpenAIBatchAPI o GeminiBatchAPI, o None si falta la API key
+		"""
+		client = getattr(self.currentClient, "primary", self.currentClient)
+		if getattr(client, "PROVIDER", None) != provider:
+			client = self._createClient(provider)
+		if not client:
+			return None
+		if provider == "openai":
+			return OpenAIBatchAPI(client, config.conf["aiImageDescriber"]["bulkOpenaiUrl"])
+		return GeminiBatchAPI(client, config.conf["aiImageDescriber"]["bulkGeminiUrl"])
+	
+	def _submitFolderBulk(self, folder):
+		"""Envía las imágenes pendientes de una carpeta como trabajos por lotes del proveedor"""
+		cancelToken = self._currentCancelToken()
+		try:
+			provider = config.conf["aiImageDescriber"]["apiProvider"]
+			if provider not in ("openai", "gemini"):
+				nvdaUI.message("Los trabajos por lotes solo están disponibles con OpenAI o Gemini")
+				return
+			batchApi = self._createBatchAPI(provider)
+			if not batchApi:
+				nvdaUI.message("Configura una API key en las opciones de AI Image Describer")
+				return
+			
+			processor = BulkBatchProcessor(
+				batchApi.client,
+				self.imageProcessor,
+				batchApi,
+				self.bulkJobStore,
+				detail=config.conf["aiImageDescriber"]["detailLevel"],
+				language=config.conf["aiImageDescriber"]["language"],
+				helperEngine=self._ensureHelperEngine()
+			)
+			log.info(f"_submitFolderBulk: folder='{folder}'")
+			
+			summary, jobs = self._awaitFuture(processor.submitAsync(folder, cancelToken), cancelToken)
+			
+			if summary["total"] == 0:
+				nvdaUI.message("No se encontraron imágenes en la carpeta")
+				return
+			if jobs:
+				message = (
+					f"Enviadas {summary['submitted']} imágenes en {len(jobs)} trabajos por lotes. "
+					"Se anunciará cuando terminen"
+				)
+			else:
+				message = "No hay imágenes nuevas que enviar"
+			if summary["inProgress"]:
+				message += f". {summary['inProgress']} ya estaban en un trabajo anterior"
+			if summary["skipped"] or summary["reused"]:
+				message += f". {summary['skipped'] + summary['reused']} ya descritas"
+			nvdaUI.message(message)
+			
+		except CANCELLED_ERRORS:
+			log.info("Envío del trabajo por lotes cancelado; los trabajos ya creados se recogerán igual")
+		except Exception as e:
+			log.error(f"Error al enviar trabajo por lotes: {e}", exc_info=True)
+			nvdaUI.message(f"Error: {str(e)}")
+		finally:
+			self._startBulkPolling()
+	
+	def _startBulkPolling(self):
+		"""Empieza a consultar los trabajos por lotes pendientes si no se está haciendo ya"""
+		if not self.bulkJobStore.jobs:
+			return
+		if self._bulkPollFuture is not None and not self._bulkPollFuture.done():
+			return
+		self._bulkPollFuture = asyncCore.submit(self._pollBulkJobsAsync())
+	
+	async def _pollBulkJobsAsync(self):
+		"""Consulta periódicamente los trabajos por lotes y vuelca los terminados"""
+		while self.bulkJobStore.jobs:
+			await asyncio.sleep(config.conf["aiImageDescriber"]["bulkPollInterval"])
+			for job in list(self.bulkJobStore.jobs):
+				batchApi = self._createBatchAPI(job["provider"])
+				if not batchApi:
+					log.warning(f"Sin API key de {job['provider']} para consultar el trabajo {job['id']}")
+					continue
+				processor = BulkBatchProcessor(
+					batchApi.client,
+					self.imageProcessor,
+					batchApi,
+					self.bulkJobStore,
+					detail=job["detail"],
+					language=job["language"]
+				)
+				try:
+					summary = await processor.collectAsync(job)
+				except asyncio.CancelledError:
+					raise
+				except Exception as e:
+					# Errores de red o del proveedor: se reintenta en la siguiente consulta
+					log.warning(f"Error al consultar el trabajo por lotes {job['id']}: {e}")
+					continue
+				if summary is None:
+					continue
+				
+				message = (
+					f"Trabajo por lotes de {os.path.basename(job['folder'])} terminado: "
+					f"{summary['described'] + summary['reused']} imágenes descritas"
+				)
+				if summary["failed"]:
+					message += f", {summary['failed']} con error (se reintentarán al repetir el lote)"
+				nvdaUI.message(message)
+		log.info("No quedan trabajos por lotes pendientes")
+	
+	def _onWatchedFile(self, folder, path):
+		"""
+		Encola la descripción de una imagen nueva de una carpeta vigilada
+		
+		Returns:
+			bool: False si la cola está llena (la vigilancia lo reintentará)
+		"""
+		if not self.currentClient:
+			return False
+		try:
+			self.jobScheduler.submit(
+				self._describeWatchedFile,
+				folder,
+				path,
+				priority=PRIORITY_BACKGROUND,
+				description=os.path.basename(path)
+			)
+			return True
+		except QueueFullError:
+			return False
+	
+	def _describeWatchedFile(self, folder, path):
+		"""Describe una imagen recién llegada y guarda el resultado junto a ella"""
+		cancelToken = self._currentCancelToken()
+		try:
+			processor = BatchProcessor(
+				self.currentClient,
+				self.imageProcessor,
+				detail=config.conf["aiImageDescriber"]["detailLevel"],
+				language=config.conf["aiImageDescriber"]["language"],
+				helperEngine=self._ensureHelperEngine()
+			)
+			log.info(f"_describeWatchedFile: path='{path}'")
+			
+			description = self._awaitFuture(processor.describeNewFileAsync(folder, path, cancelToken), cancelToken)
+			
+			if config.conf["aiImageDescriber"]["watchAnnounce"]:
+				fileName = os.path.basename(path)
+				self._outputDescription(
+					f"Descripción de {fileName}",
+					description,
+					False,
+					cancelToken,
+					spokenPrefix=f"Nueva imagen {fileName}: "
+				)
+			
+		except CANCELLED_ERRORS:
+			log.info("Descripción de imagen vigilada cancelada")
+		except Exception as e:
+			log.error(f"Error al describir imagen vigilada: {e}", exc_info=True)
+			if config.conf["aiImageDescriber"]["watchAnnounce"]:
+				nvdaUI.message(f"Error al describir {os.path.basename(path)}: {str(e)}")
+	
+	def _isScreenWatchBusy(self):
+		"""True mientras se describe el último cambio de pantalla"""
+		job = self._screenWatchJob
+		return job is not None and job.state in ("pending", "running") and not job.isCancelled
+	
+	def _onScreenChanged(self, screen, changes):
+		"""
+		Encola la descripción de las zonas de la pantalla que han cambiado
+		
+		Returns:
+			bool: False si no se pudo encolar (la vigilancia lo comprobará de nuevo)
+		"""
+		if not self.currentClient:
+			return False
+		try:
+			self._screenWatchJob = self.jobScheduler.submit(
+				self._describeScreenChanges,
+				screen,
+				changes,
+				priority=PRIORITY_BACKGROUND,
+				description="cambios en pantalla"
+			)
+			return True
+		except QueueFullError:
+			return False
+	
+	def _describeScreenChanges(self, screen, changes):
+		"""Describe las zonas cambiadas y las verbaliza"""
+		cancelToken = self._currentCancelToken()
+		try:
+			describer = ScreenChangeDescriber(
+				self.currentClient,
+				detail=config.conf["aiImageDescriber"]["detailLevel"],
+				language=config.conf["aiImageDescriber"]["language"]
+			)
+			coro = describer.describeAsync(screen, changes, cancelToken)
+			changes = None
+			description = self._awaitFuture(coro, cancelToken)
+			
+			# La vigilancia pudo desactivarse mientras se describía
+			if self.screenWatcher:
+				self._outputDescription("Cambios en pantalla", description, False, cancelToken)
+			
+		except CANCELLED_ERRORS:
+			log.info("Descripción de cambios de pantalla cancelada")
+		except Exception as e:
+			log.error(f"Error al describir cambios de pantalla: {e}", exc_info=True)
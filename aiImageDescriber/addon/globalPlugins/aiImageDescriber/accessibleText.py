@@ -0,0 +1,216 @@
+# -*- coding: UTF-8 -*-
+"""
+Texto accesible de la ventana activa
+Recoge lo que NVDA ya sabe de la ventana activa (nombres, valores y texto del modelo
+de pantalla de sus objetos) para enviarlo junto a una captura reducida: el modelo no
+tiene que leer el texto en los píxeles y basta una imagen de poca resolución
+"""
+
+import asyncio
+import time
+import api
+import controlTypes
+from logHandler import log
+
+from .cancellation import raiseIfCancelled
+from .tiling import encodeImage
+
+MAX_TEXT_OBJECTS = 400  # Objetos recorridos como máximo
+MAX_TEXT_DEPTH = 25
+MAX_TEXT_CHARS = 6000  # Caracteres de texto accesible enviados como máximo
+MAX_VALUE_CHARS = 500  # Caracteres como máximo del valor de un objeto (documentos, campos de edición)
+MIN_TEXT_CHARS = 40  # Con menos texto la captura se describe como siempre
+COLLECT_TIME_LIMIT = 0.5  # Segundos como máximo recorriendo el árbol en el hilo principal
+SCREEN_TEXT_IMAGE_SIZE = 1024  # Lado máximo de la captura enviada con el texto
+SCREEN_TEXT_MAX_TOKENS = {"low": 200, "auto": 800, "high": 2000}
+
+# Pantalla reducida acompañada del texto que la ventana activa expone a los lectores de pantalla
+SCREEN_TEXT_PROMPTS = {
+	"es": (
+		"Esta imagen es una captura reducida de la pantalla; la ventana activa es «{window}». Debajo tienes el "
+		"texto que esa ventana expone a los lectores de pantalla (nombres, valores y texto dibujado, con su tipo "
+		"de control), más fiable que el que se lee en la imagen. Describe la pantalla para una persona con "
+		"discapacidad visual: usa la imagen para la disposición, las imágenes, los colores y el estado visual, y "
+		"cita los textos tal como aparecen en el texto accesible. {detail}\n\nTexto accesible:\n{text}"
+	),
+	"en": (
+		"This image is a reduced screenshot; the active window is \"{window}\". Below is the text that window "
+		"exposes to screen readers (names, values and drawn text, with their control type), more reliable than "
+		"the text read from the image. Describe the screen for a visually impaired person: use the image for "
+		"layout, pictures, colours and visual state, and quote texts as they appear in the accessible text. "
+		"{detail}\n\nAccessible text:\n{text}"
+	),
+	"fr": (
+		"Cette image est une capture d'écran réduite; la fenêtre active est «{window}». Ci-dessous se trouve le "
+		"texte que cette fenêtre expose aux lecteurs d'écran (noms, valeurs et texte affiché, avec leur type de "
+		"contrôle), plus fiable que celui lu dans l'image. Décris l'écran pour une personne malvoyante: utilise "
+		"l'image pour la disposition, les images, les couleurs et l'état visuel, et cite les textes tels qu'ils "
+		"apparaissent dans le texte accessible. {detail}\n\nTexte accessible:\n{text}"
+	)
+}
+
+SCREEN_TEXT_DETAIL = {
+	"low": {
+		"es": "Hazlo en 2 o 3 frases: qué aplicación es y qué está haciendo el usuario.",
+		"en": "Do it in 2 or 3 sentences: which application it is and what the user is doing.",
+		"fr": "Fais-le en 2 ou 3 phrases: quelle application c'est et ce que fait l'utilisateur."
+	},
+	"auto": {
+		"es": "Sé claro y conciso, de arriba abajo.",
+		"en": "Be clear and concise, from top to bottom.",
+		"fr": "Sois clair et concis, de haut en bas."
+	},
+	"high": {
+		"es": "Sé exhaustivo y recorre la pantalla de arriba abajo y de izquierda a derecha.",
+		"en": "Be exhaustive and go through the screen from top to bottom and left to right.",
+		"fr": "Sois exhaustif et parcours l'écran de haut en bas et de gauche à droite."
+	}
+}
+
+
+def buildScreenTextPrompt(window, text, detail, language):
+	"""Prompt de la pantalla con el texto accesible de la ventana activa"""
+	template = SCREEN_TEXT_PROMPTS.get(language, SCREEN_TEXT_PROMPTS["es"])
+	instructions = SCREEN_TEXT_DETAIL.get(detail, SCREEN_TEXT_DETAIL["auto"])
+	return template.format(window=window, text=text, detail=instructions.get(language, instructions["es"]))
+
+
+class WindowText:
+	"""Texto accesible de una ventana"""
+	
+	def __init__(self, window, lines):
+		"""
+		Args:
+			window (str): Nombre de la ventana
+			lines (list): Una línea por objeto, con su tipo de control
+		"""
+		self.window = window
+		self.lines = lines
+	
+	@property
+	def text(self):
+		return "\n".join(self.lines)
+
+
+def _objectText(obj):
+	"""
+	Texto de un objeto: nombre y valor, o el texto dibujado si no expone ninguno
+	
+	Returns:
+		str: Texto sin espacios sobrantes, vacío si no tiene
+	"""
+	name = (obj.name or "").strip()
+	value = (obj.value or "").strip()[:MAX_VALUE_CHARS]
+	if value and value != name:
+		text = f"{name}: {value}" if name else value
+	else:
+		text = name
+	if not text and not obj.childCount:
+		# Controles dibujados a mano: el modelo de pantalla tiene su texto
+		try:
+			text = " ".join((obj.displayText or "").split())[:MAX_VALUE_CHARS]
+		except Exception:
+			text = ""
+	return text
+
+
+def collectWindowText(maxObjects=MAX_TEXT_OBJECTS, maxChars=MAX_TEXT_CHARS):
+	"""
+	Recorre los objetos visibles de la ventana activa en orden y recoge su texto
+	
+	Debe llamarse desde el hilo principal de NVDA
+	
+	Args:
+		maxObjects (int): Objetos recorridos como máximo
+		maxChars (int): Caracteres de texto como máximo
+	
+	Returns:
+		WindowText: Texto de la ventana, o None si tiene demasiado poco
+	"""
+	foreground = api.getForegroundObject()
+	if foreground is None:
+		return None
+	deadline = time.monotonic() + COLLECT_TIME_LIMIT
+	lines = []
+	chars = 0
+	visited = 0
+	stack = [(foreground, 0)]
+	while stack and visited < maxObjects and chars < maxChars:
+		if time.monotonic() > deadline:
+			log.debug("Tiempo agotado al recoger el texto accesible")
+			break
+		obj, depth = stack.pop()
+		visited += 1
+		try:
+			states = obj.states
+			if controlTypes.State.INVISIBLE in states or controlTypes.State.OFFSCREEN in states:
+				continue
+			# El contenido de los campos de contraseña nunca se envía al proveedor
+			if controlTypes.State.PROTECTED in states or obj.role == controlTypes.Role.PASSWORDEDIT:
+				continue
+			text = _objectText(obj)
+			if text and (not lines or not lines[-1].endswith(text)):
+				line = f"{obj.role.displayString}: {text}"
+				lines.append(line)
+				chars += len(line) + 1
+			if depth < MAX_TEXT_DEPTH:
+				# Se apilan al revés para recorrerlos en el orden de la ventana
+				stack.extend((child, depth + 1) for child in reversed(obj.children))
+		except Exception as e:
+			log.debug(f"Objeto sin texto accesible: {e}")
+	
+	if sum(len(line) for line in lines) < MIN_TEXT_CHARS:
+		return None
+	text = "\n".join(lines)[:maxChars]
+	log.info(f"Texto accesible de la ventana activa: {len(lines)} líneas, {len(text)} caracteres de {visited} objetos")
+	return WindowText((foreground.name or "").strip(), text.split("\n"))
+
+
+class ScreenTextDescriber:
+	"""Describe la pantalla reducida junto con el texto accesible de la ventana activa"""
+	
+	def __init__(self, client, imageCapture, detail="auto", language="es"):
+		"""
+		Args:
+			client: Cliente de API con describeWithPromptAsync
+			imageCapture (ImageCapture): Captura la pantalla
+			detail (str): Nivel de detalle
+			language (str): Idioma de la descripción
+		"""
+		self.client = client
+		self.imageCapture = imageCapture
+		self.detail = detail if detail in ("low", "high") else "auto"
+		self.language = language
+	
+	async def describeAsync(self, windowText, cancelToken=None):
+		"""
+		Captura la pantalla y la describe con el texto accesible
+		
+		Salvo en detalle alto la imagen se envía con detalle bajo: el texto ya no hay que
+		leerlo en ella
+		
+		Args:
+			windowText (WindowText): Texto de la ventana activa
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			str: Descripción de la pantalla
+		"""
+		loop = asyncio.get_running_loop()
+		imageData = await loop.run_in_executor(None, self._captureScreen, cancelToken)
+		raiseIfCancelled(cancelToken)
+		return await self.client.describeWithPromptAsync(
+			[imageData],
+			buildScreenTextPrompt(windowText.window, windowText.text, self.detail, self.language),
+			detail="high" if self.detail == "high" else "low",
+			maxTokens=SCREEN_TEXT_MAX_TOKENS[self.detail],
+			cancelToken=cancelToken
+		)
+	
+	def _captureScreen(self, cancelToken):
+		"""Captura y codifica la pantalla a resolución reducida"""
+		screenshot = self.imageCapture.grabFullScreen(cancelToken)
+		try:
+			return encodeImage(screenshot, SCREEN_TEXT_IMAGE_SIZE)
+		finally:
+			screenshot.close()
@@ -5,6 +5,9 @@ Paquete de clientes API para servicios de IA
 
 from .openai_client import OpenAIClient
 from .gemini_client import GeminiClient
+from .hedged_client import HedgedClient
+from .local_client import LocalClient
+from .compatible_client import OpenAICompatibleClient
 
-__all__ = ['OpenAIClient', 'GeminiClient']
+__all__ = ['OpenAIClient', 'GeminiClient', 'HedgedClient', 'LocalClient', 'OpenAICompatibleClient']
 
@@ -0,0 +1,152 @@
+# -*- coding: UTF-8 -*-
+"""
+Cliente para servidores compatibles con la API de OpenAI
+Servidores propios o de la red local (Ollama, LM Studio, vLLM, llama.cpp...) que exponen
+chat/completions con visión: mismo formato de petición que OpenAI, con la dirección base,
+el modelo y la autenticación configurables
+"""
+
+import re
+from logHandler import log
+
+from ..asyncCore import asyncCore
+from ..latencyTracker import latencyTracker
+from .openai_client import OpenAIClient
+
+# Fragmentos del nombre de los modelos con visión más habituales en servidores locales
+VISION_MODEL_HINTS = (
+	"vision", "-vl", "vl-", "llava", "bakllava", "pixtral", "minicpm-v", "moondream",
+	"gemma3", "gemma-3", "qwen2.5vl", "qwen3-vl", "internvl", "smolvlm", "granite3.2-vision"
+)
+
+
+def normalizeBaseURL(baseUrl):
+	"""
+	Dirección base del servidor sin barra final ni la ruta de chat/completions
+	
+	Args:
+		baseUrl (str): Dirección indicada por el usuario (p. ej. http://192.168.1.10:11434/v1)
+	
+	Returns:
+		str: Dirección base normalizada
+	"""
+	baseUrl = (baseUrl or "").strip().rstrip("/")
+	baseUrl = re.sub(r"/chat/completions$", "", baseUrl)
+	if baseUrl and not re.match(r"^https?://", baseUrl, re.IGNORECASE):
+		baseUrl = f"http://{baseUrl}"
+	return baseUrl
+
+
+class OpenAICompatibleClient(OpenAIClient):
+	"""Cliente para un servidor propio compatible con chat/completions de OpenAI"""
+	
+	PROVIDER = "compatible"
+	NAME = "servidor compatible con OpenAI"
+	MAX_IMAGES_PER_REQUEST = 4  # Los modelos locales suelen admitir pocas imágenes por petición
+	
+	def __init__(self, baseUrl, model="", apiKey=""):
+		"""
+		Inicializa el cliente
+		
+		Args:
+			baseUrl (str): Dirección base del servidor (la que precede a /chat/completions)
+			model (str): Modelo a usar; vacío para elegirlo entre los que anuncia el servidor
+			apiKey (str): Clave para la cabecera Authorization; vacía si el servidor no la pide
+		"""
+		super().__init__(apiKey)
+		self.baseUrl = normalizeBaseURL(baseUrl)
+		self.API_URL = f"{self.baseUrl}/chat/completions"
+		self.MODELS_URL = f"{self.baseUrl}/models"
+		self.model = model.strip()
+		self._modelDetected = bool(self.model)
+	
+	def _headers(self):
+		"""Cabeceras de autenticación (ninguna si no hay clave)"""
+		if not self.apiKey:
+			return {}
+		return super()._headers()
+	
+	async def listModelsAsync(self):
+		"""
+		Lista los modelos que anuncia el servidor (GET /models)
+		
+		Returns:
+			list: Identificadores de los modelos
+		
+		Raises:
+			Exception: Si el servidor no responde o la respuesta no es válida
+		"""
+		response = await asyncCore.request(
+			"GET",
+			self.MODELS_URL,
+			headers=self._headers(),
+			timeout=latencyTracker.getListTimeouts(self.PROVIDER)
+		)
+		if response.status_code == 401:
+			raise Exception("El servidor compatible pide una API key válida")
+		response.raise_for_status()
+		latencyTracker.recordConnect(self.PROVIDER, response)
+		latencyTracker.record((self.PROVIDER, "list"), response.elapsed)
+		try:
+			models = [item["id"] for item in response.json().get("data", []) if item.get("id")]
+		except (ValueError, AttributeError, KeyError, TypeError):
+			raise Exception("El servidor no devolvió una lista de modelos compatible con OpenAI")
+		log.info(f"Modelos del servidor compatible: {', '.join(models) or 'ninguno'}")
+		return models
+	
+	@staticmethod
+	def chooseModel(models):
+		"""
+		Elige el modelo que probablemente tiene visión
+		
+		Args:
+			models (list): Identificadores de los modelos del servidor
+		
+		Returns:
+			str: Primer modelo con visión según su nombre, o el primero de la lista
+		"""
+		for model in models:
+			if any(hint in model.lower() for hint in VISION_MODEL_HINTS):
+				return model
+		return models[0] if models else ""
+	
+	async def _ensureModelAsync(self):
+		"""Elige el modelo del servidor la primera vez si no se configuró ninguno"""
+		if self._modelDetected:
+			return
+		self.model = self.chooseModel(await self.listModelsAsync())
+		if not self.model:
+			raise Exception("El servidor compatible no anuncia ningún modelo; indica uno en las opciones")
+		self._modelDetected = True
+		log.info(f"Modelo del servidor compatible: {self.model}")
+	
+	async def _postAsync(self, payload, detailLevel, cancelToken=None, transport=None, timeout=None, stream=None):
+		"""Envía la petición con el modelo detectado (ver OpenAIClient._postAsync)"""
+		await self._ensureModelAsync()
+		payload["model"] = self.model
+		return await super()._postAsync(payload, detailLevel, cancelToken, transport, timeout, stream)
+	
+	async def testConnectionAsync(self):
+		"""
+		Prueba la conexión con el servidor listando sus modelos
+		
+		Returns:
+			bool: True si el servidor responde con una lista de modelos
+		"""
+		try:
+			models = await self.listModelsAsync()
+		except Exception as e:
+			log.error(f"Error al probar conexión con el servidor compatible: {e}")
+			return False
+		if self.model and self.model not in models:
+			log.warning(f"El servidor compatible no anuncia el modelo configurado: {self.model}")
+		return True
+	
+	def listModels(self):
+		"""
+		Lista los modelos del servidor (bloqueante)
+		
+		Returns:
+			list: Identificadores de los modelos
+		"""
+		return asyncCore.run(self.listModelsAsync())
@@ -4,56 +4,300 @@ Cliente para Google Gemini API
 Basado en la documentación oficial: https://ai.google.dev/gemini-api/docs/vision
 """
 
+import asyncio
 import json
+import mimetypes
+import time
+from urllib.parse import urlparse
 from logHandler import log
 
-try:
-	import requests
-	REQUESTS_AVAILABLE = True
-except ImportError:
-	log.warning("requests no disponible")
-	REQUESTS_AVAILABLE = False
+from ..asyncCore import asyncCore, ConnectionFailed, ConnectTimeout, RequestTimeout, HttpStatusError, RequestRejected
+from ..cancellation import raiseIfCancelled
+from ..latencyTracker import latencyTracker, RollingSamples
+from .multiImage import (
+	buildMultiImagePrompt, buildContactSheetPrompt, contactSheetMaxTokens, imageLabel, maxTokensFor,
+	parseNumberedAnswers, MULTI_IMAGE_TIMEOUT
+)
+from .structured import buildStructuredPrompt, structuredMaxTokens, ResponseStream, StructuredDescription, SummaryWatcher
 
 
 class GeminiClient:
 	"""Cliente para interactuar con Google Gemini"""
 	
+	PROVIDER = "gemini"
 	# URL correcta según documentación oficial
 	API_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+	STREAM_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent"
+	MODELS_URL = "https://generativelanguage.googleapis.com/v1beta/models"
 	DEFAULT_MODEL = "gemini-1.5-flash-latest"  # Modelo con soporte para visión
 	FALLBACK_MODELS = ["gemini-1.5-flash", "gemini-1.5-pro-latest", "gemini-pro-vision"]
 	
-	def __init__(self, apiKey):
+	# Clasificación de modelos por latencia
+	MAX_PROBE_MODELS = 4  # Modelos candidatos que se prueban con la imagen de sondeo
+	# Modelos que no aceptan imágenes o no generan texto
+	EXCLUDED_MODEL_KEYWORDS = ("embedding", "tts", "image-generation", "audio", "live", "aqa")
+	# Errores HTTP propios del modelo: se pasa al siguiente de la cadena
+	MODEL_FALLBACK_STATUS = (404, 429, 500, 503)
+	MODEL_COOLDOWN = 300  # Segundos que un modelo con errores queda fuera de la cadena
+	MAX_IMAGES_PER_REQUEST = 16  # Imágenes por petición al describir varias a la vez
+	# Tipos de imagen que Gemini acepta por dirección (el tipo se deduce de la extensión)
+	URL_IMAGE_TYPES = ("image/png", "image/jpeg", "image/webp", "image/heic", "image/heif")
+	# PNG de 16x16 (cuadrado rojo sobre fondo blanco) usado para sondear modelos
+	PROBE_IMAGE = (
+		"iVBORw0KGgoAAAANSUhEUgAAABAAAAAQCAIAAACQkWg2AAAAG0lEQVR42mP4TyJgGOwaGBiwo1EN9NUw"
+		"NNMSAKgAfZ8a7/XqAAAAAElFTkSuQmCC"
+	)
+	
+	# Presupuesto de razonamiento (thinking) por nivel de detalle: 0 = mínimo, -1 = dinámico
+	DEFAULT_THINKING_BUDGETS = {"low": 0, "auto": 0, "high": -1}
+	THINKING_MIN_BUDGET_PRO = 128  # Los modelos "pro" no permiten desactivar el razonamiento
+	THINKING_DYNAMIC_ALLOWANCE = 2000  # Tokens reservados cuando el presupuesto es dinámico
+	
+	# Límite de tokens visibles según las longitudes observadas
+	OUTPUT_TOKEN_DEFAULTS = {"low": 200, "auto": 800, "high": 2000}
+	OUTPUT_TOKEN_FLOORS = {"low": 100, "auto": 300, "high": 800}
+	OUTPUT_TOKEN_MARGIN = 1.5
+	
+	# Longitudes de respuesta observadas por (modelo, nivel de detalle), compartidas entre instancias
+	_outputTokenSamples = {}
+	
+	def __init__(self, apiKey, thinkingBudgets=None):
 		"""
 		Inicializa el cliente de Gemini
 		
 		Args:
 			apiKey (str): Clave API de Google Gemini
+			thinkingBudgets (dict): Presupuesto de razonamiento por nivel de detalle
+				("low", "auto", "high"); 0 = mínimo, -1 = dinámico
 		"""
 		self.apiKey = apiKey
+		self.thinkingBudgets = dict(self.DEFAULT_THINKING_BUDGETS)
+		if thinkingBudgets:
+			self.thinkingBudgets.update(thinkingBudgets)
 		self.model = self.DEFAULT_MODEL
 		self._modelDetected = False  # Flag para saber si ya detectamos el modelo
+		self.modelChain = [self.DEFAULT_MODEL]  # Modelos ordenados por latencia
+		self._modelFailures = {}  # modelo -> instante del último error propio del modelo
 	
-	def describeImage(self, imageBase64, detail="auto", language="es", maxTokens=5000):
+	async def describeImageAsync(self, imageBase64, detail="auto", language="es", maxTokens=5000, cancelToken=None, transport=None):
 		"""
-		Describe una imagen usando Gemini
+		Describe una imagen usando Gemini dentro del núcleo asíncrono
 		
 		Args:
 			imageBase64 (str): Imagen codificada en base64
-			detail (str): Nivel de detalle (no usado en Gemini)
+			detail (str): Nivel de detalle: elige el prompt, el razonamiento y el límite de salida
 			language (str): Idioma de respuesta
-			maxTokens (int): Máximo de tokens en la respuesta
+			maxTokens (int): Límite máximo de tokens de salida (incluye los de razonamiento)
+			cancelToken (CancellationToken): Token de cancelación; la petición en curso
+				se aborta cancelando el futuro que la ejecuta
+			transport: Objeto con el método request() del núcleo asíncrono que envía la
+				petición (por defecto asyncCore; HelperTransport para el proceso auxiliar)
 		
 		Returns:
 			str: Descripción de la imagen
 		"""
-		if not REQUESTS_AVAILABLE:
-			raise Exception("requests no está instalado. Instala con: pip install requests")
+		# Normalizar nivel de detalle (cualquier otro valor equivale a "auto")
+		if detail not in ("low", "high"):
+			detail = "auto"
+		
+		payload = self._buildPayload(imageBase64, detail, language)
+		return await self._generateAsync(payload, detail, maxTokens, cancelToken, transport)
+	
+	async def describeImageURLAsync(self, url, detail="auto", language="es", maxTokens=5000, cancelToken=None):
+		"""
+		Describe una imagen pública que descarga el propio Gemini
+		
+		Args:
+			url (str): Dirección http(s) pública de la imagen
+			detail (str): Nivel de detalle
+			language (str): Idioma de respuesta
+			maxTokens (int): Límite máximo de tokens de salida (incluye los de razonamiento)
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			str: Descripción de la imagen
+		
+		Raises:
+			RequestRejected: Si el tipo de imagen no se conoce o Gemini no acepta la dirección
+		"""
+		mimeType = mimetypes.guess_type(urlparse(url).path)[0]
+		if mimeType not in self.URL_IMAGE_TYPES:
+			raise RequestRejected(f"Tipo de imagen no admitido por dirección: {mimeType}")
+		if detail not in ("low", "high"):
+			detail = "auto"
+		payload = self._buildPayload(None, detail, language, imageUrl=url, mimeType=mimeType)
+		return await self._generateAsync(payload, detail, maxTokens, cancelToken)
+	
+	async def describeStructuredAsync(self, imageBase64, detail="auto", language="es", cancelToken=None, transport=None, onSummary=None):
+		"""
+		Describe una imagen con una respuesta JSON que empieza por un resumen de una línea
+		
+		La respuesta se pide en streaming (salvo con el proceso auxiliar) y onSummary se
+		llama en cuanto el resumen está completo, antes de que termine la respuesta
+		
+		Args:
+			imageBase64 (str): Imagen codificada en base64
+			detail (str): Nivel de detalle
+			language (str): Idioma de respuesta
+			cancelToken (CancellationToken): Token de cancelación, o None
+			transport: Transporte de la petición (por defecto asyncCore)
+			onSummary: Función (resumen) llamada desde el núcleo asíncrono, o None
+		
+		Returns:
+			StructuredDescription: Resumen, texto detectado y apartados
+		"""
+		if detail not in ("low", "high"):
+			detail = "auto"
+		payload = {"contents": [{"parts": [
+			{"text": buildStructuredPrompt(detail, language)},
+			{"inline_data": {"mime_type": "image/png", "data": imageBase64}}
+		]}]}
+		stream = None
+		if transport is None:
+			stream = ResponseStream(
+				lambda event: "".join(
+					part.get("text", "")
+					for part in event["candidates"][0]["content"]["parts"]
+					if not part.get("thought")
+				),
+				SummaryWatcher(onSummary) if onSummary else None
+			)
+		outputLimit = structuredMaxTokens(detail)
+		answer = await self._generateAsync(
+			payload,
+			detail,
+			outputLimit + self.THINKING_DYNAMIC_ALLOWANCE,
+			cancelToken,
+			transport,
+			outputLimit=outputLimit,
+			stream=stream,
+			responseMimeType="application/json"
+		)
+		return StructuredDescription.parse(answer, language)
+	
+	async def describeImagesAsync(self, imagesBase64, detail="auto", language="es", cancelToken=None, transport=None):
+		"""
+		Describe varias imágenes en una sola petición
+		
+		Args:
+			imagesBase64 (list): Imágenes codificadas en base64 (como mucho MAX_IMAGES_PER_REQUEST)
+			detail (str): Nivel de detalle
+			language (str): Idioma de respuesta
+			cancelToken (CancellationToken): Token de cancelación, o None
+			transport: Transporte de la petición (por defecto asyncCore)
+		
+		Returns:
+			list: Descripción de cada imagen en el mismo orden (None si faltó en la respuesta)
+		"""
+		if detail not in ("low", "high"):
+			detail = "auto"
+		
+		parts = [{"text": buildMultiImagePrompt(len(imagesBase64), detail, language)}]
+		for number, imageBase64 in enumerate(imagesBase64, 1):
+			parts.append({"text": imageLabel(number, language)})
+			parts.append({"inline_data": {"mime_type": "image/png", "data": imageBase64}})
+		payload = {"contents": [{"parts": parts}]}
+		
+		outputLimit = maxTokensFor(len(imagesBase64), detail)
+		text = await self._generateAsync(
+			payload,
+			detail,
+			outputLimit + self.THINKING_DYNAMIC_ALLOWANCE,
+			cancelToken,
+			transport,
+			timeout=MULTI_IMAGE_TIMEOUT,
+			outputLimit=outputLimit
+		)
+		return parseNumberedAnswers(text, len(imagesBase64))
+	
+	async def labelContactSheetAsync(self, sheetBase64, count, language="es", cancelToken=None, transport=None):
+		"""
+		Pide una etiqueta corta para cada icono numerado de una hoja de contactos
+		
+		Args:
+			sheetBase64 (str): Hoja de contactos codificada en base64
+			count (int): Número de iconos de la hoja
+			language (str): Idioma de las etiquetas
+			cancelToken (CancellationToken): Token de cancelación, o None
+			transport: Transporte de la petición (por defecto asyncCore)
 		
+		Returns:
+			list: Etiqueta de cada icono en orden (None si faltó en la respuesta)
+		"""
+		payload = {"contents": [{"parts": [
+			{"text": buildContactSheetPrompt(count, language)},
+			{"inline_data": {"mime_type": "image/png", "data": sheetBase64}}
+		]}]}
+		
+		# Etiquetas cortas: razonamiento mínimo del nivel bajo
+		outputLimit = contactSheetMaxTokens(count)
+		text = await self._generateAsync(
+			payload,
+			"low",
+			outputLimit + self.THINKING_DYNAMIC_ALLOWANCE,
+			cancelToken,
+			transport,
+			timeout=MULTI_IMAGE_TIMEOUT,
+			outputLimit=outputLimit
+		)
+		return parseNumberedAnswers(text, count)
+	
+	async def describeWithPromptAsync(self, imagesBase64, prompt, detail="auto", maxTokens=1000, cancelToken=None, transport=None):
+		"""
+		Envía un prompt propio con una o varias imágenes
+		
+		Args:
+			imagesBase64 (list): Imágenes codificadas en base64
+			prompt (str): Instrucciones de la petición
+			detail (str): Nivel de detalle: elige el razonamiento
+			maxTokens (int): Límite de tokens de salida (sin contar el razonamiento)
+			cancelToken (CancellationToken): Token de cancelación, o None
+			transport: Transporte de la petición (por defecto asyncCore)
+		
+		Returns:
+			str: Texto de la respuesta
+		"""
+		if detail not in ("low", "high"):
+			detail = "auto"
+		
+		parts = [{"text": prompt}]
+		for imageBase64 in imagesBase64:
+			parts.append({"inline_data": {"mime_type": "image/png", "data": imageBase64}})
+		return await self._generateAsync(
+			{"contents": [{"parts": parts}]},
+			detail,
+			maxTokens + self.THINKING_DYNAMIC_ALLOWANCE,
+			cancelToken,
+			transport,
+			timeout=MULTI_IMAGE_TIMEOUT,
+			outputLimit=maxTokens
+		)
+	
+	async def _generateAsync(self, payload, detail, maxTokens, cancelToken=None, transport=None, timeout=None, outputLimit=None,
+			stream=None, responseMimeType=None):
+		"""
+		Envía una petición generateContent recorriendo la cadena de modelos
+		
+		Args:
+			payload (dict): Cuerpo de la petición sin generationConfig
+			detail (str): Nivel de detalle normalizado
+			maxTokens (int): Límite máximo de tokens de salida (incluye los de razonamiento)
+			cancelToken (CancellationToken): Token de cancelación, o None
+			transport: Transporte de la petición (por defecto asyncCore)
+			timeout (tuple): Timeouts fijos; None para usar los adaptativos y registrar
+				la latencia y la longitud de la respuesta
+			outputLimit (int): Tokens de texto visible; None para calcularlos a partir
+				de las respuestas observadas
+			stream (ResponseStream): Lector de la respuesta para pedirla en streaming, o None
+			responseMimeType (str): Tipo de la respuesta ("application/json"), o None para texto
+		
+		Returns:
+			str: Texto de la respuesta
+		"""
 		# Detectar modelo disponible si no se ha hecho antes
 		if not self._modelDetected:
 			log.info("Detectando modelo de Gemini disponible...")
-			if not self._detectAvailableModel():
+			if not await self._detectAvailableModelAsync():
 				raise Exception(
 					"No se pudo encontrar un modelo de Gemini compatible. "
 					"Verifica que tu API key tenga acceso a Generative AI API en https://aistudio.google.com/apikey"
@@ -62,176 +306,74 @@ class GeminiClient:
 			log.info(f"Usando modelo de Gemini: {self.model}")
 		
 		try:
-			# Preparar prompt según nivel de detalle e idioma
-			if detail == "low":
-				# Descripción breve (usa menos tokens)
-				prompts = {
-					"es": "Describe brevemente esta imagen en 1-2 frases: qué es y qué está sucediendo.",
-					"en": "Briefly describe this image in 1-2 sentences: what it is and what's happening.",
-					"fr": "Décris brièvement cette image en 1-2 phrases: ce que c'est et ce qui se passe."
-				}
-				maxTokensToUse = 300  # Aumentado de 150 a 300 para thinking tokens
-			elif detail == "high":
-				# Descripción muy detallada (usa más tokens)
-				prompts = {
-					"es": (
-						"Describe esta imagen de forma muy detallada y estructurada para una persona con discapacidad visual. "
-						"Incluye:\n"
-						"1. Escena general y contexto detallado\n"
-						"2. Objetos principales y secundarios con su disposición espacial exacta\n"
-						"3. Personas presentes: número, posición, edad aproximada, acciones, expresiones, ropa y accesorios\n"
-						"4. Colores específicos, iluminación, sombras y texturas\n"
-						"5. Texto visible: transcribe todo el texto legible\n"
-						"6. Ambiente, emociones y atmósfera que transmite\n"
-						"7. Detalles de fondo y elementos menos prominentes\n"
-						"Sé exhaustivo, específico y meticuloso."
-					),
-					"en": (
-						"Describe this image in great detail and structured way for a visually impaired person. "
-						"Include:\n"
-						"1. General scene and detailed context\n"
-						"2. Main and secondary objects with exact spatial arrangement\n"
-						"3. People present: number, position, approximate age, actions, expressions, clothing and accessories\n"
-						"4. Specific colors, lighting, shadows and textures\n"
-						"5. Visible text: transcribe all readable text\n"
-						"6. Mood, emotions and atmosphere conveyed\n"
-						"7. Background details and less prominent elements\n"
-						"Be exhaustive, specific and meticulous."
-					),
-					"fr": (
-						"Décris cette image de manière très détaillée et structurée pour une personne malvoyante. "
-						"Inclure:\n"
-						"1. Scène générale et contexte détaillé\n"
-						"2. Objets principaux et secondaires avec disposition spatiale exacte\n"
-						"3. Personnes présentes: nombre, position, âge approximatif, actions, expressions, vêtements et accessoires\n"
-						"4. Couleurs spécifiques, éclairage, ombres et textures\n"
-						"5. Texte visible: transcrire tout le texte lisible\n"
-						"6. Ambiance, émotions et atmosphère transmises\n"
-						"7. Détails d'arrière-plan et éléments moins proéminents\n"
-						"Sois exhaustif, spécifique et méticuleux."
-					)
-				}
-				maxTokensToUse = maxTokens
-			else:  # auto o cualquier otro valor = descripción balanceada
-				# Descripción equilibrada (balance entre detalle y tokens)
-				prompts = {
-					"es": (
-						"Describe esta imagen de forma clara para una persona con discapacidad visual. "
-						"Incluye: escena general, objetos principales, personas (si las hay), colores relevantes, "
-						"texto visible, y el mensaje o propósito de la imagen. Sé específico pero conciso."
-					),
-					"en": (
-						"Describe this image clearly for a visually impaired person. "
-						"Include: general scene, main objects, people (if any), relevant colors, "
-						"visible text, and the message or purpose of the image. Be specific but concise."
-					),
-					"fr": (
-						"Décris cette image clairement pour une personne malvoyante. "
-						"Inclure: scène générale, objets principaux, personnes (le cas échéant), couleurs pertinentes, "
-				"texte visible, et le message ou l'objectif de l'image. Sois précis mais concis."
-			)
-		}
-			maxTokensToUse = 2000  # Aumentado para thinking tokens de Gemini
-			
-			prompt = prompts.get(language, prompts["es"])
-			
-			# URL con API key como query parameter
-			url = self.API_URL.format(model=self.model) + f"?key={self.apiKey}"
-			
 			# Preparar headers
 			headers = {
 				"Content-Type": "application/json"
 			}
 			
-			# Preparar payload según formato REST de Gemini
-			payload = {
-				"contents": [{
-					"parts": [
-						{"text": prompt},
-						{
-							"inline_data": {
-								"mime_type": "image/png",
-								"data": imageBase64
-							}
-						}
-					]
-				}],
-				"generationConfig": {
-					"maxOutputTokens": maxTokensToUse,
-					"temperature": 0.4
-				}
-			}
-			
-			# Hacer petición
-			log.info("Enviando petición a Google Gemini...")
-			log.debug(f"URL: {self.API_URL.format(model=self.model)}")
-			
-			response = requests.post(
-				url,
-				headers=headers,
-				json=payload,
-				timeout=30
-			)
-			
-			log.info(f"Respuesta Gemini - Status: {response.status_code}")
+			# Recorrer la cadena de modelos: si uno devuelve un error propio
+			# del modelo (no encontrado, cuota, sobrecarga) se pasa al siguiente.
+			# self.model no cambia: las peticiones simultáneas registran latencia y
+			# tokens bajo el modelo que realmente respondió
+			for model in self._getModelsToTry():
+				# URL con API key como query parameter
+				if stream:
+					url = self.STREAM_URL.format(model=model) + f"?alt=sse&key={self.apiKey}"
+				else:
+					url = self.API_URL.format(model=model) + f"?key={self.apiKey}"
+				
+				# La configuración de razonamiento depende del modelo
+				payload["generationConfig"] = self._buildGenerationConfig(model, detail, maxTokens, outputLimit)
+				if responseMimeType:
+					payload["generationConfig"]["responseMimeType"] = responseMimeType
+				
+				# Hacer petición
+				raiseIfCancelled(cancelToken)
+				log.info(f"Enviando petición a Google Gemini ({model})...")
+				
+				start = time.monotonic()
+				options = {"onChunk": stream.feed} if stream else {}
+				response = await (transport or asyncCore).request(
+					"POST",
+					url,
+					headers=headers,
+					json=payload,
+					timeout=timeout or latencyTracker.getTimeouts(self.PROVIDER, model, detail),
+					**options
+				)
+				latencyTracker.recordConnect(self.PROVIDER, response)
+				
+				log.info(f"Respuesta Gemini - Status: {response.status_code}")
+				
+				if response.status_code in self.MODEL_FALLBACK_STATUS:
+					log.warning(f"Modelo {model} falló con status {response.status_code}, probando el siguiente")
+					self._modelFailures[model] = time.monotonic()
+					continue
+				break
 			
 			# Verificar respuesta
 			if response.status_code != 200:
 				log.error(f"Error de Gemini. Respuesta: {response.text[:500]}")
 				response.raise_for_status()
 			
-			# Extraer descripción
-			result = response.json()
+			# Extraer descripción (en streaming, el último evento trae el uso de tokens)
+			if stream:
+				stream.flush()
+				result = stream.lastEvent
+			else:
+				result = response.json()
 			log.info(f"Respuesta completa de Gemini: {json.dumps(result, indent=2)[:2000]}")
 			
-			if "candidates" not in result or len(result["candidates"]) == 0:
-				log.error(f"Estructura de respuesta: {list(result.keys())}")
-				raise Exception("No se recibió respuesta de Gemini")
-			
-			candidate = result["candidates"][0]
-			log.info(f"Candidate completo: {json.dumps(candidate, indent=2)[:1000]}")
-			
-			# Verificar si hay filtros de seguridad
-			if "finishReason" in candidate:
-				finish_reason = candidate["finishReason"]
-				log.info(f"Finish reason: {finish_reason}")
-				if finish_reason == "SAFETY":
-					raise Exception("La respuesta fue bloqueada por filtros de seguridad de Gemini")
-				elif finish_reason == "RECITATION":
-					raise Exception("La respuesta fue bloqueada por detección de recitación")
-				elif finish_reason == "MAX_TOKENS":
-					# En Gemini 2.5, los thinking tokens pueden consumir todo el límite
-					# Si hay contenido parcial, usarlo con advertencia
-					log.warning("Gemini alcanzó MAX_TOKENS, verificando si hay contenido parcial...")
-					if "content" not in candidate or "parts" not in candidate.get("content", {}):
-						raise Exception(
-							"El modelo alcanzó el límite de tokens sin generar respuesta. "
-							"Intenta usar el nivel de detalle 'Bajo' en las preferencias."
-						)
-					# Si hay contenido, continuar y usarlo (puede estar truncado)
-			
-			if "content" not in candidate:
-				log.error(f"Candidate structure: {json.dumps(candidate, indent=2)[:500]}")
-				raise Exception("Respuesta de Gemini sin campo 'content'")
-			
-			content = candidate["content"]
-			if "parts" not in content:
-				log.error(f"Content structure: {json.dumps(content, indent=2)[:500]}")
-				raise Exception("Respuesta de Gemini sin campo 'parts'")
-			
-			parts = content["parts"]
-			if not parts or len(parts) == 0:
-				raise Exception("Respuesta de Gemini vacía")
-			
-			description = parts[0].get("text", "")
-			if not description:
-				log.error(f"Part structure: {json.dumps(parts[0], indent=2)[:500]}")
-				raise Exception("No se encontró texto en la respuesta")
+			if timeout is None and outputLimit is None and result.get("candidates"):
+				self._recordOutputTokens(model, detail, result.get("usageMetadata", {}))
+			description = (stream.text.strip() if stream else "") or self._parseDescription(result)
 			
+			if timeout is None:
+				latencyTracker.record((self.PROVIDER, model, detail), time.monotonic() - start)
 			log.info("Descripción recibida de Gemini")
-			return description.strip()
-			
-		except requests.exceptions.HTTPError as e:
+			return description
+		
+		except HttpStatusError as e:
 			error_msg = ""
 			try:
 				error_data = e.response.json()
@@ -243,10 +385,10 @@ class GeminiClient:
 				if "API_KEY_INVALID" in error_msg or "API key not valid" in error_msg:
 					raise Exception("API key de Gemini inválida o no tiene permisos para Generative AI API")
 				else:
-					raise Exception(f"Error en la petición: {error_msg}")
+					raise RequestRejected(f"Error en la petición: {error_msg}")
 			elif e.response.status_code == 404:
 				raise Exception(
-					f"Modelo '{self.model}' no encontrado. "
+					f"Modelo '{model}' no encontrado. "
 					"Verifica que tu API key tenga acceso a Generative AI API "
 					"y que esté habilitada en https://aistudio.google.com/apikey"
 				)
@@ -257,10 +399,13 @@ class GeminiClient:
 			else:
 				raise Exception(f"Error HTTP {e.response.status_code}: {error_msg}")
 		
-		except requests.exceptions.Timeout:
+		except ConnectTimeout:
+			raise Exception("No se pudo establecer conexión con Gemini")
+		
+		except RequestTimeout:
 			raise Exception("Tiempo de espera agotado al conectar con Gemini")
 		
-		except requests.exceptions.RequestException as e:
+		except ConnectionFailed as e:
 			log.error(f"Error en GeminiClient: {e}", exc_info=True)
 			raise Exception(f"Error de conexión con Gemini: {str(e)}")
 		
@@ -270,26 +415,203 @@ class GeminiClient:
 			log.error(f"Error inesperado en GeminiClient: {e}", exc_info=True)
 			raise Exception(f"Error al procesar respuesta de Gemini: {str(e)}")
 	
-	def _detectAvailableModel(self):
+	def _buildPayload(self, imageBase64, detail, language, imageUrl=None, mimeType=None):
+		"""
+		Construye el cuerpo de la petición de descripción (sin generationConfig)
+		
+		Args:
+			imageBase64 (str): Imagen codificada en base64 (None si se pasa imageUrl)
+			detail (str): Nivel de detalle normalizado ("low", "auto" o "high")
+			language (str): Idioma de respuesta
+			imageUrl (str): Dirección pública de la imagen, que descarga Gemini, o None
+			mimeType (str): Tipo de la imagen de imageUrl
+		
+		Returns:
+			dict: Payload en formato REST de Gemini
+		"""
+		# Preparar prompt según nivel de detalle e idioma
+		if detail == "low":
+			# Descripción breve (usa menos tokens)
+			prompts = {
+				"es": "Describe brevemente esta imagen en 1-2 frases: qué es y qué está sucediendo.",
+				"en": "Briefly describe this image in 1-2 sentences: what it is and what's happening.",
+				"fr": "Décris brièvement cette image en 1-2 phrases: ce que c'est et ce qui se passe."
+			}
+		elif detail == "high":
+			# Descripción muy detallada (usa más tokens)
+			prompts = {
+				"es": (
+					"Describe esta imagen de forma muy detallada y estructurada para una persona con discapacidad visual. "
+					"Incluye:\n"
+					"1. Escena general y contexto detallado\n"
+					"2. Objetos principales y secundarios con su disposición espacial exacta\n"
+					"3. Personas presentes: número, posición, edad aproximada, acciones, expresiones, ropa y accesorios\n"
+					"4. Colores específicos, iluminación, sombras y texturas\n"
+					"5. Texto visible: transcribe todo el texto legible\n"
+					"6. Ambiente, emociones y atmósfera que transmite\n"
+					"7. Detalles de fondo y elementos menos prominentes\n"
+					"Sé exhaustivo, específico y meticuloso."
+				),
+				"en": (
+					"Describe this image in great detail and structured way for a visually impaired person. "
+					"Include:\n"
+					"1. General scene and detailed context\n"
+					"2. Main and secondary objects with exact spatial arrangement\n"
+					"3. People present: number, position, approximate age, actions, expressions, clothing and accessories\n"
+					"4. Specific colors, lighting, shadows and textures\n"
+					"5. Visible text: transcribe all readable text\n"
+					"6. Mood, emotions and atmosphere conveyed\n"
+					"7. Background details and less prominent elements\n"
+					"Be exhaustive, specific and meticulous."
+				),
+				"fr": (
+					"Décris cette image de manière très détaillée et structurée pour une personne malvoyante. "
+					"Inclure:\n"
+					"1. Scène générale et contexte détaillé\n"
+					"2. Objets principaux et secondaires avec disposition spatiale exacte\n"
+					"3. Personnes présentes: nombre, position, âge approximatif, actions, expressions, vêtements et accessoires\n"
+					"4. Couleurs spécifiques, éclairage, ombres et textures\n"
+					"5. Texte visible: transcrire tout le texte lisible\n"
+					"6. Ambiance, émotions et atmosphère transmises\n"
+					"7. Détails d'arrière-plan et éléments moins proéminents\n"
+					"Sois exhaustif, spécifique et méticuleux."
+				)
+			}
+		else:  # auto o cualquier otro valor = descripción balanceada
+			# Descripción equilibrada (balance entre detalle y tokens)
+			prompts = {
+				"es": (
+					"Describe esta imagen de forma clara para una persona con discapacidad visual. "
+					"Incluye: escena general, objetos principales, personas (si las hay), colores relevantes, "
+					"texto visible, y el mensaje o propósito de la imagen. Sé específico pero conciso."
+				),
+				"en": (
+					"Describe this image clearly for a visually impaired person. "
+					"Include: general scene, main objects, people (if any), relevant colors, "
+					"visible text, and the message or purpose of the image. Be specific but concise."
+				),
+				"fr": (
+					"Décris cette image clairement pour une personne malvoyante. "
+					"Inclure: scène générale, objets principaux, personnes (le cas échéant), couleurs pertinentes, "
+					"texte visible, et le message ou l'objectif de l'image. Sois précis mais concis."
+				)
+			}
+		
+		prompt = prompts.get(language, prompts["es"])
+		
+		if imageUrl:
+			imagePart = {"file_data": {"mime_type": mimeType, "file_uri": imageUrl}}
+		else:
+			imagePart = {"inline_data": {"mime_type": "image/png", "data": imageBase64}}
+		
+		# Preparar payload según formato REST de Gemini
+		payload = {
+			"contents": [{
+				"parts": [
+					{"text": prompt},
+					imagePart
+				]
+			}]
+		}
+		return payload
+	
+	def _parseDescription(self, result):
+		"""
+		Extrae la descripción de una respuesta de generateContent
+		
+		Args:
+			result (dict): Respuesta JSON de Gemini
+		
+		Returns:
+			str: Descripción sin espacios sobrantes
+		
+		Raises:
+			Exception: Si la respuesta está vacía o fue bloqueada
+		"""
+		if "candidates" not in result or len(result["candidates"]) == 0:
+			log.error(f"Estructura de respuesta: {list(result.keys())}")
+			raise Exception("No se recibió respuesta de Gemini")
+		
+		candidate = result["candidates"][0]
+		log.info(f"Candidate completo: {json.dumps(candidate, indent=2)[:1000]}")
+		
+		# Verificar si hay filtros de seguridad
+		if "finishReason" in candidate:
+			finish_reason = candidate["finishReason"]
+			log.info(f"Finish reason: {finish_reason}")
+			if finish_reason == "SAFETY":
+				raise Exception("La respuesta fue bloqueada por filtros de seguridad de Gemini")
+			elif finish_reason == "RECITATION":
+				raise Exception("La respuesta fue bloqueada por detección de recitación")
+			elif finish_reason == "MAX_TOKENS":
+				# En Gemini 2.5, los thinking tokens pueden consumir todo el límite
+				# Si hay contenido parcial, usarlo con advertencia
+				log.warning("Gemini alcanzó MAX_TOKENS, verificando si hay contenido parcial...")
+				if "content" not in candidate or "parts" not in candidate.get("content", {}):
+					raise Exception(
+						"El modelo alcanzó el límite de tokens sin generar respuesta. "
+						"Intenta usar el nivel de detalle 'Bajo' en las preferencias."
+					)
+				# Si hay contenido, continuar y usarlo (puede estar truncado)
+		
+		if "content" not in candidate:
+			log.error(f"Candidate structure: {json.dumps(candidate, indent=2)[:500]}")
+			raise Exception("Respuesta de Gemini sin campo 'content'")
+		
+		content = candidate["content"]
+		if "parts" not in content:
+			log.error(f"Content structure: {json.dumps(content, indent=2)[:500]}")
+			raise Exception("Respuesta de Gemini sin campo 'parts'")
+		
+		parts = content["parts"]
+		if not parts or len(parts) == 0:
+			raise Exception("Respuesta de Gemini vacía")
+		
+		description = parts[0].get("text", "")
+		if not description:
+			log.error(f"Part structure: {json.dumps(parts[0], indent=2)[:500]}")
+			raise Exception("No se encontró texto en la respuesta")
+		return description.strip()
+	
+	def describeImage(self, imageBase64, detail="auto", language="es", maxTokens=5000):
+		"""
+		Describe una imagen usando Gemini (bloquea hasta tener la respuesta)
+		
+		Args:
+			imageBase64 (str): Imagen codificada en base64
+			detail (str): Nivel de detalle: elige el prompt, el razonamiento y el límite de salida
+			language (str): Idioma de respuesta
+			maxTokens (int): Límite máximo de tokens de salida (incluye los de razonamiento)
+		
+		Returns:
+			str: Descripción de la imagen
+		"""
+		return asyncCore.run(self.describeImageAsync(imageBase64, detail, language, maxTokens))
+	
+	async def _detectAvailableModelAsync(self):
 		"""
 		Detecta qué modelo de Gemini está disponible y lo configura
 		
 		Returns:
 			bool: True si encontró un modelo compatible, False en caso contrario
 		"""
-		if not REQUESTS_AVAILABLE:
-			return False
-		
 		try:
 			# URL para listar modelos disponibles
-			url = f"https://generativelanguage.googleapis.com/v1beta/models?key={self.apiKey}"
+			url = f"{self.MODELS_URL}?key={self.apiKey}"
 			
-			response = requests.get(url, timeout=10)
+			response = await asyncCore.request(
+				"GET",
+				url,
+				timeout=latencyTracker.getListTimeouts(self.PROVIDER)
+			)
 			
 			if response.status_code != 200:
 				log.error(f"Error al listar modelos de Gemini. Status: {response.status_code}, Response: {response.text[:200]}")
 				return False
 			
+			latencyTracker.recordConnect(self.PROVIDER, response)
+			latencyTracker.record((self.PROVIDER, "list"), response.elapsed)
+			
 			result = response.json()
 			models = result.get("models", [])
 			
@@ -315,38 +637,247 @@ class GeminiClient:
 			
 			log.info(f"Modelos disponibles: {', '.join(available_models)}")
 			
-			# Intentar encontrar un modelo compatible
-			# Primero intentar con el modelo por defecto
-			if self.DEFAULT_MODEL in available_models:
-				log.info(f"Usando modelo por defecto: {self.DEFAULT_MODEL}")
-				self.model = self.DEFAULT_MODEL
-				return True
-			
-			# Intentar con modelos fallback
-			for fallback in self.FALLBACK_MODELS:
-				if fallback in available_models:
-					log.info(f"Usando modelo fallback: {fallback}")
-					self.model = fallback
-					return True
+			# Probar los modelos candidatos y ordenarlos por latencia
+			candidates = self._getCandidateModels(available_models)
+			ranked = await self._rankModelsAsync(candidates)
+			if not ranked:
+				# Ningún modelo respondió al sondeo (p. ej. cuota agotada):
+				# mantener el orden de preferencia y dejar que la cadena decida
+				log.warning("Ningún modelo respondió al sondeo, usando orden de preferencia")
+				ranked = candidates
 			
-			# Usar el primer modelo disponible
-			self.model = available_models[0]
-			log.info(f"Usando primer modelo disponible: {self.model}")
+			self.modelChain = ranked
+			self._modelFailures = {}
+			self.model = ranked[0]
+			log.info(f"Cadena de modelos de Gemini: {', '.join(ranked)}")
 			return True
-				
+		
 		except Exception as e:
 			log.error(f"Error al detectar modelos de Gemini: {e}", exc_info=True)
 			return False
 	
-	def testConnection(self):
+	def _supportsThinking(self, model):
+		"""Indica si el modelo admite configuración de razonamiento (Gemini 2.5 o posterior)"""
+		return "2.5" in model or model.startswith("gemini-3")
+	
+	def _buildThinkingConfig(self, model, budget):
+		"""
+		Construye el thinkingConfig de un modelo para un presupuesto dado
+		
+		Args:
+			model (str): Nombre del modelo
+			budget (int): Presupuesto de tokens de razonamiento (0 = mínimo, -1 = dinámico)
+		
+		Returns:
+			dict: thinkingConfig, o None si el modelo no lo admite o el presupuesto es dinámico
+		"""
+		if not self._supportsThinking(model) or budget < 0:
+			return None
+		if model.startswith("gemini-3"):
+			# Gemini 3 usa niveles de razonamiento en lugar de presupuestos
+			return {"thinkingLevel": "low" if budget <= 1024 else "high"}
+		if "pro" in model:
+			budget = max(budget, self.THINKING_MIN_BUDGET_PRO)
+		return {"thinkingBudget": budget}
+	
+	def _getOutputTokenLimit(self, model, detail, maxTokens):
+		"""
+		Calcula el límite de tokens visibles a partir de las respuestas observadas
+		
+		Args:
+			model (str): Nombre del modelo
+			detail (str): Nivel de detalle
+			maxTokens (int): Límite máximo permitido por quien llama
+		
+		Returns:
+			int: Límite de tokens de texto visible
+		"""
+		samples = self._outputTokenSamples.get((model, detail))
+		p95 = samples.quantile(0.95, minSamples=latencyTracker.MIN_SAMPLES) if samples else None
+		if p95 is None:
+			limit = self.OUTPUT_TOKEN_DEFAULTS[detail]
+		else:
+			limit = max(int(p95 * self.OUTPUT_TOKEN_MARGIN), self.OUTPUT_TOKEN_FLOORS[detail])
+		return min(limit, maxTokens)
+	
+	def _recordOutputTokens(self, model, detail, usageMetadata):
+		"""Registra la longitud (en tokens visibles) de una respuesta"""
+		tokens = usageMetadata.get("candidatesTokenCount")
+		if not tokens:
+			return
+		samples = self._outputTokenSamples.setdefault((model, detail), RollingSamples())
+		samples.add(tokens)
+		thoughts = usageMetadata.get("thoughtsTokenCount", 0)
+		log.info(f"Tokens de Gemini ({model}, {detail}): respuesta={tokens}, razonamiento={thoughts}")
+	
+	def _buildGenerationConfig(self, model, detail, maxTokens, outputLimit=None):
+		"""
+		Construye generationConfig con razonamiento y límite de salida adaptados
+		
+		Args:
+			model (str): Nombre del modelo
+			detail (str): Nivel de detalle
+			maxTokens (int): Límite máximo de tokens totales
+			outputLimit (int): Tokens de texto visible; None para calcularlos a partir
+				de las respuestas observadas
+		
+		Returns:
+			dict: generationConfig para la petición
+		"""
+		if outputLimit is None:
+			outputLimit = self._getOutputTokenLimit(model, detail, maxTokens)
+		budget = self.thinkingBudgets.get(detail, 0)
+		thinkingConfig = self._buildThinkingConfig(model, budget)
+		
+		# maxOutputTokens incluye los tokens de razonamiento
+		if not self._supportsThinking(model):
+			thinkingAllowance = 0
+		elif budget < 0:
+			thinkingAllowance = self.THINKING_DYNAMIC_ALLOWANCE
+		else:
+			# Con niveles de razonamiento (Gemini 3) no hay presupuesto exacto
+			thinkingAllowance = thinkingConfig.get("thinkingBudget", self.THINKING_DYNAMIC_ALLOWANCE)
+		
+		generationConfig = {
+			"maxOutputTokens": min(outputLimit + thinkingAllowance, maxTokens),
+			"temperature": 0.4
+		}
+		if thinkingConfig:
+			generationConfig["thinkingConfig"] = thinkingConfig
+		return generationConfig
+	
+	def _getCandidateModels(self, availableModels):
+		"""
+		Selecciona los modelos candidatos a describir imágenes
+		
+		Args:
+			availableModels (list): Nombres de modelos que soportan generateContent
+		
+		Returns:
+			list: Candidatos en orden de preferencia (como mucho MAX_PROBE_MODELS)
+		"""
+		candidates = []
+		# Primero el modelo por defecto y los fallback conocidos
+		for model in [self.DEFAULT_MODEL] + self.FALLBACK_MODELS:
+			if model in availableModels and model not in candidates:
+				candidates.append(model)
+		# Después el resto de modelos Gemini con visión, priorizando los "flash"
+		others = [
+			m for m in availableModels
+			if m.startswith("gemini") and m not in candidates
+			and not any(keyword in m for keyword in self.EXCLUDED_MODEL_KEYWORDS)
+		]
+		others.sort(key=lambda m: "flash" not in m)
+		candidates.extend(others)
+		if not candidates:
+			candidates = list(availableModels)
+		return candidates[:self.MAX_PROBE_MODELS]
+	
+	async def _probeModelAsync(self, model):
+		"""
+		Envía la imagen de sondeo a un modelo y mide su latencia
+		
+		Args:
+			model (str): Nombre del modelo
+		
+		Returns:
+			float: Latencia en segundos, o None si el modelo falló
+		"""
+		url = self.API_URL.format(model=model) + f"?key={self.apiKey}"
+		payload = {
+			"contents": [{
+				"parts": [
+					{"text": "¿De qué color es el cuadrado? Responde con una palabra."},
+					{
+						"inline_data": {
+							"mime_type": "image/png",
+							"data": self.PROBE_IMAGE
+						}
+					}
+				]
+			}],
+			"generationConfig": {
+				"maxOutputTokens": 64,
+				"temperature": 0
+			}
+		}
+		thinkingConfig = self._buildThinkingConfig(model, 0)
+		if thinkingConfig:
+			payload["generationConfig"]["thinkingConfig"] = thinkingConfig
+		try:
+			start = time.monotonic()
+			response = await asyncCore.request(
+				"POST",
+				url,
+				headers={"Content-Type": "application/json"},
+				json=payload,
+				timeout=latencyTracker.getTimeouts(self.PROVIDER, model, "low")
+			)
+			elapsed = time.monotonic() - start
+			latencyTracker.recordConnect(self.PROVIDER, response)
+			if response.status_code != 200:
+				log.info(f"Sondeo de {model} falló con status {response.status_code}")
+				return None
+			latencyTracker.record((self.PROVIDER, model, "probe"), elapsed)
+			log.info(f"Sondeo de {model}: {elapsed:.2f}s")
+			return elapsed
+		except Exception as e:
+			log.info(f"Sondeo de {model} falló: {e}")
+			return None
+	
+	async def _rankModelsAsync(self, candidates):
+		"""
+		Sondea los modelos candidatos en paralelo y los ordena por latencia
+		
+		Args:
+			candidates (list): Modelos a sondear
+		
+		Returns:
+			list: Modelos que respondieron correctamente, del más rápido al más lento
+		"""
+		results = await asyncio.gather(*(self._probeModelAsync(m) for m in candidates))
+		latencies = dict(zip(candidates, results))
+		
+		healthy = [m for m in candidates if latencies.get(m) is not None]
+		healthy.sort(key=lambda m: latencies[m])
+		return healthy
+	
+	def _getModelsToTry(self):
+		"""
+		Retorna la cadena de modelos para una petición, omitiendo los que fallaron recientemente
+		
+		Returns:
+			list: Modelos en orden de preferencia
+		"""
+		now = time.monotonic()
+		chain = [
+			m for m in self.modelChain
+			if now - self._modelFailures.get(m, -self.MODEL_COOLDOWN) >= self.MODEL_COOLDOWN
+		]
+		if not chain:
+			# Todos los modelos fallaron recientemente: volver a clasificar en la próxima petición
+			log.warning("Todos los modelos de Gemini fallaron recientemente")
+			self._modelDetected = False
+			chain = list(self.modelChain)
+		return chain
+	
+	async def testConnectionAsync(self):
 		"""
 		Prueba la conexión con la API de Gemini y detecta el modelo disponible
 		
 		Returns:
 			bool: True si la conexión es exitosa, False en caso contrario
 		"""
-		result = self._detectAvailableModel()
+		result = await self._detectAvailableModelAsync()
 		if result:
 			self._modelDetected = True
 		return result
-
+	
+	def testConnection(self):
+		"""
+		Prueba la conexión con la API de Gemini (bloqueante)
+		
+		Returns:
+			bool: True si la conexión es exitosa, False en caso contrario
+		"""
+		return asyncCore.run(self.testConnectionAsync())
@@ -0,0 +1,258 @@
+# -*- coding: UTF-8 -*-
+"""
+Cliente con peticiones de respaldo (hedging) entre dos proveedores
+Si el proveedor principal tarda más que un percentil de sus latencias recientes,
+se envía la misma imagen al proveedor secundario y se usa la primera respuesta
+"""
+
+import asyncio
+import time
+from logHandler import log
+
+from ..asyncCore import asyncCore
+from ..cancellation import raiseIfCancelled
+from ..latencyTracker import latencyTracker
+
+
+class HedgedClient:
+	"""Combina dos clientes y lanza una petición de respaldo si el principal se retrasa"""
+	
+	PROVIDER = "hedged"
+	DEFAULT_DELAY = 8.0  # Segundos de espera mientras no haya historial suficiente
+	MIN_DELAY = 1.0
+	MIN_SAMPLES = 5  # Muestras necesarias para confiar en el percentil
+	
+	def __init__(self, primary, secondary, quantile=0.9):
+		"""
+		Inicializa el cliente con respaldo
+		
+		Args:
+			primary: Cliente principal (OpenAIClient o GeminiClient)
+			secondary: Cliente secundario usado como respaldo
+			quantile (float): Percentil de latencia del principal que dispara el respaldo
+		"""
+		self.primary = primary
+		self.secondary = secondary
+		self.quantile = quantile
+		self.lastProvider = primary.PROVIDER
+	
+	def _hedgeDelay(self, detail):
+		"""
+		Calcula cuánto esperar al principal antes de lanzar el respaldo
+		
+		Args:
+			detail (str): Nivel de detalle de la petición
+		
+		Returns:
+			float: Retraso en segundos
+		"""
+		delay = latencyTracker.quantile(
+			(self.primary.PROVIDER, self.primary.model, detail),
+			self.quantile,
+			default=self.DEFAULT_DELAY,
+			minSamples=self.MIN_SAMPLES
+		)
+		return max(delay, self.MIN_DELAY)
+	
+	async def describeImageAsync(self, imageBase64, detail="auto", language="es", maxTokens=500, cancelToken=None, transport=None):
+		"""
+		Describe una imagen con el proveedor principal y, si tarda, también con el secundario
+		
+		Args:
+			imageBase64 (str): Imagen codificada en base64 (se reutiliza en ambas peticiones)
+			detail (str): Nivel de detalle
+			language (str): Idioma de respuesta
+			maxTokens (int): Máximo de tokens en la respuesta
+			cancelToken (CancellationToken): Token de cancelación compartido por ambas peticiones
+			transport: Transporte compartido por ambas peticiones (la imagen se codifica una vez)
+		
+		Returns:
+			str: Descripción del primer proveedor que responda correctamente
+		"""
+		tasks = {}
+		
+		def launch(client):
+			# No lanzar el respaldo de una descripción ya cancelada
+			raiseIfCancelled(cancelToken)
+			task = asyncio.ensure_future(client.describeImageAsync(
+				imageBase64,
+				detail=detail,
+				language=language,
+				maxTokens=maxTokens,
+				cancelToken=cancelToken,
+				transport=transport
+			))
+			tasks[task] = client
+		
+		delay = self._hedgeDelay(detail)
+		start = time.monotonic()
+		launch(self.primary)
+		errors = []
+		
+		try:
+			done, pending = await asyncio.wait(list(tasks), timeout=delay)
+			if not done:
+				log.info(
+					f"{self.primary.PROVIDER} no respondió en {delay:.1f}s, "
+					f"enviando petición de respaldo a {self.secondary.PROVIDER}"
+				)
+				launch(self.secondary)
+			
+			while True:
+				if not done:
+					done, pending = await asyncio.wait(
+						[t for t in tasks if not t.done()],
+						return_when=asyncio.FIRST_COMPLETED
+					)
+				
+				for task in done:
+					client = tasks[task]
+					error = task.exception()
+					if error is None:
+						self.lastProvider = client.PROVIDER
+						elapsed = time.monotonic() - start
+						log.info(f"Respuesta obtenida de {client.PROVIDER} en {elapsed:.1f}s")
+						return task.result()
+					log.warning(f"Error en {client.PROVIDER} durante petición con respaldo: {error}")
+					errors.append(error)
+				done = set()
+				
+				# Si el principal falla antes del retraso, pasar directamente al secundario
+				if len(tasks) == 1:
+					launch(self.secondary)
+				elif all(t.done() for t in tasks):
+					raise errors[0]
+		finally:
+			# Cancelar la petición perdedora: se cierra su conexión
+			for task in tasks:
+				if not task.done():
+					log.info(f"Cancelando petición a {tasks[task].PROVIDER}")
+					task.cancel()
+	
+	@property
+	def MAX_IMAGES_PER_REQUEST(self):
+		"""Imágenes por petición del proveedor principal"""
+		return self.primary.MAX_IMAGES_PER_REQUEST
+	
+	async def describeImageURLAsync(self, url, detail="auto", language="es", maxTokens=500, cancelToken=None):
+		"""
+		Describe una imagen pública con el proveedor principal (sin respaldo)
+		
+		Si el principal rechaza la dirección, el llamador vuelve a la imagen descargada,
+		que sí puede duplicarse
+		
+		Returns:
+			str: Descripción de la imagen
+		"""
+		self.lastProvider = self.primary.PROVIDER
+		return await self.primary.describeImageURLAsync(
+			url,
+			detail=detail,
+			language=language,
+			maxTokens=maxTokens,
+			cancelToken=cancelToken
+		)
+	
+	async def describeStructuredAsync(self, imageBase64, detail="auto", language="es", cancelToken=None, transport=None, onSummary=None):
+		"""
+		Describe una imagen con respuesta estructurada en el proveedor principal (sin respaldo)
+		
+		El resumen se anuncia en cuanto llega, así que no puede competir con otra petición
+		
+		Returns:
+			StructuredDescription: Resumen, texto detectado y apartados
+		"""
+		self.lastProvider = self.primary.PROVIDER
+		return await self.primary.describeStructuredAsync(
+			imageBase64,
+			detail=detail,
+			language=language,
+			cancelToken=cancelToken,
+			transport=transport,
+			onSummary=onSummary
+		)
+	
+	async def describeImagesAsync(self, imagesBase64, detail="auto", language="es", cancelToken=None, transport=None):
+		"""
+		Describe varias imágenes en una sola petición al proveedor principal
+		
+		Las peticiones con varias imágenes no se duplican: su latencia no es comparable
+		con el historial de una sola imagen que decide el respaldo
+		
+		Returns:
+			list: Descripción de cada imagen en el mismo orden (None si faltó en la respuesta)
+		"""
+		self.lastProvider = self.primary.PROVIDER
+		return await self.primary.describeImagesAsync(
+			imagesBase64,
+			detail=detail,
+			language=language,
+			cancelToken=cancelToken,
+			transport=transport
+		)
+	
+	async def labelContactSheetAsync(self, sheetBase64, count, language="es", cancelToken=None, transport=None):
+		"""
+		Etiqueta una hoja de contactos de iconos con el proveedor principal (sin respaldo)
+		
+		Returns:
+			list: Etiqueta de cada icono en orden (None si faltó en la respuesta)
+		"""
+		self.lastProvider = self.primary.PROVIDER
+		return await self.primary.labelContactSheetAsync(
+			sheetBase64,
+			count,
+			language=language,
+			cancelToken=cancelToken,
+			transport=transport
+		)
+	
+	async def describeWithPromptAsync(self, imagesBase64, prompt, detail="auto", maxTokens=1000, cancelToken=None, transport=None):
+		"""
+		Envía un prompt propio con imágenes al proveedor principal (sin respaldo)
+		
+		Returns:
+			str: Texto de la respuesta
+		"""
+		self.lastProvider = self.primary.PROVIDER
+		return await self.primary.describeWithPromptAsync(
+			imagesBase64,
+			prompt,
+			detail=detail,
+			maxTokens=maxTokens,
+			cancelToken=cancelToken,
+			transport=transport
+		)
+	
+	def describeImage(self, imageBase64, detail="auto", language="es", maxTokens=500):
+		"""
+		Describe una imagen con respaldo (bloquea hasta tener la respuesta)
+		
+		Args:
+			imageBase64 (str): Imagen codificada en base64
+			detail (str): Nivel de detalle
+			language (str): Idioma de respuesta
+			maxTokens (int): Máximo de tokens en la respuesta
+		
+		Returns:
+			str: Descripción del primer proveedor que responda correctamente
+		"""
+		return asyncCore.run(self.describeImageAsync(imageBase64, detail, language, maxTokens))
+	
+	async def testConnectionAsync(self):
+		"""
+		Prueba la conexión con el proveedor principal
+		
+		Returns:
+			bool: True si la conexión es exitosa
+		"""
+		return await self.primary.testConnectionAsync()
+	
+	def testConnection(self):
+		"""
+		Prueba la conexión con el proveedor principal (bloqueante)
+		
+		Returns:
+			bool: True si la conexión es exitosa
+		"""
+		return asyncCore.run(self.testConnectionAsync())
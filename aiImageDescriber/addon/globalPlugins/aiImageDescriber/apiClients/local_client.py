@@ -0,0 +1,337 @@
+# -*- coding: UTF-8 -*-
+"""
+Cliente local de descripción de imágenes con ONNX Runtime
+Ejecuta en la CPU un modelo pequeño de subtitulado de imágenes (codificador de visión y
+decodificador de texto exportados a ONNX, por ejemplo vit-gpt2-image-captioning) sin
+conexión a internet; responde con una frase corta en menos de un segundo
+"""
+
+import asyncio
+import base64
+import json
+import os
+import threading
+import time
+from io import BytesIO
+from logHandler import log
+
+from ..asyncCore import asyncCore
+from ..cancellation import raiseIfCancelled
+
+try:
+	import numpy
+	import onnxruntime
+	ONNX_AVAILABLE = True
+except ImportError:
+	ONNX_AVAILABLE = False
+
+try:
+	from PIL import Image
+	PIL_AVAILABLE = True
+except ImportError:
+	PIL_AVAILABLE = False
+
+ENCODER_FILE = "encoder_model.onnx"
+DECODER_FILE = "decoder_model.onnx"
+VOCAB_FILES = ("vocab.json", "tokenizer.json")
+MAX_CAPTION_TOKENS = {"low": 16, "auto": 24, "high": 32}
+DEFAULT_IMAGE_SIZE = 224
+DEFAULT_END_TOKEN = 50256  # <|endoftext|> de GPT-2
+SPECIAL_TOKENS = ("<|endoftext|>", "<s>", "</s>", "<pad>", "[CLS]", "[SEP]", "[PAD]")
+
+
+def _bytesToUnicode():
+	"""Tabla de GPT-2 que asigna un carácter imprimible a cada byte"""
+	printable = (
+		list(range(ord("!"), ord("~") + 1))
+		+ list(range(ord("¡"), ord("¬") + 1))
+		+ list(range(ord("®"), ord("ÿ") + 1))
+	)
+	characters = printable[:]
+	extra = 0
+	for byte in range(256):
+		if byte not in printable:
+			printable.append(byte)
+			characters.append(256 + extra)
+			extra += 1
+	return dict(zip(printable, (chr(character) for character in characters)))
+
+
+BYTE_DECODER = {character: byte for byte, character in _bytesToUnicode().items()}
+
+
+class LocalModel:
+	"""Modelo de subtitulado cargado en ONNX Runtime"""
+	
+	def __init__(self, modelPath):
+		"""
+		Carga las sesiones de inferencia, el vocabulario y el preprocesado de la imagen
+		
+		Args:
+			modelPath (str): Carpeta del modelo exportado
+		"""
+		options = onnxruntime.SessionOptions()
+		# La mitad de los núcleos: NVDA sigue respondiendo mientras se describe
+		options.intra_op_num_threads = max(1, (os.cpu_count() or 2) // 2)
+		providers = ["CPUExecutionProvider"]
+		self.encoder = onnxruntime.InferenceSession(os.path.join(modelPath, ENCODER_FILE), options, providers=providers)
+		self.decoder = onnxruntime.InferenceSession(os.path.join(modelPath, DECODER_FILE), options, providers=providers)
+		self.encoderInput = self.encoder.get_inputs()[0].name
+		self.decoderInputs = {item.name for item in self.decoder.get_inputs()}
+		
+		settings = {}
+		for name in ("config.json", "generation_config.json"):
+			settings.update(self._readJSON(modelPath, name))
+		decoderSettings = settings.get("decoder", {})
+		self.startToken = self._firstToken(
+			settings.get("decoder_start_token_id"), decoderSettings.get("bos_token_id")
+		)
+		self.endToken = self._firstToken(settings.get("eos_token_id"), decoderSettings.get("eos_token_id"))
+		
+		preprocessor = self._readJSON(modelPath, "preprocessor_config.json")
+		size = preprocessor.get("size", DEFAULT_IMAGE_SIZE)
+		if isinstance(size, dict):
+			size = (size.get("width", DEFAULT_IMAGE_SIZE), size.get("height", DEFAULT_IMAGE_SIZE))
+		else:
+			size = (size, size)
+		self.imageSize = size
+		self.mean = numpy.array(preprocessor.get("image_mean", [0.5, 0.5, 0.5]), dtype=numpy.float32)
+		self.std = numpy.array(preprocessor.get("image_std", [0.5, 0.5, 0.5]), dtype=numpy.float32)
+		
+		self.tokens, self.byteLevel = self._loadVocabulary(modelPath)
+	
+	@staticmethod
+	def _firstToken(*tokenIds):
+		"""Primer identificador de token configurado (el 0 es válido), o el de GPT-2"""
+		for tokenId in tokenIds:
+			if isinstance(tokenId, list):
+				tokenId = tokenId[0] if tokenId else None
+			if tokenId is not None:
+				return tokenId
+		return DEFAULT_END_TOKEN
+	
+	@staticmethod
+	def _readJSON(modelPath, name):
+		"""Lee un archivo JSON opcional del modelo"""
+		path = os.path.join(modelPath, name)
+		if not os.path.isfile(path):
+			return {}
+		with open(path, encoding="utf-8") as f:
+			return json.load(f)
+	
+	@classmethod
+	def _loadVocabulary(cls, modelPath):
+		"""
+		Lee el vocabulario del decodificador
+		
+		Returns:
+			tuple: (dict id -> token, True si los tokens son de bytes como en GPT-2)
+		"""
+		vocabulary = cls._readJSON(modelPath, "vocab.json")
+		if vocabulary:
+			# Los vocabularios WordPiece (BERT) tienen sus tokens especiales entre corchetes
+			byteLevel = "[CLS]" not in vocabulary
+		else:
+			tokenizer = cls._readJSON(modelPath, "tokenizer.json")
+			vocabulary = tokenizer.get("model", {}).get("vocab", {})
+			byteLevel = (tokenizer.get("decoder") or {}).get("type") == "ByteLevel"
+		if not vocabulary:
+			raise Exception("El modelo local no incluye vocab.json ni tokenizer.json")
+		return {index: token for token, index in vocabulary.items()}, byteLevel
+	
+	def pixelValues(self, imageBase64):
+		"""Imagen normalizada en la forma que espera el codificador (1, 3, alto, ancho)"""
+		with Image.open(BytesIO(base64.b64decode(imageBase64))) as image:
+			with image.convert("RGB") as rgb:
+				resized = rgb.resize(self.imageSize, Image.Resampling.BILINEAR)
+		try:
+			pixels = numpy.asarray(resized, dtype=numpy.float32) / 255.0
+		finally:
+			resized.close()
+		pixels = (pixels - self.mean) / self.std
+		return pixels.transpose(2, 0, 1)[numpy.newaxis, ...]
+	
+	def caption(self, imageBase64, maxTokens, cancelToken=None):
+		"""
+		Genera la descripción de una imagen con decodificación voraz
+		
+		Args:
+			imageBase64 (str): Imagen codificada en base64
+			maxTokens (int): Tokens generados como máximo
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			str: Descripción generada
+		"""
+		hiddenStates = self.encoder.run(None, {self.encoderInput: self.pixelValues(imageBase64)})[0]
+		tokens = [self.startToken]
+		for _step in range(maxTokens):
+			raiseIfCancelled(cancelToken)
+			inputs = {
+				"input_ids": numpy.array([tokens], dtype=numpy.int64),
+				"encoder_hidden_states": hiddenStates
+			}
+			if "attention_mask" in self.decoderInputs:
+				inputs["attention_mask"] = numpy.ones((1, len(tokens)), dtype=numpy.int64)
+			if "encoder_attention_mask" in self.decoderInputs:
+				inputs["encoder_attention_mask"] = numpy.ones(hiddenStates.shape[:2], dtype=numpy.int64)
+			logits = self.decoder.run(None, inputs)[0]
+			token = int(logits[0, -1].argmax())
+			if token == self.endToken:
+				break
+			tokens.append(token)
+		return self.decode(tokens[1:])
+	
+	def decode(self, tokenIds):
+		"""Convierte los tokens generados en texto"""
+		pieces = [self.tokens.get(tokenId, "") for tokenId in tokenIds]
+		pieces = [piece for piece in pieces if piece not in SPECIAL_TOKENS]
+		if self.byteLevel:
+			data = bytes(BYTE_DECODER.get(character, 32) for character in "".join(pieces))
+			text = data.decode("utf-8", errors="ignore")
+		else:
+			text = " ".join(pieces).replace(" ##", "")
+		return " ".join(text.split())
+
+
+class LocalClient:
+	"""Cliente que describe imágenes en el propio equipo con un modelo ONNX"""
+	
+	PROVIDER = "local"
+	MAX_IMAGES_PER_REQUEST = 1
+	
+	def __init__(self, modelPath):
+		"""
+		Inicializa el cliente local (el modelo se carga en la primera descripción)
+		
+		Args:
+			modelPath (str): Carpeta con encoder_model.onnx, decoder_model.onnx y el vocabulario
+		"""
+		self.modelPath = modelPath
+		self.model = os.path.basename(os.path.normpath(modelPath))
+		self._modelDetected = True
+		self._localModel = None
+		self._modelLock = threading.Lock()
+	
+	@staticmethod
+	def isModelPath(modelPath):
+		"""
+		Indica si una carpeta contiene un modelo local utilizable
+		
+		Args:
+			modelPath (str): Carpeta del modelo
+		
+		Returns:
+			bool: True si están los dos modelos ONNX y el vocabulario
+		"""
+		if not modelPath or not os.path.isdir(modelPath):
+			return False
+		return (
+			os.path.isfile(os.path.join(modelPath, ENCODER_FILE))
+			and os.path.isfile(os.path.join(modelPath, DECODER_FILE))
+			and any(os.path.isfile(os.path.join(modelPath, name)) for name in VOCAB_FILES)
+		)
+	
+	def _getModel(self):
+		"""Carga el modelo una sola vez, aunque lo pidan varios hilos a la vez"""
+		with self._modelLock:
+			if self._localModel is None:
+				if not ONNX_AVAILABLE or not PIL_AVAILABLE:
+					raise Exception("onnxruntime no está instalado. Instala con: pip install onnxruntime")
+				start = time.monotonic()
+				self._localModel = LocalModel(self.modelPath)
+				log.info(f"Modelo local cargado en {time.monotonic() - start:.1f}s: {self.modelPath}")
+			return self._localModel
+	
+	def _caption(self, imageBase64, detail, cancelToken):
+		"""Describe una imagen en el hilo actual (bloquea durante la inferencia)"""
+		raiseIfCancelled(cancelToken)
+		model = self._getModel()
+		start = time.monotonic()
+		caption = model.caption(imageBase64, MAX_CAPTION_TOKENS.get(detail, MAX_CAPTION_TOKENS["auto"]), cancelToken)
+		if not caption:
+			raise Exception("El modelo local no generó ninguna descripción")
+		log.info(f"Descripción local en {time.monotonic() - start:.2f}s")
+		return caption[0].upper() + caption[1:] + ("" if caption.endswith(".") else ".")
+	
+	async def describeImageAsync(self, imageBase64, detail="auto", language="es", maxTokens=500, cancelToken=None, transport=None):
+		"""
+		Describe una imagen sin conexión
+		
+		La inferencia se ejecuta en un hilo del grupo del bucle para no bloquearlo. La
+		descripción sale en el idioma del modelo (normalmente inglés), sea cual sea language
+		
+		Args:
+			imageBase64 (str): Imagen codificada en base64
+			detail (str): Nivel de detalle (solo cambia la longitud máxima)
+			language (str): Idioma pedido (el modelo no lo tiene en cuenta)
+			maxTokens (int): Sin uso; la longitud depende del nivel de detalle
+			cancelToken (CancellationToken): Token de cancelación, o None
+			transport: Debe ser None: el modelo necesita la imagen en este proceso
+		
+		Returns:
+			str: Descripción corta de la imagen
+		"""
+		if transport is not None:
+			raise Exception("El modelo local no puede usar el proceso auxiliar")
+		if detail not in ("low", "high"):
+			detail = "auto"
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(None, self._caption, imageBase64, detail, cancelToken)
+	
+	async def describeImagesAsync(self, imagesBase64, detail="auto", language="es", cancelToken=None, transport=None):
+		"""
+		Describe varias imágenes, una tras otra
+		
+		Returns:
+			list: Descripción de cada imagen en el mismo orden
+		"""
+		return [
+			await self.describeImageAsync(imageBase64, detail, language, cancelToken=cancelToken, transport=transport)
+			for imageBase64 in imagesBase64
+		]
+	
+	async def describeWithPromptAsync(self, imagesBase64, prompt, detail="auto", maxTokens=1000, cancelToken=None, transport=None):
+		"""
+		Describe las imágenes de una petición con prompt propio
+		
+		El modelo local no sigue instrucciones: se devuelve la descripción de cada imagen,
+		numerada si hay varias
+		
+		Returns:
+			str: Descripciones de las imágenes
+		"""
+		captions = await self.describeImagesAsync(imagesBase64, detail, cancelToken=cancelToken, transport=transport)
+		if len(captions) == 1:
+			return captions[0]
+		return "\n".join(f"{number}. {caption}" for number, caption in enumerate(captions, 1))
+	
+	async def labelContactSheetAsync(self, sheetBase64, count, language="es", cancelToken=None, transport=None):
+		"""El modelo local no distingue los iconos numerados de una hoja de contactos"""
+		raise Exception("El modelo local no puede etiquetar iconos; elige OpenAI o Gemini")
+	
+	async def testConnectionAsync(self):
+		"""
+		Comprueba que el modelo carga y describe una imagen de prueba
+		
+		Returns:
+			bool: True si el modelo funciona
+		"""
+		try:
+			buffer = BytesIO()
+			with Image.new("RGB", (64, 64), "white") as image:
+				image.save(buffer, format="PNG")
+			await self.describeImageAsync(base64.b64encode(buffer.getvalue()).decode("ascii"), "low")
+			return True
+		except Exception as e:
+			log.error(f"Error al probar el modelo local: {e}")
+			return False
+	
+	def testConnection(self):
+		"""
+		Comprueba el modelo local (bloqueante)
+		
+		Returns:
+			bool: True si el modelo funciona
+		"""
+		return asyncCore.run(self.testConnectionAsync())
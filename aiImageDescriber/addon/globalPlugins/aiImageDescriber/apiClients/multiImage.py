@@ -0,0 +1,170 @@
+# -*- coding: UTF-8 -*-
+"""
+Peticiones con varias imágenes
+Prompt común a los proveedores que pide una respuesta por imagen (o por icono de una
+hoja de contactos) marcada con su número, y separación de esas respuestas
+"""
+
+import re
+
+# Tokens de salida por imagen según nivel de detalle
+TOKENS_PER_IMAGE = {"low": 150, "auto": 400, "high": 1000}
+MAX_TOTAL_TOKENS = 8000
+
+# Las peticiones con varias imágenes tardan más que el historial de una sola
+MULTI_IMAGE_TIMEOUT = (10.0, 120.0)
+
+IMAGE_LABELS = {"es": "Imagen", "en": "Image", "fr": "Image"}
+
+DETAIL_INSTRUCTIONS = {
+	"low": {
+		"es": "Describe cada una brevemente en 1-2 frases: qué es y qué está pasando.",
+		"en": "Briefly describe each one in 1-2 sentences: what it is and what's happening.",
+		"fr": "Décris brièvement chacune en 1-2 phrases: ce que c'est et ce qui se passe."
+	},
+	"auto": {
+		"es": (
+			"Describe cada una de forma clara para una persona con discapacidad visual: escena general, "
+			"objetos principales, personas (si las hay), texto visible y propósito de la imagen. Sé específico pero conciso."
+		),
+		"en": (
+			"Describe each one clearly for a visually impaired person: general scene, main objects, "
+			"people (if any), visible text and the purpose of the image. Be specific but concise."
+		),
+		"fr": (
+			"Décris chacune clairement pour une personne malvoyante: scène générale, objets principaux, "
+			"personnes (le cas échéant), texte visible et objectif de l'image. Sois précis mais concis."
+		)
+	},
+	"high": {
+		"es": (
+			"Describe cada una de forma detallada para una persona con discapacidad visual: escena y contexto, "
+			"objetos y su disposición, personas, colores, todo el texto legible y el ambiente."
+		),
+		"en": (
+			"Describe each one in detail for a visually impaired person: scene and context, "
+			"objects and their layout, people, colors, all readable text and the mood."
+		),
+		"fr": (
+			"Décris chacune en détail pour une personne malvoyante: scène et contexte, "
+			"objets et leur disposition, personnes, couleurs, tout le texte lisible et l'ambiance."
+		)
+	}
+}
+
+PROMPTS = {
+	"es": (
+		"Vas a recibir {count} imágenes numeradas del 1 al {count}. {instructions} "
+		"Empieza la respuesta de cada imagen en una línea nueva con «Imagen N:», donde N es su número, "
+		"en el mismo orden y sin omitir ninguna. No añadas texto antes ni después."
+	),
+	"en": (
+		"You will receive {count} images numbered 1 to {count}. {instructions} "
+		"Start the answer for each image on a new line with \"Image N:\", where N is its number, "
+		"in the same order and without skipping any. Do not add text before or after."
+	),
+	"fr": (
+		"Tu vas recevoir {count} images numérotées de 1 à {count}. {instructions} "
+		"Commence la réponse de chaque image sur une nouvelle ligne par « Image N: », où N est son numéro, "
+		"dans le même ordre et sans en omettre aucune. N'ajoute pas de texte avant ou après."
+	)
+}
+
+# Hoja de contactos: una sola imagen con iconos numerados
+TOKENS_PER_ICON = 15
+
+CONTACT_SHEET_PROMPTS = {
+	"es": (
+		"La imagen es una hoja con {count} iconos de una interfaz, cada uno con su número encima. "
+		"Para cada icono escribe una etiqueta corta (de 1 a 4 palabras) que sirva como nombre del botón, "
+		"según la función que suele tener ese icono (por ejemplo «Guardar», «Negrita» o «Buscar»). "
+		"Responde una línea por icono con «Icono N: etiqueta», en orden y sin omitir ninguno. No añadas nada más."
+	),
+	"en": (
+		"The image is a sheet with {count} icons from a user interface, each with its number above it. "
+		"For each icon write a short label (1 to 4 words) that works as the button name, "
+		"based on the function that icon usually has (for example \"Save\", \"Bold\" or \"Search\"). "
+		"Answer one line per icon with \"Icon N: label\", in order and without skipping any. Do not add anything else."
+	),
+	"fr": (
+		"L'image est une planche de {count} icônes d'une interface, chacune avec son numéro au-dessus. "
+		"Pour chaque icône écris une étiquette courte (1 à 4 mots) qui serve de nom de bouton, "
+		"selon la fonction habituelle de cette icône (par exemple « Enregistrer », « Gras » ou « Rechercher »). "
+		"Réponds une ligne par icône avec « Icône N: étiquette », dans l'ordre et sans en omettre aucune. N'ajoute rien d'autre."
+	)
+}
+
+# Marcador de inicio de respuesta: «Imagen 3:», «**Image 3**:», «### Imagen 3 -», «[Imagen 3]», «Icono 3:»
+ANSWER_MARKER = re.compile(
+	r"^[ \t>#*\[]*(?:imagen|image|icono|icône|icon)\s*(\d+)\s*[\]*]*\s*[:.\-–)]*[ \t]*\**[ \t]*",
+	re.IGNORECASE | re.MULTILINE
+)
+
+
+def buildMultiImagePrompt(count, detail, language):
+	"""
+	Construye el prompt de una petición con varias imágenes
+	
+	Args:
+		count (int): Número de imágenes
+		detail (str): Nivel de detalle normalizado ("low", "auto" o "high")
+		language (str): Idioma de respuesta
+	
+	Returns:
+		str: Prompt
+	"""
+	if language not in PROMPTS:
+		language = "es"
+	instructions = DETAIL_INSTRUCTIONS.get(detail, DETAIL_INSTRUCTIONS["auto"])[language]
+	return PROMPTS[language].format(count=count, instructions=instructions)
+
+
+def imageLabel(number, language):
+	"""Texto que precede a cada imagen en la petición"""
+	return f"{IMAGE_LABELS.get(language, IMAGE_LABELS['es'])} {number}:"
+
+
+def maxTokensFor(count, detail):
+	"""Límite de tokens de salida de una petición con varias imágenes"""
+	return min(TOKENS_PER_IMAGE.get(detail, TOKENS_PER_IMAGE["auto"]) * count, MAX_TOTAL_TOKENS)
+
+
+def buildContactSheetPrompt(count, language):
+	"""
+	Construye el prompt de una hoja de contactos de iconos
+	
+	Args:
+		count (int): Número de iconos de la hoja
+		language (str): Idioma de las etiquetas
+	
+	Returns:
+		str: Prompt
+	"""
+	return CONTACT_SHEET_PROMPTS.get(language, CONTACT_SHEET_PROMPTS["es"]).format(count=count)
+
+
+def contactSheetMaxTokens(count):
+	"""Límite de tokens de salida de una hoja de contactos"""
+	return min(100 + TOKENS_PER_ICON * count, MAX_TOTAL_TOKENS)
+
+
+def parseNumberedAnswers(text, count):
+	"""
+	Separa la respuesta de cada imagen
+	
+	Args:
+		text (str): Respuesta del modelo
+		count (int): Número de imágenes enviadas
+	
+	Returns:
+		list: Descripción de cada imagen en orden (None si falta en la respuesta)
+	"""
+	answers = [None] * count
+	markers = [m for m in ANSWER_MARKER.finditer(text) if 1 <= int(m.group(1)) <= count]
+	for index, marker in enumerate(markers):
+		end = markers[index + 1].start() if index + 1 < len(markers) else len(text)
+		answer = text[marker.end():end].strip()
+		number = int(marker.group(1))
+		if answer and answers[number - 1] is None:
+			answers[number - 1] = answer
+	return answers
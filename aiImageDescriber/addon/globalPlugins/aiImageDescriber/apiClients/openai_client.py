@@ -4,21 +4,28 @@ Cliente para OpenAI GPT-4 Vision API
 """
 
 import json
+import time
 from logHandler import log
 
-try:
-	import requests
-	REQUESTS_AVAILABLE = True
-except ImportError:
-	log.warning("requests no disponible")
-	REQUESTS_AVAILABLE = False
+from ..asyncCore import asyncCore, ConnectionFailed, ConnectTimeout, RequestTimeout, HttpStatusError, RequestRejected
+from ..cancellation import raiseIfCancelled
+from ..latencyTracker import latencyTracker
+from .multiImage import (
+	buildMultiImagePrompt, buildContactSheetPrompt, contactSheetMaxTokens, imageLabel, maxTokensFor,
+	parseNumberedAnswers, MULTI_IMAGE_TIMEOUT
+)
+from .structured import buildStructuredPrompt, structuredMaxTokens, ResponseStream, StructuredDescription, SummaryWatcher
 
 
 class OpenAIClient:
 	"""Cliente para interactuar con OpenAI GPT-4 Vision"""
 	
+	PROVIDER = "openai"
+	NAME = "OpenAI"  # Nombre en los mensajes de error
 	API_URL = "https://api.openai.com/v1/chat/completions"
+	MODELS_URL = "https://api.openai.com/v1/models"
 	DEFAULT_MODEL = "gpt-4o"  # Modelo más reciente con visión
+	MAX_IMAGES_PER_REQUEST = 10  # Imágenes por petición al describir varias a la vez
 	
 	def __init__(self, apiKey):
 		"""
@@ -30,119 +37,114 @@ class OpenAIClient:
 		self.apiKey = apiKey
 		self.model = self.DEFAULT_MODEL
 	
-	def describeImage(self, imageBase64, detail="auto", language="es", maxTokens=500):
+	def _headers(self):
+		"""Cabeceras de autenticación de las peticiones"""
+		return {"Authorization": f"Bearer {self.apiKey}"}
+	
+	def _buildPayload(self, imageBase64, detail, language, maxTokens, imageUrl=None):
 		"""
-		Describe una imagen usando GPT-4 Vision
+		Construye el cuerpo de la petición de descripción
 		
 		Args:
-			imageBase64 (str): Imagen codificada en base64
+			imageBase64 (str): Imagen codificada en base64 (None si se pasa imageUrl)
 			detail (str): Nivel de detalle - "low", "high", o "auto"
 			language (str): Idioma de respuesta
 			maxTokens (int): Máximo de tokens en la respuesta
+			imageUrl (str): Dirección pública de la imagen, que descarga OpenAI, o None
 		
 		Returns:
-			str: Descripción de la imagen
+			tuple: (payload, nivel de detalle normalizado)
 		"""
-		if not REQUESTS_AVAILABLE:
-			raise Exception("requests no está instalado. Instala con: pip install requests")
-		
-		try:
-			# Preparar prompt según nivel de detalle e idioma
-			if detail == "low":
-				# Descripción breve y concisa (ahorra tokens)
-				prompts = {
-					"es": "Describe brevemente esta imagen en 1-2 frases: qué es y qué está pasando.",
-					"en": "Briefly describe this image in 1-2 sentences: what it is and what's happening.",
-					"fr": "Décris brièvement cette image en 1-2 phrases: ce que c'est et ce qui se passe."
-				}
-				maxTokensToUse = 150
-				detailLevel = "low"
-			elif detail == "high":
-				# Descripción muy detallada (usa más tokens)
-				prompts = {
-					"es": (
-						"Describe esta imagen de forma muy detallada y estructurada para una persona con discapacidad visual. "
-						"Incluye:\n"
-						"1. Escena general y contexto detallado\n"
-						"2. Objetos principales y secundarios con su disposición espacial exacta\n"
-						"3. Personas presentes: número, posición, edad aproximada, acciones, expresiones, ropa y accesorios\n"
-						"4. Colores específicos, iluminación, sombras y texturas\n"
-						"5. Texto visible: transcribe todo el texto legible\n"
-						"6. Ambiente, emociones y atmósfera que transmite\n"
-						"7. Detalles de fondo y elementos menos prominentes\n"
-						"Sé exhaustivo, específico y meticuloso."
-					),
-					"en": (
-						"Describe this image in great detail and structured way for a visually impaired person. "
-						"Include:\n"
-						"1. General scene and detailed context\n"
-						"2. Main and secondary objects with exact spatial arrangement\n"
-						"3. People present: number, position, approximate age, actions, expressions, clothing and accessories\n"
-						"4. Specific colors, lighting, shadows and textures\n"
-						"5. Visible text: transcribe all readable text\n"
-						"6. Mood, emotions and atmosphere conveyed\n"
-						"7. Background details and less prominent elements\n"
-						"Be exhaustive, specific and meticulous."
-					),
-					"fr": (
-						"Décris cette image de manière très détaillée et structurée pour une personne malvoyante. "
-						"Inclure:\n"
-						"1. Scène générale et contexte détaillé\n"
-						"2. Objets principaux et secondaires avec disposition spatiale exacte\n"
-						"3. Personnes présentes: nombre, position, âge approximatif, actions, expressions, vêtements et accessoires\n"
-						"4. Couleurs spécifiques, éclairage, ombres et textures\n"
-						"5. Texte visible: transcrire tout le texte lisible\n"
-						"6. Ambiance, émotions et atmosphère transmises\n"
-						"7. Détails d'arrière-plan et éléments moins proéminents\n"
-						"Sois exhaustif, spécifique et méticuleux."
-					)
-				}
-				maxTokensToUse = maxTokens
-				detailLevel = "high"
-			else:  # auto o cualquier otro valor = descripción balanceada
-				# Descripción equilibrada (balance entre detalle y tokens)
-				prompts = {
-					"es": (
-						"Describe esta imagen de forma clara para una persona con discapacidad visual. "
-						"Incluye: escena general, objetos principales, personas (si las hay), colores relevantes, "
-						"texto visible, y el mensaje o propósito de la imagen. Sé específico pero conciso."
-					),
-					"en": (
-						"Describe this image clearly for a visually impaired person. "
-						"Include: general scene, main objects, people (if any), relevant colors, "
-						"visible text, and the message or purpose of the image. Be specific but concise."
-					),
-					"fr": (
-						"Décris cette image clairement pour une personne malvoyante. "
-						"Inclure: scène générale, objets principaux, personnes (le cas échéant), couleurs pertinentes, "
-						"texte visible, et le message ou l'objectif de l'image. Sois précis mais concis."
-					)
-				}
-				maxTokensToUse = 500  # Reducido de 800 a 500 para nivel AUTO
-				detailLevel = "auto"
-			
-			prompt = prompts.get(language, prompts["es"])
-			
-			# Construir payload
-			headers = {
-				"Content-Type": "application/json",
-				"Authorization": f"Bearer {self.apiKey}"
+		# Preparar prompt según nivel de detalle e idioma
+		if detail == "low":
+			# Descripción breve y concisa (ahorra tokens)
+			prompts = {
+				"es": "Describe brevemente esta imagen en 1-2 frases: qué es y qué está pasando.",
+				"en": "Briefly describe this image in 1-2 sentences: what it is and what's happening.",
+				"fr": "Décris brièvement cette image en 1-2 phrases: ce que c'est et ce qui se passe."
 			}
-			
-			payload = {
-				"model": self.model,
-				"messages": [
-					{
-						"role": "user",
-						"content": [
-							{
-								"type": "text",
-								"text": prompt
-							},
+			maxTokensToUse = 150
+			detailLevel = "low"
+		elif detail == "high":
+			# Descripción muy detallada (usa más tokens)
+			prompts = {
+				"es": (
+					"Describe esta imagen de forma muy detallada y estructurada para una persona con discapacidad visual. "
+					"Incluye:\n"
+					"1. Escena general y contexto detallado\n"
+					"2. Objetos principales y secundarios con su disposición espacial exacta\n"
+					"3. Personas presentes: número, posición, edad aproximada, acciones, expresiones, ropa y accesorios\n"
+					"4. Colores específicos, iluminación, sombras y texturas\n"
+					"5. Texto visible: transcribe todo el texto legible\n"
+					"6. Ambiente, emociones y atmósfera que transmite\n"
+					"7. Detalles de fondo y elementos menos prominentes\n"
+					"Sé exhaustivo, específico y meticuloso."
+				),
+				"en": (
+					"Describe this image in great detail and structured way for a visually impaired person. "
+					"Include:\n"
+					"1. General scene and detailed context\n"
+					"2. Main and secondary objects with exact spatial arrangement\n"
+					"3. People present: number, position, approximate age, actions, expressions, clothing and accessories\n"
+					"4. Specific colors, lighting, shadows and textures\n"
+					"5. Visible text: transcribe all readable text\n"
+					"6. Mood, emotions and atmosphere conveyed\n"
+					"7. Background details and less prominent elements\n"
+					"Be exhaustive, specific and meticulous."
+				),
+				"fr": (
+					"Décris cette image de manière très détaillée et structurée pour une personne malvoyante. "
+					"Inclure:\n"
+					"1. Scène générale et contexte détaillé\n"
+					"2. Objets principaux et secondaires avec disposition spatiale exacte\n"
+					"3. Personnes présentes: nombre, position, âge approximatif, actions, expressions, vêtements et accessoires\n"
+					"4. Couleurs spécifiques, éclairage, ombres et textures\n"
+					"5. Texte visible: transcrire tout le texte lisible\n"
+					"6. Ambiance, émotions et atmosphère transmises\n"
+					"7. Détails d'arrière-plan et éléments moins proéminents\n"
+					"Sois exhaustif, spécifique et méticuleux."
+				)
+			}
+			maxTokensToUse = maxTokens
+			detailLevel = "high"
+		else:  # auto o cualquier otro valor = descripción balanceada
+			# Descripción equilibrada (balance entre detalle y tokens)
+			prompts = {
+				"es": (
+					"Describe esta imagen de forma clara para una persona con discapacidad visual. "
+					"Incluye: escena general, objetos principales, personas (si las hay), colores relevantes, "
+					"texto visible, y el mensaje o propósito de la imagen. Sé específico pero conciso."
+				),
+				"en": (
+					"Describe this image clearly for a visually impaired person. "
+					"Include: general scene, main objects, people (if any), relevant colors, "
+					"visible text, and the message or purpose of the image. Be specific but concise."
+				),
+				"fr": (
+					"Décris cette image clairement pour une personne malvoyante. "
+					"Inclure: scène générale, objets principaux, personnes (le cas échéant), couleurs pertinentes, "
+					"texte visible, et le message ou l'objectif de l'image. Sois précis mais concis."
+				)
+			}
+			maxTokensToUse = 500  # Reducido de 800 a 500 para nivel AUTO
+			detailLevel = "auto"
+		
+		prompt = prompts.get(language, prompts["es"])
+		
+		payload = {
+			"model": self.model,
+			"messages": [
+				{
+					"role": "user",
+					"content": [
+						{
+							"type": "text",
+							"text": prompt
+						},
 						{
 							"type": "image_url",
 							"image_url": {
-								"url": f"data:image/png;base64,{imageBase64}",
+								"url": imageUrl or f"data:image/png;base64,{imageBase64}",
 								"detail": detailLevel
 							}
 						}
@@ -150,48 +152,285 @@ class OpenAIClient:
 				}
 			],
 			"max_tokens": maxTokensToUse
-		}			# Hacer petición
-			log.info("Enviando petición a OpenAI GPT-4 Vision...")
-			response = requests.post(
+		}
+		return payload, detailLevel
+	
+	def _parseDescription(self, result):
+		"""
+		Extrae la descripción de una respuesta de chat/completions
+		
+		Args:
+			result (dict): Respuesta JSON de OpenAI
+		
+		Returns:
+			str: Descripción sin espacios sobrantes
+		"""
+		return result["choices"][0]["message"]["content"].strip()
+	
+	async def describeImageAsync(self, imageBase64, detail="auto", language="es", maxTokens=500, cancelToken=None, transport=None):
+		"""
+		Describe una imagen usando GPT-4 Vision dentro del núcleo asíncrono
+		
+		Args:
+			imageBase64 (str): Imagen codificada en base64
+			detail (str): Nivel de detalle - "low", "high", o "auto"
+			language (str): Idioma de respuesta
+			maxTokens (int): Máximo de tokens en la respuesta
+			cancelToken (CancellationToken): Token de cancelación; la petición en curso
+				se aborta cancelando el futuro que la ejecuta
+			transport: Objeto con el método request() del núcleo asíncrono que envía la
+				petición (por defecto asyncCore; HelperTransport para el proceso auxiliar)
+		
+		Returns:
+			str: Descripción de la imagen
+		"""
+		payload, detailLevel = self._buildPayload(imageBase64, detail, language, maxTokens)
+		return await self._postAsync(payload, detailLevel, cancelToken, transport)
+	
+	async def describeImageURLAsync(self, url, detail="auto", language="es", maxTokens=500, cancelToken=None):
+		"""
+		Describe una imagen pública que descarga el propio OpenAI
+		
+		Args:
+			url (str): Dirección http(s) pública de la imagen
+			detail (str): Nivel de detalle - "low", "high", o "auto"
+			language (str): Idioma de respuesta
+			maxTokens (int): Máximo de tokens en la respuesta
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			str: Descripción de la imagen
+		
+		Raises:
+			RequestRejected: Si OpenAI no pudo descargar o no acepta la imagen
+		"""
+		payload, detailLevel = self._buildPayload(None, detail, language, maxTokens, imageUrl=url)
+		return await self._postAsync(payload, detailLevel, cancelToken)
+	
+	async def describeStructuredAsync(self, imageBase64, detail="auto", language="es", cancelToken=None, transport=None, onSummary=None):
+		"""
+		Describe una imagen con una respuesta JSON que empieza por un resumen de una línea
+		
+		La respuesta se pide en streaming (salvo con el proceso auxiliar) y onSummary se
+		llama en cuanto el resumen está completo, antes de que termine la respuesta
+		
+		Args:
+			imageBase64 (str): Imagen codificada en base64
+			detail (str): Nivel de detalle - "low", "high", o "auto"
+			language (str): Idioma de respuesta
+			cancelToken (CancellationToken): Token de cancelación, o None
+			transport: Transporte de la petición (por defecto asyncCore)
+			onSummary: Función (resumen) llamada desde el núcleo asíncrono, o None
+		
+		Returns:
+			StructuredDescription: Resumen, texto detectado y apartados
+		"""
+		detailLevel = detail if detail in ("low", "high") else "auto"
+		payload = {
+			"model": self.model,
+			"messages": [{"role": "user", "content": [
+				{"type": "text", "text": buildStructuredPrompt(detailLevel, language)},
+				{"type": "image_url", "image_url": {"url": f"data:image/png;base64,{imageBase64}", "detail": detailLevel}}
+			]}],
+			"max_tokens": structuredMaxTokens(detailLevel),
+			"response_format": {"type": "json_object"}
+		}
+		stream = None
+		if transport is None:
+			payload["stream"] = True
+			stream = ResponseStream(
+				lambda event: event["choices"][0]["delta"].get("content") if event.get("choices") else None,
+				SummaryWatcher(onSummary) if onSummary else None
+			)
+		answer = await self._postAsync(payload, detailLevel, cancelToken, transport, stream=stream)
+		return StructuredDescription.parse(answer, language)
+	
+	async def describeImagesAsync(self, imagesBase64, detail="auto", language="es", cancelToken=None, transport=None):
+		"""
+		Describe varias imágenes en una sola petición
+		
+		Args:
+			imagesBase64 (list): Imágenes codificadas en base64 (como mucho MAX_IMAGES_PER_REQUEST)
+			detail (str): Nivel de detalle - "low", "high", o "auto"
+			language (str): Idioma de respuesta
+			cancelToken (CancellationToken): Token de cancelación, o None
+			transport: Transporte de la petición (por defecto asyncCore)
+		
+		Returns:
+			list: Descripción de cada imagen en el mismo orden (None si faltó en la respuesta)
+		"""
+		detailLevel = detail if detail in ("low", "high") else "auto"
+		content = [{"type": "text", "text": buildMultiImagePrompt(len(imagesBase64), detailLevel, language)}]
+		for number, imageBase64 in enumerate(imagesBase64, 1):
+			content.append({"type": "text", "text": imageLabel(number, language)})
+			content.append({
+				"type": "image_url",
+				"image_url": {
+					"url": f"data:image/png;base64,{imageBase64}",
+					"detail": detailLevel
+				}
+			})
+		payload = {
+			"model": self.model,
+			"messages": [{"role": "user", "content": content}],
+			"max_tokens": maxTokensFor(len(imagesBase64), detailLevel)
+		}
+		text = await self._postAsync(payload, detailLevel, cancelToken, transport, timeout=MULTI_IMAGE_TIMEOUT)
+		return parseNumberedAnswers(text, len(imagesBase64))
+	
+	async def labelContactSheetAsync(self, sheetBase64, count, language="es", cancelToken=None, transport=None):
+		"""
+		Pide una etiqueta corta para cada icono numerado de una hoja de contactos
+		
+		Args:
+			sheetBase64 (str): Hoja de contactos codificada en base64
+			count (int): Número de iconos de la hoja
+			language (str): Idioma de las etiquetas
+			cancelToken (CancellationToken): Token de cancelación, o None
+			transport: Transporte de la petición (por defecto asyncCore)
+		
+		Returns:
+			list: Etiqueta de cada icono en orden (None si faltó en la respuesta)
+		"""
+		payload = {
+			"model": self.model,
+			"messages": [{
+				"role": "user",
+				"content": [
+					{"type": "text", "text": buildContactSheetPrompt(count, language)},
+					{
+						"type": "image_url",
+						# Detalle alto: los iconos y sus números son pequeños
+						"image_url": {"url": f"data:image/png;base64,{sheetBase64}", "detail": "high"}
+					}
+				]
+			}],
+			"max_tokens": contactSheetMaxTokens(count)
+		}
+		text = await self._postAsync(payload, "high", cancelToken, transport, timeout=MULTI_IMAGE_TIMEOUT)
+		return parseNumberedAnswers(text, count)
+	
+	async def describeWithPromptAsync(self, imagesBase64, prompt, detail="auto", maxTokens=1000, cancelToken=None, transport=None):
+		"""
+		Envía un prompt propio con una o varias imágenes
+		
+		Args:
+			imagesBase64 (list): Imágenes codificadas en base64
+			prompt (str): Instrucciones de la petición
+			detail (str): Nivel de detalle de las imágenes - "low", "high", o "auto"
+			maxTokens (int): Límite de tokens de salida
+			cancelToken (CancellationToken): Token de cancelación, o None
+			transport: Transporte de la petición (por defecto asyncCore)
+		
+		Returns:
+			str: Texto de la respuesta
+		"""
+		detailLevel = detail if detail in ("low", "high") else "auto"
+		content = [{"type": "text", "text": prompt}]
+		for imageBase64 in imagesBase64:
+			content.append({
+				"type": "image_url",
+				"image_url": {"url": f"data:image/png;base64,{imageBase64}", "detail": detailLevel}
+			})
+		payload = {
+			"model": self.model,
+			"messages": [{"role": "user", "content": content}],
+			"max_tokens": maxTokens
+		}
+		return await self._postAsync(payload, detailLevel, cancelToken, transport, timeout=MULTI_IMAGE_TIMEOUT)
+	
+	async def _postAsync(self, payload, detailLevel, cancelToken=None, transport=None, timeout=None, stream=None):
+		"""
+		Envía una petición a chat/completions
+		
+		Args:
+			payload (dict): Cuerpo de la petición
+			detailLevel (str): Nivel de detalle normalizado
+			cancelToken (CancellationToken): Token de cancelación, o None
+			transport: Transporte de la petición (por defecto asyncCore)
+			timeout (tuple): Timeouts fijos; None para usar los adaptativos y registrar la latencia
+			stream (ResponseStream): Lector de la respuesta si se pidió en streaming, o None
+		
+		Returns:
+			str: Texto de la respuesta
+		"""
+		try:
+			headers = {"Content-Type": "application/json", **self._headers()}
+			
+			# Hacer petición
+			raiseIfCancelled(cancelToken)
+			log.info(f"Enviando petición a {self.NAME} ({self.model})...")
+			start = time.monotonic()
+			options = {"onChunk": stream.feed} if stream else {}
+			response = await (transport or asyncCore).request(
+				"POST",
 				self.API_URL,
 				headers=headers,
 				json=payload,
-				timeout=30
+				timeout=timeout or latencyTracker.getTimeouts(self.PROVIDER, self.model, detailLevel),
+				**options
 			)
+			latencyTracker.recordConnect(self.PROVIDER, response)
 			
 			# Verificar respuesta
 			response.raise_for_status()
 			
 			# Extraer descripción
-			result = response.json()
-			description = result["choices"][0]["message"]["content"]
-			
-			log.info("Descripción recibida de OpenAI")
-			return description.strip()
+			if stream:
+				stream.flush()
+				description = stream.text.strip()
+			else:
+				description = self._parseDescription(response.json())
+			if timeout is None:
+				latencyTracker.record((self.PROVIDER, self.model, detailLevel), time.monotonic() - start)
 			
-		except requests.exceptions.HTTPError as e:
+			log.info(f"Descripción recibida de {self.NAME}")
+			return description
+		
+		except HttpStatusError as e:
 			if e.response.status_code == 401:
-				raise Exception("API key de OpenAI inválida")
+				raise Exception(f"API key de {self.NAME} inválida")
 			elif e.response.status_code == 429:
 				raise Exception("Límite de solicitudes excedido. Intenta más tarde")
 			elif e.response.status_code == 400:
-				error_data = e.response.json()
-				error_msg = error_data.get("error", {}).get("message", "Error desconocido")
-				raise Exception(f"Error en la petición: {error_msg}")
+				try:
+					error_msg = e.response.json().get("error", {}).get("message", "Error desconocido")
+				except (ValueError, AttributeError):
+					# Algunos servidores compatibles responden con texto plano
+					error_msg = e.response.text[:200] or "Error desconocido"
+				raise RequestRejected(f"Error en la petición: {error_msg}")
 			else:
 				raise Exception(f"Error HTTP {e.response.status_code}: {str(e)}")
 		
-		except requests.exceptions.Timeout:
+		except ConnectTimeout:
+			raise Exception(f"No se pudo establecer conexión con {self.NAME}. Verifica tu conexión")
+		
+		except RequestTimeout:
 			raise Exception("Tiempo de espera agotado. Verifica tu conexión")
 		
-		except requests.exceptions.ConnectionError:
+		except ConnectionFailed:
 			raise Exception("Error de conexión. Verifica tu conexión a internet")
 		
 		except Exception as e:
-			log.error(f"Error en OpenAI client: {e}", exc_info=True)
+			log.error(f"Error en cliente de {self.NAME}: {e}", exc_info=True)
 			raise Exception(f"Error al procesar imagen: {str(e)}")
 	
-	def testConnection(self):
+	def describeImage(self, imageBase64, detail="auto", language="es", maxTokens=500):
+		"""
+		Describe una imagen usando GPT-4 Vision (bloquea hasta tener la respuesta)
+		
+		Args:
+			imageBase64 (str): Imagen codificada en base64
+			detail (str): Nivel de detalle - "low", "high", o "auto"
+			language (str): Idioma de respuesta
+			maxTokens (int): Máximo de tokens en la respuesta
+		
+		Returns:
+			str: Descripción de la imagen
+		"""
+		return asyncCore.run(self.describeImageAsync(imageBase64, detail, language, maxTokens))
+	
+	async def testConnectionAsync(self):
 		"""
 		Prueba la conexión con la API de OpenAI
 		
@@ -199,19 +438,27 @@ class OpenAIClient:
 			bool: True si la conexión es exitosa
 		"""
 		try:
-			headers = {
-				"Authorization": f"Bearer {self.apiKey}"
-			}
-			
-			response = requests.get(
-				"https://api.openai.com/v1/models",
-				headers=headers,
-				timeout=10
+			response = await asyncCore.request(
+				"GET",
+				self.MODELS_URL,
+				headers=self._headers(),
+				timeout=latencyTracker.getListTimeouts(self.PROVIDER)
 			)
 			
 			response.raise_for_status()
+			latencyTracker.recordConnect(self.PROVIDER, response)
+			latencyTracker.record((self.PROVIDER, "list"), response.elapsed)
 			return True
-			
+		
 		except Exception as e:
-			log.error(f"Error al probar conexión con OpenAI: {e}")
+			log.error(f"Error al probar conexión con {self.NAME}: {e}")
 			return False
+	
+	def testConnection(self):
+		"""
+		Prueba la conexión con la API de OpenAI (bloqueante)
+		
+		Returns:
+			bool: True si la conexión es exitosa
+		"""
+		return asyncCore.run(self.testConnectionAsync())
@@ -0,0 +1,234 @@
+# -*- coding: UTF-8 -*-
+"""
+Respuestas estructuradas con el resumen primero
+Prompt común a los proveedores que pide un objeto JSON con un resumen de una línea,
+el texto detectado y apartados de detalle; lectura de respuestas en streaming (SSE)
+que avisa del resumen en cuanto llega completo, antes de que termine la respuesta
+"""
+
+import json
+import re
+from logHandler import log
+
+STRUCTURED_MAX_TOKENS = {"low": 300, "auto": 900, "high": 2500}
+
+SECTION_HINTS = {
+	"low": {
+		"es": "Como mucho un apartado breve.",
+		"en": "At most one short section.",
+		"fr": "Au plus une section courte."
+	},
+	"auto": {
+		"es": "De 2 a 4 apartados concisos (por ejemplo: escena, personas, objetos, colores).",
+		"en": "2 to 4 concise sections (for example: scene, people, objects, colours).",
+		"fr": "De 2 à 4 sections concises (par exemple: scène, personnes, objets, couleurs)."
+	},
+	"high": {
+		"es": (
+			"Apartados detallados para la escena y el contexto, los objetos y su disposición, las personas, "
+			"los colores y la iluminación, y el ambiente."
+		),
+		"en": (
+			"Detailed sections for the scene and context, objects and their layout, people, colours and "
+			"lighting, and mood."
+		),
+		"fr": (
+			"Des sections détaillées pour la scène et le contexte, les objets et leur disposition, les personnes, "
+			"les couleurs et l'éclairage, et l'ambiance."
+		)
+	}
+}
+
+STRUCTURED_PROMPTS = {
+	"es": (
+		"Describe esta imagen para una persona con discapacidad visual. Responde solo con un objeto JSON con "
+		"estas claves y en este orden: \"summary\" (una sola frase que diga lo esencial), \"text\" (el texto "
+		"visible transcrito literalmente, o una cadena vacía) y \"sections\" (lista de objetos con \"title\" y "
+		"\"content\"). {sections} Escribe en español."
+	),
+	"en": (
+		"Describe this image for a visually impaired person. Reply only with a JSON object with these keys in "
+		"this order: \"summary\" (a single sentence stating the essentials), \"text\" (the visible text "
+		"transcribed verbatim, or an empty string) and \"sections\" (list of objects with \"title\" and "
+		"\"content\"). {sections} Write in English."
+	),
+	"fr": (
+		"Décris cette image pour une personne malvoyante. Réponds uniquement avec un objet JSON avec ces clés "
+		"dans cet ordre: \"summary\" (une seule phrase qui dit l'essentiel), \"text\" (le texte visible transcrit "
+		"mot pour mot, ou une chaîne vide) et \"sections\" (liste d'objets avec \"title\" et \"content\"). "
+		"{sections} Écris en français."
+	)
+}
+
+TEXT_TITLES = {"es": "Texto detectado", "en": "Detected text", "fr": "Texte détecté"}
+
+# Resumen completo (la cadena ya está cerrada) al principio de una respuesta en curso
+SUMMARY_PATTERN = re.compile(r'"summary"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def buildStructuredPrompt(detail, language):
+	"""Prompt de la respuesta estructurada"""
+	hints = SECTION_HINTS.get(detail, SECTION_HINTS["auto"])
+	template = STRUCTURED_PROMPTS.get(language, STRUCTURED_PROMPTS["es"])
+	return template.format(sections=hints.get(language, hints["es"]))
+
+
+def structuredMaxTokens(detail):
+	"""Tokens de salida de la respuesta estructurada según el nivel de detalle"""
+	return STRUCTURED_MAX_TOKENS.get(detail, STRUCTURED_MAX_TOKENS["auto"])
+
+
+class StructuredDescription(str):
+	"""
+	Descripción estructurada
+	
+	Es el texto Markdown completo (resumen, texto detectado y apartados), así que sirve
+	donde se espera una descripción normal; además conserva cada parte por separado
+	"""
+	
+	def __new__(cls, summary, text="", sections=(), language="es"):
+		"""
+		Args:
+			summary (str): Resumen de una línea
+			text (str): Texto detectado en la imagen
+			sections (list): (título, contenido) de cada apartado
+			language (str): Idioma del título del texto detectado
+		"""
+		parts = [summary]
+		if text:
+			parts.append(f"## {TEXT_TITLES.get(language, TEXT_TITLES['es'])}\n\n{text}")
+		parts.extend(f"## {title}\n\n{content}" for title, content in sections)
+		self = super().__new__(cls, "\n\n".join(parts))
+		self.summary = summary
+		self.text = text
+		self.sections = list(sections)
+		self.textTitle = TEXT_TITLES.get(language, TEXT_TITLES["es"])
+		return self
+	
+	@property
+	def details(self):
+		"""Texto detectado y apartados, sin el resumen"""
+		return self[len(self.summary):].strip()
+	
+	@classmethod
+	def parse(cls, answer, language="es"):
+		"""
+		Interpreta la respuesta del modelo
+		
+		Si no es JSON válido se conserva entera como un único apartado, con su primera
+		frase como resumen
+		
+		Args:
+			answer (str): Respuesta del modelo
+			language (str): Idioma de la descripción
+		
+		Returns:
+			StructuredDescription: Descripción estructurada
+		"""
+		cleaned = answer.strip()
+		# Algunos modelos envuelven el JSON en un bloque de código
+		if cleaned.startswith("```"):
+			cleaned = cleaned.strip("`")
+			if cleaned.lower().startswith("json"):
+				cleaned = cleaned[4:]
+		try:
+			data = json.loads(cleaned)
+			summary = str(data.get("summary") or "").strip()
+			text = str(data.get("text") or "").strip()
+			sections = [
+				(str(section.get("title") or "").strip(), str(section.get("content") or "").strip())
+				for section in data.get("sections") or []
+				if isinstance(section, dict) and section.get("content")
+			]
+		except (ValueError, AttributeError, TypeError) as e:
+			log.warning(f"Respuesta estructurada no válida, se usa como texto: {e}")
+			summary, _separator, rest = cleaned.partition(". ")
+			return cls(summary.strip(), "", [("", rest.strip())] if rest.strip() else [], language)
+		if not summary:
+			raise Exception("La respuesta estructurada no incluye un resumen")
+		return cls(summary, text, sections, language)
+
+
+class SummaryWatcher:
+	"""Avisa una sola vez del resumen en cuanto aparece completo en el texto recibido"""
+	
+	def __init__(self, onSummary):
+		"""
+		Args:
+			onSummary: Función (resumen) llamada desde el bucle del núcleo asíncrono
+		"""
+		self.onSummary = onSummary
+		self.summary = None
+	
+	def __call__(self, text):
+		if self.summary is not None:
+			return
+		match = SUMMARY_PATTERN.search(text)
+		if not match:
+			return
+		try:
+			self.summary = json.loads(f'"{match.group(1)}"').strip()
+		except ValueError:
+			return
+		if self.summary:
+			try:
+				self.onSummary(self.summary)
+			except Exception as e:
+				log.warning(f"Error al anunciar el resumen: {e}")
+
+
+class ResponseStream:
+	"""
+	Acumula el texto de una respuesta en streaming (eventos server-sent)
+	
+	Se pasa feed como onChunk de asyncCore.request
+	"""
+	
+	def __init__(self, extractText, onText=None):
+		"""
+		Args:
+			extractText: Función (evento JSON) -> fragmento de texto del evento
+			onText: Función (texto acumulado) llamada tras cada fragmento, o None
+		"""
+		self.extractText = extractText
+		self.onText = onText
+		self.lastEvent = {}
+		self._pending = b""
+		self._parts = []
+	
+	@property
+	def text(self):
+		"""Texto recibido hasta ahora"""
+		return "".join(self._parts)
+	
+	def feed(self, headers, chunk):
+		"""Procesa un fragmento del cuerpo (los eventos pueden llegar partidos)"""
+		self._pending = (self._pending + chunk).replace(b"\r\n", b"\n")
+		*events, self._pending = self._pending.split(b"\n\n")
+		self._readEvents(events)
+	
+	def flush(self):
+		"""Procesa el último evento si la respuesta no terminó con una línea en blanco"""
+		pending, self._pending = self._pending, b""
+		self._readEvents([pending])
+	
+	def _readEvents(self, events):
+		"""Añade el texto de los eventos completos y avisa a onText"""
+		received = False
+		for event in events:
+			for line in event.split(b"\n"):
+				if not line.startswith(b"data:"):
+					continue
+				data = line[5:].strip()
+				if not data or data == b"[DONE]":
+					continue
+				try:
+					self.lastEvent = json.loads(data)
+					piece = self.extractText(self.lastEvent)
+				except (ValueError, KeyError, IndexError, TypeError):
+					continue
+				if piece:
+					self._parts.append(piece)
+					received = True
+		if received and self.onText is not None:
+			self.onText(self.text)
@@ -0,0 +1,432 @@
+# -*- coding: UTF-8 -*-
+"""
+Núcleo asíncrono de red
+Un único bucle de eventos asyncio en segundo plano ejecuta todas las peticiones HTTP
+(OpenAI, Gemini y descargas de imágenes) y devuelve futuros cancelables al lado de NVDA/wx
+"""
+
+import asyncio
+import concurrent.futures
+import json as jsonModule
+import threading
+import time
+from logHandler import log
+
+try:
+	import aiohttp
+	AIOHTTP_AVAILABLE = True
+except ImportError:
+	log.info("aiohttp no disponible, las peticiones se harán con requests en un grupo de hilos")
+	AIOHTTP_AVAILABLE = False
+
+try:
+	import requests
+	import urllib3
+	REQUESTS_AVAILABLE = True
+except ImportError:
+	log.warning("requests no disponible")
+	REQUESTS_AVAILABLE = False
+
+
+class ConnectionFailed(Exception):
+	"""No se pudo conectar con el servidor"""
+
+
+class RequestTimeout(Exception):
+	"""Tiempo de espera agotado esperando la respuesta"""
+
+
+class ConnectTimeout(RequestTimeout):
+	"""Tiempo de espera agotado al establecer la conexión"""
+
+
+class ResponseTooLarge(Exception):
+	"""El cuerpo de la respuesta supera el tamaño máximo permitido"""
+
+
+class RequestRejected(Exception):
+	"""El proveedor rechazó la petición por su contenido (HTTP 400)"""
+
+
+class HttpStatusError(Exception):
+	"""Respuesta HTTP con código de error"""
+	
+	def __init__(self, response):
+		super().__init__(f"HTTP {response.status_code}")
+		self.response = response
+
+
+class ResponseHeaders(dict):
+	"""Cabeceras de una respuesta que se consultan sin distinguir mayúsculas de minúsculas"""
+	
+	def __init__(self, headers=None):
+		"""
+		Args:
+			headers: Cabeceras recibidas (dict, CIMultiDict de aiohttp o CaseInsensitiveDict de requests)
+		"""
+		super().__init__((str(name).lower(), value) for name, value in (headers or {}).items())
+	
+	def __getitem__(self, name):
+		return super().__getitem__(name.lower())
+	
+	def __contains__(self, name):
+		return super().__contains__(name.lower())
+	
+	def get(self, name, default=None):
+		return super().get(name.lower(), default)
+
+
+class HttpResponse:
+	"""Respuesta HTTP ya leída por completo"""
+	
+	def __init__(self, url, status_code, headers, content, elapsed, connectElapsed=None):
+		"""
+		Args:
+			url (str): URL solicitada
+			status_code (int): Código de estado HTTP
+			headers (dict): Cabeceras de la respuesta (se consultan sin distinguir mayúsculas)
+			content (bytes): Cuerpo de la respuesta
+			elapsed (float): Segundos hasta recibir las cabeceras
+			connectElapsed (float): Segundos en abrir la conexión (DNS, TCP y TLS), o None
+				si se reutilizó una conexión abierta o no se pudo medir
+		"""
+		self.url = url
+		self.status_code = status_code
+		self.headers = headers if isinstance(headers, ResponseHeaders) else ResponseHeaders(headers)
+		self.content = content
+		self.elapsed = elapsed
+		self.connectElapsed = connectElapsed
+	
+	@property
+	def text(self):
+		"""Cuerpo de la respuesta como texto"""
+		return self.content.decode("utf-8", errors="replace")
+	
+	def json(self):
+		"""Cuerpo de la respuesta interpretado como JSON"""
+		return jsonModule.loads(self.content)
+	
+	def raise_for_status(self):
+		"""Lanza HttpStatusError si el código de estado indica un error"""
+		if self.status_code >= 400:
+			raise HttpStatusError(self)
+
+
+# Segundos que tardó la última conexión abierta por cada hilo del grupo de requests
+_connectTiming = threading.local()
+
+
+def _timedPool(poolClass):
+	"""
+	Subclase de un grupo de conexiones de urllib3 que mide cuánto tarda cada conexión nueva
+	
+	urllib3 conecta en el mismo hilo que hace la petición, así que la medida queda en
+	_connectTiming para ese hilo
+	"""
+	class TimedConnection(poolClass.ConnectionCls):
+		def connect(self):
+			start = time.monotonic()
+			super().connect()
+			_connectTiming.elapsed = time.monotonic() - start
+	
+	class TimedPool(poolClass):
+		ConnectionCls = TimedConnection
+	
+	return TimedPool
+
+
+class AsyncCore:
+	"""Bucle de eventos asyncio compartido en un hilo de fondo"""
+	
+	MAX_CONNECTIONS = 8  # Sockets simultáneos en total
+	MAX_CONNECTIONS_PER_HOST = 4
+	FALLBACK_WORKERS = 4  # Hilos para peticiones con requests si falta aiohttp
+	CHUNK_SIZE = 64 * 1024  # Bytes por fragmento al leer respuestas con límite de tamaño
+	
+	def __init__(self):
+		"""Inicializa el núcleo (el bucle se arranca al primer uso)"""
+		self._loop = None
+		self._thread = None
+		self._session = None
+		self._executor = None
+		self._requestsSession = None
+		self._lock = threading.Lock()
+	
+	def _ensureStarted(self):
+		"""Arranca el hilo del bucle de eventos si no está en marcha"""
+		with self._lock:
+			if self._loop is not None:
+				return self._loop
+			loop = asyncio.new_event_loop()
+			ready = threading.Event()
+			
+			def runLoop():
+				asyncio.set_event_loop(loop)
+				loop.call_soon(ready.set)
+				loop.run_forever()
+			
+			self._thread = threading.Thread(
+				target=runLoop,
+				name="aiImageDescriber-asyncCore",
+				daemon=True
+			)
+			self._thread.start()
+			ready.wait()
+			self._loop = loop
+			log.info("Núcleo asíncrono iniciado")
+			return loop
+	
+	def submit(self, coro):
+		"""
+		Ejecuta una corrutina en el bucle de fondo
+		
+		Args:
+			coro: Corrutina a ejecutar
+		
+		Returns:
+			concurrent.futures.Future: Futuro cancelable; cancelarlo cancela la tarea
+				y cierra las conexiones que tenga abiertas
+		"""
+		loop = self._ensureStarted()
+		return asyncio.run_coroutine_threadsafe(coro, loop)
+	
+	def run(self, coro, timeout=None):
+		"""
+		Ejecuta una corrutina y espera su resultado (fachada bloqueante)
+		
+		Args:
+			coro: Corrutina a ejecutar
+			timeout (float): Segundos máximos de espera, o None
+		
+		Returns:
+			Resultado de la corrutina
+		"""
+		if self._thread is not None and threading.current_thread() is self._thread:
+			coro.close()
+			raise RuntimeError("AsyncCore.run no puede llamarse desde el propio bucle de eventos")
+		future = self.submit(coro)
+		try:
+			return future.result(timeout)
+		except concurrent.futures.TimeoutError:
+			future.cancel()
+			raise
+	
+	def stop(self):
+		"""Cancela las peticiones pendientes, cierra las conexiones y detiene el bucle"""
+		with self._lock:
+			loop = self._loop
+			self._loop = None
+		if loop is None:
+			return
+		try:
+			asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(5)
+		except Exception as e:
+			log.warning(f"Error al cerrar el núcleo asíncrono: {e}")
+		loop.call_soon_threadsafe(loop.stop)
+		self._thread.join(5)
+		self._thread = None
+		if self._executor:
+			self._executor.shutdown(wait=False)
+			self._executor = None
+		if self._requestsSession:
+			self._requestsSession.close()
+			self._requestsSession = None
+		log.info("Núcleo asíncrono detenido")
+	
+	async def _shutdown(self):
+		"""Cancela todas las tareas en curso y cierra la sesión HTTP"""
+		current = asyncio.current_task()
+		tasks = [t for t in asyncio.all_tasks() if t is not current]
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+		if self._session is not None:
+			await self._session.close()
+			self._session = None
+	
+	def _getSession(self):
+		"""Retorna la sesión aiohttp compartida (debe llamarse dentro del bucle)"""
+		if self._session is None or self._session.closed:
+			connector = aiohttp.TCPConnector(
+				limit=self.MAX_CONNECTIONS,
+				limit_per_host=self.MAX_CONNECTIONS_PER_HOST
+			)
+			traceConfig = aiohttp.TraceConfig()
+			traceConfig.on_connection_create_start.append(self._onConnectionStart)
+			traceConfig.on_connection_create_end.append(self._onConnectionEnd)
+			self._session = aiohttp.ClientSession(connector=connector, trace_configs=[traceConfig])
+		return self._session
+	
+	@staticmethod
+	async def _onConnectionStart(session, context, params):
+		"""Anota el inicio de una conexión nueva de aiohttp"""
+		context.connectStart = time.monotonic()
+	
+	@staticmethod
+	async def _onConnectionEnd(session, context, params):
+		"""Guarda en la petición cuánto tardó en abrirse su conexión"""
+		if context.trace_request_ctx is not None:
+			context.trace_request_ctx["connect"] = time.monotonic() - context.connectStart
+	
+	async def request(self, method, url, headers=None, json=None, data=None, timeout=(5.0, 30.0), maxBytes=None, onChunk=None):
+		"""
+		Realiza una petición HTTP dentro del bucle de eventos
+		
+		Con maxBytes u onChunk el cuerpo se lee por fragmentos: la respuesta se rechaza por
+		Content-Length antes de leerla y se corta en cuanto supera el límite
+		
+		Args:
+			method (str): Método HTTP ("GET", "POST"...)
+			url (str): URL de destino
+			headers (dict): Cabeceras de la petición
+			json: Cuerpo a enviar serializado como JSON
+			data: Cuerpo a enviar tal cual (bytes, o un objeto de archivo que se lee por
+				fragmentos; en ese caso las cabeceras deben incluir su Content-Length)
+			timeout (tuple): (timeout de conexión, timeout de lectura) en segundos
+			maxBytes (int): Tamaño máximo del cuerpo, o None sin límite
+			onChunk: Función (cabeceras, fragmento) llamada con cada fragmento de una respuesta
+				correcta; si lanza una excepción la descarga se aborta, o None
+		
+		Returns:
+			HttpResponse: Respuesta leída por completo
+		
+		Raises:
+			ResponseTooLarge: Si el cuerpo supera maxBytes
+		"""
+		if AIOHTTP_AVAILABLE:
+			return await self._aiohttpRequest(method, url, headers, json, data, timeout, maxBytes, onChunk)
+		if not REQUESTS_AVAILABLE:
+			raise Exception("requests no está instalado. Instala con: pip install requests")
+		return await self._requestsRequest(method, url, headers, json, data, timeout, maxBytes, onChunk)
+	
+	@staticmethod
+	def _checkContentLength(headers, maxBytes):
+		"""Rechaza la respuesta si su Content-Length ya supera el límite"""
+		if maxBytes is None:
+			return
+		try:
+			length = int(headers.get("Content-Length", ""))
+		except ValueError:
+			return
+		if length > maxBytes:
+			raise ResponseTooLarge(f"La respuesta ocupa {length} bytes (máximo {maxBytes})")
+	
+	@staticmethod
+	def _appendChunk(buffer, chunk, maxBytes, onChunk, headers):
+		"""Añade un fragmento al cuerpo comprobando el límite y avisando a onChunk"""
+		buffer.extend(chunk)
+		if maxBytes is not None and len(buffer) > maxBytes:
+			raise ResponseTooLarge(f"La respuesta supera {maxBytes} bytes")
+		if onChunk is not None:
+			onChunk(headers, chunk)
+	
+	async def _aiohttpRequest(self, method, url, headers, json, data, timeout, maxBytes=None, onChunk=None):
+		"""Petición con aiohttp: la cancelación aborta el socket de inmediato"""
+		connectTimeout, readTimeout = timeout
+		clientTimeout = aiohttp.ClientTimeout(
+			total=None,
+			sock_connect=connectTimeout,
+			sock_read=readTimeout
+		)
+		timing = {}
+		start = time.monotonic()
+		try:
+			async with self._getSession().request(
+				method,
+				url,
+				headers=headers,
+				json=json,
+				data=data,
+				timeout=clientTimeout,
+				trace_request_ctx=timing
+			) as response:
+				elapsed = time.monotonic() - start
+				responseHeaders = ResponseHeaders(response.headers)
+				if maxBytes is None and onChunk is None:
+					content = await response.read()
+				else:
+					self._checkContentLength(responseHeaders, maxBytes)
+					chunkCallback = onChunk if response.status < 400 else None
+					buffer = bytearray()
+					async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+						self._appendChunk(buffer, chunk, maxBytes, chunkCallback, responseHeaders)
+					content = bytes(buffer)
+				return HttpResponse(url, response.status, responseHeaders, content, elapsed, timing.get("connect"))
+		except getattr(aiohttp, "ConnectionTimeoutError", ()) as e:
+			raise ConnectTimeout(str(e))
+		except asyncio.TimeoutError as e:
+			raise RequestTimeout(str(e))
+		except aiohttp.ClientError as e:
+			raise ConnectionFailed(str(e))
+	
+	async def _requestsRequest(self, method, url, headers, json, data, timeout, maxBytes=None, onChunk=None):
+		"""
+		Petición con requests en un grupo de hilos acotado
+		
+		Cancelar la tarea descarta el resultado, pero el hilo termina la petición
+		"""
+		if self._executor is None:
+			self._executor = concurrent.futures.ThreadPoolExecutor(
+				max_workers=self.FALLBACK_WORKERS,
+				thread_name_prefix="aiImageDescriber-http"
+			)
+			self._requestsSession = requests.Session()
+			adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.MAX_CONNECTIONS_PER_HOST)
+			adapter.poolmanager.pool_classes_by_scheme = {
+				"http": _timedPool(urllib3.HTTPConnectionPool),
+				"https": _timedPool(urllib3.HTTPSConnectionPool)
+			}
+			self._requestsSession.mount("http://", adapter)
+			self._requestsSession.mount("https://", adapter)
+		
+		session = self._requestsSession
+		streamed = maxBytes is not None or onChunk is not None
+		
+		def doRequest():
+			_connectTiming.elapsed = None
+			try:
+				response = session.request(
+					method,
+					url,
+					headers=headers,
+					json=json,
+					data=data,
+					timeout=timeout,
+					stream=streamed
+				)
+				if not streamed:
+					content = response.content
+				else:
+					with response:
+						responseHeaders = ResponseHeaders(response.headers)
+						self._checkContentLength(responseHeaders, maxBytes)
+						chunkCallback = onChunk if response.status_code < 400 else None
+						buffer = bytearray()
+						# Los eventos en streaming (SSE) se entregan según llegan, sin esperar
+						# a reunir un fragmento completo (el tipo no distingue mayúsculas)
+						contentType = responseHeaders.get("Content-Type", "").strip().lower()
+						chunkSize = None if contentType.startswith("text/event-stream") else self.CHUNK_SIZE
+						for chunk in response.iter_content(chunkSize):
+							self._appendChunk(buffer, chunk, maxBytes, chunkCallback, responseHeaders)
+						content = bytes(buffer)
+			except requests.exceptions.ConnectTimeout as e:
+				raise ConnectTimeout(str(e))
+			except requests.exceptions.Timeout as e:
+				raise RequestTimeout(str(e))
+			except requests.exceptions.RequestException as e:
+				raise ConnectionFailed(str(e))
+			return HttpResponse(
+				url,
+				response.status_code,
+				response.headers,
+				content,
+				response.elapsed.total_seconds(),
+				_connectTiming.elapsed
+			)
+		
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(self._executor, doRequest)
+
+
+# Instancia compartida por todo el complemento
+asyncCore = AsyncCore()
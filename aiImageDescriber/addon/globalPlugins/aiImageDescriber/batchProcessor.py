@@ -0,0 +1,404 @@
+# -*- coding: UTF-8 -*-
+"""
+Descripción por lotes de carpetas de imágenes
+Describe todas las imágenes de una carpeta con peticiones concurrentes limitadas,
+reutiliza las descripciones de archivos idénticos (mismo hash) y guarda el progreso
+en un manifiesto JSONL para poder reanudar sin volver a pagar lo ya descrito
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import time
+from logHandler import log
+
+from .cancellation import raiseIfCancelled
+from .complexity import resolveDetailAsync, ADAPTIVE
+from .helperEngine import IMAGE_PLACEHOLDER
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp")
+MANIFEST_NAME = "aiImageDescriber.jsonl"
+SIDECAR_EXTENSION = ".txt"
+
+
+def fileSha256(path):
+	"""
+	Calcula el hash SHA-256 del contenido de un archivo
+	
+	Args:
+		path (str): Ruta del archivo
+	
+	Returns:
+		str: Hash en hexadecimal
+	"""
+	digest = hashlib.sha256()
+	with open(path, "rb") as f:
+		for chunk in iter(lambda: f.read(1024 * 1024), b""):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+
+class RateLimiter:
+	"""Espaciado mínimo entre peticiones para respetar un máximo por minuto"""
+	
+	def __init__(self, requestsPerMinute):
+		"""
+		Args:
+			requestsPerMinute (int): Peticiones máximas por minuto
+		"""
+		self.interval = 60.0 / max(1, requestsPerMinute)
+		self._next = 0.0
+	
+	async def acquire(self):
+		"""Espera hasta que se pueda enviar la siguiente petición"""
+		now = time.monotonic()
+		wait = self._next - now
+		self._next = max(now, self._next) + self.interval
+		if wait > 0:
+			await asyncio.sleep(wait)
+
+
+class BatchProcessor:
+	"""Describe una carpeta completa de imágenes de forma reanudable"""
+	
+	ENCODE_WORKERS = 2  # Hilos para hash y codificación cuando no hay proceso auxiliar
+	
+	def __init__(self, client, imageProcessor, detail="auto", language="es",
+			helperEngine=None, maxConcurrent=4, requestsPerMinute=30, progressCallback=None):
+		"""
+		Args:
+			client: Cliente de API con describeImageAsync
+			imageProcessor (ImageProcessor): Carga y codifica imágenes dentro de NVDA
+			detail (str): Nivel de detalle
+			language (str): Idioma de las descripciones
+			helperEngine (HelperEngine): Proceso auxiliar que codifica y envía, o None
+			maxConcurrent (int): Peticiones simultáneas como máximo
+			requestsPerMinute (int): Peticiones por minuto como máximo
+			progressCallback: Función (completadas, total) llamada tras cada imagen
+		"""
+		self.client = client
+		self.imageProcessor = imageProcessor
+		self.detail = detail
+		self.language = language
+		self.helperEngine = helperEngine
+		self.maxConcurrent = maxConcurrent
+		self.requestsPerMinute = requestsPerMinute
+		self.progressCallback = progressCallback
+		self._executor = None
+		self._manifestFile = None
+	
+	@staticmethod
+	def scanFolder(folder):
+		"""
+		Busca imágenes en una carpeta y sus subcarpetas
+		
+		Args:
+			folder (str): Carpeta raíz
+		
+		Returns:
+			list: Rutas de las imágenes ordenadas
+		"""
+		paths = []
+		for root, dirs, files in os.walk(folder):
+			dirs.sort()
+			for name in sorted(files):
+				if name.lower().endswith(IMAGE_EXTENSIONS):
+					paths.append(os.path.join(root, name))
+		return paths
+	
+	@staticmethod
+	def loadManifest(folder):
+		"""
+		Lee el manifiesto de una carpeta
+		
+		Args:
+			folder (str): Carpeta del lote
+		
+		Returns:
+			tuple: (dict hash -> registro correcto, dict archivo relativo -> hash descrito)
+		"""
+		byHash = {}
+		byFile = {}
+		path = os.path.join(folder, MANIFEST_NAME)
+		if not os.path.isfile(path):
+			return byHash, byFile
+		with open(path, "r", encoding="utf-8") as f:
+			for line in f:
+				try:
+					record = json.loads(line)
+				except ValueError:
+					# Línea incompleta de una ejecución interrumpida
+					continue
+				if record.get("status") != "ok":
+					continue
+				byHash[record["sha256"]] = record
+				byFile[record["file"]] = record["sha256"]
+		return byHash, byFile
+	
+	async def runAsync(self, folder, cancelToken=None):
+		"""
+		Describe las imágenes de una carpeta (se ejecuta en el núcleo asíncrono)
+		
+		Args:
+			folder (str): Carpeta a procesar
+			cancelToken (CancellationToken): Token para detener el lote, o None
+		
+		Returns:
+			dict: Resumen con total, described, reused, skipped y failed
+		"""
+		self._openResources(folder)
+		try:
+			paths, pending, summary = await self._planAsync(folder, cancelToken)
+			
+			semaphore = asyncio.Semaphore(self.maxConcurrent)
+			rateLimiter = RateLimiter(self.requestsPerMinute)
+			
+			async def processGroup(sha, group):
+				async with semaphore:
+					await rateLimiter.acquire()
+					try:
+						description = await self._describeFile(group[0], cancelToken)
+					except asyncio.CancelledError:
+						raise
+					except Exception as e:
+						log.warning(f"Error al describir {group[0]}: {e}")
+						self._recordGroup(folder, sha, group, summary, error=str(e))
+					else:
+						self._recordGroup(folder, sha, group, summary, description=description)
+				self._reportProgress(self._completedCount(summary), len(paths))
+			
+			await asyncio.gather(*(processGroup(sha, group) for sha, group in pending))
+			return summary
+		finally:
+			self._closeResources()
+	
+	async def _planAsync(self, folder, cancelToken=None):
+		"""
+		Busca las imágenes de una carpeta, las agrupa por hash y registra las ya descritas
+		
+		Los archivos con el mismo contenido que otro ya descrito se registran reutilizando
+		su descripción; el manifiesto debe estar abierto
+		
+		Args:
+			folder (str): Carpeta a procesar
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			tuple: (rutas, lista de (hash, rutas del grupo) pendientes de describir, resumen)
+		"""
+		loop = asyncio.get_running_loop()
+		summary = {"total": 0, "described": 0, "reused": 0, "skipped": 0, "failed": 0}
+		paths = await loop.run_in_executor(self._executor, self.scanFolder, folder)
+		summary["total"] = len(paths)
+		doneByHash, doneByFile = self.loadManifest(folder)
+		
+		# Agrupar por contenido: los archivos idénticos se describen una sola vez
+		groups = {}
+		for path in paths:
+			raiseIfCancelled(cancelToken)
+			sha = await loop.run_in_executor(self._executor, fileSha256, path)
+			groups.setdefault(sha, []).append(path)
+		log.info(f"Lote en {folder}: {len(paths)} imágenes, {len(groups)} distintas")
+		
+		pending = []
+		for sha, group in groups.items():
+			if sha in doneByHash:
+				for path in group:
+					relPath = self._relPath(folder, path)
+					if doneByFile.get(relPath) == sha:
+						summary["skipped"] += 1
+					else:
+						self._recordSuccess(folder, path, sha, doneByHash[sha]["description"], reusedFrom=doneByHash[sha]["file"])
+						summary["reused"] += 1
+			else:
+				pending.append((sha, group))
+		self._reportProgress(self._completedCount(summary), len(paths))
+		return paths, pending, summary
+	
+	async def describeNewFileAsync(self, folder, path, cancelToken=None):
+		"""
+		Describe una imagen recién llegada a una carpeta y la registra en su manifiesto
+		
+		Si el manifiesto ya tiene una descripción del mismo contenido, se reutiliza sin petición
+		
+		Args:
+			folder (str): Carpeta cuyo manifiesto se actualiza
+			path (str): Ruta de la imagen
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			str: Descripción de la imagen
+		"""
+		loop = asyncio.get_running_loop()
+		self._openResources(folder)
+		try:
+			sha = await loop.run_in_executor(self._executor, fileSha256, path)
+			doneByHash, _doneByFile = self.loadManifest(folder)
+			if sha in doneByHash:
+				record = doneByHash[sha]
+				self._recordSuccess(folder, path, sha, record["description"], reusedFrom=record["file"])
+				return record["description"]
+			
+			try:
+				description = await self._describeFile(path, cancelToken)
+			except asyncio.CancelledError:
+				raise
+			except Exception as e:
+				self._recordError(folder, path, sha, str(e))
+				raise
+			self._recordSuccess(folder, path, sha, description)
+			return description
+		finally:
+			self._closeResources()
+	
+	def _openResources(self, folder):
+		"""Crea el grupo de hilos y abre el manifiesto de la carpeta para añadir registros"""
+		self._executor = concurrent.futures.ThreadPoolExecutor(
+			max_workers=self.ENCODE_WORKERS,
+			thread_name_prefix="aiImageDescriber-batch"
+		)
+		self._manifestFile = open(os.path.join(folder, MANIFEST_NAME), "a", encoding="utf-8")
+	
+	def _closeResources(self):
+		"""Cierra el manifiesto y el grupo de hilos"""
+		if self._manifestFile:
+			self._manifestFile.close()
+			self._manifestFile = None
+		if self._executor:
+			self._executor.shutdown(wait=False)
+			self._executor = None
+	
+	async def _describeFile(self, path, cancelToken):
+		"""
+		Codifica y describe un archivo
+		
+		Con proceso auxiliar la imagen se abre y codifica allí; si no, se codifica
+		con ImageProcessor.loadFromFile en un hilo del lote
+		"""
+		raiseIfCancelled(cancelToken)
+		transport = None
+		if self.helperEngine:
+			transport = self.helperEngine.transportForFile(path)
+			imageData = IMAGE_PLACEHOLDER
+			detail = "auto" if self.detail == ADAPTIVE else self.detail
+		else:
+			imageData = await self._encodeFile(path, cancelToken)
+			detail, imageData = await resolveDetailAsync(imageData, self.detail, cancelToken)
+		try:
+			return await self.client.describeImageAsync(
+				imageData,
+				detail=detail,
+				language=self.language,
+				maxTokens=4000,
+				cancelToken=cancelToken,
+				transport=transport
+			)
+		finally:
+			if transport:
+				transport.close()
+	
+	async def _encodeFile(self, path, cancelToken):
+		"""
+		Codifica un archivo en base64 sin describirlo
+		
+		Con proceso auxiliar la imagen se abre y codifica allí; si no, en un hilo del lote
+		
+		Returns:
+			str: Imagen codificada en base64
+		"""
+		raiseIfCancelled(cancelToken)
+		if self.helperEngine:
+			source = {"path": os.path.abspath(path)}
+			future = self.helperEngine.submit({"op": "encode", "source": source})
+			try:
+				reply = await asyncio.wrap_future(future)
+			finally:
+				self.helperEngine.release(source)
+			if reply.get("error"):
+				raise Exception(f"Error en el proceso auxiliar: {reply.get('message', '')}")
+			return reply["data"]
+		
+		loop = asyncio.get_running_loop()
+		imageData = await loop.run_in_executor(
+			self._executor,
+			self.imageProcessor.loadFromFile,
+			path,
+			cancelToken
+		)
+		if not imageData:
+			raise Exception("No se pudo cargar la imagen")
+		return imageData
+	
+	def _relPath(self, folder, path):
+		"""Ruta relativa a la carpeta del lote, con barras normales"""
+		return os.path.relpath(path, folder).replace(os.sep, "/")
+	
+	def _writeRecord(self, record):
+		"""Añade un registro al manifiesto y lo vuelca a disco"""
+		record["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+		self._manifestFile.write(json.dumps(record, ensure_ascii=False) + "\n")
+		self._manifestFile.flush()
+	
+	def _recordSuccess(self, folder, path, sha, description, reusedFrom=None):
+		"""Escribe el archivo de texto junto a la imagen y registra la descripción"""
+		with open(path + SIDECAR_EXTENSION, "w", encoding="utf-8") as f:
+			f.write(description)
+		record = {
+			"file": self._relPath(folder, path),
+			"sha256": sha,
+			"status": "ok",
+			"description": description,
+			"detail": self.detail,
+			"language": self.language,
+			"provider": getattr(self.client, "lastProvider", getattr(self.client, "PROVIDER", "")),
+		}
+		if reusedFrom:
+			record["reusedFrom"] = reusedFrom
+		self._writeRecord(record)
+	
+	def _recordError(self, folder, path, sha, error):
+		"""Registra un error (el archivo se reintenta al reanudar)"""
+		self._writeRecord({
+			"file": self._relPath(folder, path),
+			"sha256": sha,
+			"status": "error",
+			"error": error,
+		})
+	
+	def _recordGroup(self, folder, sha, group, summary, description=None, error=None):
+		"""
+		Registra el resultado de un grupo de archivos idénticos y actualiza el resumen
+		
+		Args:
+			folder (str): Carpeta del lote
+			sha (str): Hash del contenido
+			group (list): Rutas del grupo; la primera es la que se describió
+			summary (dict): Resumen del lote
+			description (str): Descripción obtenida, o None si hubo error
+			error (str): Mensaje de error, o None
+		"""
+		if description is None:
+			for path in group:
+				self._recordError(folder, path, sha, error)
+			summary["failed"] += len(group)
+			return
+		first = self._relPath(folder, group[0])
+		for path in group:
+			reusedFrom = None if path == group[0] else first
+			self._recordSuccess(folder, path, sha, description, reusedFrom=reusedFrom)
+		summary["described"] += 1
+		summary["reused"] += len(group) - 1
+	
+	def _completedCount(self, summary):
+		"""Archivos ya procesados según el resumen del lote"""
+		return summary["described"] + summary["reused"] + summary["skipped"] + summary["failed"]
+	
+	def _reportProgress(self, completed, total):
+		"""Notifica el progreso si hay función de progreso"""
+		if self.progressCallback:
+			try:
+				self.progressCallback(completed, total)
+			except Exception as e:
+				log.warning(f"Error al notificar progreso del lote: {e}")
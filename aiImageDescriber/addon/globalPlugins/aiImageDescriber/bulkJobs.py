@@ -0,0 +1,600 @@
+# -*- coding: UTF-8 -*-
+"""
+Trabajos por lotes del proveedor
+Empaqueta las imágenes de una carpeta en el formato de lotes asíncronos de OpenAI
+(Batch API) o de Gemini (batchGenerateContent), los envía, consulta su estado y
+vuelca los resultados al manifiesto de la carpeta. Cada imagen cuesta menos que en
+una petición interactiva y no consume sus límites, a cambio de tardar minutos u horas
+"""
+
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from logHandler import log
+
+from .asyncCore import asyncCore
+from .batchProcessor import BatchProcessor
+
+STATE_FILE_NAME = "aiImageDescriber-bulkJobs.json"
+
+# Bytes que añade cada petición del lote además de la imagen codificada (prompt y JSON)
+REQUEST_OVERHEAD = 4096
+
+
+class RequestSpool:
+	"""
+	Archivo temporal con las peticiones de un trabajo, escritas según se codifican
+	
+	Las imágenes codificadas no se acumulan en memoria: el archivo se sube después
+	por fragmentos dentro de un cuerpo de petición (ver uploadBody)
+	"""
+	
+	def __init__(self, separator):
+		"""
+		Args:
+			separator (bytes): Separador entre peticiones (salto de línea en JSONL, coma en JSON)
+		"""
+		self.separator = separator
+		self.count = 0
+		self.size = 0
+		self._file = tempfile.TemporaryFile(prefix="aiImageDescriber-bulk-")
+	
+	def add(self, request):
+		"""Serializa una petición y la añade al archivo"""
+		data = json.dumps(request).encode("utf-8")
+		if self.count:
+			data = self.separator + data
+		self._file.write(data)
+		self.count += 1
+		self.size += len(data)
+	
+	def uploadBody(self, prefix, suffix):
+		"""
+		Cuerpo de subida con las peticiones entre un prefijo y un sufijo
+		
+		Args:
+			prefix (bytes): Bytes que preceden a las peticiones
+			suffix (bytes): Bytes que las siguen
+		
+		Returns:
+			UploadBody: Objeto de archivo de solo lectura con su longitud
+		"""
+		self._file.flush()
+		self._file.seek(0)
+		return UploadBody([io.BytesIO(prefix), self._file, io.BytesIO(suffix)], len(prefix) + self.size + len(suffix))
+	
+	def close(self):
+		"""Cierra y borra el archivo temporal"""
+		self._file.close()
+
+
+class UploadBody(io.RawIOBase):
+	"""Lectura secuencial de varias partes como un único archivo, sin copiarlas en memoria"""
+	
+	def __init__(self, parts, length):
+		"""
+		Args:
+			parts (list): Objetos de archivo que se leen uno tras otro
+			length (int): Longitud total en bytes (para la cabecera Content-Length)
+		"""
+		super().__init__()
+		self._parts = list(parts)
+		self._length = length
+		self._position = 0
+	
+	def __len__(self):
+		return self._length
+	
+	def readable(self):
+		return True
+	
+	def tell(self):
+		return self._position
+	
+	def readinto(self, buffer):
+		while self._parts:
+			count = self._parts[0].readinto(buffer)
+			if count:
+				self._position += count
+				return count
+			self._parts.pop(0)
+		return 0
+
+
+class OpenAIBatchAPI:
+	"""Batch API de OpenAI: archivo JSONL subido a /files y trabajo creado en /batches"""
+	
+	PROVIDER = "openai"
+	DEFAULT_BASE_URL = "https://api.openai.com/v1"
+	ENDPOINT = "/v1/chat/completions"
+	COMPLETION_WINDOW = "24h"
+	MAX_REQUESTS = 50000
+	MAX_BYTES = 50 * 1024 * 1024  # El archivo de entrada admite hasta 200 MB; se sube en trabajos más pequeños
+	MAX_TOKENS = 4000
+	UPLOAD_TIMEOUT = (10.0, 600.0)
+	POLL_TIMEOUT = (10.0, 60.0)
+	RESULTS_TIMEOUT = (10.0, 300.0)
+	
+	def __init__(self, client, baseUrl=""):
+		"""
+		Args:
+			client (OpenAIClient): Cliente con la API key, el modelo y el formato de petición
+			baseUrl (str): URL base de la API; vacía para la oficial
+		"""
+		self.client = client
+		self.baseUrl = (baseUrl or self.DEFAULT_BASE_URL).rstrip("/")
+	
+	@property
+	def model(self):
+		"""Modelo con el que se describen las imágenes del lote"""
+		return self.client.model
+	
+	def _headers(self, contentType="application/json"):
+		"""Cabeceras con la API key"""
+		headers = {"Authorization": f"Bearer {self.client.apiKey}"}
+		if contentType:
+			headers["Content-Type"] = contentType
+		return headers
+	
+	def buildRequest(self, customId, imageBase64, detail, language):
+		"""
+		Construye una línea del archivo de entrada
+		
+		Args:
+			customId (str): Identificador de la petición dentro del lote
+			imageBase64 (str): Imagen codificada en base64
+			detail (str): Nivel de detalle
+			language (str): Idioma de la descripción
+		
+		Returns:
+			dict: Petición en formato de la Batch API
+		"""
+		payload, _detailLevel = self.client._buildPayload(imageBase64, detail, language, self.MAX_TOKENS)
+		return {"custom_id": customId, "method": "POST", "url": self.ENDPOINT, "body": payload}
+	
+	def openSpool(self):
+		"""Archivo temporal para las peticiones de un trabajo (una por línea, JSONL)"""
+		return RequestSpool(b"\n")
+	
+	async def submitAsync(self, spool, displayName):
+		"""
+		Sube el archivo de entrada y crea el trabajo
+		
+		Args:
+			spool (RequestSpool): Peticiones construidas con buildRequest
+			displayName (str): Nombre descriptivo del trabajo
+		
+		Returns:
+			str: Identificador del trabajo
+		"""
+		boundary = uuid.uuid4().hex
+		prefix = (
+			f"--{boundary}\r\n"
+			'Content-Disposition: form-data; name="purpose"\r\n\r\n'
+			"batch\r\n"
+			f"--{boundary}\r\n"
+			'Content-Disposition: form-data; name="file"; filename="aiImageDescriber-batch.jsonl"\r\n'
+			"Content-Type: application/jsonl\r\n\r\n"
+		).encode("utf-8")
+		body = spool.uploadBody(prefix, f"\n\r\n--{boundary}--\r\n".encode("utf-8"))
+		headers = self._headers(f"multipart/form-data; boundary={boundary}")
+		headers["Content-Length"] = str(len(body))
+		
+		response = await asyncCore.request(
+			"POST",
+			f"{self.baseUrl}/files",
+			headers=headers,
+			data=body,
+			timeout=self.UPLOAD_TIMEOUT
+		)
+		response.raise_for_status()
+		inputFileId = response.json()["id"]
+		
+		response = await asyncCore.request(
+			"POST",
+			f"{self.baseUrl}/batches",
+			headers=self._headers(),
+			json={
+				"input_file_id": inputFileId,
+				"endpoint": self.ENDPOINT,
+				"completion_window": self.COMPLETION_WINDOW,
+				"metadata": {"description": displayName},
+			},
+			timeout=self.POLL_TIMEOUT
+		)
+		response.raise_for_status()
+		return response.json()["id"]
+	
+	async def pollAsync(self, jobId, keys):
+		"""
+		Consulta un trabajo y descarga sus resultados si terminó
+		
+		Args:
+			jobId (str): Identificador del trabajo
+			keys (list): Identificadores de las peticiones en el orden en que se enviaron
+		
+		Returns:
+			tuple: (terminado, dict id -> (descripción o None, error o None), error del trabajo o None)
+		"""
+		response = await asyncCore.request(
+			"GET",
+			f"{self.baseUrl}/batches/{jobId}",
+			headers=self._headers(None),
+			timeout=self.POLL_TIMEOUT
+		)
+		response.raise_for_status()
+		batch = response.json()
+		status = batch.get("status")
+		
+		if status == "failed":
+			errors = (batch.get("errors") or {}).get("data") or []
+			message = "; ".join(error.get("message", "") for error in errors) or "El trabajo falló"
+			return True, {}, message
+		if status not in ("completed", "expired", "cancelled"):
+			return False, {}, None
+		
+		# Los trabajos caducados o cancelados entregan los resultados que llegaron a completar
+		results = {}
+		for fileKey in ("output_file_id", "error_file_id"):
+			fileId = batch.get(fileKey)
+			if not fileId:
+				continue
+			response = await asyncCore.request(
+				"GET",
+				f"{self.baseUrl}/files/{fileId}/content",
+				headers=self._headers(None),
+				timeout=self.RESULTS_TIMEOUT
+			)
+			response.raise_for_status()
+			for line in response.text.splitlines():
+				if line.strip():
+					item = json.loads(line)
+					results[item.get("custom_id")] = self._parseItem(item)
+		
+		error = None if status == "completed" else f"El trabajo terminó con estado {status}"
+		return True, results, error
+	
+	def _parseItem(self, item):
+		"""Convierte una línea de resultados en (descripción, error)"""
+		if item.get("error"):
+			return None, item["error"].get("message", str(item["error"]))
+		response = item.get("response") or {}
+		body = response.get("body") or {}
+		if response.get("status_code") != 200:
+			message = (body.get("error") or {}).get("message", "")
+			return None, message or f"Error HTTP {response.get('status_code')}"
+		try:
+			return self.client._parseDescription(body), None
+		except (KeyError, IndexError, TypeError, AttributeError) as e:
+			return None, f"Respuesta no válida: {e}"
+
+
+class GeminiBatchAPI:
+	"""Modo por lotes de Gemini con las peticiones en línea (batchGenerateContent)"""
+	
+	PROVIDER = "gemini"
+	DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+	DEFAULT_MODEL = "gemini-2.5-flash"  # Si no se detectó modelo; los lotes requieren modelos actuales
+	MAX_REQUESTS = 1000
+	MAX_BYTES = 18 * 1024 * 1024  # Las peticiones en línea no pueden superar 20 MB
+	MAX_TOKENS = 5000
+	UPLOAD_TIMEOUT = (10.0, 300.0)
+	POLL_TIMEOUT = (10.0, 120.0)
+	
+	def __init__(self, client, baseUrl=""):
+		"""
+		Args:
+			client (GeminiClient): Cliente con la API key, el modelo y el formato de petición
+			baseUrl (str): URL base de la API; vacía para la oficial
+		"""
+		self.client = client
+		self.baseUrl = (baseUrl or self.DEFAULT_BASE_URL).rstrip("/")
+	
+	@property
+	def model(self):
+		"""Modelo con el que se describen las imágenes del lote"""
+		return self.client.model if self.client._modelDetected else self.DEFAULT_MODEL
+	
+	def buildRequest(self, customId, imageBase64, detail, language):
+		"""
+		Construye una petición en línea del lote
+		
+		Args:
+			customId (str): Identificador de la petición dentro del lote
+			imageBase64 (str): Imagen codificada en base64
+			detail (str): Nivel de detalle
+			language (str): Idioma de la descripción
+		
+		Returns:
+			dict: Petición con su clave en los metadatos
+		"""
+		if detail not in ("low", "high"):
+			detail = "auto"
+		request = self.client._buildPayload(imageBase64, detail, language)
+		request["generationConfig"] = self.client._buildGenerationConfig(self.model, detail, self.MAX_TOKENS)
+		return {"request": request, "metadata": {"key": customId}}
+	
+	def openSpool(self):
+		"""Archivo temporal para las peticiones de un trabajo (elementos de una lista JSON)"""
+		return RequestSpool(b",")
+	
+	async def submitAsync(self, spool, displayName):
+		"""
+		Crea el trabajo con las peticiones en línea
+		
+		Args:
+			spool (RequestSpool): Peticiones construidas con buildRequest
+			displayName (str): Nombre descriptivo del trabajo
+		
+		Returns:
+			str: Nombre del trabajo ("batches/...")
+		"""
+		# {"batch": {"display_name": ..., "input_config": {"requests": {"requests": [...]}}}}
+		prefix = (
+			f'{{"batch": {{"display_name": {json.dumps(displayName)}, '
+			'"input_config": {"requests": {"requests": ['
+		).encode("utf-8")
+		body = spool.uploadBody(prefix, b"]}}}}")
+		response = await asyncCore.request(
+			"POST",
+			f"{self.baseUrl}/models/{self.model}:batchGenerateContent?key={self.client.apiKey}",
+			headers={"Content-Type": "application/json", "Content-Length": str(len(body))},
+			data=body,
+			timeout=self.UPLOAD_TIMEOUT
+		)
+		response.raise_for_status()
+		return response.json()["name"]
+	
+	async def pollAsync(self, jobId, keys):
+		"""
+		Consulta un trabajo y lee sus resultados si terminó
+		
+		Args:
+			jobId (str): Nombre del trabajo
+			keys (list): Identificadores de las peticiones en el orden en que se enviaron
+		
+		Returns:
+			tuple: (terminado, dict id -> (descripción o None, error o None), error del trabajo o None)
+		"""
+		response = await asyncCore.request(
+			"GET",
+			f"{self.baseUrl}/{jobId}?key={self.client.apiKey}",
+			timeout=self.POLL_TIMEOUT
+		)
+		response.raise_for_status()
+		operation = response.json()
+		if not operation.get("done"):
+			return False, {}, None
+		if operation.get("error"):
+			return True, {}, operation["error"].get("message", "El trabajo falló")
+		
+		metadata = operation.get("metadata") or {}
+		output = operation.get("response") or metadata.get("output") or {}
+		inlined = (output.get("inlinedResponses") or {}).get("inlinedResponses") or []
+		results = {}
+		for index, item in enumerate(inlined):
+			# Las respuestas llegan en el orden de las peticiones; la clave solo si se conserva
+			key = (item.get("metadata") or {}).get("key")
+			if key is None and index < len(keys):
+				key = keys[index]
+			results[key] = self._parseItem(item)
+		
+		state = metadata.get("state", "")
+		error = None if state.endswith("SUCCEEDED") else f"El trabajo terminó con estado {state}"
+		return True, results, error
+	
+	def _parseItem(self, item):
+		"""Convierte una respuesta en línea en (descripción, error)"""
+		if item.get("error"):
+			return None, item["error"].get("message", str(item["error"]))
+		try:
+			return self.client._parseDescription(item.get("response") or {}), None
+		except Exception as e:
+			return None, str(e)
+
+
+class BulkJobStore:
+	"""Trabajos enviados y pendientes de recoger, guardados en un archivo JSON"""
+	
+	def __init__(self, path):
+		"""
+		Args:
+			path (str): Archivo donde se guardan los trabajos (sobrevive a reinicios de NVDA)
+		"""
+		self.path = path
+		self._lock = threading.Lock()
+		self.jobs = self._load()
+	
+	def _load(self):
+		"""Lee los trabajos guardados"""
+		if not os.path.isfile(self.path):
+			return []
+		try:
+			with open(self.path, "r", encoding="utf-8") as f:
+				return json.load(f).get("jobs", [])
+		except (OSError, ValueError) as e:
+			log.error(f"No se pudieron leer los trabajos por lotes de {self.path}: {e}")
+			return []
+	
+	def _save(self):
+		"""Escribe los trabajos de forma atómica (debe llamarse con el bloqueo tomado)"""
+		temporaryPath = self.path + ".tmp"
+		with open(temporaryPath, "w", encoding="utf-8") as f:
+			json.dump({"jobs": self.jobs}, f, ensure_ascii=False, indent=1)
+		os.replace(temporaryPath, self.path)
+	
+	def add(self, job):
+		"""Guarda un trabajo recién enviado"""
+		with self._lock:
+			self.jobs.append(job)
+			self._save()
+	
+	def remove(self, job):
+		"""Olvida un trabajo ya recogido"""
+		with self._lock:
+			self.jobs = [j for j in self.jobs if j["id"] != job["id"]]
+			self._save()
+	
+	def pendingHashes(self, folder):
+		"""Hashes de una carpeta que ya están en un trabajo sin recoger"""
+		with self._lock:
+			return {
+				sha
+				for job in self.jobs if job["folder"] == folder
+				for sha in job["items"]
+			}
+
+
+class BulkBatchProcessor(BatchProcessor):
+	"""
+	Describe una carpeta mediante trabajos por lotes del proveedor
+	
+	Comparte con BatchProcessor el recorrido, la deduplicación por hash y el manifiesto;
+	en lugar de describir cada imagen al momento, las envía en trabajos y después
+	vuelca sus resultados
+	"""
+	
+	def __init__(self, client, imageProcessor, batchApi, store, detail="auto", language="es",
+			helperEngine=None, progressCallback=None):
+		"""
+		Args:
+			client: Cliente del proveedor del lote (OpenAIClient o GeminiClient)
+			imageProcessor (ImageProcessor): Carga y codifica imágenes dentro de NVDA
+			batchApi: OpenAIBatchAPI o GeminiBatchAPI
+			store (BulkJobStore): Almacén de trabajos enviados
+			detail (str): Nivel de detalle
+			language (str): Idioma de las descripciones
+			helperEngine (HelperEngine): Proceso auxiliar que codifica, o None
+			progressCallback: Función (procesadas, total) llamada mientras se codifica
+		"""
+		super().__init__(
+			client,
+			imageProcessor,
+			detail=detail,
+			language=language,
+			helperEngine=helperEngine,
+			progressCallback=progressCallback
+		)
+		self.batchApi = batchApi
+		self.store = store
+	
+	async def submitAsync(self, folder, cancelToken=None):
+		"""
+		Codifica las imágenes pendientes de una carpeta y las envía en trabajos por lotes
+		
+		Cada trabajo se guarda en el almacén en cuanto se crea, así que una cancelación
+		o un error a mitad no pierde los que ya se enviaron
+		
+		Args:
+			folder (str): Carpeta a procesar
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			tuple: (resumen con total, submitted, inProgress, skipped, reused y failed, trabajos creados)
+		"""
+		folder = os.path.abspath(folder)
+		self._openResources(folder)
+		spool = None
+		try:
+			paths, pending, summary = await self._planAsync(folder, cancelToken)
+			summary["submitted"] = 0
+			summary["inProgress"] = 0
+			
+			inFlight = self.store.pendingHashes(folder)
+			jobs = []
+			items = {}
+			for sha, group in pending:
+				if sha in inFlight:
+					summary["inProgress"] += len(group)
+					continue
+				try:
+					imageData = await self._encodeFile(group[0], cancelToken)
+				except asyncio.CancelledError:
+					raise
+				except Exception as e:
+					log.warning(f"Error al codificar {group[0]}: {e}")
+					self._recordGroup(folder, sha, group, summary, error=str(e))
+					continue
+				
+				requestSize = len(imageData) + REQUEST_OVERHEAD
+				if spool is not None and spool.count and (
+					spool.size + requestSize > self.batchApi.MAX_BYTES
+					or spool.count >= self.batchApi.MAX_REQUESTS
+				):
+					jobs.append(await self._submitJob(folder, spool, items))
+					spool.close()
+					spool, items = None, {}
+				if spool is None:
+					spool = self.batchApi.openSpool()
+				spool.add(self.batchApi.buildRequest(sha, imageData, self.detail, self.language))
+				imageData = None
+				items[sha] = [self._relPath(folder, path) for path in group]
+				summary["submitted"] += len(group)
+				self._reportProgress(self._completedCount(summary) + summary["submitted"], len(paths))
+			
+			if spool is not None and spool.count:
+				jobs.append(await self._submitJob(folder, spool, items))
+			return summary, jobs
+		finally:
+			if spool is not None:
+				spool.close()
+			self._closeResources()
+	
+	async def _submitJob(self, folder, spool, items):
+		"""Envía un trabajo y lo guarda en el almacén"""
+		displayName = f"aiImageDescriber {os.path.basename(folder)} {time.strftime('%Y-%m-%d %H:%M')}"
+		jobId = await self.batchApi.submitAsync(spool, displayName)
+		job = {
+			"id": jobId,
+			"provider": self.batchApi.PROVIDER,
+			"model": self.batchApi.model,
+			"folder": folder,
+			"detail": self.detail,
+			"language": self.language,
+			"submitted": time.strftime("%Y-%m-%dT%H:%M:%S"),
+			"items": items,
+		}
+		self.store.add(job)
+		log.info(f"Trabajo por lotes {jobId} enviado a {job['provider']} con {spool.count} imágenes de {folder}")
+		return job
+	
+	async def collectAsync(self, job):
+		"""
+		Consulta un trabajo y, si terminó, vuelca sus resultados al manifiesto de su carpeta
+		
+		Las imágenes sin resultado se registran como error y se reintentan al repetir el lote
+		
+		Args:
+			job (dict): Trabajo guardado en el almacén
+		
+		Returns:
+			dict: Resumen con described, reused y failed, o None si el trabajo sigue en curso
+		"""
+		finished, results, jobError = await self.batchApi.pollAsync(job["id"], list(job["items"]))
+		if not finished:
+			return None
+		
+		folder = job["folder"]
+		summary = {"total": 0, "described": 0, "reused": 0, "skipped": 0, "failed": 0}
+		if not os.path.isdir(folder):
+			log.warning(f"La carpeta del trabajo por lotes {job['id']} ya no existe: {folder}")
+			self.store.remove(job)
+			return summary
+		
+		self._openResources(folder)
+		try:
+			for sha, files in job["items"].items():
+				group = [os.path.join(folder, *relPath.split("/")) for relPath in files]
+				summary["total"] += len(group)
+				description, error = results.get(sha, (None, jobError or "El proveedor no devolvió resultado"))
+				self._recordGroup(folder, sha, group, summary, description=description, error=error)
+		finally:
+			self._closeResources()
+		self.store.remove(job)
+		log.info(f"Trabajo por lotes {job['id']} recogido: {summary}")
+		return summary
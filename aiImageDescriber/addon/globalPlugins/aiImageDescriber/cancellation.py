@@ -0,0 +1,86 @@
+# -*- coding: UTF-8 -*-
+"""
+Token de cancelación compartido por todas las etapas de una descripción
+(captura, codificación, petición de red y salida de voz o ventana)
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from logHandler import log
+
+# Excepciones que indican una descripción cancelada: la de asyncio (la que lanza el token;
+# hereda de BaseException desde Python 3.8, de ahí la versión mínima NVDA 2024.1, y no la
+# capturan los "except Exception" de captura y red) y la de concurrent.futures (la que lanza
+# future.result() de un futuro cancelado; esta sí hereda de Exception y los manejadores
+# genéricos que la puedan recibir deben relanzarla con "except CANCELLED_ERRORS: raise")
+CANCELLED_ERRORS = (asyncio.CancelledError, concurrent.futures.CancelledError)
+
+
+class CancellationToken:
+	"""Señal de cancelación segura entre hilos con funciones asociadas"""
+	
+	def __init__(self):
+		"""Inicializa un token sin cancelar"""
+		self._cancelled = False
+		self._callbacks = []
+		self._lock = threading.Lock()
+	
+	@property
+	def isCancelled(self):
+		"""True si el token fue cancelado"""
+		return self._cancelled
+	
+	def cancel(self):
+		"""
+		Cancela el token y ejecuta las funciones registradas
+		
+		Returns:
+			bool: True si el token no estaba cancelado
+		"""
+		with self._lock:
+			if self._cancelled:
+				return False
+			self._cancelled = True
+			callbacks = self._callbacks
+			self._callbacks = []
+		for callback in callbacks:
+			try:
+				callback()
+			except Exception as e:
+				log.warning(f"Error al ejecutar función de cancelación: {e}")
+		return True
+	
+	def addCallback(self, callback):
+		"""
+		Registra una función que se llama al cancelar (p. ej. cancelar un futuro de red)
+		
+		Si el token ya está cancelado, la función se llama inmediatamente
+		"""
+		with self._lock:
+			if not self._cancelled:
+				self._callbacks.append(callback)
+				return
+		callback()
+	
+	def removeCallback(self, callback):
+		"""Elimina una función registrada si sigue pendiente"""
+		with self._lock:
+			if callback in self._callbacks:
+				self._callbacks.remove(callback)
+	
+	def raiseIfCancelled(self):
+		"""Lanza asyncio.CancelledError si el token fue cancelado"""
+		if self._cancelled:
+			raise asyncio.CancelledError()
+
+
+def raiseIfCancelled(cancelToken):
+	"""
+	Lanza asyncio.CancelledError si el token existe y fue cancelado
+	
+	Args:
+		cancelToken (CancellationToken): Token a comprobar, o None
+	"""
+	if cancelToken is not None:
+		cancelToken.raiseIfCancelled()
@@ -0,0 +1,150 @@
+# -*- coding: UTF-8 -*-
+"""
+Nivel de detalle adaptativo
+Mide en local rasgos baratos de la imagen (tamaño, colores, densidad de bordes y
+parecido a texto) sobre una miniatura y elige el nivel de detalle más barato que
+probablemente da una buena respuesta; el nivel fija el prompt y el límite de tokens
+del proveedor y aquí también la resolución con la que se envía la imagen
+"""
+
+import asyncio
+import base64
+from io import BytesIO
+from logHandler import log
+
+from .cancellation import CANCELLED_ERRORS, raiseIfCancelled
+from .imageProcessor import MAX_IMAGE_SIZE
+from .tiling import encodeImage
+
+try:
+	from PIL import Image, ImageChops
+	PIL_AVAILABLE = True
+except ImportError:
+	PIL_AVAILABLE = False
+
+ADAPTIVE = "adaptive"
+ANALYSIS_SIZE = 512  # Lado de la muestra en la que se miden los rasgos
+EDGE_STEP = 64  # Diferencia entre píxeles vecinos (0 a 255) que cuenta como borde nítido
+TEXT_ROW_EDGES = 0.08  # Parte de bordes nítidos de una fila con texto
+MAX_COLORS = 4096  # Colores contados como máximo (más cuenta como una foto)
+
+# Umbrales de la elección, a ajustar con los rasgos registrados en el log
+SMALL_SIZE = 160  # Lado mayor de iconos y miniaturas: siempre detalle bajo
+FLAT_COLORS = 64  # Colores de un gráfico plano (logotipo, icono, forma sencilla)
+FLAT_EDGES = 0.03
+FLAT_TEXT = 0.05
+DENSE_TEXT = 0.2  # Parte de filas con texto de un documento, captura o gráfico con etiquetas
+DENSE_EDGES = 0.15  # Densidad de bordes de un diagrama o gráfico denso
+
+# Lado máximo de la imagen enviada según el nivel elegido
+ADAPTIVE_IMAGE_SIZES = {"low": 512, "auto": 1024, "high": MAX_IMAGE_SIZE}
+
+
+def imageFeatures(image):
+	"""
+	Rasgos de complejidad de una imagen
+	
+	Args:
+		image: Imagen PIL
+	
+	Returns:
+		dict: size (lado mayor), colors (colores distintos, hasta MAX_COLORS + 1),
+			edges (parte de bordes nítidos) y text (parte de filas con muchos bordes)
+	"""
+	# Muestreo por vecino más próximo: conserva los bordes nítidos del texto pequeño
+	# y no inventa colores intermedios
+	scale = min(1.0, ANALYSIS_SIZE / max(image.size))
+	size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+	sample = image.resize(size, Image.Resampling.NEAREST)
+	try:
+		rgb = sample.convert("RGB")
+		colors = rgb.getcolors(MAX_COLORS)
+		gray = rgb.convert("L")
+		rgb.close()
+	finally:
+		sample.close()
+	
+	try:
+		width, height = gray.size
+		if width < 2:
+			return {"size": max(image.size), "colors": len(colors) if colors else MAX_COLORS + 1, "edges": 0.0, "text": 0.0}
+		# Bordes nítidos entre píxeles vecinos de la misma fila: el texto tiene muchos por fila,
+		# las fotos cambian de forma más gradual
+		edges = ImageChops.difference(gray.crop((1, 0, width, height)), gray.crop((0, 0, width - 1, height)))
+		edges = edges.point(lambda value: 255 if value > EDGE_STEP else 0)
+		rows = [value / 255 for value in edges.resize((1, height), Image.Resampling.BOX).getdata()]
+		edges.close()
+	finally:
+		gray.close()
+	return {
+		"size": max(image.size),
+		"colors": len(colors) if colors else MAX_COLORS + 1,
+		"edges": round(sum(rows) / len(rows), 3),
+		"text": round(sum(1 for value in rows if value >= TEXT_ROW_EDGES) / len(rows), 3)
+	}
+
+
+def chooseDetail(features):
+	"""
+	Nivel de detalle más barato adecuado a los rasgos
+	
+	Returns:
+		tuple: ("low", "auto" o "high", motivo)
+	"""
+	if features["size"] <= SMALL_SIZE:
+		return "low", "imagen pequeña"
+	if features["text"] >= DENSE_TEXT:
+		return "high", "mucho texto"
+	if features["edges"] >= DENSE_EDGES:
+		return "high", "muchos detalles"
+	if features["colors"] <= FLAT_COLORS and features["edges"] < FLAT_EDGES and features["text"] < FLAT_TEXT:
+		return "low", "gráfico plano"
+	return "auto", "complejidad media"
+
+
+def adaptImage(imageBase64, cancelToken=None):
+	"""
+	Elige el nivel de detalle de una imagen y la reduce a la resolución de ese nivel
+	
+	Args:
+		imageBase64 (str): Imagen codificada en base64
+		cancelToken (CancellationToken): Token de cancelación, o None
+	
+	Returns:
+		tuple: (nivel de detalle, imagen en base64, reducida si hacía falta)
+	"""
+	if not PIL_AVAILABLE:
+		return "auto", imageBase64
+	try:
+		with Image.open(BytesIO(base64.b64decode(imageBase64))) as image:
+			features = imageFeatures(image)
+			detail, reason = chooseDetail(features)
+			maxSize = ADAPTIVE_IMAGE_SIZES[detail]
+			log.info(f"Detalle adaptativo: {detail} ({reason}); rasgos {features}")
+			if max(image.size) <= maxSize:
+				return detail, imageBase64
+			raiseIfCancelled(cancelToken)
+			return detail, encodeImage(image, maxSize)
+	except CANCELLED_ERRORS:
+		raise
+	except Exception as e:
+		log.warning(f"No se pudo medir la complejidad de la imagen, se usa detalle auto: {e}")
+		return "auto", imageBase64
+
+
+async def resolveDetailAsync(imageBase64, detail, cancelToken=None):
+	"""
+	Resuelve el nivel adaptativo de una imagen dentro del núcleo asíncrono
+	
+	Args:
+		imageBase64 (str): Imagen codificada en base64
+		detail (str): Nivel de detalle configurado
+		cancelToken (CancellationToken): Token de cancelación, o None
+	
+	Returns:
+		tuple: (nivel de detalle, imagen en base64); sin cambios si el nivel no es adaptativo
+	"""
+	if detail != ADAPTIVE:
+		return detail, imageBase64
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor(None, adaptImage, imageBase64, cancelToken)
@@ -0,0 +1,252 @@
+# -*- coding: UTF-8 -*-
+"""
+Proceso auxiliar de AI Image Describer
+Se ejecuta con un intérprete de Python externo a NVDA y se encarga de la parte
+pesada de cada descripción: decodificar y redimensionar la imagen, codificarla
+en PNG y base64, y enviar la petición HTTP al proveedor.
+
+Protocolo: una petición JSON por línea en stdin y una respuesta JSON por línea
+en stdout. Los píxeles capturados llegan por memoria compartida.
+
+Este módulo no debe importar nada de NVDA.
+"""
+
+import base64
+import http.client
+import json
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from multiprocessing import shared_memory
+
+try:
+	from PIL import Image
+	PIL_AVAILABLE = True
+except ImportError:
+	PIL_AVAILABLE = False
+
+MAX_WORKERS = 4
+MAX_IMAGE_SIZE = 2048
+
+
+def attachSharedMemory(name):
+	"""
+	Abre un bloque de memoria compartida creado por NVDA
+	
+	El bloque pertenece a NVDA: aquí solo se lee y se cierra, nunca se elimina
+	"""
+	try:
+		return shared_memory.SharedMemory(name=name, track=False)
+	except TypeError:
+		# Python < 3.13: evitar que el resource_tracker lo elimine al salir
+		shm = shared_memory.SharedMemory(name=name)
+		try:
+			from multiprocessing import resource_tracker
+			resource_tracker.unregister(shm._name, "shared_memory")
+		except Exception:
+			pass
+		return shm
+
+
+class DescribeHelper:
+	"""Atiende las peticiones de NVDA leídas de stdin"""
+	
+	def __init__(self):
+		self._output = sys.stdout
+		self._outputLock = threading.Lock()
+		self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+		self._encoded = {}  # clave de origen -> imagen en base64
+		self._encodeLocks = {}
+		self._cacheLock = threading.Lock()
+		self._connections = {}  # id de petición -> conexión HTTP abierta
+		self._accepted = set()  # Peticiones pendientes o en curso
+		self._cancelled = set()
+		self._connectionsLock = threading.Lock()
+	
+	def run(self):
+		"""Bucle principal: termina cuando NVDA cierra stdin"""
+		for line in sys.stdin:
+			line = line.strip()
+			if not line:
+				continue
+			try:
+				message = json.loads(line)
+			except ValueError:
+				continue
+			op = message.get("op")
+			if op == "ping":
+				self._reply({"id": message.get("id"), "ok": True, "pil": PIL_AVAILABLE})
+			elif op in ("request", "encode"):
+				with self._connectionsLock:
+					self._accepted.add(message.get("id"))
+				self._executor.submit(self._handle, message)
+			elif op == "cancel":
+				self._cancel(message.get("id"))
+			elif op == "release":
+				self._release(message.get("source"))
+		self._executor.shutdown(wait=False)
+	
+	def _reply(self, reply):
+		"""Escribe una respuesta en stdout"""
+		data = json.dumps(reply) + "\n"
+		with self._outputLock:
+			self._output.write(data)
+			self._output.flush()
+	
+	def _handle(self, message):
+		"""Procesa una petición en un hilo del grupo"""
+		requestId = message.get("id")
+		try:
+			encoded = self._encode(message["source"], message.get("maxSize", MAX_IMAGE_SIZE))
+			if message["op"] == "encode":
+				self._reply({"id": requestId, "data": encoded})
+				return
+			reply = self._request(requestId, message, encoded)
+		except Exception as e:
+			reply = {"id": requestId, "error": "encode", "message": str(e)}
+		finally:
+			with self._connectionsLock:
+				self._accepted.discard(requestId)
+				self._cancelled.discard(requestId)
+		reply["id"] = requestId
+		self._reply(reply)
+	
+	def _sourceKey(self, source):
+		"""Clave de caché de un origen de imagen"""
+		return json.dumps(source, sort_keys=True)
+	
+	def _encode(self, source, maxSize):
+		"""
+		Codifica un origen en PNG base64, reutilizando el resultado si ya se codificó
+		
+		Un mismo origen puede usarse en varias peticiones (cadena de modelos, respaldo)
+		"""
+		key = self._sourceKey(source)
+		with self._cacheLock:
+			lock = self._encodeLocks.setdefault(key, threading.Lock())
+		with lock:
+			with self._cacheLock:
+				if key in self._encoded:
+					return self._encoded[key]
+			encoded = self._encodeImage(source, maxSize)
+			with self._cacheLock:
+				self._encoded[key] = encoded
+			return encoded
+	
+	def _encodeImage(self, source, maxSize):
+		"""Carga la imagen (memoria compartida o archivo) y la codifica"""
+		if not PIL_AVAILABLE:
+			raise Exception("Pillow no está instalado en el intérprete del proceso auxiliar")
+		if "shm" in source:
+			shm = attachSharedMemory(source["shm"])
+			try:
+				size = (source["width"], source["height"])
+				image = Image.frombytes(source["mode"], size, bytes(shm.buf[:source["length"]]))
+			finally:
+				shm.close()
+		else:
+			image = Image.open(source["path"])
+			image.load()
+		
+		try:
+			if image.width > maxSize or image.height > maxSize:
+				image.thumbnail((maxSize, maxSize), Image.Resampling.LANCZOS)
+			buffered = BytesIO()
+			image.save(buffered, format="PNG", optimize=True)
+			return base64.b64encode(buffered.getvalue()).decode("ascii")
+		finally:
+			image.close()
+	
+	def _release(self, source):
+		"""Olvida la imagen codificada de un origen"""
+		if not source:
+			return
+		key = self._sourceKey(source)
+		with self._cacheLock:
+			self._encoded.pop(key, None)
+			self._encodeLocks.pop(key, None)
+	
+	def _cancel(self, requestId):
+		"""Aborta una petición pendiente o en curso cerrando su socket"""
+		with self._connectionsLock:
+			# Una cancelación que llega cuando la petición ya terminó se ignora
+			if requestId not in self._accepted:
+				return
+			self._cancelled.add(requestId)
+			connection = self._connections.get(requestId)
+		if connection is not None and connection.sock is not None:
+			try:
+				connection.sock.shutdown(socket.SHUT_RDWR)
+			except OSError:
+				pass
+	
+	def _request(self, requestId, message, encoded):
+		"""
+		Envía la petición HTTP sustituyendo el marcador por la imagen codificada
+		
+		Returns:
+			dict: status, headers, body, elapsed y connectElapsed, o error y message
+		"""
+		body = message.get("body") or ""
+		placeholder = message.get("placeholder")
+		if placeholder:
+			body = body.replace(placeholder, encoded)
+		connectTimeout, readTimeout = message.get("timeout", (5.0, 30.0))
+		
+		parts = urllib.parse.urlsplit(message["url"])
+		if parts.scheme == "https":
+			connection = http.client.HTTPSConnection(parts.hostname, parts.port, timeout=connectTimeout)
+		else:
+			connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=connectTimeout)
+		path = parts.path or "/"
+		if parts.query:
+			path += "?" + parts.query
+		
+		with self._connectionsLock:
+			if requestId in self._cancelled:
+				return {"error": "cancelled", "message": "Petición cancelada"}
+			self._connections[requestId] = connection
+		
+		start = time.monotonic()
+		try:
+			try:
+				connection.connect()
+			except socket.timeout as e:
+				return {"error": "connectTimeout", "message": str(e)}
+			connectElapsed = time.monotonic() - start
+			connection.sock.settimeout(readTimeout)
+			connection.request(
+				message.get("method", "POST"),
+				path,
+				body=body.encode("utf-8"),
+				headers=message.get("headers") or {}
+			)
+			response = connection.getresponse()
+			elapsed = time.monotonic() - start
+			content = response.read()
+			return {
+				"status": response.status,
+				"headers": dict(response.getheaders()),
+				"body": content.decode("utf-8", errors="replace"),
+				"elapsed": elapsed,
+				"connectElapsed": connectElapsed
+			}
+		except socket.timeout as e:
+			return {"error": "timeout", "message": str(e)}
+		except (OSError, http.client.HTTPException) as e:
+			with self._connectionsLock:
+				if requestId in self._cancelled:
+					return {"error": "cancelled", "message": "Petición cancelada"}
+			return {"error": "connection", "message": str(e)}
+		finally:
+			connection.close()
+			with self._connectionsLock:
+				self._connections.pop(requestId, None)
+
+
+if __name__ == "__main__":
+	DescribeHelper().run()
@@ -0,0 +1,230 @@
+# -*- coding: UTF-8 -*-
+"""
+Imágenes del documento en modo exploración
+Recorre el búfer virtual, reúne los gráficos sin repetir y los describe con el menor
+número de idas y vueltas: descargas concurrentes y varias imágenes por petición
+"""
+
+import asyncio
+import os
+import threading
+import api
+from logHandler import log
+
+from .cancellation import raiseIfCancelled
+
+MAX_IMAGES = 60  # Gráficos como máximo por documento
+MIN_SIZE = 16  # Píxeles; los gráficos menores suelen ser espaciadores o píxeles de seguimiento
+MULTI_IMAGE_SIZE = 1024  # Lado máximo de cada imagen en las peticiones con varias
+MAX_CONCURRENT_LOADS = 6
+MAX_CONCURRENT_REQUESTS = 3
+
+
+class DocumentImage:
+	"""Gráfico del documento con lo necesario para describirlo y volver a él"""
+	
+	def __init__(self, item, label, src, location, onScreen):
+		"""
+		Args:
+			item: Elemento de navegación rápida del gráfico (permite mover el cursor hasta él)
+			label (str): Texto alternativo o nombre del gráfico
+			src (str): Dirección de la imagen, o None
+			location (tuple): (izquierda, arriba, ancho, alto) en pantalla, o None
+			onScreen (bool): True si el gráfico está visible y puede capturarse
+		"""
+		self.item = item
+		self.label = label
+		self.src = src
+		self.location = location
+		self.onScreen = onScreen
+		self.imageData = None
+		self.description = None
+		self.error = None
+	
+	@property
+	def displayName(self):
+		"""Nombre para la lista de resultados"""
+		if self.label:
+			return self.label
+		if self.src and not self.src.startswith("data:"):
+			return os.path.basename(self.src.split("?")[0]) or self.src
+		return "Imagen sin nombre"
+	
+	def moveTo(self):
+		"""Lleva el cursor de exploración hasta el gráfico y lo anuncia"""
+		self.item.moveTo()
+		self.item.report()
+
+
+def collectDocumentImages(treeInterceptor, maxImages=MAX_IMAGES):
+	"""
+	Reúne los gráficos de un documento en modo exploración, sin repetir la misma imagen
+	
+	Debe llamarse desde el hilo principal de NVDA
+	
+	Args:
+		treeInterceptor: Documento en modo exploración
+		maxImages (int): Gráficos como máximo
+	
+	Returns:
+		list: DocumentImage en el orden del documento
+	"""
+	desktop = api.getDesktopObject().location
+	images = []
+	seen = set()
+	for item in treeInterceptor._iterNodesByType("graphic"):
+		obj = item.obj
+		location = obj.location
+		if location and location.width < MIN_SIZE and location.height < MIN_SIZE:
+			continue
+		
+		src = None
+		attributes = getattr(obj, "IA2Attributes", None)
+		if attributes:
+			src = attributes.get("src")
+		
+		# La misma imagen puede aparecer varias veces (logotipos, iconos repetidos)
+		key = src or (tuple(location) if location else id(obj))
+		if key in seen:
+			continue
+		seen.add(key)
+		
+		onScreen = bool(
+			location and desktop
+			and location.left >= desktop.left and location.top >= desktop.top
+			and location.left + location.width <= desktop.left + desktop.width
+			and location.top + location.height <= desktop.top + desktop.height
+		)
+		images.append(DocumentImage(item, obj.name or "", src, tuple(location) if location else None, onScreen))
+		if len(images) >= maxImages:
+			log.info(f"Documento con más de {maxImages} imágenes, se describen las primeras")
+			break
+	return images
+
+
+class DocumentImageDescriber:
+	"""Obtiene y describe los gráficos de un documento con peticiones agrupadas"""
+	
+	def __init__(self, client, imageProcessor, imageCapture, detail="auto", language="es"):
+		"""
+		Args:
+			client: Cliente de API con describeImageAsync y describeImagesAsync
+			imageProcessor (ImageProcessor): Descarga y codifica imágenes
+			imageCapture (ImageCapture): Captura los gráficos sin dirección descargable
+			detail (str): Nivel de detalle
+			language (str): Idioma de las descripciones
+		"""
+		self.client = client
+		self.imageProcessor = imageProcessor
+		self.imageCapture = imageCapture
+		self.detail = detail
+		self.language = language
+		self._captureLock = threading.Lock()
+	
+	async def describeAllAsync(self, images, cancelToken=None):
+		"""
+		Obtiene las imágenes en paralelo y las describe en grupos
+		
+		Rellena description o error de cada imagen
+		
+		Args:
+			images (list): DocumentImage a describir
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			list: Las mismas imágenes
+		"""
+		try:
+			await self._loadAllAsync(images, cancelToken)
+			loaded = [image for image in images if image.imageData]
+			groupSize = max(1, getattr(self.client, "MAX_IMAGES_PER_REQUEST", 1))
+			groups = [loaded[i:i + groupSize] for i in range(0, len(loaded), groupSize)]
+			log.info(f"Describiendo {len(loaded)} imágenes del documento en {len(groups)} peticiones")
+			
+			semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+			await asyncio.gather(*(self._describeGroupAsync(group, semaphore, cancelToken) for group in groups))
+			return images
+		finally:
+			# Liberar las imágenes codificadas
+			for image in images:
+				image.imageData = None
+	
+	async def _loadAllAsync(self, images, cancelToken):
+		"""Descarga o captura todas las imágenes con concurrencia limitada"""
+		semaphore = asyncio.Semaphore(MAX_CONCURRENT_LOADS)
+		loop = asyncio.get_running_loop()
+		
+		async def load(image):
+			async with semaphore:
+				raiseIfCancelled(cancelToken)
+				try:
+					if image.src:
+						image.imageData = await self.imageProcessor.loadFromURLAsync(image.src, MULTI_IMAGE_SIZE, cancelToken)
+					if not image.imageData and image.onScreen:
+						image.imageData = await loop.run_in_executor(None, self._capture, image, cancelToken)
+				except asyncio.CancelledError:
+					raise
+				except Exception as e:
+					log.warning(f"No se pudo obtener la imagen {image.displayName}: {e}")
+				if not image.imageData:
+					image.error = "No se pudo obtener la imagen"
+		
+		await asyncio.gather(*(load(image) for image in images))
+	
+	def _capture(self, image, cancelToken):
+		"""Captura un gráfico visible (las capturas se hacen de una en una)"""
+		left, top, width, height = image.location
+		with self._captureLock:
+			return self.imageCapture.captureRegion(left, top, left + width, top + height, cancelToken)
+	
+	async def _describeGroupAsync(self, group, semaphore, cancelToken):
+		"""Describe un grupo en una petición; las respuestas que falten se piden por separado"""
+		async with semaphore:
+			raiseIfCancelled(cancelToken)
+			try:
+				if len(group) == 1:
+					answers = [await self._describeOneAsync(group[0], cancelToken)]
+				else:
+					answers = await self.client.describeImagesAsync(
+						[image.imageData for image in group],
+						detail=self.detail,
+						language=self.language,
+						cancelToken=cancelToken
+					)
+			except asyncio.CancelledError:
+				raise
+			except Exception as e:
+				log.warning(f"Error al describir un grupo de {len(group)} imágenes: {e}")
+				for image in group:
+					image.error = str(e)
+				return
+		
+		missing = []
+		for image, answer in zip(group, answers):
+			if answer:
+				image.description = answer
+			else:
+				missing.append(image)
+		if missing:
+			log.info(f"La respuesta omitió {len(missing)} imágenes, se piden por separado")
+		
+		async def retry(image):
+			async with semaphore:
+				try:
+					image.description = await self._describeOneAsync(image, cancelToken)
+				except asyncio.CancelledError:
+					raise
+				except Exception as e:
+					image.error = str(e)
+		
+		await asyncio.gather(*(retry(image) for image in missing))
+	
+	async def _describeOneAsync(self, image, cancelToken):
+		"""Describe una sola imagen"""
+		return await self.client.describeImageAsync(
+			image.imageData,
+			detail=self.detail,
+			language=self.language,
+			maxTokens=4000,
+			cancelToken=cancelToken
+		)
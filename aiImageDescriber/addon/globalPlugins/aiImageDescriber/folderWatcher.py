@@ -0,0 +1,139 @@
+# -*- coding: UTF-8 -*-
+"""
+Vigilancia de carpetas
+Detecta imágenes nuevas en las carpetas configuradas y las entrega al complemento
+cuando terminan de escribirse (tamaño y fecha estables durante varias comprobaciones)
+"""
+
+import os
+import threading
+from logHandler import log
+
+from .batchProcessor import IMAGE_EXTENSIONS
+
+
+class FolderWatcher:
+	"""Sondea carpetas en un hilo de fondo y notifica las imágenes nuevas ya completas"""
+	
+	DEFAULT_INTERVAL = 1.0  # Segundos entre comprobaciones
+	STABLE_CHECKS = 2  # Comprobaciones seguidas sin cambios antes de dar el archivo por escrito
+	
+	def __init__(self, folders, onNewFile, interval=DEFAULT_INTERVAL, stableChecks=STABLE_CHECKS):
+		"""
+		Args:
+			folders (list): Carpetas a vigilar
+			onNewFile: Función (carpeta, ruta) -> bool; si retorna False se reintenta más tarde
+			interval (float): Segundos entre comprobaciones
+			stableChecks (int): Comprobaciones estables necesarias
+		"""
+		self.folders = [os.path.abspath(f) for f in folders if os.path.isdir(f)]
+		self.onNewFile = onNewFile
+		self.interval = interval
+		self.stableChecks = stableChecks
+		# ruta -> (tamaño, fecha) de la versión ya entregada: un archivo sobrescrito con el
+		# mismo nombre (como hacen algunas herramientas de captura) vuelve a describirse
+		self._seen = {}
+		self._candidates = {}  # ruta -> (tamaño, fecha, comprobaciones estables)
+		self._stopEvent = threading.Event()
+		self._thread = None
+	
+	@property
+	def isRunning(self):
+		"""True si el hilo de vigilancia está en marcha"""
+		return self._thread is not None and self._thread.is_alive()
+	
+	def start(self):
+		"""Empieza a vigilar; las imágenes que ya existen no se describen"""
+		if self.isRunning:
+			return
+		for folder in self.folders:
+			self._seen.update(self._listImages(folder) or {})
+		self._stopEvent.clear()
+		self._thread = threading.Thread(
+			target=self._watchLoop,
+			name="aiImageDescriber-folderWatcher",
+			daemon=True
+		)
+		self._thread.start()
+		log.info(f"Vigilando carpetas: {', '.join(self.folders)}")
+	
+	def stop(self):
+		"""Deja de vigilar"""
+		self._stopEvent.set()
+		if self._thread is not None:
+			self._thread.join(self.interval * 2)
+			self._thread = None
+		log.info("Vigilancia de carpetas detenida")
+	
+	def _listImages(self, folder):
+		"""
+		Retorna las imágenes de una carpeta (sin subcarpetas)
+		
+		Returns:
+			dict: ruta -> (tamaño, fecha), o None si la carpeta no se pudo leer
+		"""
+		images = {}
+		try:
+			with os.scandir(folder) as entries:
+				for entry in entries:
+					if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+						stat = entry.stat()
+						images[entry.path] = (stat.st_size, stat.st_mtime)
+		except OSError as e:
+			log.warning(f"No se pudo leer la carpeta vigilada {folder}: {e}")
+			return None
+		return images
+	
+	def _watchLoop(self):
+		"""Bucle de sondeo"""
+		while not self._stopEvent.wait(self.interval):
+			present = set()
+			listedFolders = set()
+			for folder in self.folders:
+				images = self._listImages(folder)
+				if images is None:
+					continue
+				listedFolders.add(folder)
+				present.update(images)
+				for path, version in images.items():
+					if self._seen.get(path) != version:
+						self._checkCandidate(folder, path)
+			# Olvidar los archivos que desaparecieron (entregados o a medio escribir); las
+			# carpetas que no se pudieron leer esta vez conservan su estado
+			for known in (self._seen, self._candidates):
+				for path in list(known):
+					if path not in present and os.path.dirname(path) in listedFolders:
+						del known[path]
+	
+	def _checkCandidate(self, folder, path):
+		"""Actualiza el estado de un archivo nuevo y lo entrega cuando está completo"""
+		try:
+			stat = os.stat(path)
+		except OSError:
+			return
+		size, mtime = stat.st_size, stat.st_mtime
+		previous = self._candidates.get(path)
+		if previous and previous[0] == size and previous[1] == mtime and size > 0:
+			stableCount = previous[2] + 1
+		else:
+			stableCount = 0
+		self._candidates[path] = (size, mtime, stableCount)
+		if stableCount < self.stableChecks or not self._isReadable(path):
+			return
+		
+		try:
+			accepted = self.onNewFile(folder, path)
+		except Exception as e:
+			log.error(f"Error al procesar imagen vigilada {path}: {e}", exc_info=True)
+			accepted = True
+		if accepted:
+			self._seen[path] = (size, mtime)
+			del self._candidates[path]
+	
+	def _isReadable(self, path):
+		"""True si el archivo puede abrirse (en Windows falla mientras otro programa lo escribe)"""
+		try:
+			with open(path, "rb"):
+				return True
+		except OSError:
+			return False
@@ -0,0 +1,317 @@
+# -*- coding: UTF-8 -*-
+"""
+Imágenes animadas y de varias páginas
+Recorre los fotogramas de GIF, WebP o PNG animados y las páginas de TIFF sin cargarlos
+todos a la vez: de las animaciones se eligen fotogramas clave por diferencia entre
+fotogramas y se describen en una sola petición; las páginas se describen en paralelo
+"""
+
+import asyncio
+import math
+import os
+import threading
+from io import BytesIO
+from urllib.parse import urlparse
+from logHandler import log
+
+from .cancellation import raiseIfCancelled
+from .imageProcessor import MAX_IMAGE_SIZE
+from .tiling import encodeImage
+
+try:
+	from PIL import Image, ImageChops, ImageStat
+	PIL_AVAILABLE = True
+except ImportError:
+	PIL_AVAILABLE = False
+
+ANIMATED_FORMATS = ("GIF", "WEBP", "PNG")  # PNG animado (APNG)
+# Documentos de varias páginas (DCX: fax multipágina); el resto de formatos con varios fotogramas
+# (MPO estereoscópico de las cámaras, iconos en varios tamaños...) se describe como una sola imagen
+PAGED_FORMATS = ("TIFF", "DCX")
+ANIMATABLE_EXTENSIONS = (".gif", ".webp", ".apng")  # Los PNG animados con extensión .png son raros
+MAX_SCAN_FRAMES = 300  # Fotogramas comparados como máximo; en animaciones más largas se muestrean
+MAX_KEYFRAMES = 6
+KEYFRAME_THRESHOLD = 12  # Diferencia media (0 a 255) con el último fotograma clave para elegir uno nuevo
+THUMBNAIL_SIZE = 64  # Lado de las miniaturas usadas para comparar fotogramas
+KEYFRAME_SIZE = 1024  # Lado máximo de cada fotograma clave enviado
+ANIMATION_MAX_TOKENS = 1500
+DEFAULT_FRAME_DURATION = 100  # Milisegundos, si el archivo no indica la duración
+MAX_PAGES = 20
+MAX_CONCURRENT_PAGES = 4
+
+# Fotogramas clave de una imagen animada, enviados en orden en una sola petición
+ANIMATION_PROMPTS = {
+	"es": (
+		"Estas {count} imágenes son fotogramas clave, en orden, de una imagen animada de unos {duration} segundos. "
+		"Describe para una persona con discapacidad visual qué muestra la animación y qué ocurre a lo largo de ella, "
+		"y transcribe literalmente el texto visible. Describe la animación como un todo, no cada fotograma por separado."
+	),
+	"en": (
+		"These {count} images are keyframes, in order, of an animated image lasting about {duration} seconds. "
+		"Describe for a visually impaired person what the animation shows and what happens over its course, "
+		"and transcribe the visible text verbatim. Describe the animation as a whole, not each frame separately."
+	),
+	"fr": (
+		"Ces {count} images sont des images clés, dans l'ordre, d'une image animée d'environ {duration} secondes. "
+		"Décris pour une personne malvoyante ce que montre l'animation et ce qui se passe tout au long de celle-ci, "
+		"et transcris mot pour mot le texte visible. Décris l'animation dans son ensemble, pas chaque image séparément."
+	)
+}
+
+PAGE_TITLES = {
+	"es": "Página {number}",
+	"en": "Page {number}",
+	"fr": "Page {number}"
+}
+
+
+def buildAnimationPrompt(count, duration, language):
+	"""Prompt de los fotogramas clave de una animación (duración en segundos)"""
+	return ANIMATION_PROMPTS.get(language, ANIMATION_PROMPTS["es"]).format(count=count, duration=duration)
+
+
+def pageTitle(number, language):
+	"""Título de una página en la descripción de un documento de varias páginas"""
+	return PAGE_TITLES.get(language, PAGE_TITLES["es"]).format(number=number)
+
+
+def _open(source):
+	"""Abre una imagen desde una ruta o desde bytes"""
+	return Image.open(BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+
+
+def frameKind(image):
+	"""
+	Tipo de imagen con varios fotogramas
+	
+	Returns:
+		tuple: ("animation" o "pages", número de fotogramas), o None si se describe como una sola imagen
+	"""
+	if not getattr(image, "is_animated", False):
+		return None
+	count = getattr(image, "n_frames", 1)
+	if count < 2:
+		return None
+	if image.format in ANIMATED_FORMATS:
+		return "animation", count
+	if image.format in PAGED_FORMATS:
+		return "pages", count
+	return None
+
+
+def multiFrameInfo(source):
+	"""
+	Comprueba si una imagen es animada o tiene varias páginas (sin decodificar los fotogramas)
+	
+	Args:
+		source: Ruta del archivo o contenido en bytes
+	
+	Returns:
+		tuple: ("animation" o "pages", número de fotogramas), o None
+	"""
+	if not PIL_AVAILABLE:
+		return None
+	try:
+		with _open(source) as image:
+			return frameKind(image)
+	except Exception as e:
+		log.debug(f"No se pudieron contar los fotogramas: {e}")
+		return None
+
+
+def mayBeAnimated(url):
+	"""True si la extensión de la dirección es de un formato que puede ser animado"""
+	extension = os.path.splitext(urlparse(url).path)[1].lower()
+	return extension in ANIMATABLE_EXTENSIONS
+
+
+def _thumbnail(image):
+	"""Miniatura en escala de grises del fotograma actual, para compararlo"""
+	frame = image.convert("L")
+	try:
+		return frame.resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.BILINEAR)
+	finally:
+		frame.close()
+
+
+def selectKeyframes(image, maxKeyframes=MAX_KEYFRAMES, threshold=KEYFRAME_THRESHOLD, cancelToken=None):
+	"""
+	Elige los fotogramas clave de una animación
+	
+	Solo se guarda la miniatura del último fotograma clave, así que la memoria no depende
+	de la longitud de la animación
+	
+	Args:
+		image: Imagen PIL animada
+		maxKeyframes (int): Fotogramas clave como máximo
+		threshold (int): Diferencia media mínima con el último fotograma clave
+		cancelToken (CancellationToken): Token de cancelación, o None
+	
+	Returns:
+		tuple: (índices de los fotogramas clave en orden, duración estimada en segundos)
+	"""
+	count = image.n_frames
+	step = max(1, math.ceil(count / MAX_SCAN_FRAMES))
+	keyframes = []  # (índice, diferencia con el anterior)
+	previous = None
+	duration = 0
+	try:
+		for index in range(0, count, step):
+			raiseIfCancelled(cancelToken)
+			image.seek(index)
+			duration += (image.info.get("duration") or DEFAULT_FRAME_DURATION) * step
+			thumbnail = _thumbnail(image)
+			if previous is None:
+				keyframes.append((index, float("inf")))
+				previous = thumbnail
+				continue
+			difference = ImageChops.difference(previous, thumbnail)
+			score = ImageStat.Stat(difference).mean[0]
+			difference.close()
+			if score > threshold:
+				keyframes.append((index, score))
+				previous.close()
+				previous = thumbnail
+			else:
+				thumbnail.close()
+	finally:
+		if previous is not None:
+			previous.close()
+	
+	# Si hay demasiados, se conservan el primero y los cambios mayores
+	if len(keyframes) > maxKeyframes:
+		keyframes = sorted(keyframes, key=lambda keyframe: keyframe[1], reverse=True)[:maxKeyframes]
+		keyframes.sort()
+	return [index for index, _ in keyframes], round(duration / 1000, 1)
+
+
+class FrameDescriber:
+	"""Describe imágenes animadas por fotogramas clave y documentos por páginas"""
+	
+	def __init__(self, client, detail="auto", language="es"):
+		"""
+		Args:
+			client: Cliente de API con describeImageAsync y describeWithPromptAsync
+			detail (str): Nivel de detalle
+			language (str): Idioma de la descripción
+		"""
+		self.client = client
+		self.detail = detail
+		self.language = language
+		self._seekLock = threading.Lock()  # Los fotogramas de una imagen PIL se leen de uno en uno
+	
+	async def describeSourceAsync(self, source, cancelToken=None):
+		"""
+		Describe una imagen animada o de varias páginas
+		
+		Args:
+			source: Ruta del archivo o contenido en bytes
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			str: Descripción de la animación o de las páginas
+		"""
+		if not PIL_AVAILABLE:
+			raise Exception("PIL/Pillow no disponible")
+		loop = asyncio.get_running_loop()
+		image = await loop.run_in_executor(None, _open, source)
+		try:
+			return await self.describeAsync(image, cancelToken)
+		finally:
+			image.close()
+	
+	async def describeAsync(self, image, cancelToken=None):
+		"""
+		Describe una imagen PIL con varios fotogramas
+		
+		Args:
+			image: Imagen PIL (el llamador la cierra)
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			str: Descripción
+		"""
+		kind = frameKind(image)
+		if kind is None:
+			raise Exception("La imagen no tiene varios fotogramas")
+		if kind[0] == "animation":
+			return await self._describeAnimationAsync(image, cancelToken)
+		return await self._describePagesAsync(image, kind[1], cancelToken)
+	
+	async def _describeAnimationAsync(self, image, cancelToken):
+		"""Describe los fotogramas clave de una animación en una sola petición"""
+		loop = asyncio.get_running_loop()
+		indices, duration = await loop.run_in_executor(None, lambda: selectKeyframes(image, cancelToken=cancelToken))
+		log.info(f"Animación de {image.n_frames} fotogramas y {duration} s: {len(indices)} fotogramas clave {indices}")
+		frames = await loop.run_in_executor(None, self._encodeFrames, image, indices, cancelToken)
+		
+		if len(frames) == 1:
+			# Animación casi estática: se describe como una imagen normal
+			return await self.client.describeImageAsync(
+				frames[0],
+				detail=self.detail,
+				language=self.language,
+				maxTokens=4000,
+				cancelToken=cancelToken
+			)
+		return await self.client.describeWithPromptAsync(
+			frames,
+			buildAnimationPrompt(len(frames), duration, self.language),
+			detail=self.detail,
+			maxTokens=ANIMATION_MAX_TOKENS,
+			cancelToken=cancelToken
+		)
+	
+	def _encodeFrames(self, image, indices, cancelToken):
+		"""Codifica los fotogramas indicados"""
+		frames = []
+		for index in indices:
+			raiseIfCancelled(cancelToken)
+			frames.append(self._encodeFrame(image, index, KEYFRAME_SIZE))
+		return frames
+	
+	def _encodeFrame(self, image, index, maxSize=MAX_IMAGE_SIZE):
+		"""Codifica un fotograma o página (la lectura se hace con el bloqueo, la codificación no)"""
+		with self._seekLock:
+			image.seek(index)
+			frame = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+		try:
+			return encodeImage(frame, maxSize)
+		finally:
+			frame.close()
+	
+	async def _describePagesAsync(self, image, count, cancelToken):
+		"""Describe las páginas en paralelo; cada una se codifica justo antes de enviarla"""
+		loop = asyncio.get_running_loop()
+		pages = min(count, MAX_PAGES)
+		if count > MAX_PAGES:
+			log.info(f"Documento de {count} páginas, se describen las primeras {MAX_PAGES}")
+		semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+		
+		async def describePage(index):
+			async with semaphore:
+				raiseIfCancelled(cancelToken)
+				try:
+					pageData = await loop.run_in_executor(None, self._encodeFrame, image, index)
+					return await self.client.describeImageAsync(
+						pageData,
+						detail=self.detail,
+						language=self.language,
+						maxTokens=4000,
+						cancelToken=cancelToken
+					)
+				except asyncio.CancelledError:
+					raise
+				except Exception as e:
+					log.warning(f"Error al describir la página {index + 1}: {e}")
+					return None
+		
+		results = await asyncio.gather(*(describePage(index) for index in range(pages)))
+		raiseIfCancelled(cancelToken)
+		if not any(results):
+			raise Exception("No se pudo describir ninguna página")
+		return "\n\n".join(
+			f"## {pageTitle(index + 1, self.language)}\n\n{description}"
+			for index, description in enumerate(results)
+			if description
+		)
@@ -0,0 +1,319 @@
+# -*- coding: UTF-8 -*-
+"""
+Motor de descripción fuera de proceso
+Gestiona el proceso auxiliar (describeHelper.py) desde NVDA: le pasa los píxeles
+capturados por memoria compartida y recibe las respuestas HTTP por stdin/stdout,
+de modo que la codificación de la imagen y el envío de megabytes de JSON no
+compiten por el GIL con la voz y la navegación
+"""
+
+import asyncio
+import concurrent.futures
+import itertools
+import json as jsonModule
+import os
+import subprocess
+import threading
+from logHandler import log
+
+from .asyncCore import ConnectionFailed, ConnectTimeout, RequestTimeout, HttpResponse
+
+try:
+	from multiprocessing import shared_memory
+	SHARED_MEMORY_AVAILABLE = True
+except ImportError:
+	log.warning("multiprocessing.shared_memory no disponible, el proceso auxiliar no se usará")
+	SHARED_MEMORY_AVAILABLE = False
+
+# Marcador que el proceso auxiliar sustituye por la imagen codificada
+IMAGE_PLACEHOLDER = "@@AIIMAGEDESCRIBER_IMAGE@@"
+
+HELPER_SCRIPT = os.path.join(os.path.dirname(__file__), "describeHelper.py")
+
+# Modos de imagen que se copian tal cual a la memoria compartida
+SHARED_IMAGE_MODES = ("RGB", "RGBA", "L")
+
+
+class HelperEngine:
+	"""Proceso auxiliar con canal JSON por líneas y respuestas como futuros"""
+	
+	START_TIMEOUT = 10.0  # Segundos para que el proceso responda al primer ping
+	
+	def __init__(self, pythonPath):
+		"""
+		Args:
+			pythonPath (str): Ruta del intérprete de Python que ejecuta el proceso auxiliar
+		"""
+		self.pythonPath = pythonPath
+		self._process = None
+		self._pending = {}
+		self._ids = itertools.count(1)
+		self._lock = threading.Lock()
+		self._writeLock = threading.Lock()
+	
+	def isAvailable(self):
+		"""True si el intérprete existe y hay memoria compartida"""
+		return SHARED_MEMORY_AVAILABLE and bool(self.pythonPath) and os.path.isfile(self.pythonPath)
+	
+	def start(self):
+		"""
+		Arranca el proceso auxiliar si no está en marcha
+		
+		Raises:
+			Exception: Si el proceso no arranca o no responde
+		"""
+		with self._lock:
+			if self._process is not None and self._process.poll() is None:
+				return
+			if not self.isAvailable():
+				raise Exception(f"Intérprete del proceso auxiliar no encontrado: {self.pythonPath}")
+			log.info(f"Iniciando proceso auxiliar con {self.pythonPath}")
+			self._process = subprocess.Popen(
+				[self.pythonPath, "-u", HELPER_SCRIPT],
+				stdin=subprocess.PIPE,
+				stdout=subprocess.PIPE,
+				stderr=subprocess.PIPE,
+				creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+			)
+			process = self._process
+			threading.Thread(
+				target=self._readLoop,
+				args=(process,),
+				name="aiImageDescriber-helperReader",
+				daemon=True
+			).start()
+			threading.Thread(
+				target=self._stderrLoop,
+				args=(process,),
+				name="aiImageDescriber-helperStderr",
+				daemon=True
+			).start()
+		
+		try:
+			reply = self.submit({"op": "ping"}).result(self.START_TIMEOUT)
+		except Exception as e:
+			self.stop()
+			raise Exception(f"El proceso auxiliar no responde: {e}")
+		if not reply.get("pil"):
+			self.stop()
+			raise Exception("Pillow no está instalado en el intérprete del proceso auxiliar")
+		log.info("Proceso auxiliar iniciado")
+	
+	def stop(self):
+		"""Detiene el proceso auxiliar y falla las peticiones pendientes"""
+		with self._lock:
+			process = self._process
+			self._process = None
+		if process is None:
+			return
+		try:
+			process.stdin.close()
+			process.wait(2)
+		except Exception:
+			process.kill()
+		self._failPending(ConnectionFailed("El proceso auxiliar se detuvo"))
+		log.info("Proceso auxiliar detenido")
+	
+	def submit(self, message):
+		"""
+		Envía un mensaje al proceso auxiliar
+		
+		Args:
+			message (dict): Mensaje del protocolo (se le asigna un id)
+		
+		Returns:
+			concurrent.futures.Future: Futuro con la respuesta; cancelarlo aborta la petición
+		"""
+		requestId = next(self._ids)
+		message = dict(message, id=requestId)
+		future = concurrent.futures.Future()
+		with self._lock:
+			process = self._process
+			self._pending[requestId] = future
+		if process is None:
+			self._pending.pop(requestId, None)
+			future.set_exception(ConnectionFailed("El proceso auxiliar no está en marcha"))
+			return future
+		
+		def onDone(f):
+			if f.cancelled():
+				self._pending.pop(requestId, None)
+				self._send({"op": "cancel", "id": requestId})
+		
+		future.add_done_callback(onDone)
+		if not self._send(message):
+			self._pending.pop(requestId, None)
+			future.set_exception(ConnectionFailed("No se pudo escribir en el proceso auxiliar"))
+		return future
+	
+	def release(self, source):
+		"""Indica al proceso auxiliar que ya no necesita la imagen codificada de un origen"""
+		self._send({"op": "release", "source": source})
+	
+	def transportForImage(self, image):
+		"""
+		Copia los píxeles de una imagen PIL a memoria compartida
+		
+		Args:
+			image: Imagen PIL (puede cerrarse en cuanto esta función retorna)
+		
+		Returns:
+			HelperTransport: Transporte que envía peticiones con esa imagen
+		"""
+		if image.mode not in SHARED_IMAGE_MODES:
+			image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+		pixels = image.tobytes()
+		sharedMemory = shared_memory.SharedMemory(create=True, size=len(pixels))
+		sharedMemory.buf[:len(pixels)] = pixels
+		source = {
+			"shm": sharedMemory.name,
+			"width": image.width,
+			"height": image.height,
+			"mode": image.mode,
+			"length": len(pixels),
+		}
+		return HelperTransport(self, source, sharedMemory)
+	
+	def transportForFile(self, filePath):
+		"""
+		Args:
+			filePath (str): Ruta de la imagen, que el proceso auxiliar abre directamente
+		
+		Returns:
+			HelperTransport: Transporte que envía peticiones con esa imagen
+		"""
+		return HelperTransport(self, {"path": os.path.abspath(filePath)})
+	
+	def _send(self, message):
+		"""Escribe un mensaje en stdin del proceso; retorna False si falla"""
+		with self._lock:
+			process = self._process
+		if process is None:
+			return False
+		data = (jsonModule.dumps(message) + "\n").encode("utf-8")
+		try:
+			with self._writeLock:
+				process.stdin.write(data)
+				process.stdin.flush()
+			return True
+		except (OSError, ValueError) as e:
+			log.warning(f"Error al escribir en el proceso auxiliar: {e}")
+			return False
+	
+	def _readLoop(self, process):
+		"""Lee las respuestas del proceso auxiliar y resuelve sus futuros"""
+		for line in process.stdout:
+			try:
+				reply = jsonModule.loads(line)
+			except ValueError:
+				log.warning(f"Respuesta no válida del proceso auxiliar: {line[:200]!r}")
+				continue
+			future = self._pending.pop(reply.get("id"), None)
+			if future is not None and not future.done():
+				try:
+					future.set_result(reply)
+				except concurrent.futures.InvalidStateError:
+					pass
+		log.info("El proceso auxiliar cerró su salida")
+		with self._lock:
+			if self._process is process:
+				self._process = None
+		self._failPending(ConnectionFailed("El proceso auxiliar terminó inesperadamente"))
+	
+	def _stderrLoop(self, process):
+		"""Registra los errores que el proceso auxiliar escribe en stderr"""
+		for line in process.stderr:
+			log.debug(f"Proceso auxiliar: {line.decode('utf-8', errors='replace').rstrip()}")
+	
+	def _failPending(self, error):
+		"""Falla todas las peticiones pendientes"""
+		with self._lock:
+			pending = list(self._pending.values())
+			self._pending.clear()
+		for future in pending:
+			if not future.done():
+				try:
+					future.set_exception(error)
+				except concurrent.futures.InvalidStateError:
+					pass
+
+
+class HelperTransport:
+	"""
+	Transporte HTTP que delega en el proceso auxiliar
+	
+	Tiene la misma interfaz request() que el núcleo asíncrono, así que los clientes
+	lo usan sin cambios: reciben IMAGE_PLACEHOLDER como imagen y el proceso auxiliar
+	lo sustituye por la imagen codificada antes de enviar la petición
+	"""
+	
+	def __init__(self, engine, source, sharedMemory=None):
+		"""
+		Args:
+			engine (HelperEngine): Motor que ejecuta las peticiones
+			source (dict): Origen de la imagen en el protocolo del proceso auxiliar
+			sharedMemory: Bloque de memoria compartida con los píxeles, o None
+		"""
+		self.engine = engine
+		self.source = source
+		self._sharedMemory = sharedMemory
+	
+	async def request(self, method, url, headers=None, json=None, data=None, timeout=(5.0, 30.0)):
+		"""
+		Envía una petición a través del proceso auxiliar
+		
+		Args:
+			method (str): Método HTTP
+			url (str): URL de destino
+			headers (dict): Cabeceras de la petición
+			json: Cuerpo a enviar serializado como JSON (con IMAGE_PLACEHOLDER)
+			data (bytes): Cuerpo a enviar tal cual
+			timeout (tuple): (timeout de conexión, timeout de lectura) en segundos
+		
+		Returns:
+			HttpResponse: Respuesta leída por completo
+		"""
+		if json is not None:
+			body = jsonModule.dumps(json)
+		else:
+			body = data.decode("utf-8") if data else ""
+		future = self.engine.submit({
+			"op": "request",
+			"source": self.source,
+			"method": method,
+			"url": url,
+			"headers": headers or {},
+			"body": body,
+			"placeholder": IMAGE_PLACEHOLDER,
+			"timeout": list(timeout),
+		})
+		reply = await asyncio.wrap_future(future)
+		
+		error = reply.get("error")
+		message = reply.get("message", "")
+		if error == "connectTimeout":
+			raise ConnectTimeout(message)
+		elif error == "timeout":
+			raise RequestTimeout(message)
+		elif error == "connection":
+			raise ConnectionFailed(message)
+		elif error == "cancelled":
+			raise asyncio.CancelledError()
+		elif error:
+			raise Exception(f"Error en el proceso auxiliar: {message}")
+		return HttpResponse(
+			url,
+			reply["status"],
+			reply.get("headers", {}),
+			reply.get("body", "").encode("utf-8"),
+			reply.get("elapsed", 0.0),
+			reply.get("connectElapsed")
+		)
+	
+	def close(self):
+		"""Libera la imagen en el proceso auxiliar y la memoria compartida"""
+		self.engine.release(self.source)
+		if self._sharedMemory is not None:
+			self._sharedMemory.close()
+			self._sharedMemory.unlink()
+			self._sharedMemory = None
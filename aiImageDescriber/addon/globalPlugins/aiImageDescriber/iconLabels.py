@@ -0,0 +1,363 @@
+# -*- coding: UTF-8 -*-
+"""
+Etiquetado de iconos sin nombre
+Reúne los botones y gráficos sin etiqueta de la ventana en primer plano, los coloca
+numerados en una hoja de contactos y pide todas las etiquetas en una sola petición.
+Las etiquetas se guardan por hash de los píxeles del icono para no volver a pedirlas
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+import api
+import controlTypes
+import ui as nvdaUI
+from logHandler import log
+
+from .cancellation import raiseIfCancelled
+
+try:
+	from PIL import Image, ImageDraw
+	PIL_AVAILABLE = True
+except ImportError:
+	PIL_AVAILABLE = False
+
+CACHE_FILE_NAME = "aiImageDescriber-iconLabels.json"
+MAX_CACHE_ENTRIES = 2000
+
+MAX_ICONS = 96  # Iconos como máximo por ventana
+MAX_ICONS_PER_SHEET = 48
+MIN_ICON_SIZE = 8  # Píxeles
+MAX_ICON_SIZE = 96  # Los objetos mayores no suelen ser iconos
+MAX_VISITED_OBJECTS = 2000  # Límite del recorrido del árbol de objetos
+CELL_SIZE = 64  # Lado de la celda de cada icono en la hoja
+NUMBER_HEIGHT = 14  # Franja para el número sobre cada icono
+CELL_PADDING = 6
+MAX_COLUMNS = 8
+
+ICON_ROLES = {
+	controlTypes.Role.GRAPHIC,
+	controlTypes.Role.ICON,
+	controlTypes.Role.BUTTON,
+	controlTypes.Role.TOGGLEBUTTON,
+	controlTypes.Role.MENUBUTTON,
+	controlTypes.Role.SPLITBUTTON,
+	controlTypes.Role.DROPDOWNBUTTON,
+}
+
+
+class UnlabeledIcon:
+	"""Objeto sin nombre con su posición en pantalla y, al terminar, su etiqueta"""
+	
+	def __init__(self, obj, location):
+		"""
+		Args:
+			obj: Objeto NVDA del icono
+			location (tuple): (izquierda, arriba, ancho, alto) en pantalla
+		"""
+		self.obj = obj
+		self.location = location
+		self.roleName = obj.role.displayString
+		self.windowHandle = obj.windowHandle
+		self.pixelHash = None
+		self.description = None
+		self.error = None
+		self.fromCache = False
+	
+	@property
+	def key(self):
+		"""Clave con la que se reconoce el objeto mientras la ventana no cambie"""
+		return (self.windowHandle, self.location)
+	
+	@property
+	def displayName(self):
+		"""Nombre para la lista de resultados"""
+		return f"{self.description or 'Sin etiqueta'} ({self.roleName})"
+	
+	def moveTo(self):
+		"""Lleva el navegador de objetos hasta el icono y anuncia su etiqueta"""
+		api.setNavigatorObject(self.obj)
+		nvdaUI.message(self.displayName)
+
+
+def objectKey(obj):
+	"""
+	Clave de un objeto NVDA comparable con UnlabeledIcon.key
+	
+	Returns:
+		tuple: (ventana, posición), o None si el objeto no tiene posición
+	"""
+	location = obj.location
+	if not location:
+		return None
+	return (obj.windowHandle, tuple(location))
+
+
+def collectUnlabeledIcons(root, maxIcons=MAX_ICONS):
+	"""
+	Reúne los iconos sin nombre visibles bajo un objeto
+	
+	Debe llamarse desde el hilo principal de NVDA
+	
+	Args:
+		root: Objeto raíz (normalmente la ventana en primer plano)
+		maxIcons (int): Iconos como máximo
+	
+	Returns:
+		list: UnlabeledIcon en orden del árbol de objetos
+	"""
+	icons = []
+	stack = [root]
+	visited = 0
+	while stack and visited < MAX_VISITED_OBJECTS and len(icons) < maxIcons:
+		obj = stack.pop()
+		visited += 1
+		states = obj.states
+		if controlTypes.State.INVISIBLE in states or controlTypes.State.OFFSCREEN in states:
+			continue
+		
+		if obj.role in ICON_ROLES and not (obj.name or "").strip():
+			location = obj.location
+			if (
+				location
+				and MIN_ICON_SIZE <= location.width <= MAX_ICON_SIZE
+				and MIN_ICON_SIZE <= location.height <= MAX_ICON_SIZE
+			):
+				icons.append(UnlabeledIcon(obj, tuple(location)))
+				continue
+		
+		# Hijos en orden inverso para recorrerlos en el orden del árbol
+		stack.extend(reversed(obj.children))
+	if visited >= MAX_VISITED_OBJECTS:
+		log.info(f"Recorrido de iconos detenido tras {visited} objetos")
+	return icons
+
+
+class IconLabelCache:
+	"""Etiquetas de iconos por hash de píxeles e idioma, guardadas en un archivo JSON"""
+	
+	def __init__(self, path, maxEntries=MAX_CACHE_ENTRIES):
+		"""
+		Args:
+			path (str): Archivo donde se guardan las etiquetas (sobrevive a reinicios de NVDA)
+			maxEntries (int): Etiquetas como máximo; se descartan las usadas hace más tiempo
+		"""
+		self.path = path
+		self.maxEntries = maxEntries
+		self._lock = threading.Lock()
+		self._labels = self._load()
+	
+	def _load(self):
+		"""Lee las etiquetas guardadas"""
+		if not os.path.isfile(self.path):
+			return OrderedDict()
+		try:
+			with open(self.path, "r", encoding="utf-8") as f:
+				return OrderedDict(json.load(f).get("labels", {}))
+		except (OSError, ValueError) as e:
+			log.error(f"No se pudieron leer las etiquetas de iconos de {self.path}: {e}")
+			return OrderedDict()
+	
+	def _save(self):
+		"""Escribe las etiquetas de forma atómica (debe llamarse con el bloqueo tomado)"""
+		temporaryPath = self.path + ".tmp"
+		with open(temporaryPath, "w", encoding="utf-8") as f:
+			json.dump({"labels": self._labels}, f, ensure_ascii=False)
+		os.replace(temporaryPath, self.path)
+	
+	def get(self, pixelHash, language):
+		"""
+		Returns:
+			str: Etiqueta guardada del icono, o None
+		"""
+		key = f"{language}:{pixelHash}"
+		with self._lock:
+			label = self._labels.get(key)
+			if label is not None:
+				self._labels.move_to_end(key)
+			return label
+	
+	def update(self, labels, language):
+		"""
+		Guarda varias etiquetas nuevas
+		
+		Args:
+			labels (dict): hash de píxeles -> etiqueta
+			language (str): Idioma de las etiquetas
+		"""
+		if not labels:
+			return
+		with self._lock:
+			for pixelHash, label in labels.items():
+				key = f"{language}:{pixelHash}"
+				self._labels[key] = label
+				self._labels.move_to_end(key)
+			while len(self._labels) > self.maxEntries:
+				self._labels.popitem(last=False)
+			try:
+				self._save()
+			except OSError as e:
+				log.error(f"No se pudieron guardar las etiquetas de iconos: {e}")
+
+
+class IconLabeler:
+	"""Etiqueta iconos con hojas de contactos y caché por hash de píxeles"""
+	
+	def __init__(self, client, imageCapture, cache):
+		"""
+		Args:
+			client: Cliente de API con labelContactSheetAsync
+			imageCapture (ImageCapture): Captura la región que ocupan los iconos
+			cache (IconLabelCache): Etiquetas ya obtenidas
+		"""
+		self.client = client
+		self.imageCapture = imageCapture
+		self.cache = cache
+	
+	async def labelAsync(self, icons, language="es", cancelToken=None):
+		"""
+		Captura los iconos y obtiene sus etiquetas (de la caché o del proveedor)
+		
+		Rellena description o error de cada icono
+		
+		Args:
+			icons (list): UnlabeledIcon a etiquetar
+			language (str): Idioma de las etiquetas
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			list: Los mismos iconos
+		"""
+		if not PIL_AVAILABLE:
+			raise Exception("PIL/Pillow no disponible")
+		loop = asyncio.get_running_loop()
+		crops = await loop.run_in_executor(None, self._captureIcons, icons, cancelToken)
+		try:
+			# Iconos ya conocidos y hashes únicos por etiquetar
+			pending = OrderedDict()
+			for icon in icons:
+				label = self.cache.get(icon.pixelHash, language)
+				if label:
+					icon.description = label
+					icon.fromCache = True
+				else:
+					pending.setdefault(icon.pixelHash, []).append(icon)
+			log.info(f"Iconos: {len(icons) - sum(len(group) for group in pending.values())} desde la caché, {len(pending)} por etiquetar")
+			
+			hashes = list(pending)
+			sheets = [hashes[i:i + MAX_ICONS_PER_SHEET] for i in range(0, len(hashes), MAX_ICONS_PER_SHEET)]
+			results = await asyncio.gather(
+				*(self._labelSheetAsync(sheet, crops, language, cancelToken) for sheet in sheets),
+				return_exceptions=True
+			)
+		finally:
+			for crop in crops.values():
+				crop.close()
+		
+		newLabels = {}
+		for sheet, result in zip(sheets, results):
+			if isinstance(result, asyncio.CancelledError):
+				raise result
+			for index, pixelHash in enumerate(sheet):
+				if isinstance(result, Exception):
+					label, error = None, str(result)
+				else:
+					label, error = result[index], "Sin etiqueta en la respuesta"
+				if label:
+					newLabels[pixelHash] = label
+				for icon in pending[pixelHash]:
+					icon.description = label
+					icon.error = None if label else error
+		self.cache.update(newLabels, language)
+		return icons
+	
+	def _captureIcons(self, icons, cancelToken):
+		"""
+		Captura de una vez la región que contiene todos los iconos y recorta cada uno
+		
+		Returns:
+			dict: hash de píxeles -> recorte PIL (uno por icono distinto)
+		"""
+		left = min(icon.location[0] for icon in icons)
+		top = min(icon.location[1] for icon in icons)
+		right = max(icon.location[0] + icon.location[2] for icon in icons)
+		bottom = max(icon.location[1] + icon.location[3] for icon in icons)
+		screenshot = self.imageCapture.grabRegion(left, top, right, bottom, cancelToken)
+		crops = {}
+		try:
+			for icon in icons:
+				raiseIfCancelled(cancelToken)
+				x, y, width, height = icon.location
+				crop = screenshot.crop((x - left, y - top, x - left + width, y - top + height)).convert("RGB")
+				icon.pixelHash = hashlib.sha1(f"{width}x{height}".encode("ascii") + crop.tobytes()).hexdigest()
+				if icon.pixelHash in crops:
+					crop.close()
+				else:
+					crops[icon.pixelHash] = crop
+		except BaseException:
+			for crop in crops.values():
+				crop.close()
+			raise
+		finally:
+			screenshot.close()
+		return crops
+	
+	async def _labelSheetAsync(self, hashes, crops, language, cancelToken):
+		"""Envía una hoja de contactos y retorna la etiqueta de cada icono en orden"""
+		loop = asyncio.get_running_loop()
+		sheetBase64 = await loop.run_in_executor(None, buildContactSheet, [crops[h] for h in hashes])
+		raiseIfCancelled(cancelToken)
+		return await self.client.labelContactSheetAsync(
+			sheetBase64,
+			len(hashes),
+			language=language,
+			cancelToken=cancelToken
+		)
+
+
+def buildContactSheet(images):
+	"""
+	Coloca las imágenes en una cuadrícula con su número encima
+	
+	Los iconos pequeños se amplían sin suavizado para que sigan siendo nítidos
+	
+	Args:
+		images (list): Imágenes PIL en orden
+	
+	Returns:
+		str: Hoja de contactos PNG codificada en base64
+	"""
+	columns = min(MAX_COLUMNS, max(1, math.ceil(math.sqrt(len(images)))))
+	rows = math.ceil(len(images) / columns)
+	cellWidth = CELL_SIZE + 2 * CELL_PADDING
+	cellHeight = NUMBER_HEIGHT + CELL_SIZE + 2 * CELL_PADDING
+	sheet = Image.new("RGB", (columns * cellWidth, rows * cellHeight), (255, 255, 255))
+	try:
+		draw = ImageDraw.Draw(sheet)
+		for index, image in enumerate(images):
+			column, row = index % columns, index // columns
+			x, y = column * cellWidth, row * cellHeight
+			draw.rectangle((x, y, x + cellWidth - 1, y + cellHeight - 1), outline=(160, 160, 160))
+			draw.text((x + CELL_PADDING, y + 2), str(index + 1), fill=(200, 0, 0))
+			
+			scale = max(1, min(4, CELL_SIZE // max(image.width, image.height)))
+			icon = image.resize((image.width * scale, image.height * scale), Image.NEAREST) if scale > 1 else image
+			icon.thumbnail((CELL_SIZE, CELL_SIZE))
+			sheet.paste(
+				icon,
+				(x + CELL_PADDING + (CELL_SIZE - icon.width) // 2, y + NUMBER_HEIGHT + CELL_PADDING + (CELL_SIZE - icon.height) // 2)
+			)
+			if icon is not image:
+				icon.close()
+		
+		buffered = BytesIO()
+		sheet.save(buffered, format="PNG", optimize=True)
+		return base64.b64encode(buffered.getvalue()).decode("utf-8")
+	finally:
+		sheet.close()
@@ -8,6 +8,8 @@ import base64
 from io import BytesIO
 from logHandler import log
 
+from .cancellation import raiseIfCancelled
+
 try:
 	from PIL import ImageGrab, Image
 	PIL_AVAILABLE = True
@@ -24,10 +26,13 @@ class ImageCapture:
 		if not PIL_AVAILABLE:
 			log.error("PIL no disponible. Las funciones de captura no funcionarán.")
 	
-	def captureFullScreen(self):
+	def captureFullScreen(self, cancelToken=None):
 		"""
 		Captura la pantalla completa
 		
+		Args:
+			cancelToken (CancellationToken): Token para abortar la captura, o None
+		
 		Returns:
 			str: Imagen en formato base64, o None si falla
 		"""
@@ -36,19 +41,35 @@ class ImageCapture:
 		
 		try:
 			# Capturar pantalla
-			screenshot = ImageGrab.grab()
+			screenshot = self.grabFullScreen(cancelToken)
 			
 			# Convertir a base64
-			return self._imageToBase64(screenshot)
+			return self._encodeAndRelease(screenshot, cancelToken)
 			
 		except Exception as e:
 			log.error(f"Error al capturar pantalla: {e}", exc_info=True)
 			return None
 	
-	def captureActiveWindow(self):
+	def grabFullScreen(self, cancelToken=None):
+		"""
+		Captura la pantalla completa sin codificarla
+		
+		Args:
+			cancelToken (CancellationToken): Token para abortar la captura, o None
+		
+		Returns:
+			Image: Captura como imagen PIL (el llamador debe cerrarla)
+		"""
+		raiseIfCancelled(cancelToken)
+		return ImageGrab.grab()
+	
+	def captureActiveWindow(self, cancelToken=None):
 		"""
 		Captura solo la ventana activa
 		
+		Args:
+			cancelToken (CancellationToken): Token para abortar la captura, o None
+		
 		Returns:
 			str: Imagen en formato base64, o None si falla
 		"""
@@ -100,19 +121,20 @@ class ImageCapture:
 			
 			if result == 0:
 				log.warning("PrintWindow falló, usando captura de región")
-				return self.captureRegion(left, top, right, bottom)
+				img.close()
+				return self.captureRegion(left, top, right, bottom, cancelToken)
 			
-			return self._imageToBase64(img)
+			return self._encodeAndRelease(img, cancelToken)
 			
 		except ImportError:
 			log.warning("pywin32 no disponible. Usando captura de región")
 			# Fallback a captura de pantalla completa
-			return self.captureFullScreen()
+			return self.captureFullScreen(cancelToken)
 		except Exception as e:
 			log.error(f"Error al capturar ventana activa: {e}", exc_info=True)
 			return None
 	
-	def captureRegion(self, x1, y1, x2, y2):
+	def captureRegion(self, x1, y1, x2, y2, cancelToken=None):
 		"""
 		Captura una región específica de la pantalla
 		
@@ -121,6 +143,7 @@ class ImageCapture:
 			y1 (int): Coordenada Y superior izquierda
 			x2 (int): Coordenada X inferior derecha
 			y2 (int): Coordenada Y inferior derecha
+			cancelToken (CancellationToken): Token para abortar la captura, o None
 		
 		Returns:
 			str: Imagen en formato base64, o None si falla
@@ -130,16 +153,48 @@ class ImageCapture:
 		
 		try:
 			# Capturar región
-			bbox = (x1, y1, x2, y2)
-			screenshot = ImageGrab.grab(bbox=bbox)
+			screenshot = self.grabRegion(x1, y1, x2, y2, cancelToken)
 			
-			return self._imageToBase64(screenshot)
+			return self._encodeAndRelease(screenshot, cancelToken)
 			
 		except Exception as e:
 			log.error(f"Error al capturar región: {e}", exc_info=True)
 			return None
 	
-	def _imageToBase64(self, image, format="PNG", quality=85):
+	def grabRegion(self, x1, y1, x2, y2, cancelToken=None):
+		"""
+		Captura una región de la pantalla sin codificarla
+		
+		Args:
+			x1 (int): Coordenada X superior izquierda
+			y1 (int): Coordenada Y superior izquierda
+			x2 (int): Coordenada X inferior derecha
+			y2 (int): Coordenada Y inferior derecha
+			cancelToken (CancellationToken): Token para abortar la captura, o None
+		
+		Returns:
+			Image: Captura como imagen PIL (el llamador debe cerrarla)
+		"""
+		raiseIfCancelled(cancelToken)
+		return ImageGrab.grab(bbox=(x1, y1, x2, y2))
+	
+	def _encodeAndRelease(self, image, cancelToken=None):
+		"""
+		Codifica una imagen capturada y libera su búfer de píxeles
+		
+		Args:
+			image: Objeto Image de PIL (se cierra al terminar)
+			cancelToken (CancellationToken): Token para abortar la codificación, o None
+		
+		Returns:
+			str: Imagen codificada en base64
+		"""
+		try:
+			return self._imageToBase64(image, cancelToken=cancelToken)
+		finally:
+			image.close()
+	
+	def _imageToBase64(self, image, format="PNG", quality=85, cancelToken=None):
 		"""
 		Convierte una imagen PIL a base64
 		
@@ -147,17 +202,20 @@ class ImageCapture:
 			image: Objeto Image de PIL
 			format (str): Formato de salida (PNG, JPEG, etc.)
 			quality (int): Calidad para JPEG (1-100)
+			cancelToken (CancellationToken): Token para abortar la codificación, o None
 		
 		Returns:
 			str: Imagen codificada en base64
 		"""
 		try:
 			# Optimizar tamaño si es muy grande
+			raiseIfCancelled(cancelToken)
 			max_size = 2048
 			if image.width > max_size or image.height > max_size:
 				image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
 			
 			# Convertir a bytes
+			raiseIfCancelled(cancelToken)
 			buffered = BytesIO()
 			
 			if format.upper() == "JPEG":
@@ -169,6 +227,7 @@ class ImageCapture:
 				image.save(buffered, format=format, optimize=True)
 			
 			# Codificar en base64
+			raiseIfCancelled(cancelToken)
 			img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
 			
 			return img_base64
@@ -177,10 +236,13 @@ class ImageCapture:
 			log.error(f"Error al convertir imagen a base64: {e}", exc_info=True)
 			return None
 	
-	def captureFromClipboard(self):
+	def captureFromClipboard(self, cancelToken=None):
 		"""
 		Captura imagen desde el portapapeles
 		
+		Args:
+			cancelToken (CancellationToken): Token para abortar la captura, o None
+		
 		Returns:
 			str: Imagen en formato base64, o None si no hay imagen
 		"""
@@ -188,21 +250,38 @@ class ImageCapture:
 			return None
 		
 		try:
-			from PIL import ImageGrab
-			
-			# Intentar obtener imagen del portapapeles
-			clipboard_image = ImageGrab.grabclipboard()
-			
+			clipboard_image = self.grabFromClipboard(cancelToken)
 			if clipboard_image is None:
-				log.info("No hay imagen en el portapapeles")
 				return None
 			
-			if not isinstance(clipboard_image, Image.Image):
-				log.warning("El contenido del portapapeles no es una imagen")
-				return None
-			
-			return self._imageToBase64(clipboard_image)
+			return self._encodeAndRelease(clipboard_image, cancelToken)
 			
 		except Exception as e:
 			log.error(f"Error al capturar desde portapapeles: {e}", exc_info=True)
 			return None
+	
+	def grabFromClipboard(self, cancelToken=None):
+		"""
+		Obtiene la imagen del portapapeles sin codificarla
+		
+		Args:
+			cancelToken (CancellationToken): Token para abortar la captura, o None
+		
+		Returns:
+			Image: Imagen PIL (el llamador debe cerrarla), o None si no hay imagen
+		"""
+		from PIL import ImageGrab
+		
+		# Intentar obtener imagen del portapapeles
+		raiseIfCancelled(cancelToken)
+		clipboard_image = ImageGrab.grabclipboard()
+		
+		if clipboard_image is None:
+			log.info("No hay imagen en el portapapeles")
+			return None
+		
+		if not isinstance(clipboard_image, Image.Image):
+			log.warning("El contenido del portapapeles no es una imagen")
+			return None
+		
+		return clipboard_image
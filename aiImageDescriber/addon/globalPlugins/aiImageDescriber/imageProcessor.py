@@ -4,19 +4,128 @@ Módulo de procesamiento de imágenes
 Extrae y procesa imágenes de objetos NVDA y otras fuentes
 """
 
+import asyncio
 import base64
+import ipaddress
 import os
 from io import BytesIO
+from urllib.parse import urlparse
 from logHandler import log
 import controlTypes
 
+from .asyncCore import asyncCore, ConnectionFailed, RequestTimeout, ResponseTooLarge
+from .cancellation import CANCELLED_ERRORS, raiseIfCancelled
+
 try:
-	from PIL import Image
+	from PIL import Image, ImageFile
 	PIL_AVAILABLE = True
 except ImportError:
 	log.warning("PIL/Pillow no disponible")
 	PIL_AVAILABLE = False
 
+MAX_IMAGE_SIZE = 2048  # Lado máximo en píxeles de las imágenes enviadas
+MAX_DOWNLOAD_BYTES = 15 * 1024 * 1024  # Tamaño máximo de una imagen descargada
+DOWNLOAD_TIMEOUT = 20.0  # Segundos como máximo por intento de descarga, aunque lleguen datos
+PROBE_BYTES = 256 * 1024  # Bytes tras los que se abandona una descarga de formato no reconocido
+MAX_DECODE_PIXELS = 40_000_000  # Píxeles como máximo de una imagen descargada
+SUPPORTED_FORMATS = ("JPEG", "PNG", "GIF", "WEBP", "BMP", "TIFF", "ICO")
+REJECTED_CONTENT_TYPES = ("text/", "application/json", "image/svg")
+MAX_PUBLIC_URL_LENGTH = 2048
+PRIVATE_HOST_SUFFIXES = (".local", ".localhost", ".internal", ".intranet", ".lan", ".home.arpa", ".corp")
+
+
+class ImageRejected(Exception):
+	"""La descarga no es una imagen que se pueda describir"""
+
+
+def isPublicURL(url):
+	"""
+	Comprueba si una dirección de imagen es accesible desde internet
+	
+	Solo se mira la propia dirección (sin resolver el nombre): esquema http(s), sin
+	credenciales y con un servidor que no sea local, de la red privada ni de una intranet
+	
+	Args:
+		url (str): Dirección de la imagen
+	
+	Returns:
+		bool: True si el proveedor puede descargarla por sí mismo
+	"""
+	if not url or len(url) > MAX_PUBLIC_URL_LENGTH:
+		return False
+	try:
+		parsed = urlparse(url)
+		host = parsed.hostname
+	except ValueError:
+		return False
+	if parsed.scheme not in ("http", "https") or not host or parsed.username or parsed.password:
+		return False
+	try:
+		return ipaddress.ip_address(host).is_global
+	except ValueError:
+		pass
+	# Los nombres sin dominio son de la intranet
+	host = host.rstrip(".")
+	return "." in host and host != "localhost" and not host.endswith(PRIVATE_HOST_SUFFIXES)
+
+
+class ImageProbe:
+	"""
+	Reconoce el formato y las dimensiones de una descarga con sus primeros bytes
+	
+	Se alimenta con los fragmentos según llegan, de modo que una imagen no compatible o
+	demasiado grande se rechaza sin esperar a descargarla entera
+	"""
+	
+	def __init__(self, maxPixels=MAX_DECODE_PIXELS):
+		"""
+		Args:
+			maxPixels (int): Píxeles como máximo
+		"""
+		self.maxPixels = maxPixels
+		self.format = None
+		self.size = None
+		self._parser = ImageFile.Parser()
+		self._received = 0
+	
+	def feed(self, headers, chunk):
+		"""
+		Analiza un fragmento de la descarga
+		
+		Args:
+			headers (ResponseHeaders): Cabeceras de la respuesta
+			chunk (bytes): Fragmento recibido
+		
+		Raises:
+			ImageRejected: Si la descarga no es una imagen compatible o es demasiado grande
+		"""
+		if self._parser is None:
+			return
+		if self._received == 0:
+			contentType = headers.get("Content-Type", "").lower()
+			if contentType.startswith(REJECTED_CONTENT_TYPES):
+				raise ImageRejected(f"La dirección no devuelve una imagen compatible ({contentType})")
+		self._received += len(chunk)
+		try:
+			self._parser.feed(chunk)
+		except Exception as e:
+			raise ImageRejected(f"Datos de imagen no válidos: {e}")
+		image = self._parser.image
+		if image is None:
+			if self._received > PROBE_BYTES:
+				raise ImageRejected("No se reconoce el formato de la imagen")
+			return
+		
+		# Cabecera leída: el resto de la descarga ya no se analiza
+		self._parser = None
+		self.format, self.size = image.format, image.size
+		if self.format not in SUPPORTED_FORMATS:
+			raise ImageRejected(f"Formato de imagen no compatible: {self.format}")
+		# Los JPEG se decodifican ya reducidos (hasta 1/8 por lado), así que admiten más píxeles
+		limit = self.maxPixels * (64 if self.format == "JPEG" else 1)
+		if self.size[0] * self.size[1] > limit:
+			raise ImageRejected(f"Imagen demasiado grande: {self.size[0]}x{self.size[1]} píxeles")
+
 
 class ImageProcessor:
 	"""Clase para procesar y extraer imágenes"""
@@ -25,12 +134,14 @@ class ImageProcessor:
 		"""Inicializa el procesador de imágenes"""
 		pass
 	
-	def extractFromObject(self, obj):
+	def extractFromObject(self, obj, cancelToken=None, useURL=True):
 		"""
 		Extrae imagen de un objeto NVDA
 		
 		Args:
 			obj: Objeto NVDA
+			cancelToken (CancellationToken): Token para abortar la extracción, o None
+			useURL (bool): False si la dirección de la imagen ya se intentó descargar
 		
 		Returns:
 			str: Imagen en base64, o None si no se puede extraer
@@ -45,10 +156,10 @@ class ImageProcessor:
 			imageData = None
 			
 			# Método 1: Desde URL (para imágenes web)
-			if hasattr(obj, 'IA2Attributes') and obj.IA2Attributes:
+			if useURL and hasattr(obj, 'IA2Attributes') and obj.IA2Attributes:
 				imageUrl = obj.IA2Attributes.get('src', None)
 				if imageUrl:
-					imageData = self._loadFromURL(imageUrl)
+					imageData = self._loadFromURL(imageUrl, cancelToken)
 					if imageData:
 						return imageData
 			
@@ -62,30 +173,33 @@ class ImageProcessor:
 				right = left + obj.location.width
 				bottom = top + obj.location.height
 				
-				imageData = capture.captureRegion(left, top, right, bottom)
+				imageData = capture.captureRegion(left, top, right, bottom, cancelToken)
 				if imageData:
 					return imageData
 			
 			# Método 3: Desde ruta de archivo local
 			if hasattr(obj, 'value') and obj.value:
 				if os.path.isfile(obj.value):
-					imageData = self.loadFromFile(obj.value)
+					imageData = self.loadFromFile(obj.value, cancelToken)
 					if imageData:
 						return imageData
 			
 			log.warning("No se pudo extraer imagen del objeto")
 			return None
 			
+		except CANCELLED_ERRORS:
+			raise
 		except Exception as e:
 			log.error(f"Error al extraer imagen de objeto: {e}", exc_info=True)
 			return None
 	
-	def loadFromFile(self, filePath):
+	def loadFromFile(self, filePath, cancelToken=None):
 		"""
 		Carga imagen desde archivo y la convierte a base64
 		
 		Args:
 			filePath (str): Ruta al archivo de imagen
+			cancelToken (CancellationToken): Token para abortar la carga, o None
 		
 		Returns:
 			str: Imagen en base64, o None si falla
@@ -100,21 +214,22 @@ class ImageProcessor:
 				return None
 			
 			# Cargar imagen
-			image = Image.open(filePath)
-			
-			# Convertir a base64
-			return self._imageToBase64(image)
+			raiseIfCancelled(cancelToken)
+			with Image.open(filePath) as image:
+				# Convertir a base64
+				return self._imageToBase64(image, cancelToken=cancelToken)
 			
 		except Exception as e:
 			log.error(f"Error al cargar imagen desde archivo: {e}", exc_info=True)
 			return None
 	
-	def _loadFromURL(self, url):
+	def _loadFromURL(self, url, cancelToken=None):
 		"""
 		Descarga imagen desde URL y la convierte a base64
 		
 		Args:
 			url (str): URL de la imagen
+			cancelToken (CancellationToken): Token para abortar la descarga, o None
 		
 		Returns:
 			str: Imagen en base64, o None si falla
@@ -123,54 +238,167 @@ class ImageProcessor:
 			return None
 		
 		try:
-			import requests
-			from requests.adapters import HTTPAdapter
-			from urllib3.util.retry import Retry
-			
-			# Configurar sesión con reintentos
-			session = requests.Session()
-			retry = Retry(total=3, backoff_factor=0.3)
-			adapter = HTTPAdapter(max_retries=retry)
-			session.mount('http://', adapter)
-			session.mount('https://', adapter)
-			
-			# Descargar imagen
-			headers = {
-				'User-Agent': 'NVDA-AIImageDescriber/1.0'
-			}
-			response = session.get(url, headers=headers, timeout=10)
-			response.raise_for_status()
+			content = self.fetchURL(url, cancelToken)
 			
 			# Cargar imagen desde bytes
-			image = Image.open(BytesIO(response.content))
+			with Image.open(BytesIO(content)) as image:
+				return self._imageToBase64(image, cancelToken=cancelToken)
 			
-			return self._imageToBase64(image)
-			
-		except ImportError:
-			log.warning("requests no disponible. No se pueden descargar imágenes de URLs")
+		except (ResponseTooLarge, ImageRejected) as e:
+			log.warning(f"Imagen descartada: {e}")
 			return None
+		except CANCELLED_ERRORS:
+			# El usuario canceló: no se recurre a la captura de pantalla
+			raise
 		except Exception as e:
 			log.error(f"Error al descargar imagen desde URL: {e}", exc_info=True)
 			return None
 	
-	def _imageToBase64(self, image, format="PNG"):
+	def fetchURL(self, url, cancelToken=None):
+		"""
+		Descarga el contenido de una URL sin decodificarlo
+		
+		Args:
+			url (str): URL de la imagen
+			cancelToken (CancellationToken): Token para abortar la descarga, o None
+		
+		Returns:
+			bytes: Contenido descargado
+		"""
+		# Descargar en el núcleo asíncrono (cancelar el token aborta la descarga)
+		raiseIfCancelled(cancelToken)
+		future = asyncCore.submit(self._downloadAsync(url))
+		if cancelToken is not None:
+			cancelToken.addCallback(future.cancel)
+		try:
+			return future.result()
+		finally:
+			if cancelToken is not None:
+				cancelToken.removeCallback(future.cancel)
+	
+	async def loadFromURLAsync(self, url, maxSize=MAX_IMAGE_SIZE, cancelToken=None):
+		"""
+		Descarga y codifica una imagen dentro del núcleo asíncrono
+		
+		Acepta también URLs data: (la imagen viene incluida en la propia dirección)
+		
+		Args:
+			url (str): URL de la imagen
+			maxSize (int): Lado máximo en píxeles de la imagen codificada
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			str: Imagen en base64, o None si no es una imagen válida
+		"""
+		raiseIfCancelled(cancelToken)
+		if url.startswith("data:"):
+			header, _separator, data = url.partition(",")
+			if ";base64" not in header:
+				return None
+			if len(data) * 3 // 4 > MAX_DOWNLOAD_BYTES:
+				log.warning("Imagen data: descartada por superar el tamaño máximo")
+				return None
+			content = base64.b64decode(data)
+		else:
+			content = await self._downloadAsync(url)
+		
+		# Decodificar y recodificar en un hilo para no bloquear el bucle
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(None, self.loadFromBytes, content, maxSize, cancelToken)
+	
+	def loadFromBytes(self, content, maxSize=MAX_IMAGE_SIZE, cancelToken=None):
+		"""
+		Codifica una imagen recibida como bytes
+		
+		Args:
+			content (bytes): Contenido del archivo de imagen
+			maxSize (int): Lado máximo en píxeles de la imagen codificada
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			str: Imagen en base64, o None si falla
+		"""
+		if not PIL_AVAILABLE:
+			return None
+		try:
+			with Image.open(BytesIO(content)) as image:
+				return self._imageToBase64(image, cancelToken=cancelToken, maxSize=maxSize)
+		except Exception as e:
+			log.warning(f"No se pudo decodificar la imagen: {e}")
+			return None
+	
+	async def _downloadAsync(self, url, maxBytes=MAX_DOWNLOAD_BYTES):
+		"""
+		Descarga el contenido de una URL con reintentos
+		
+		La descarga se lee por fragmentos: se rechaza por Content-Length antes de empezar, se
+		corta al superar maxBytes o DOWNLOAD_TIMEOUT, y los primeros kilobytes bastan para
+		descartar formatos no compatibles e imágenes con demasiados píxeles
+		
+		Args:
+			url (str): URL de la imagen
+			maxBytes (int): Tamaño máximo de la descarga
+		
+		Returns:
+			bytes: Contenido descargado
+		
+		Raises:
+			ResponseTooLarge: Si la imagen supera maxBytes
+			ImageRejected: Si no es una imagen compatible
+		"""
+		headers = {
+			'User-Agent': 'NVDA-AIImageDescriber/1.0'
+		}
+		attempts = 3
+		for attempt in range(attempts):
+			probe = ImageProbe()
+			try:
+				response = await asyncio.wait_for(
+					asyncCore.request(
+						"GET",
+						url,
+						headers=headers,
+						timeout=(5.0, 10.0),
+						maxBytes=maxBytes,
+						onChunk=probe.feed
+					),
+					DOWNLOAD_TIMEOUT
+				)
+				if response.status_code < 500 or attempt == attempts - 1:
+					response.raise_for_status()
+					if probe.format:
+						log.debug(f"Imagen descargada: {probe.format} {probe.size[0]}x{probe.size[1]}, {len(response.content)} bytes")
+					return response.content
+			except asyncio.TimeoutError:
+				if attempt == attempts - 1:
+					raise RequestTimeout(f"La descarga tardó más de {DOWNLOAD_TIMEOUT} segundos")
+			except (ConnectionFailed, RequestTimeout):
+				if attempt == attempts - 1:
+					raise
+			# Espera exponencial entre reintentos
+			await asyncio.sleep(0.3 * (2 ** attempt))
+	
+	def _imageToBase64(self, image, format="PNG", cancelToken=None, maxSize=MAX_IMAGE_SIZE):
 		"""
 		Convierte imagen PIL a base64
 		
 		Args:
 			image: Imagen PIL
 			format (str): Formato de salida
+			cancelToken (CancellationToken): Token para abortar la codificación, o None
+			maxSize (int): Lado máximo en píxeles
 		
 		Returns:
 			str: Imagen en base64
 		"""
 		try:
 			# Optimizar tamaño
-			max_size = 2048
-			if image.width > max_size or image.height > max_size:
-				image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+			raiseIfCancelled(cancelToken)
+			if image.width > maxSize or image.height > maxSize:
+				image.thumbnail((maxSize, maxSize), Image.Resampling.LANCZOS)
 			
 			# Convertir a bytes
+			raiseIfCancelled(cancelToken)
 			buffered = BytesIO()
 			
 			if format.upper() == "JPEG":
@@ -181,6 +409,7 @@ class ImageProcessor:
 				image.save(buffered, format=format, optimize=True)
 			
 			# Codificar en base64
+			raiseIfCancelled(cancelToken)
 			img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
 			
 			return img_base64
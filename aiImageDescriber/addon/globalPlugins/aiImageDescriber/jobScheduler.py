@@ -0,0 +1,218 @@
+# -*- coding: UTF-8 -*-
+"""
+Planificador de tareas de descripción
+Un grupo fijo de hilos atiende una cola con prioridades, en lugar de crear
+un hilo nuevo por cada pulsación de tecla
+"""
+
+import itertools
+import queue
+import threading
+from logHandler import log
+
+from .cancellation import CancellationToken, CANCELLED_ERRORS
+
+# Prioridades (menor número = se atiende antes)
+PRIORITY_INTERACTIVE = 0  # Gestos del usuario que esperan respuesta inmediata
+PRIORITY_BACKGROUND = 1  # Trabajo en segundo plano disparado automáticamente
+PRIORITY_BATCH = 2  # Lotes largos (carpetas, documentos completos...)
+
+
+class QueueFullError(Exception):
+	"""La cola de tareas alcanzó su límite"""
+
+
+class Job:
+	"""Tarea planificada"""
+	
+	_ids = itertools.count(1)
+	
+	def __init__(self, func, args, priority, description, group=None):
+		"""
+		Args:
+			func: Función a ejecutar en un hilo del grupo
+			args (tuple): Argumentos de la función
+			priority (int): Prioridad (PRIORITY_*)
+			description (str): Texto que se anuncia al consultar el estado
+			group (str): Grupo "el último gana": una tarea nueva del mismo grupo cancela las anteriores
+		"""
+		self.id = next(self._ids)
+		self.func = func
+		self.args = args
+		self.priority = priority
+		self.description = description
+		self.group = group
+		self.state = "pending"
+		self.token = CancellationToken()  # Se pasa a captura, codificación, red y salida
+	
+	@property
+	def isCancelled(self):
+		"""True si la tarea fue cancelada"""
+		return self.token.isCancelled
+	
+	def addCancelCallback(self, callback):
+		"""
+		Registra una función que se llama al cancelar la tarea (p. ej. cancelar un futuro de red)
+		
+		Si la tarea ya está cancelada, la función se llama inmediatamente
+		"""
+		self.token.addCallback(callback)
+	
+	def cancel(self):
+		"""Cancela la tarea: si está en cola no se ejecutará, si está en curso se suprime su resultado"""
+		if self.token.cancel():
+			log.debug(f"Tarea {self.id} cancelada")
+
+
+class JobScheduler:
+	"""Grupo fijo de hilos con cola de prioridades, política "el último gana" y límite de cola"""
+	
+	DEFAULT_WORKERS = 2
+	DEFAULT_MAX_QUEUED = 8
+	# Hilos reservados a las tareas interactivas: la prioridad solo ordena la cola y no
+	# interrumpe lo que está en curso, así que los lotes largos no pueden ocuparlos todos
+	RESERVED_INTERACTIVE_WORKERS = 1
+	
+	def __init__(self, workers=DEFAULT_WORKERS, maxQueued=DEFAULT_MAX_QUEUED):
+		"""
+		Args:
+			workers (int): Número de hilos de trabajo
+			maxQueued (int): Máximo de tareas pendientes en cola
+		"""
+		self.workers = workers
+		self.maxQueued = maxQueued
+		self.backgroundLimit = max(1, workers - self.RESERVED_INTERACTIVE_WORKERS)
+		self._queue = queue.PriorityQueue()
+		self._sequence = itertools.count()
+		self._pending = []
+		self._running = []
+		self._deferred = []  # Tareas no interactivas en espera de un hilo no reservado
+		self._threads = []
+		self._lock = threading.Lock()
+		self._local = threading.local()
+	
+	def start(self):
+		"""Arranca los hilos de trabajo"""
+		if self._threads:
+			return
+		for index in range(self.workers):
+			thread = threading.Thread(
+				target=self._workerLoop,
+				name=f"aiImageDescriber-worker-{index}",
+				daemon=True
+			)
+			thread.start()
+			self._threads.append(thread)
+		log.info(f"Planificador de tareas iniciado con {self.workers} hilos")
+	
+	def stop(self):
+		"""Cancela todas las tareas y detiene los hilos de trabajo"""
+		self.cancelAll()
+		for _thread in self._threads:
+			# Centinela con la prioridad más baja posible
+			self._queue.put((float("inf"), next(self._sequence), None))
+		self._threads = []
+	
+	def submit(self, func, *args, priority=PRIORITY_INTERACTIVE, description="", group=None):
+		"""
+		Encola una tarea
+		
+		Args:
+			func: Función a ejecutar
+			*args: Argumentos de la función
+			priority (int): Prioridad (PRIORITY_*)
+			description (str): Descripción legible de la tarea
+			group (str): Grupo "el último gana", o None
+		
+		Returns:
+			Job: Tarea encolada
+		
+		Raises:
+			QueueFullError: Si la cola está llena
+		"""
+		job = Job(func, args, priority, description, group)
+		with self._lock:
+			if group:
+				# El último gana: cancelar las tareas anteriores del mismo grupo
+				for other in self._pending + self._running:
+					if other.group == group:
+						log.info(f"Tarea {other.id} sustituida por una más reciente del grupo '{group}'")
+						other.cancel()
+				self._pending = [j for j in self._pending if not j.isCancelled]
+			if len(self._pending) >= self.maxQueued:
+				raise QueueFullError(f"Hay {len(self._pending)} tareas en cola")
+			self._pending.append(job)
+		self._queue.put((priority, next(self._sequence), job))
+		return job
+	
+	def currentJob(self):
+		"""Retorna la tarea que se ejecuta en el hilo actual, o None"""
+		return getattr(self._local, "job", None)
+	
+	def getStatus(self):
+		"""
+		Retorna las tareas pendientes y en curso
+		
+		Returns:
+			tuple: (lista de tareas pendientes, lista de tareas en curso)
+		"""
+		with self._lock:
+			return list(self._pending), list(self._running)
+	
+	def cancelAll(self):
+		"""
+		Cancela todas las tareas pendientes y en curso
+		
+		Returns:
+			int: Número de tareas canceladas
+		"""
+		with self._lock:
+			jobs = self._pending + self._running
+			self._pending = []
+		for job in jobs:
+			job.cancel()
+		return len(jobs)
+	
+	def _backgroundRunning(self):
+		"""Número de tareas no interactivas en curso (con el bloqueo tomado)"""
+		return sum(1 for job in self._running if job.priority != PRIORITY_INTERACTIVE)
+	
+	def _workerLoop(self):
+		"""Bucle de un hilo de trabajo"""
+		while True:
+			item = self._queue.get()
+			job = item[2]
+			if job is None:
+				return
+			with self._lock:
+				if job.isCancelled:
+					if job in self._pending:
+						self._pending.remove(job)
+					job.state = "cancelled"
+					continue
+				if job.priority != PRIORITY_INTERACTIVE and self._backgroundRunning() >= self.backgroundLimit:
+					# Sigue pendiente hasta que termine otra tarea no interactiva
+					self._deferred.append(item)
+					continue
+				if job in self._pending:
+					self._pending.remove(job)
+				job.state = "running"
+				self._running.append(job)
+			self._local.job = job
+			try:
+				job.func(*job.args)
+			except CANCELLED_ERRORS:
+				log.debug(f"Tarea {job.id} cancelada durante su ejecución")
+			except BaseException as e:
+				# Cualquier excepción, no solo Exception: el hilo debe seguir atendiendo la cola
+				log.error(f"Error en la tarea {job.id} ({job.description}): {e}", exc_info=True)
+			finally:
+				self._local.job = None
+				deferred = []
+				with self._lock:
+					self._running.remove(job)
+					if job.priority != PRIORITY_INTERACTIVE:
+						deferred, self._deferred = self._deferred, []
+				for waiting in deferred:
+					self._queue.put(waiting)
+				job.state = "cancelled" if job.isCancelled else "done"
@@ -0,0 +1,202 @@
+# -*- coding: UTF-8 -*-
+"""
+Registro de latencias de las peticiones a los proveedores de IA
+Mantiene ventanas deslizantes de muestras recientes para calcular percentiles
+y derivar de ellas los timeouts de conexión y lectura
+"""
+
+import threading
+from collections import deque
+
+
+class RollingSamples:
+	"""Ventana deslizante de muestras numéricas con cálculo de percentiles"""
+	
+	def __init__(self, maxSamples=50):
+		"""
+		Args:
+			maxSamples (int): Número máximo de muestras que se conservan
+		"""
+		self._samples = deque(maxlen=maxSamples)
+		self._lock = threading.Lock()
+	
+	def add(self, value):
+		"""Añade una muestra a la ventana"""
+		with self._lock:
+			self._samples.append(float(value))
+	
+	def count(self):
+		"""Retorna el número de muestras almacenadas"""
+		with self._lock:
+			return len(self._samples)
+	
+	def quantile(self, q, default=None, minSamples=1):
+		"""
+		Calcula un percentil de las muestras recientes
+		
+		Args:
+			q (float): Percentil entre 0 y 1 (por ejemplo 0.9)
+			default: Valor a retornar si no hay suficientes muestras
+			minSamples (int): Muestras mínimas para considerar el cálculo fiable
+		
+		Returns:
+			float: Valor del percentil, o default si no hay datos suficientes
+		"""
+		with self._lock:
+			values = sorted(self._samples)
+		if len(values) < max(1, minSamples):
+			return default
+		q = min(max(q, 0.0), 1.0)
+		# Interpolación lineal entre las dos muestras más cercanas
+		position = q * (len(values) - 1)
+		lower = int(position)
+		upper = min(lower + 1, len(values) - 1)
+		fraction = position - lower
+		return values[lower] + (values[upper] - values[lower]) * fraction
+
+
+class LatencyTracker:
+	"""Almacena latencias por clave (proveedor, modelo, etc.) de forma segura entre hilos"""
+	
+	MIN_SAMPLES = 5  # Muestras necesarias antes de adaptar los timeouts
+	
+	# Timeout de conexión: se deriva del tiempo en abrir las conexiones nuevas
+	CONNECT_DEFAULT = 5.0
+	CONNECT_FLOOR = 2.0
+	CONNECT_CEILING = 10.0
+	CONNECT_FACTOR = 3.0
+	
+	# Timeout de lectura de descripciones según nivel de detalle
+	READ_DEFAULTS = {"low": 20.0, "auto": 30.0, "high": 60.0}
+	READ_FLOORS = {"low": 8.0, "auto": 12.0, "high": 20.0}
+	READ_CEILING = 120.0
+	READ_FACTOR = 2.0
+	
+	# Timeout de lectura de peticiones ligeras
+	LIST_READ_DEFAULT = 10.0
+	LIST_READ_FLOOR = 5.0
+	LIST_READ_CEILING = 30.0
+	
+	def __init__(self, maxSamples=50):
+		"""
+		Args:
+			maxSamples (int): Muestras conservadas por cada clave
+		"""
+		self._maxSamples = maxSamples
+		self._windows = {}
+		self._lock = threading.Lock()
+	
+	def _window(self, key):
+		"""Retorna (creándola si hace falta) la ventana asociada a una clave"""
+		with self._lock:
+			window = self._windows.get(key)
+			if window is None:
+				window = RollingSamples(self._maxSamples)
+				self._windows[key] = window
+			return window
+	
+	def record(self, key, seconds):
+		"""
+		Registra la duración de una petición
+		
+		Args:
+			key: Clave hashable que identifica el tipo de petición
+			seconds (float): Duración en segundos
+		"""
+		self._window(key).add(seconds)
+	
+	def recordConnect(self, provider, response):
+		"""
+		Registra cuánto tardó en abrirse la conexión de una respuesta
+		
+		Las respuestas que reutilizan una conexión abierta no aportan muestra
+		
+		Args:
+			provider (str): Nombre del proveedor
+			response (HttpResponse): Respuesta de cualquier petición al proveedor
+		"""
+		if response.connectElapsed is not None:
+			self.record((provider, "connect"), response.connectElapsed)
+	
+	def count(self, key):
+		"""Retorna el número de muestras registradas para una clave"""
+		return self._window(key).count()
+	
+	def quantile(self, key, q, default=None, minSamples=1):
+		"""
+		Calcula un percentil de latencia para una clave
+		
+		Args:
+			key: Clave de la petición
+			q (float): Percentil entre 0 y 1
+			default: Valor si no hay suficientes muestras
+			minSamples (int): Muestras mínimas requeridas
+		
+		Returns:
+			float: Latencia en segundos, o default
+		"""
+		return self._window(key).quantile(q, default=default, minSamples=minSamples)
+	
+	def getConnectTimeout(self, provider):
+		"""
+		Calcula el timeout de conexión de un proveedor
+		
+		Se basa en lo que tardaron en abrirse (DNS, TCP y TLS) las conexiones nuevas
+		de las peticiones al proveedor, incluidas las de descripción.
+		
+		Args:
+			provider (str): Nombre del proveedor
+		
+		Returns:
+			float: Timeout de conexión en segundos
+		"""
+		p90 = self.quantile((provider, "connect"), 0.9, minSamples=self.MIN_SAMPLES)
+		if p90 is None:
+			return self.CONNECT_DEFAULT
+		return _clamp(p90 * self.CONNECT_FACTOR, self.CONNECT_FLOOR, self.CONNECT_CEILING)
+	
+	def getTimeouts(self, provider, model, detail):
+		"""
+		Calcula los timeouts (conexión, lectura) para describir una imagen
+		
+		Args:
+			provider (str): Nombre del proveedor
+			model (str): Modelo utilizado
+			detail (str): Nivel de detalle ("low", "auto" o "high")
+		
+		Returns:
+			tuple: (timeout de conexión, timeout de lectura) en segundos
+		"""
+		detail = detail if detail in self.READ_DEFAULTS else "auto"
+		p95 = self.quantile((provider, model, detail), 0.95, minSamples=self.MIN_SAMPLES)
+		if p95 is None:
+			read = self.READ_DEFAULTS[detail]
+		else:
+			read = _clamp(p95 * self.READ_FACTOR, self.READ_FLOORS[detail], self.READ_CEILING)
+		return (self.getConnectTimeout(provider), read)
+	
+	def getListTimeouts(self, provider):
+		"""
+		Calcula los timeouts (conexión, lectura) para peticiones ligeras como listar modelos
+		
+		Args:
+			provider (str): Nombre del proveedor
+		
+		Returns:
+			tuple: (timeout de conexión, timeout de lectura) en segundos
+		"""
+		p95 = self.quantile((provider, "list"), 0.95, minSamples=self.MIN_SAMPLES)
+		if p95 is None:
+			read = self.LIST_READ_DEFAULT
+		else:
+			read = _clamp(p95 * self.READ_FACTOR, self.LIST_READ_FLOOR, self.LIST_READ_CEILING)
+		return (self.getConnectTimeout(provider), read)
+
+
+def _clamp(value, floor, ceiling):
+	"""Limita un valor al rango [floor, ceiling]"""
+	return min(max(value, floor), ceiling)
+
+
+# Instancia compartida por todos los clientes del complemento
+latencyTracker = LatencyTracker()
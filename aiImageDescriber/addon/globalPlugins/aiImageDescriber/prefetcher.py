@@ -0,0 +1,265 @@
+# -*- coding: UTF-8 -*-
+"""
+Descarga anticipada de imágenes en modo exploración
+Descarga, codifica y, dentro de un presupuesto de peticiones por hora, describe las
+próximas imágenes por delante del cursor, para que la orden de describir responda
+desde la caché sin esperar
+"""
+
+import concurrent.futures
+import threading
+import time
+from collections import OrderedDict, deque
+from logHandler import log
+
+from .asyncCore import asyncCore
+from .cancellation import CancellationToken, CANCELLED_ERRORS, raiseIfCancelled
+from .complexity import resolveDetailAsync
+
+POLL_INTERVAL = 1000  # Milisegundos entre comprobaciones de la posición del cursor
+MAX_ENTRIES = 32  # Imágenes guardadas como máximo
+MAX_CACHED_BYTES = 32 * 1024 * 1024  # Tamaño máximo de las imágenes codificadas guardadas
+BUDGET_WINDOW = 3600  # Segundos de la ventana del presupuesto de descripciones
+WAIT_STEP = 0.2  # Segundos entre comprobaciones de cancelación al esperar una descarga en curso
+
+
+def imageSource(obj):
+	"""
+	Dirección de la imagen de un objeto NVDA
+	
+	Returns:
+		str: Atributo src, o None si el objeto no lo tiene
+	"""
+	attributes = getattr(obj, "IA2Attributes", None)
+	if not attributes:
+		return None
+	return attributes.get("src") or None
+
+
+def upcomingImageSources(treeInterceptor, count):
+	"""
+	Direcciones de las próximas imágenes por delante del cursor de exploración
+	
+	Debe llamarse desde el hilo principal de NVDA
+	
+	Args:
+		treeInterceptor: Documento en modo exploración
+		count (int): Imágenes como máximo
+	
+	Returns:
+		list: Direcciones sin repetir, en el orden del documento
+	"""
+	sources = []
+	for item in treeInterceptor._iterNodesByType("graphic", "next", treeInterceptor.selection):
+		src = imageSource(item.obj)
+		if src and src not in sources:
+			sources.append(src)
+			if len(sources) >= count:
+				break
+	return sources
+
+
+def clientKey(client):
+	"""
+	Proveedor y modelo que identifican las descripciones de un cliente
+	
+	Args:
+		client: Cliente de API (con respaldo o no)
+	
+	Returns:
+		tuple: Proveedor y modelo; en el cliente con respaldo, los de ambos proveedores
+	"""
+	if hasattr(client, "primary"):
+		return (client.PROVIDER, clientKey(client.primary), clientKey(client.secondary))
+	return (client.PROVIDER, getattr(client, "model", ""))
+
+
+class PrefetchEntry:
+	"""Imagen anticipada: su codificación y las descripciones ya obtenidas"""
+	
+	def __init__(self):
+		self.imageData = None
+		self.descriptions = {}  # (proveedor y modelo, detalle, idioma) -> descripción
+	
+	@property
+	def size(self):
+		"""Bytes que ocupa la imagen codificada"""
+		return len(self.imageData) if self.imageData else 0
+
+
+class Prefetcher:
+	"""Caché LRU de imágenes anticipadas con presupuesto de descripciones por hora"""
+	
+	def __init__(self, imageProcessor, budgetPerHour):
+		"""
+		Args:
+			imageProcessor (ImageProcessor): Descarga y codifica las imágenes
+			budgetPerHour (int): Descripciones anticipadas como máximo por hora (0 = solo descargar)
+		"""
+		self.imageProcessor = imageProcessor
+		self.budgetPerHour = budgetPerHour
+		self._entries = OrderedDict()  # src -> PrefetchEntry
+		self._inFlight = {}  # src -> (futuro, token)
+		self._spent = deque()  # Momentos de las descripciones anticipadas de la última hora (reservadas o ya hechas)
+		self._lock = threading.Lock()
+	
+	def schedule(self, sources, client, detail, language):
+		"""
+		Anticipa las imágenes que aún no están en la caché ni en curso
+		
+		Args:
+			sources (list): Direcciones de las imágenes
+			client: Cliente de API para describirlas, o None para solo descargarlas
+			detail (str): Nivel de detalle
+			language (str): Idioma de las descripciones
+		"""
+		for src in sources:
+			with self._lock:
+				if src in self._inFlight:
+					continue
+				entry = self._entries.get(src)
+				hasImage = entry is not None and entry.imageData is not None
+				if entry is not None and client is not None and (clientKey(client), detail, language) in entry.descriptions:
+					continue
+				charge = self._takeBudget() if client is not None else None
+				if hasImage and charge is None:
+					continue
+				token = CancellationToken()
+				future = asyncCore.submit(self._prefetchAsync(
+					src,
+					client if charge is not None else None,
+					detail,
+					language,
+					token,
+					charge
+				))
+				self._inFlight[src] = (future, token)
+			future.add_done_callback(lambda f, src=src: self._finished(src))
+	
+	def _takeBudget(self):
+		"""
+		Reserva una descripción del presupuesto (debe llamarse con el bloqueo tomado)
+		
+		Returns:
+			float: Momento de la reserva, o None si el presupuesto está agotado
+		"""
+		now = time.monotonic()
+		while self._spent and now - self._spent[0] > BUDGET_WINDOW:
+			self._spent.popleft()
+		if len(self._spent) >= self.budgetPerHour:
+			return None
+		self._spent.append(now)
+		return now
+	
+	def _refundBudget(self, charge):
+		"""Devuelve al presupuesto una reserva cuya descripción no llegó a hacerse"""
+		with self._lock:
+			try:
+				self._spent.remove(charge)
+			except ValueError:
+				# La reserva ya salió de la ventana del presupuesto
+				pass
+	
+	def _finished(self, src):
+		"""Olvida una anticipación terminada"""
+		with self._lock:
+			self._inFlight.pop(src, None)
+	
+	async def _prefetchAsync(self, src, client, detail, language, cancelToken, charge=None):
+		"""
+		Descarga y codifica una imagen y, si hay cliente, la describe
+		
+		La reserva del presupuesto (charge) solo se consume si la descripción se obtiene
+		"""
+		described = False
+		try:
+			with self._lock:
+				entry = self._entries.get(src)
+				imageData = entry.imageData if entry else None
+			if imageData is None:
+				imageData = await self.imageProcessor.loadFromURLAsync(src, cancelToken=cancelToken)
+				if not imageData:
+					return
+				self._store(src, imageData=imageData)
+			if client is None:
+				return
+			
+			# La imagen reducida por el detalle adaptativo no se guarda: la caché conserva la original
+			resolvedDetail, resolvedData = await resolveDetailAsync(imageData, detail, cancelToken)
+			description = await client.describeImageAsync(
+				resolvedData,
+				detail=resolvedDetail,
+				language=language,
+				maxTokens=4000,
+				cancelToken=cancelToken
+			)
+			# La clave se calcula tras describir: el servidor compatible elige su modelo en la primera petición
+			self._store(src, description=((clientKey(client), detail, language), description))
+			described = True
+			log.info(f"Imagen anticipada y descrita: {src[:80]}")
+		except CANCELLED_ERRORS:
+			raise
+		except Exception as e:
+			log.warning(f"No se pudo anticipar la imagen {src[:80]}: {e}")
+		finally:
+			if charge is not None and not described:
+				self._refundBudget(charge)
+	
+	def _store(self, src, imageData=None, description=None):
+		"""Guarda la imagen o una descripción y descarta las menos usadas si se excede el límite"""
+		with self._lock:
+			entry = self._entries.get(src)
+			if entry is None:
+				entry = self._entries[src] = PrefetchEntry()
+			self._entries.move_to_end(src)
+			if imageData is not None:
+				entry.imageData = imageData
+			if description is not None:
+				key, text = description
+				entry.descriptions[key] = text
+			
+			total = sum(e.size for e in self._entries.values())
+			while len(self._entries) > 1 and (len(self._entries) > MAX_ENTRIES or total > MAX_CACHED_BYTES):
+				_, evicted = self._entries.popitem(last=False)
+				total -= evicted.size
+	
+	def lookup(self, src, client, detail, language, cancelToken=None):
+		"""
+		Busca una imagen en la caché; si se está anticipando, espera a que termine
+		
+		Args:
+			src (str): Dirección de la imagen
+			client: Cliente de API actual (solo sirven las descripciones de su proveedor y modelo)
+			detail (str): Nivel de detalle
+			language (str): Idioma de la descripción
+			cancelToken (CancellationToken): Token de la descripción que espera, o None
+		
+		Returns:
+			tuple: (descripción o None, imagen codificada o None)
+		"""
+		with self._lock:
+			inFlight = self._inFlight.get(src)
+		if inFlight is not None:
+			# Esperar sin cancelar la anticipación: su resultado sigue siendo útil para la caché
+			future = inFlight[0]
+			while not future.done():
+				raiseIfCancelled(cancelToken)
+				concurrent.futures.wait([future], timeout=WAIT_STEP)
+		
+		with self._lock:
+			entry = self._entries.get(src)
+			if entry is None:
+				return None, None
+			self._entries.move_to_end(src)
+			description = entry.descriptions.get((clientKey(client), detail, language)) if client else None
+			return description, entry.imageData
+	
+	def cancelAll(self):
+		"""Cancela las anticipaciones en curso"""
+		with self._lock:
+			inFlight = list(self._inFlight.values())
+		for future, token in inFlight:
+			token.cancel()
+			future.cancel()
+		if inFlight:
+			log.info(f"Canceladas {len(inFlight)} anticipaciones de imágenes")
@@ -0,0 +1,297 @@
+# -*- coding: UTF-8 -*-
+"""
+Descripción de la pantalla por regiones
+Usa el árbol de objetos de NVDA (ventanas de primer nivel, paneles y sus rectángulos)
+para dividir la pantalla en regiones con sentido, que se codifican cada una a su mejor
+resolución y se describen a la vez
+"""
+
+import asyncio
+import api
+import controlTypes
+from logHandler import log
+
+from .cancellation import raiseIfCancelled
+from .tiling import encodeImage
+
+MAX_REGIONS = 8
+MIN_REGION_SIZE = 24  # Píxeles de ancho y alto (la barra de tareas es estrecha)
+MIN_REGION_AREA = 40000  # Píxeles cuadrados; lo menor son botones o iconos sueltos
+MAX_SPLIT_DEPTH = 6  # Niveles que se desciende por contenedores que ocupan casi todo su padre
+CONTAINER_SHARE = 0.7  # Un hijo único que ocupa esta parte de su padre se considera su contenedor
+MAX_TOP_LEVEL_WINDOWS = 40  # Ventanas de primer nivel revisadas como máximo
+MAX_HIDDEN_SHARE = 0.2  # Parte de una ventana que puede tapar la ventana activa
+REGION_MAX_TOKENS = 600
+MAX_CONCURRENT_REGIONS = 6
+
+# Regiones de la pantalla (ventanas y paneles según el árbol de objetos)
+REGION_PROMPTS = {
+	"es": (
+		"Esta imagen es una región de la pantalla: {name}, situada {position}. Describe su contenido para una "
+		"persona con discapacidad visual y transcribe literalmente el texto visible, incluido el texto pequeño. "
+		"Sé conciso y no describas el fondo de escritorio."
+	),
+	"en": (
+		"This image is a region of the screen: {name}, located {position}. Describe its content for a "
+		"visually impaired person and transcribe the visible text verbatim, including small text. "
+		"Be concise and do not describe the desktop wallpaper."
+	),
+	"fr": (
+		"Cette image est une région de l'écran: {name}, située {position}. Décris son contenu pour une "
+		"personne malvoyante et transcris mot pour mot le texte visible, y compris le petit texte. "
+		"Sois concis et ne décris pas le fond d'écran."
+	)
+}
+
+SCREEN_POSITIONS = {
+	"es": {
+		"vertical": ("arriba", "en el centro", "abajo"),
+		"horizontal": ("a la izquierda", "en el centro", "a la derecha"),
+		"full": "ocupando toda la pantalla"
+	},
+	"en": {
+		"vertical": ("at the top", "in the middle", "at the bottom"),
+		"horizontal": ("on the left", "in the middle", "on the right"),
+		"full": "covering the whole screen"
+	},
+	"fr": {
+		"vertical": ("en haut", "au milieu", "en bas"),
+		"horizontal": ("à gauche", "au milieu", "à droite"),
+		"full": "occupant tout l'écran"
+	}
+}
+
+
+def screenPosition(box, screen, language):
+	"""
+	Posición aproximada de una región en la pantalla, en palabras
+	
+	Args:
+		box (tuple): (izquierda, arriba, derecha, abajo) de la región
+		screen (tuple): (izquierda, arriba, derecha, abajo) de la pantalla
+		language (str): Idioma
+	
+	Returns:
+		str: Por ejemplo «arriba a la izquierda»
+	"""
+	names = SCREEN_POSITIONS.get(language, SCREEN_POSITIONS["es"])
+	screenWidth = max(1, screen[2] - screen[0])
+	screenHeight = max(1, screen[3] - screen[1])
+	if (box[2] - box[0]) * (box[3] - box[1]) >= 0.8 * screenWidth * screenHeight:
+		return names["full"]
+	centerX = ((box[0] + box[2]) / 2 - screen[0]) / screenWidth
+	centerY = ((box[1] + box[3]) / 2 - screen[1]) / screenHeight
+	vertical = names["vertical"][min(2, int(centerY * 3))]
+	horizontal = names["horizontal"][min(2, int(centerX * 3))]
+	if vertical == horizontal:
+		return vertical
+	return f"{vertical} {horizontal}"
+
+
+def buildRegionPrompt(name, position, language):
+	"""Prompt de una región de la pantalla"""
+	return REGION_PROMPTS.get(language, REGION_PROMPTS["es"]).format(name=name, position=position)
+
+
+class ScreenRegion:
+	"""Rectángulo de la pantalla con el nombre del objeto que lo ocupa"""
+	
+	def __init__(self, name, box):
+		"""
+		Args:
+			name (str): Nombre y tipo del objeto, para el prompt y el resumen
+			box (tuple): (izquierda, arriba, derecha, abajo) en pantalla
+		"""
+		self.name = name
+		self.box = box
+		self.description = None
+	
+	@property
+	def area(self):
+		return (self.box[2] - self.box[0]) * (self.box[3] - self.box[1])
+
+
+def _visibleBox(obj, screen):
+	"""
+	Rectángulo visible de un objeto recortado a la pantalla
+	
+	Returns:
+		tuple: (izquierda, arriba, derecha, abajo), o None si no se ve o es demasiado pequeño
+	"""
+	states = obj.states
+	if controlTypes.State.INVISIBLE in states or controlTypes.State.OFFSCREEN in states:
+		return None
+	location = obj.location
+	if not location:
+		return None
+	box = (
+		max(location.left, screen[0]),
+		max(location.top, screen[1]),
+		min(location.left + location.width, screen[2]),
+		min(location.top + location.height, screen[3])
+	)
+	if box[2] - box[0] < MIN_REGION_SIZE or box[3] - box[1] < MIN_REGION_SIZE or _boxArea(box) < MIN_REGION_AREA:
+		return None
+	return box
+
+
+def _boxArea(box):
+	return (box[2] - box[0]) * (box[3] - box[1])
+
+
+def _intersectionArea(a, b):
+	width = min(a[2], b[2]) - max(a[0], b[0])
+	height = min(a[3], b[3]) - max(a[1], b[1])
+	return width * height if width > 0 and height > 0 else 0
+
+
+def _regionName(obj):
+	"""Nombre del objeto seguido de su tipo"""
+	roleName = obj.role.displayString
+	name = (obj.name or "").strip()
+	return f"{name} ({roleName})" if name else roleName
+
+
+def _splitObject(obj, box, screen, depth=0):
+	"""
+	Divide un objeto en sus hijos visibles, bajando por el contenedor que lo ocupa casi entero
+	cuando es el único hijo con tamaño suficiente
+	
+	Returns:
+		list: ScreenRegion del objeto o de sus hijos
+	"""
+	children = []
+	for child in obj.children:
+		childBox = _visibleBox(child, screen)
+		if childBox:
+			children.append((child, childBox))
+	if not children:
+		return [ScreenRegion(_regionName(obj), box)]
+	
+	if len(children) == 1:
+		child, childBox = children[0]
+		if _boxArea(childBox) >= CONTAINER_SHARE * _boxArea(box) and depth < MAX_SPLIT_DEPTH:
+			return _splitObject(child, childBox, screen, depth + 1)
+		return [ScreenRegion(_regionName(obj), box)]
+	return [ScreenRegion(_regionName(child), childBox) for child, childBox in children]
+
+
+def collectScreenRegions(maxRegions=MAX_REGIONS):
+	"""
+	Divide la pantalla en regiones según el árbol de objetos
+	
+	La ventana activa se divide en sus paneles; las demás ventanas visibles que no
+	quedan tapadas por ella (barra de tareas, ventanas a su lado) son una región cada una.
+	Debe llamarse desde el hilo principal de NVDA
+	
+	Args:
+		maxRegions (int): Regiones como máximo (se conservan las mayores)
+	
+	Returns:
+		tuple: (rectángulo de la pantalla, lista de ScreenRegion en orden de lectura)
+	"""
+	desktop = api.getDesktopObject().location
+	screen = (desktop.left, desktop.top, desktop.left + desktop.width, desktop.top + desktop.height)
+	
+	regions = []
+	foreground = api.getForegroundObject()
+	foregroundBox = _visibleBox(foreground, screen) if foreground else None
+	if foregroundBox:
+		regions.extend(_splitObject(foreground, foregroundBox, screen))
+	
+	for index, window in enumerate(api.getDesktopObject().children):
+		if index >= MAX_TOP_LEVEL_WINDOWS:
+			break
+		if foreground is not None and window == foreground:
+			continue
+		box = _visibleBox(window, screen)
+		if not box:
+			continue
+		# Las ventanas tapadas por la activa o por otra ya elegida no aportan nada
+		if any(_intersectionArea(box, region.box) > MAX_HIDDEN_SHARE * _boxArea(box) for region in regions):
+			continue
+		regions.append(ScreenRegion(_regionName(window), box))
+	
+	# Sin regiones contenidas en otras, las mayores primero y después en orden de lectura
+	regions = [
+		region for region in regions
+		if not any(other is not region and _intersectionArea(region.box, other.box) == region.area and other.area > region.area for other in regions)
+	]
+	regions.sort(key=lambda region: region.area, reverse=True)
+	regions = regions[:maxRegions]
+	regions.sort(key=lambda region: (region.box[1], region.box[0]))
+	return screen, regions
+
+
+class ScreenRegionDescriber:
+	"""Captura la pantalla una vez y describe sus regiones en paralelo"""
+	
+	def __init__(self, client, imageCapture, detail="auto", language="es"):
+		"""
+		Args:
+			client: Cliente de API con describeWithPromptAsync
+			imageCapture (ImageCapture): Captura la pantalla
+			detail (str): Nivel de detalle
+			language (str): Idioma de las descripciones
+		"""
+		self.client = client
+		self.imageCapture = imageCapture
+		self.detail = detail
+		self.language = language
+	
+	async def describeAsync(self, screen, regions, cancelToken=None):
+		"""
+		Describe las regiones y las une en un resumen ordenado
+		
+		Args:
+			screen (tuple): Rectángulo de la pantalla
+			regions (list): ScreenRegion en orden de lectura
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			str: Descripción de la pantalla por regiones
+		"""
+		loop = asyncio.get_running_loop()
+		screenshot = await loop.run_in_executor(None, self.imageCapture.grabRegion, *screen, cancelToken)
+		try:
+			semaphore = asyncio.Semaphore(MAX_CONCURRENT_REGIONS)
+			
+			async def describeRegion(region):
+				async with semaphore:
+					raiseIfCancelled(cancelToken)
+					box = tuple(value - offset for value, offset in zip(region.box, screen[:2] * 2))
+					imageData = await loop.run_in_executor(None, self._encodeRegion, screenshot, box)
+					try:
+						region.description = await self.client.describeWithPromptAsync(
+							[imageData],
+							buildRegionPrompt(region.name, screenPosition(region.box, screen, self.language), self.language),
+							detail=self.detail,
+							maxTokens=REGION_MAX_TOKENS,
+							cancelToken=cancelToken
+						)
+					except asyncio.CancelledError:
+						raise
+					except Exception as e:
+						log.warning(f"Error al describir la región {region.name}: {e}")
+			
+			log.info(f"Describiendo la pantalla en {len(regions)} regiones")
+			await asyncio.gather(*(describeRegion(region) for region in regions))
+		finally:
+			screenshot.close()
+		raiseIfCancelled(cancelToken)
+		
+		described = [region for region in regions if region.description]
+		if not described:
+			raise Exception("No se pudo describir ninguna región de la pantalla")
+		return "\n\n".join(
+			f"## {number}. {region.name}, {screenPosition(region.box, screen, self.language)}\n\n{region.description}"
+			for number, region in enumerate(described, 1)
+		)
+	
+	def _encodeRegion(self, screenshot, box):
+		"""Recorta y codifica una región a su resolución (solo se reduce si supera el máximo)"""
+		crop = screenshot.crop(box)
+		try:
+			return encodeImage(crop)
+		finally:
+			crop.close()
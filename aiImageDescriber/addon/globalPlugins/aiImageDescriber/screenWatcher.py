@@ -0,0 +1,370 @@
+# -*- coding: UTF-8 -*-
+"""
+Vigilancia de la pantalla
+Captura la pantalla a intervalos, la compara por bloques con la última descrita y
+entrega solo las zonas que han cambiado; si no hay cambios relevantes no se hace
+ninguna petición
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from logHandler import log
+
+from .cancellation import raiseIfCancelled
+from .tiling import encodeImage
+from .screenRegions import screenPosition
+
+try:
+	from PIL import ImageChops
+	PIL_AVAILABLE = True
+except ImportError:
+	PIL_AVAILABLE = False
+
+DIFF_SCALE = 2  # Las capturas se comparan a la mitad de resolución
+BLOCK_SIZE = 16  # Lado del bloque en píxeles de la captura reducida (32 en pantalla)
+BLOCK_GAP = 1  # Bloques cambiados a esta distancia o menos forman la misma zona
+BLOCK_PADDING = 1  # Bloques de margen alrededor de cada zona
+FULL_CHANGE_SHARE = 0.6  # Con esta parte de la pantalla cambiada se describe entera
+MAX_COMPONENTS = 40  # Con más zonas sueltas (vídeo, animaciones) se unen en una sola
+BUDGET_WINDOW = 3600  # Segundos de la ventana del presupuesto de peticiones
+CHANGE_MAX_TOKENS = 300
+MAX_CONCURRENT_CHANGES = 4
+
+# Sensibilidad: (diferencia media mínima de un bloque de 0 a 255, parte mínima de bloques cambiados)
+SENSITIVITY = {
+	"low": (24, 0.02),
+	"medium": (12, 0.005),
+	"high": (6, 0.0004)
+}
+
+# Regiones que han cambiado desde la última descripción (vigilancia de pantalla)
+CHANGE_PROMPTS = {
+	"es": (
+		"Esta imagen es una zona de la pantalla, situada {position}, que acaba de cambiar. Di en una o dos frases "
+		"qué muestra ahora y transcribe literalmente el texto nuevo o importante. No describas el fondo ni la "
+		"decoración."
+	),
+	"en": (
+		"This image is an area of the screen, located {position}, that has just changed. Say in one or two "
+		"sentences what it shows now and transcribe any new or important text verbatim. Do not describe the "
+		"background or decoration."
+	),
+	"fr": (
+		"Cette image est une zone de l'écran, située {position}, qui vient de changer. Dis en une ou deux phrases "
+		"ce qu'elle montre maintenant et transcris mot pour mot le texte nouveau ou important. Ne décris pas le "
+		"fond ni la décoration."
+	)
+}
+
+
+def buildChangePrompt(position, language):
+	"""Prompt de una zona de la pantalla que ha cambiado"""
+	return CHANGE_PROMPTS.get(language, CHANGE_PROMPTS["es"]).format(position=position)
+
+
+def diffFrame(screenshot):
+	"""Versión en escala de grises y reducida de una captura, para compararla"""
+	return screenshot.convert("L").reduce(DIFF_SCALE)
+
+
+def changedBlocks(previous, current, threshold):
+	"""
+	Bloques cuya diferencia media supera el umbral
+	
+	Args:
+		previous: Fotograma anterior (diffFrame)
+		current: Fotograma actual (diffFrame)
+		threshold (int): Diferencia media mínima de 0 a 255
+	
+	Returns:
+		tuple: (columnas, filas, conjunto de (columna, fila) cambiados)
+	"""
+	if previous.size != current.size:
+		# Cambio de resolución: todo ha cambiado
+		grid = current.reduce(BLOCK_SIZE)
+		columns, rows = grid.size
+		return columns, rows, {(column, row) for row in range(rows) for column in range(columns)}
+	grid = ImageChops.difference(previous, current).reduce(BLOCK_SIZE)
+	columns, rows = grid.size
+	return columns, rows, {
+		(index % columns, index // columns)
+		for index, value in enumerate(grid.getdata())
+		if value > threshold
+	}
+
+
+def groupBlocks(blocks, gap=BLOCK_GAP):
+	"""
+	Agrupa bloques cercanos en zonas
+	
+	Returns:
+		list: Rectángulos (columna inicial, fila inicial, columna final, fila final), finales incluidas
+	"""
+	remaining = set(blocks)
+	groups = []
+	while remaining:
+		start = remaining.pop()
+		stack = [start]
+		left = right = start[0]
+		top = bottom = start[1]
+		while stack:
+			column, row = stack.pop()
+			left, right = min(left, column), max(right, column)
+			top, bottom = min(top, row), max(bottom, row)
+			for dx in range(-gap - 1, gap + 2):
+				for dy in range(-gap - 1, gap + 2):
+					neighbour = (column + dx, row + dy)
+					if neighbour in remaining:
+						remaining.remove(neighbour)
+						stack.append(neighbour)
+		groups.append((left, top, right, bottom))
+	return groups
+
+
+def _union(a, b):
+	return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _area(box):
+	return (box[2] - box[0] + 1) * (box[3] - box[1] + 1)
+
+
+def mergeGroups(groups, maxCount):
+	"""
+	Une zonas hasta dejar maxCount como máximo, empezando por las que menos crecen al unirse
+	
+	Returns:
+		list: Rectángulos de bloques
+	"""
+	if len(groups) > MAX_COMPONENTS:
+		merged = groups[0]
+		for group in groups[1:]:
+			merged = _union(merged, group)
+		return [merged]
+	groups = list(groups)
+	while len(groups) > maxCount:
+		_, i, j = min(
+			(_area(_union(groups[i], groups[j])) - _area(groups[i]) - _area(groups[j]), i, j)
+			for i in range(len(groups))
+			for j in range(i + 1, len(groups))
+		)
+		merged = _union(groups[i], groups[j])
+		groups = [group for k, group in enumerate(groups) if k not in (i, j)] + [merged]
+	return groups
+
+
+def changedRegions(previous, current, sensitivity="medium", maxRegions=3):
+	"""
+	Zonas de la pantalla que han cambiado de forma apreciable
+	
+	Args:
+		previous: Fotograma anterior (diffFrame)
+		current: Fotograma actual (diffFrame)
+		sensitivity (str): "low", "medium" o "high"
+		maxRegions (int): Zonas como máximo
+	
+	Returns:
+		list: Rectángulos (izquierda, arriba, derecha, abajo) en píxeles de la captura, vacía si nada cambió
+	"""
+	threshold, minShare = SENSITIVITY.get(sensitivity, SENSITIVITY["medium"])
+	columns, rows, blocks = changedBlocks(previous, current, threshold)
+	total = columns * rows
+	if not blocks or len(blocks) < minShare * total:
+		return []
+	
+	scale = BLOCK_SIZE * DIFF_SCALE
+	width, height = current.width * DIFF_SCALE, current.height * DIFF_SCALE
+	if len(blocks) >= FULL_CHANGE_SHARE * total:
+		return [(0, 0, width, height)]
+	return [
+		(
+			max(0, (left - BLOCK_PADDING) * scale),
+			max(0, (top - BLOCK_PADDING) * scale),
+			min(width, (right + 1 + BLOCK_PADDING) * scale),
+			min(height, (bottom + 1 + BLOCK_PADDING) * scale)
+		)
+		for left, top, right, bottom in mergeGroups(groupBlocks(blocks), maxRegions)
+	]
+
+
+class ScreenWatcher:
+	"""Compara capturas periódicas en un hilo de fondo y notifica las zonas cambiadas"""
+	
+	DEFAULT_INTERVAL = 5.0  # Segundos entre capturas
+	
+	def __init__(
+		self, imageCapture, screen, onChange, interval=DEFAULT_INTERVAL,
+		sensitivity="medium", maxRegions=3, budgetPerHour=60, isBusy=None
+	):
+		"""
+		Args:
+			imageCapture (ImageCapture): Captura la pantalla
+			screen (tuple): (izquierda, arriba, derecha, abajo) de la pantalla
+			onChange: Función (pantalla, [(rectángulo, imagen codificada)]) -> bool;
+				si retorna False los cambios se vuelven a comprobar en la siguiente captura
+			interval (float): Segundos entre capturas
+			sensitivity (str): "low", "medium" o "high"
+			maxRegions (int): Zonas como máximo por cambio
+			budgetPerHour (int): Peticiones como máximo por hora (una por zona)
+			isBusy: Función sin argumentos; mientras retorne True no se captura, o None
+		"""
+		self.imageCapture = imageCapture
+		self.screen = screen
+		self.onChange = onChange
+		self.interval = interval
+		self.sensitivity = sensitivity
+		self.maxRegions = maxRegions
+		self.budgetPerHour = budgetPerHour
+		self.isBusy = isBusy
+		self._baseline = None  # Último fotograma entregado (o el inicial)
+		self._spent = deque()  # Momentos de las peticiones de la última hora
+		self._stopEvent = threading.Event()
+		self._thread = None
+	
+	@property
+	def isRunning(self):
+		"""True si el hilo de vigilancia está en marcha"""
+		return self._thread is not None and self._thread.is_alive()
+	
+	def start(self):
+		"""Empieza a vigilar; la pantalla actual es la referencia inicial"""
+		if self.isRunning:
+			return
+		if not PIL_AVAILABLE:
+			raise Exception("PIL/Pillow no disponible")
+		self._baseline = None
+		self._stopEvent.clear()
+		self._thread = threading.Thread(
+			target=self._watchLoop,
+			name="aiImageDescriber-screenWatcher",
+			daemon=True
+		)
+		self._thread.start()
+		log.info(f"Vigilando la pantalla cada {self.interval} segundos (sensibilidad {self.sensitivity})")
+	
+	def stop(self):
+		"""Deja de vigilar"""
+		self._stopEvent.set()
+		if self._thread is not None:
+			self._thread.join(self.interval * 2)
+			self._thread = None
+		self._baseline = None
+		log.info("Vigilancia de pantalla detenida")
+	
+	def _watchLoop(self):
+		"""Bucle de captura"""
+		while True:
+			# Mientras se describe el cambio anterior no se captura
+			if self.isBusy is None or not self.isBusy():
+				try:
+					self._check()
+				except Exception as e:
+					log.error(f"Error al vigilar la pantalla: {e}", exc_info=True)
+			if self._stopEvent.wait(self.interval):
+				return
+	
+	def _check(self):
+		"""Captura, compara con la referencia y entrega las zonas cambiadas"""
+		screenshot = self.imageCapture.grabRegion(*self.screen)
+		try:
+			frame = diffFrame(screenshot)
+			if self._baseline is None:
+				self._baseline = frame
+				return
+			
+			# La referencia solo avanza al entregar un cambio: los cambios pequeños se acumulan
+			boxes = changedRegions(self._baseline, frame, self.sensitivity, self.maxRegions)
+			if not boxes:
+				return
+			if not self._hasBudget(len(boxes)):
+				log.debug("Presupuesto de vigilancia de pantalla agotado, cambio pospuesto")
+				return
+			
+			changes = []
+			for box in boxes:
+				crop = screenshot.crop(box)
+				try:
+					imageData = encodeImage(crop)
+				finally:
+					crop.close()
+				screenBox = (box[0] + self.screen[0], box[1] + self.screen[1], box[2] + self.screen[0], box[3] + self.screen[1])
+				changes.append((screenBox, imageData))
+		finally:
+			screenshot.close()
+		
+		if self.onChange(self.screen, changes):
+			self._spend(len(changes))
+			self._baseline = frame
+			log.info(f"Cambio en pantalla: {len(changes)} zonas")
+	
+	def _hasBudget(self, count):
+		"""True si quedan al menos count peticiones en la ventana del presupuesto"""
+		now = time.monotonic()
+		while self._spent and now - self._spent[0] > BUDGET_WINDOW:
+			self._spent.popleft()
+		return len(self._spent) + count <= self.budgetPerHour
+	
+	def _spend(self, count):
+		"""Anota count peticiones en el presupuesto"""
+		now = time.monotonic()
+		self._spent.extend([now] * count)
+
+
+class ScreenChangeDescriber:
+	"""Describe en paralelo las zonas de la pantalla que han cambiado"""
+	
+	def __init__(self, client, detail="auto", language="es"):
+		"""
+		Args:
+			client: Cliente de API con describeWithPromptAsync
+			detail (str): Nivel de detalle
+			language (str): Idioma de las descripciones
+		"""
+		self.client = client
+		self.detail = detail
+		self.language = language
+	
+	async def describeAsync(self, screen, changes, cancelToken=None):
+		"""
+		Describe las zonas cambiadas
+		
+		Args:
+			screen (tuple): Rectángulo de la pantalla
+			changes (list): (rectángulo, imagen codificada) de cada zona
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			str: Una línea por zona, precedida de su posición
+		"""
+		semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHANGES)
+		
+		async def describeChange(box, imageData):
+			async with semaphore:
+				raiseIfCancelled(cancelToken)
+				try:
+					return await self.client.describeWithPromptAsync(
+						[imageData],
+						buildChangePrompt(screenPosition(box, screen, self.language), self.language),
+						detail=self.detail,
+						maxTokens=CHANGE_MAX_TOKENS,
+						cancelToken=cancelToken
+					)
+				except asyncio.CancelledError:
+					raise
+				except Exception as e:
+					log.warning(f"Error al describir un cambio de pantalla: {e}")
+					return None
+		
+		results = await asyncio.gather(*(describeChange(box, imageData) for box, imageData in changes))
+		raiseIfCancelled(cancelToken)
+		
+		lines = []
+		for (box, _), description in zip(changes, results):
+			if description:
+				position = screenPosition(box, screen, self.language)
+				lines.append(f"{position[0].upper()}{position[1:]}: {description.strip()}")
+		if not lines:
+			raise Exception("No se pudo describir ningún cambio de la pantalla")
+		return "\n\n".join(lines)
@@ -0,0 +1,307 @@
+# -*- coding: UTF-8 -*-
+"""
+Descripción en mosaico de imágenes muy grandes
+Divide carteles, planos, infografías y escaneos en secciones solapadas que se describen
+a la vez, y une los resultados con una petición final que recibe además una versión
+reducida de la imagen completa
+"""
+
+import asyncio
+import base64
+import math
+from io import BytesIO
+from logHandler import log
+
+from .cancellation import raiseIfCancelled
+from .imageProcessor import MAX_IMAGE_SIZE
+
+try:
+	from PIL import Image
+	PIL_AVAILABLE = True
+except ImportError:
+	PIL_AVAILABLE = False
+
+MIN_TILING_SIZE = 3000  # Lado mayor a partir del cual la imagen se divide
+TILE_SIZE = 1536  # Lado de cada sección en píxeles de la imagen original
+TILE_OVERLAP = 128  # Píxeles compartidos entre secciones vecinas
+MAX_TILES = 12
+MAX_CONCURRENT_TILES = 6
+TILE_MAX_TOKENS = 800
+SUMMARY_MAX_TOKENS = 3000
+
+# Mosaico: cada sección de una imagen grande y la descripción final que las une
+TILE_PROMPTS = {
+	"es": (
+		"Esta imagen es la sección de la fila {row} de {rows}, columna {column} de {columns}, de una imagen mayor "
+		"(las secciones se solapan ligeramente). Describe solo lo que aparece en ella para una persona con "
+		"discapacidad visual y transcribe literalmente todo el texto legible. Si algo queda cortado en un borde, "
+		"indícalo. No hagas suposiciones sobre el resto de la imagen."
+	),
+	"en": (
+		"This image is the section at row {row} of {rows}, column {column} of {columns}, of a larger image "
+		"(sections overlap slightly). Describe only what appears in it for a visually impaired person and "
+		"transcribe all readable text verbatim. If something is cut off at an edge, say so. "
+		"Do not make assumptions about the rest of the image."
+	),
+	"fr": (
+		"Cette image est la section de la ligne {row} sur {rows}, colonne {column} sur {columns}, d'une image plus grande "
+		"(les sections se chevauchent légèrement). Décris uniquement ce qui y apparaît pour une personne malvoyante "
+		"et transcris mot pour mot tout le texte lisible. Si quelque chose est coupé sur un bord, indique-le. "
+		"Ne fais pas de suppositions sur le reste de l'image."
+	)
+}
+
+TILE_SUMMARY_PROMPTS = {
+	"es": (
+		"Te envío una versión reducida de una imagen grande y, a continuación, las descripciones de sus {count} "
+		"secciones (cuadrícula de {rows} filas por {columns} columnas, con solapamiento, así que puede haber repeticiones). "
+		"Escribe una única descripción estructurada para una persona con discapacidad visual: empieza con un resumen "
+		"general y el tipo de imagen, después describe las zonas en orden de lectura y termina con el texto completo "
+		"sin duplicados. Usa títulos en Markdown.\n\n{sections}"
+	),
+	"en": (
+		"I am sending a reduced version of a large image followed by the descriptions of its {count} sections "
+		"({rows} rows by {columns} columns grid, overlapping, so there may be repetitions). Write a single structured "
+		"description for a visually impaired person: start with a general summary and the type of image, then "
+		"describe the areas in reading order and finish with the complete text without duplicates. "
+		"Use Markdown headings.\n\n{sections}"
+	),
+	"fr": (
+		"Je t'envoie une version réduite d'une grande image puis les descriptions de ses {count} sections "
+		"(grille de {rows} lignes sur {columns} colonnes, avec chevauchement, il peut donc y avoir des répétitions). "
+		"Écris une seule description structurée pour une personne malvoyante: commence par un résumé général et "
+		"le type d'image, décris ensuite les zones dans l'ordre de lecture et termine par le texte complet sans "
+		"doublons. Utilise des titres Markdown.\n\n{sections}"
+	)
+}
+
+SECTION_TITLES = {
+	"es": "Sección fila {row}, columna {column}",
+	"en": "Section row {row}, column {column}",
+	"fr": "Section ligne {row}, colonne {column}"
+}
+
+
+def buildTilePrompt(row, column, rows, columns, language):
+	"""Prompt de una sección del mosaico (fila y columna empiezan en 1)"""
+	template = TILE_PROMPTS.get(language, TILE_PROMPTS["es"])
+	return template.format(row=row, column=column, rows=rows, columns=columns)
+
+
+def sectionTitle(row, column, language):
+	"""Título de una sección del mosaico en la descripción combinada"""
+	return SECTION_TITLES.get(language, SECTION_TITLES["es"]).format(row=row, column=column)
+
+
+def buildTileSummaryPrompt(sections, rows, columns, language):
+	"""
+	Construye el prompt que une las descripciones de las secciones
+	
+	Args:
+		sections (list): (fila, columna, descripción) de cada sección
+		rows (int): Filas del mosaico
+		columns (int): Columnas del mosaico
+		language (str): Idioma de respuesta
+	
+	Returns:
+		str: Prompt
+	"""
+	text = "\n\n".join(
+		f"### {sectionTitle(row, column, language)}\n{description}"
+		for row, column, description in sections
+	)
+	template = TILE_SUMMARY_PROMPTS.get(language, TILE_SUMMARY_PROMPTS["es"])
+	return template.format(count=len(sections), rows=rows, columns=columns, sections=text)
+
+
+def largeImageSize(filePath):
+	"""
+	Tamaño de una imagen si es lo bastante grande para dividirla (solo lee la cabecera)
+	
+	Returns:
+		tuple: (ancho, alto), o None si es pequeña o no se puede abrir
+	"""
+	if not PIL_AVAILABLE:
+		return None
+	try:
+		with Image.open(filePath) as image:
+			size = image.size
+	except Exception as e:
+		log.debug(f"No se pudo leer el tamaño de {filePath}: {e}")
+		return None
+	return size if max(size) >= MIN_TILING_SIZE else None
+
+
+def planTiles(width, height, tileSize=TILE_SIZE, overlap=TILE_OVERLAP, maxTiles=MAX_TILES):
+	"""
+	Calcula las secciones solapadas que cubren la imagen
+	
+	Si harían falta más de maxTiles secciones, se agrandan (y después se reducen al codificarlas)
+	
+	Args:
+		width (int): Ancho de la imagen
+		height (int): Alto de la imagen
+		tileSize (int): Lado de cada sección
+		overlap (int): Píxeles mínimos compartidos entre secciones vecinas
+		maxTiles (int): Secciones como máximo
+	
+	Returns:
+		tuple: (filas, columnas, lista de (fila, columna, (izquierda, arriba, derecha, abajo)))
+			con fila y columna empezando en 1
+	"""
+	while True:
+		columns = max(1, math.ceil((width - overlap) / (tileSize - overlap)))
+		rows = max(1, math.ceil((height - overlap) / (tileSize - overlap)))
+		if rows * columns <= maxTiles:
+			break
+		tileSize = int(tileSize * 1.25)
+	
+	def starts(length, count):
+		size = min(tileSize, length)
+		if count == 1:
+			return [0], size
+		# Reparto uniforme: la última sección acaba justo en el borde
+		step = (length - size) / (count - 1)
+		return [round(i * step) for i in range(count)], size
+	
+	lefts, tileWidth = starts(width, columns)
+	tops, tileHeight = starts(height, rows)
+	tiles = [
+		(row + 1, column + 1, (left, top, left + tileWidth, top + tileHeight))
+		for row, top in enumerate(tops)
+		for column, left in enumerate(lefts)
+	]
+	return rows, columns, tiles
+
+
+def encodeImage(image, maxSize=MAX_IMAGE_SIZE):
+	"""
+	Codifica una imagen PIL como PNG en base64 reduciéndola si supera maxSize
+	
+	La imagen recibida no se modifica
+	"""
+	if image.mode not in ("RGB", "RGBA", "L"):
+		image = image.convert("RGB")
+	if image.width > maxSize or image.height > maxSize:
+		image = image.copy()
+		image.thumbnail((maxSize, maxSize), Image.Resampling.LANCZOS)
+	buffered = BytesIO()
+	image.save(buffered, format="PNG", optimize=True)
+	return base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+
+class TiledDescriber:
+	"""Describe una imagen grande por secciones concurrentes y una petición de resumen"""
+	
+	def __init__(self, client, detail="auto", language="es"):
+		"""
+		Args:
+			client: Cliente de API con describeWithPromptAsync
+			detail (str): Nivel de detalle
+			language (str): Idioma de la descripción
+		"""
+		self.client = client
+		self.detail = detail
+		self.language = language
+	
+	async def describeFileAsync(self, filePath, cancelToken=None):
+		"""
+		Describe un archivo de imagen grande
+		
+		Args:
+			filePath (str): Ruta de la imagen
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			str: Descripción estructurada de la imagen completa
+		"""
+		if not PIL_AVAILABLE:
+			raise Exception("PIL/Pillow no disponible")
+		loop = asyncio.get_running_loop()
+		image = await loop.run_in_executor(None, self._open, filePath)
+		try:
+			return await self.describeAsync(image, cancelToken)
+		finally:
+			image.close()
+	
+	def _open(self, filePath):
+		"""Abre y decodifica la imagen (se comparte entre las secciones)"""
+		image = Image.open(filePath)
+		image.load()
+		return image
+	
+	async def describeAsync(self, image, cancelToken=None):
+		"""
+		Describe una imagen PIL grande en mosaico
+		
+		Args:
+			image: Imagen PIL (el llamador la cierra)
+			cancelToken (CancellationToken): Token de cancelación, o None
+		
+		Returns:
+			str: Descripción estructurada de la imagen completa
+		"""
+		rows, columns, tiles = planTiles(image.width, image.height)
+		log.info(f"Describiendo imagen de {image.width}x{image.height} en {len(tiles)} secciones ({rows}x{columns})")
+		loop = asyncio.get_running_loop()
+		semaphore = asyncio.Semaphore(MAX_CONCURRENT_TILES)
+		
+		async def describeTile(row, column, box):
+			async with semaphore:
+				raiseIfCancelled(cancelToken)
+				tileData = await loop.run_in_executor(None, self._encodeTile, image, box)
+				try:
+					return await self.client.describeWithPromptAsync(
+						[tileData],
+						buildTilePrompt(row, column, rows, columns, self.language),
+						detail=self.detail,
+						maxTokens=TILE_MAX_TOKENS,
+						cancelToken=cancelToken
+					)
+				except asyncio.CancelledError:
+					raise
+				except Exception as e:
+					log.warning(f"Error al describir la sección {row},{column}: {e}")
+					return None
+		
+		# La versión reducida para el resumen se codifica mientras se describen las secciones
+		overviewFuture = loop.run_in_executor(None, encodeImage, image)
+		results = await asyncio.gather(*(describeTile(row, column, box) for row, column, box in tiles))
+		overview = await overviewFuture
+		raiseIfCancelled(cancelToken)
+		
+		sections = [
+			(row, column, description)
+			for (row, column, _), description in zip(tiles, results)
+			if description
+		]
+		if not sections:
+			raise Exception("No se pudo describir ninguna sección de la imagen")
+		if len(sections) < len(tiles):
+			log.warning(f"{len(tiles) - len(sections)} secciones sin descripción")
+		
+		try:
+			return await self.client.describeWithPromptAsync(
+				[overview],
+				buildTileSummaryPrompt(sections, rows, columns, self.language),
+				detail=self.detail,
+				maxTokens=SUMMARY_MAX_TOKENS,
+				cancelToken=cancelToken
+			)
+		except asyncio.CancelledError:
+			raise
+		except Exception as e:
+			# Sin resumen, las secciones por separado siguen siendo útiles
+			log.warning(f"Error al unir las secciones, se muestran por separado: {e}")
+			return "\n\n".join(
+				f"## {sectionTitle(row, column, self.language)}\n\n{description}"
+				for row, column, description in sections
+			)
+	
+	def _encodeTile(self, image, box):
+		"""Recorta y codifica una sección"""
+		tile = image.crop(box)
+		try:
+			return encodeImage(tile)
+		finally:
+			tile.close()
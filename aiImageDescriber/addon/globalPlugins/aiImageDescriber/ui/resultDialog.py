@@ -105,20 +105,38 @@ class ResultDialog(wx.Dialog):
 		"""
 		super().__init__(parent, title=title, size=(700, 500))
 		
+		# Las descripciones estructuradas se muestran también por partes
+		self.parts = self._structuredParts(description)
+		
 		# Agregar información del proveedor de IA al final
 		if aiProvider:
 			providerNames = {
 				"openai": "OpenAI GPT-4 Vision",
-				"gemini": "Google Gemini"
+				"gemini": "Google Gemini",
+				"compatible": "Servidor compatible con OpenAI",
+				"local": "Modelo local (ONNX Runtime)"
 			}
 			providerName = providerNames.get(aiProvider, aiProvider)
 			description += f'\n\n---\nReconocimiento realizado con: {providerName}'
 		
 		self.plainText = description  # Guardar texto plano para copiar
+		if self.parts:
+			self.parts.append(("Descripción completa", self.plainText))
 		
 		panel = wx.Panel(self)
 		mainSizer = wx.BoxSizer(wx.VERTICAL)
 		
+		self.partList = None
+		if self.parts:
+			# Lista de partes: resumen, texto detectado, apartados y descripción completa
+			listLabel = wx.StaticText(panel, label="&Partes:")
+			mainSizer.Add(listLabel, flag=wx.LEFT | wx.TOP, border=10)
+			self.partList = wx.ListBox(panel, choices=[partTitle for partTitle, _content in self.parts])
+			self.partList.Bind(wx.EVT_LISTBOX, self.onSelectPart)
+			mainSizer.Add(self.partList, proportion=1, flag=wx.EXPAND | wx.ALL, border=10)
+			textLabel = wx.StaticText(panel, label="&Descripción:")
+			mainSizer.Add(textLabel, flag=wx.LEFT, border=10)
+		
 		# Usar siempre TextCtrl para evitar problemas con wx.html2
 		self.textCtrl = wx.TextCtrl(
 			panel,
@@ -128,8 +146,13 @@ class ResultDialog(wx.Dialog):
 		# Configurar fuente para mejor legibilidad
 		font = wx.Font(10, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
 		self.textCtrl.SetFont(font)
-		self.textCtrl.SetFocus()
-		mainSizer.Add(self.textCtrl, proportion=1, flag=wx.EXPAND | wx.ALL, border=10)
+		mainSizer.Add(self.textCtrl, proportion=2 if self.parts else 1, flag=wx.EXPAND | wx.ALL, border=10)
+		if self.partList:
+			self.partList.SetSelection(0)
+			self.textCtrl.SetValue(self.parts[0][1])
+			self.partList.SetFocus()
+		else:
+			self.textCtrl.SetFocus()
 		
 		# Botones
 		buttonSizer = wx.BoxSizer(wx.HORIZONTAL)
@@ -150,6 +173,32 @@ class ResultDialog(wx.Dialog):
 		panel.SetSizer(mainSizer)
 		self.CenterOnScreen()
 	
+	def _structuredParts(self, description):
+		"""
+		Partes de una descripción estructurada
+		
+		Returns:
+			list: (título, texto) del resumen, el texto detectado y cada apartado,
+				o None si la descripción no es estructurada
+		"""
+		sections = getattr(description, "sections", None)
+		if sections is None:
+			return None
+		parts = [("Resumen", description.summary)]
+		if description.text:
+			parts.append((description.textTitle, description.text))
+		parts.extend(
+			(sectionTitle or f"Apartado {number}", content)
+			for number, (sectionTitle, content) in enumerate(sections, 1)
+		)
+		return parts
+	
+	def onSelectPart(self, event):
+		"""Muestra la parte seleccionada"""
+		index = self.partList.GetSelection()
+		if index != wx.NOT_FOUND:
+			self.textCtrl.SetValue(self.parts[index][1])
+	
 	def onCopy(self, event):
 		"""Copia el texto al portapapeles"""
 		if wx.TheClipboard.Open():
@@ -163,6 +212,112 @@ class ResultDialog(wx.Dialog):
 		self.EndModal(wx.ID_CLOSE)
 
 
+class ImageListDialog(wx.Dialog):
+	"""Diálogo con una lista de imágenes (del documento o iconos) y sus descripciones"""
+	
+	def __init__(self, parent, images, title):
+		"""
+		Args:
+			parent: Ventana padre
+			images (list): Elementos con displayName, description, error y moveTo(), en orden
+			title (str): Título del diálogo
+		"""
+		super().__init__(parent, title=title, size=(700, 500))
+		
+		self.images = images
+		self.selectedImage = None  # Imagen a la que mover el cursor al cerrar
+		
+		panel = wx.Panel(self)
+		mainSizer = wx.BoxSizer(wx.VERTICAL)
+		
+		# Lista de imágenes
+		listLabel = wx.StaticText(panel, label="&Imágenes:")
+		mainSizer.Add(listLabel, flag=wx.LEFT | wx.TOP, border=10)
+		self.imageList = wx.ListBox(
+			panel,
+			choices=[f"{number}. {image.displayName}" for number, image in enumerate(images, 1)]
+		)
+		self.imageList.Bind(wx.EVT_LISTBOX, self.onSelect)
+		self.imageList.Bind(wx.EVT_LISTBOX_DCLICK, self.onGoTo)
+		mainSizer.Add(self.imageList, proportion=1, flag=wx.EXPAND | wx.ALL, border=10)
+		
+		# Descripción de la imagen seleccionada
+		textLabel = wx.StaticText(panel, label="&Descripción:")
+		mainSizer.Add(textLabel, flag=wx.LEFT, border=10)
+		self.textCtrl = wx.TextCtrl(
+			panel,
+			style=wx.TE_MULTILINE | wx.TE_READONLY | wx.TE_WORDWRAP | wx.TE_RICH2
+		)
+		font = wx.Font(10, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
+		self.textCtrl.SetFont(font)
+		mainSizer.Add(self.textCtrl, proportion=2, flag=wx.EXPAND | wx.ALL, border=10)
+		
+		# Botones
+		buttonSizer = wx.BoxSizer(wx.HORIZONTAL)
+		
+		goToButton = wx.Button(panel, label="&Ir a la imagen")
+		goToButton.Bind(wx.EVT_BUTTON, self.onGoTo)
+		buttonSizer.Add(goToButton, flag=wx.ALL, border=5)
+		
+		copyButton = wx.Button(panel, label="&Copiar todo")
+		copyButton.Bind(wx.EVT_BUTTON, self.onCopy)
+		buttonSizer.Add(copyButton, flag=wx.ALL, border=5)
+		
+		closeButton = wx.Button(panel, wx.ID_CLOSE, label="C&errar")
+		closeButton.Bind(wx.EVT_BUTTON, self.onClose)
+		buttonSizer.Add(closeButton, flag=wx.ALL, border=5)
+		self.SetEscapeId(wx.ID_CLOSE)
+		
+		mainSizer.Add(buttonSizer, flag=wx.ALIGN_CENTER | wx.ALL, border=5)
+		
+		panel.SetSizer(mainSizer)
+		
+		if images:
+			self.imageList.SetSelection(0)
+			self._showDescription(0)
+		self.imageList.SetFocus()
+		self.CenterOnScreen()
+	
+	def _describe(self, image):
+		"""Texto a mostrar de una imagen"""
+		if image.description:
+			return image.description
+		return f"Sin descripción: {image.error or 'no se pudo obtener la imagen'}"
+	
+	def _showDescription(self, index):
+		"""Muestra la descripción de la imagen en la posición indicada"""
+		self.textCtrl.SetValue(self._describe(self.images[index]))
+	
+	def onSelect(self, event):
+		"""Actualiza la descripción al cambiar de imagen"""
+		index = self.imageList.GetSelection()
+		if index != wx.NOT_FOUND:
+			self._showDescription(index)
+	
+	def onGoTo(self, event):
+		"""Cierra el diálogo y lleva el cursor a la imagen seleccionada"""
+		index = self.imageList.GetSelection()
+		if index == wx.NOT_FOUND:
+			return
+		self.selectedImage = self.images[index]
+		self.EndModal(wx.ID_OK)
+	
+	def onCopy(self, event):
+		"""Copia todas las descripciones al portapapeles"""
+		text = "\n\n".join(
+			f"{number}. {image.displayName}\n{self._describe(image)}"
+			for number, image in enumerate(self.images, 1)
+		)
+		if wx.TheClipboard.Open():
+			wx.TheClipboard.SetData(wx.TextDataObject(text))
+			wx.TheClipboard.Close()
+			wx.Bell()
+	
+	def onClose(self, event):
+		"""Cierra el diálogo"""
+		self.EndModal(wx.ID_CLOSE)
+
+
 class WelcomeDialog(wx.Dialog):
 	"""Diálogo de bienvenida y ayuda rápida"""
 	
@@ -189,6 +344,11 @@ Comandos básicos (verbalizan la descripción):
 • NVDA+Alt+S: Captura y describe la pantalla completa
 • NVDA+Alt+C: Describe una imagen desde el portapapeles
 • NVDA+Alt+F: Describe una imagen desde archivo
+• NVDA+Alt+B: Describe todas las imágenes de una carpeta
+• NVDA+Alt+W: Activa o desactiva la vigilancia de carpetas
+• NVDA+Alt+D: Describe todas las imágenes del documento y las muestra en una lista
+• NVDA+Alt+L: Etiqueta los iconos y botones sin nombre de la ventana
+• NVDA+Alt+V: Activa o desactiva la vigilancia de pantalla
 
 Comandos con ventana (añadir Shift para mostrar en ventana):
 • NVDA+Alt+Shift+I: Imagen en foco con ventana
@@ -197,6 +357,9 @@ Comandos con ventana (añadir Shift para mostrar en ventana):
 • NVDA+Alt+Shift+F: Archivo con ventana
 
 Otros comandos:
+• NVDA+Alt+Shift+B: Envía una carpeta como trabajo por lotes del proveedor
+• NVDA+Alt+E: Anuncia las descripciones pendientes y en curso
+• NVDA+Alt+X: Cancela las descripciones pendientes y en curso
 • NVDA+Alt+H: Muestra esta ayuda
 • NVDA+Alt+O: Abre la configuración del complemento
 
@@ -211,6 +374,8 @@ PROVEEDORES DISPONIBLES:
 
 • OpenAI (GPT-4 Vision): Requiere API key de pago (muy preciso)
 • Google Gemini: Requiere API key (nivel gratuito disponible)
+• Servidor compatible con OpenAI: Servidor propio o de tu red (Ollama, LM Studio, vLLM...) con un modelo con visión
+• Modelo local: Sin conexión ni API key; requiere onnxruntime y un modelo ONNX de subtitulado
 
 NOTA: Necesitas configurar al menos una API key para usar el complemento.
 Puedes obtener tus claves en:
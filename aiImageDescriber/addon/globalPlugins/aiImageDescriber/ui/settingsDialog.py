@@ -25,7 +25,12 @@ class AIImageDescriberSettingsPanel(SettingsPanel):
 		# Proveedor de IA
 		# Translators: Etiqueta para seleccionar proveedor
 		providerLabel = _("&Proveedor de IA:")
-		providerChoices = ["OpenAI GPT-4 Vision", "Google Gemini"]
+		providerChoices = [
+			"OpenAI GPT-4 Vision",
+			"Google Gemini",
+			_("Modelo local sin conexión (ONNX Runtime)"),
+			_("Servidor compatible con OpenAI (Ollama, LM Studio, vLLM...)")
+		]
 		self.providerList = sHelper.addLabeledControl(
 			providerLabel,
 			wx.Choice,
@@ -33,7 +38,7 @@ class AIImageDescriberSettingsPanel(SettingsPanel):
 		)
 		
 		currentProvider = config.conf["aiImageDescriber"]["apiProvider"]
-		providerMap = {"openai": 0, "gemini": 1}
+		providerMap = {"openai": 0, "gemini": 1, "local": 2, "compatible": 3}
 		self.providerList.SetSelection(providerMap.get(currentProvider, 0))
 		
 		self.providerList.Bind(wx.EVT_CHOICE, self.onProviderChange)
@@ -63,6 +68,58 @@ class AIImageDescriberSettingsPanel(SettingsPanel):
 		)
 		self.geminiKeyText.SetHint("AIza...")
 		
+		# Servidor compatible con OpenAI
+		# Translators: Etiqueta para la dirección del servidor compatible
+		self.compatibleUrlText = sHelper.addLabeledControl(
+			_("Dirección &base del servidor compatible con OpenAI:"),
+			wx.TextCtrl,
+			value=config.conf["aiImageDescriber"]["compatibleBaseUrl"]
+		)
+		self.compatibleUrlText.SetHint("http://192.168.1.10:11434/v1")
+		
+		# Translators: Etiqueta para el modelo del servidor compatible
+		self.compatibleModelCombo = sHelper.addLabeledControl(
+			_("Modelo del servidor (va&cío: elegir uno con visión automáticamente):"),
+			wx.ComboBox,
+			value=config.conf["aiImageDescriber"]["compatibleModel"],
+			choices=[]
+		)
+		
+		# Translators: Etiqueta para la API key del servidor compatible
+		self.compatibleKeyText = sHelper.addLabeledControl(
+			_("API key del servidor compatible (opcional):"),
+			wx.TextCtrl,
+			value=config.conf["aiImageDescriber"]["compatibleApiKey"]
+		)
+		
+		# Modelo local
+		# Translators: Etiqueta para la carpeta del modelo local
+		self.localModelPathText = sHelper.addLabeledControl(
+			_("Carpeta del &modelo local (encoder_model.onnx, decoder_model.onnx y vocab.json):"),
+			wx.TextCtrl,
+			value=config.conf["aiImageDescriber"]["localModelPath"]
+		)
+		
+		# Translators: Etiqueta para checkbox del modelo local en el detalle bajo
+		self.localLowDetailCheckbox = wx.CheckBox(
+			self,
+			label=_("Usar el modelo &local en el nivel de detalle bajo (sin conexión)")
+		)
+		self.localLowDetailCheckbox.SetValue(
+			config.conf["aiImageDescriber"]["localForLowDetail"]
+		)
+		sHelper.addItem(self.localLowDetailCheckbox)
+		
+		# Translators: Etiqueta para checkbox de la descripción local inmediata
+		self.localQuickCheckbox = wx.CheckBox(
+			self,
+			label=_("Verbalizar una descripción local &inmediata mientras responde el proveedor")
+		)
+		self.localQuickCheckbox.SetValue(
+			config.conf["aiImageDescriber"]["localQuickAnswer"]
+		)
+		sHelper.addItem(self.localQuickCheckbox)
+		
 		# Botón para probar conexión
 		# Translators: Etiqueta del botón para probar API
 		self.testButton = wx.Button(self, label=_("&Probar conexión"))
@@ -75,7 +132,8 @@ class AIImageDescriberSettingsPanel(SettingsPanel):
 		detailChoices = [
 			_("Bajo (más rápido)"),
 			_("Auto (recomendado)"),
-			_("Alto (más lento)")
+			_("Alto (más lento)"),
+			_("Adaptativo (según la complejidad de cada imagen)")
 		]
 		self.detailList = sHelper.addLabeledControl(
 			detailLabel,
@@ -84,9 +142,26 @@ class AIImageDescriberSettingsPanel(SettingsPanel):
 		)
 		
 		currentDetail = config.conf["aiImageDescriber"]["detailLevel"]
-		detailMap = {"low": 0, "auto": 1, "high": 2}
+		detailMap = {"low": 0, "auto": 1, "high": 2, "adaptive": 3}
 		self.detailList.SetSelection(detailMap.get(currentDetail, 1))
 		
+		# Presupuesto de razonamiento de Gemini por nivel de detalle
+		# Translators: Etiquetas para el presupuesto de razonamiento de Gemini
+		self.thinkingSpins = {}
+		thinkingLabels = {
+			"Low": _("Razonamiento de Gemini en nivel bajo (tokens, -1 = dinámico):"),
+			"Auto": _("Razonamiento de Gemini en nivel auto (tokens, -1 = dinámico):"),
+			"High": _("Razonamiento de Gemini en nivel alto (tokens, -1 = dinámico):"),
+		}
+		for level, label in thinkingLabels.items():
+			self.thinkingSpins[level] = sHelper.addLabeledControl(
+				label,
+				nvdaControls.SelectOnFocusSpinCtrl,
+				min=-1,
+				max=24576,
+				initial=config.conf["aiImageDescriber"][f"geminiThinking{level}"]
+			)
+		
 		# Idioma de descripción
 		# Translators: Etiqueta para idioma
 		languageLabel = _("I&dioma de descripción:")
@@ -116,6 +191,217 @@ class AIImageDescriberSettingsPanel(SettingsPanel):
 		)
 		sHelper.addItem(self.announceCheckbox)
 		
+		# Peticiones de respaldo con el segundo proveedor
+		# Translators: Etiqueta para checkbox de peticiones de respaldo
+		self.hedgeCheckbox = wx.CheckBox(
+			self,
+			label=_("&Usar el otro proveedor como respaldo si el principal tarda (solo OpenAI y Gemini; requiere ambas API keys)")
+		)
+		self.hedgeCheckbox.SetValue(
+			config.conf["aiImageDescriber"]["hedgeRequests"]
+		)
+		sHelper.addItem(self.hedgeCheckbox)
+		
+		# Proceso auxiliar para codificar y enviar imágenes fuera de NVDA
+		# Translators: Etiqueta para checkbox del proceso auxiliar
+		self.helperCheckbox = wx.CheckBox(
+			self,
+			label=_("Procesar las imágenes en un proceso a&uxiliar (requiere Python con Pillow)")
+		)
+		self.helperCheckbox.SetValue(
+			config.conf["aiImageDescriber"]["useHelperProcess"]
+		)
+		sHelper.addItem(self.helperCheckbox)
+		
+		# Translators: Etiqueta para la ruta del intérprete del proceso auxiliar
+		helperPathLabel = _("Ruta de python.exe para el proceso auxiliar:")
+		self.helperPathText = sHelper.addLabeledControl(
+			helperPathLabel,
+			wx.TextCtrl,
+			value=config.conf["aiImageDescriber"]["helperPythonPath"]
+		)
+		self.helperPathText.SetHint("C:\\Python311\\python.exe")
+		
+		# Vigilancia de carpetas
+		# Translators: Etiqueta para checkbox de vigilancia de carpetas
+		self.watchCheckbox = wx.CheckBox(
+			self,
+			label=_("&Vigilar carpetas y describir las imágenes nuevas")
+		)
+		self.watchCheckbox.SetValue(
+			config.conf["aiImageDescriber"]["watchEnabled"]
+		)
+		sHelper.addItem(self.watchCheckbox)
+		
+		# Translators: Etiqueta para las carpetas vigiladas
+		self.watchFoldersText = sHelper.addLabeledControl(
+			_("Carpetas vigiladas (separadas por punto y coma):"),
+			wx.TextCtrl,
+			value=config.conf["aiImageDescriber"]["watchFolders"]
+		)
+		
+		# Translators: Etiqueta para checkbox de anunciar imágenes vigiladas
+		self.watchAnnounceCheckbox = wx.CheckBox(
+			self,
+			label=_("Anunciar la descripción de las imágenes nuevas (si no, solo se guarda)")
+		)
+		self.watchAnnounceCheckbox.SetValue(
+			config.conf["aiImageDescriber"]["watchAnnounce"]
+		)
+		sHelper.addItem(self.watchAnnounceCheckbox)
+		
+		# Límites de la descripción por lotes
+		# Translators: Etiqueta para las peticiones simultáneas de los lotes
+		self.batchConcurrencySpin = sHelper.addLabeledControl(
+			_("Peticiones simultáneas al describir carpetas:"),
+			nvdaControls.SelectOnFocusSpinCtrl,
+			min=1,
+			max=8,
+			initial=config.conf["aiImageDescriber"]["batchConcurrency"]
+		)
+		# Translators: Etiqueta para el límite de peticiones por minuto de los lotes
+		self.batchRateSpin = sHelper.addLabeledControl(
+			_("Peticiones por minuto al describir carpetas:"),
+			nvdaControls.SelectOnFocusSpinCtrl,
+			min=1,
+			max=600,
+			initial=config.conf["aiImageDescriber"]["batchRequestsPerMinute"]
+		)
+		
+		# Mosaico de imágenes grandes
+		# Translators: Etiqueta para checkbox de descripción por secciones
+		self.tileCheckbox = wx.CheckBox(
+			self,
+			label=_("Describir por &secciones las imágenes muy grandes (carteles, planos, escaneos)")
+		)
+		self.tileCheckbox.SetValue(
+			config.conf["aiImageDescriber"]["tileLargeImages"]
+		)
+		sHelper.addItem(self.tileCheckbox)
+		
+		# Imágenes animadas y de varias páginas
+		# Translators: Etiqueta para checkbox de descripción por fotogramas y páginas
+		self.framesCheckbox = wx.CheckBox(
+			self,
+			label=_("Describir las imágenes animadas por &fotogramas clave y los TIFF de varias páginas página a página")
+		)
+		self.framesCheckbox.SetValue(
+			config.conf["aiImageDescriber"]["describeFrames"]
+		)
+		sHelper.addItem(self.framesCheckbox)
+		
+		# Imágenes web por dirección
+		# Translators: Etiqueta para checkbox de envío de la dirección de las imágenes web
+		self.imageURLsCheckbox = wx.CheckBox(
+			self,
+			label=_("Enviar al proveedor la dirección de las imágenes &web públicas en lugar de descargarlas")
+		)
+		self.imageURLsCheckbox.SetValue(
+			config.conf["aiImageDescriber"]["sendImageURLs"]
+		)
+		sHelper.addItem(self.imageURLsCheckbox)
+		
+		# Pantalla por regiones
+		# Translators: Etiqueta para checkbox de descripción de la pantalla por regiones
+		self.decomposeCheckbox = wx.CheckBox(
+			self,
+			label=_("Describir la pantalla completa por &regiones (ventanas y paneles)")
+		)
+		self.decomposeCheckbox.SetValue(
+			config.conf["aiImageDescriber"]["decomposeScreen"]
+		)
+		sHelper.addItem(self.decomposeCheckbox)
+		
+		# Pantalla con texto accesible
+		# Translators: Etiqueta para checkbox de envío del texto accesible con la pantalla
+		self.screenTextCheckbox = wx.CheckBox(
+			self,
+			label=_("Enviar el &texto accesible de la ventana activa con la pantalla completa (imagen reducida)")
+		)
+		self.screenTextCheckbox.SetValue(
+			config.conf["aiImageDescriber"]["screenAccessibleText"]
+		)
+		sHelper.addItem(self.screenTextCheckbox)
+		
+		# Respuesta estructurada
+		# Translators: Etiqueta para checkbox de respuesta estructurada con el resumen primero
+		self.structuredCheckbox = wx.CheckBox(
+			self,
+			label=_("Respuesta estructurada: verbalizar un r&esumen de una línea en cuanto llega y después el detalle")
+		)
+		self.structuredCheckbox.SetValue(
+			config.conf["aiImageDescriber"]["structuredOutput"]
+		)
+		sHelper.addItem(self.structuredCheckbox)
+		
+		# Vigilancia de pantalla (se activa con NVDA+Alt+V)
+		# Translators: Etiqueta para el intervalo de la vigilancia de pantalla
+		self.screenWatchIntervalSpin = sHelper.addLabeledControl(
+			_("Segundos entre capturas al vigilar la pantalla:"),
+			nvdaControls.SelectOnFocusSpinCtrl,
+			min=1,
+			max=300,
+			initial=config.conf["aiImageDescriber"]["screenWatchInterval"]
+		)
+		# Translators: Etiqueta para la sensibilidad de la vigilancia de pantalla
+		self.screenWatchSensitivityList = sHelper.addLabeledControl(
+			_("Sensibilidad a los cambios de pantalla:"),
+			wx.Choice,
+			choices=[
+				_("Baja (solo cambios grandes)"),
+				_("Media (recomendada)"),
+				_("Alta (cualquier cambio)")
+			]
+		)
+		sensitivityMap = {"low": 0, "medium": 1, "high": 2}
+		self.screenWatchSensitivityList.SetSelection(
+			sensitivityMap.get(config.conf["aiImageDescriber"]["screenWatchSensitivity"], 1)
+		)
+		# Translators: Etiqueta para el número máximo de zonas por cambio
+		self.screenWatchRegionsSpin = sHelper.addLabeledControl(
+			_("Zonas cambiadas a describir como máximo por cambio:"),
+			nvdaControls.SelectOnFocusSpinCtrl,
+			min=1,
+			max=8,
+			initial=config.conf["aiImageDescriber"]["screenWatchMaxRegions"]
+		)
+		# Translators: Etiqueta para el presupuesto de la vigilancia de pantalla
+		self.screenWatchBudgetSpin = sHelper.addLabeledControl(
+			_("Peticiones por hora como máximo al vigilar la pantalla:"),
+			nvdaControls.SelectOnFocusSpinCtrl,
+			min=1,
+			max=1000,
+			initial=config.conf["aiImageDescriber"]["screenWatchBudget"]
+		)
+		
+		# Anticipación de imágenes
+		# Translators: Etiqueta para checkbox de anticipación de imágenes
+		self.prefetchCheckbox = wx.CheckBox(
+			self,
+			label=_("&Anticipar las imágenes por delante del cursor en modo exploración")
+		)
+		self.prefetchCheckbox.SetValue(
+			config.conf["aiImageDescriber"]["prefetchEnabled"]
+		)
+		sHelper.addItem(self.prefetchCheckbox)
+		
+		# Translators: Etiqueta para el número de imágenes anticipadas
+		self.prefetchAheadSpin = sHelper.addLabeledControl(
+			_("Imágenes a anticipar por delante del cursor:"),
+			nvdaControls.SelectOnFocusSpinCtrl,
+			min=1,
+			max=10,
+			initial=config.conf["aiImageDescriber"]["prefetchAhead"]
+		)
+		# Translators: Etiqueta para el presupuesto de descripciones anticipadas
+		self.prefetchBudgetSpin = sHelper.addLabeledControl(
+			_("Descripciones anticipadas por hora (0: solo descargar):"),
+			nvdaControls.SelectOnFocusSpinCtrl,
+			min=0,
+			max=1000,
+			initial=config.conf["aiImageDescriber"]["prefetchBudget"]
+		)
+		
 		# Información de atajos
 		sHelper.addItem(
 			wx.StaticText(
@@ -189,6 +475,80 @@ class AIImageDescriberSettingsPanel(SettingsPanel):
 						_("Error"),
 						wx.OK | wx.ICON_ERROR
 					)
+			
+			elif provider == 2:  # Modelo local
+				from ..apiClients.local_client import LocalClient, ONNX_AVAILABLE
+				modelPath = self.localModelPathText.GetValue().strip()
+				if not ONNX_AVAILABLE:
+					gui.messageBox(
+						_("onnxruntime no está instalado. Instala con: pip install onnxruntime"),
+						_("Error"),
+						wx.OK | wx.ICON_ERROR
+					)
+					return
+				if not LocalClient.isModelPath(modelPath):
+					gui.messageBox(
+						_("La carpeta no contiene encoder_model.onnx, decoder_model.onnx y vocab.json o tokenizer.json"),
+						_("Error"),
+						wx.OK | wx.ICON_ERROR
+					)
+					return
+				
+				client = LocalClient(modelPath)
+				
+				if client.testConnection():
+					gui.messageBox(
+						_("El modelo local funciona correctamente"),
+						_("Éxito"),
+						wx.OK | wx.ICON_INFORMATION
+					)
+				else:
+					gui.messageBox(
+						_("No se pudo cargar el modelo local. Consulta el registro de NVDA."),
+						_("Error"),
+						wx.OK | wx.ICON_ERROR
+					)
+			
+			elif provider == 3:  # Servidor compatible con OpenAI
+				baseUrl = self.compatibleUrlText.GetValue().strip()
+				if not baseUrl:
+					gui.messageBox(
+						_("Por favor, ingresa la dirección del servidor compatible"),
+						_("Error"),
+						wx.OK | wx.ICON_ERROR
+					)
+					return
+				
+				from ..apiClients.compatible_client import OpenAICompatibleClient
+				client = OpenAICompatibleClient(
+					baseUrl,
+					self.compatibleModelCombo.GetValue(),
+					self.compatibleKeyText.GetValue().strip()
+				)
+				
+				try:
+					models = client.listModels()
+				except Exception as e:
+					gui.messageBox(
+						_("No se pudo conectar con el servidor: {error}").format(error=str(e)),
+						_("Error"),
+						wx.OK | wx.ICON_ERROR
+					)
+					return
+				
+				# Ofrecer los modelos detectados en la lista del modelo
+				currentModel = self.compatibleModelCombo.GetValue()
+				self.compatibleModelCombo.SetItems(models)
+				self.compatibleModelCombo.SetValue(currentModel or client.chooseModel(models))
+				if currentModel and currentModel not in models:
+					message = _("Conexión exitosa, pero el servidor no anuncia el modelo {model}. Modelos disponibles: {models}")
+				else:
+					message = _("Conexión exitosa con el servidor. Modelos disponibles: {models}")
+				gui.messageBox(
+					message.format(model=currentModel, models=", ".join(models) or _("ninguno")),
+					_("Éxito"),
+					wx.OK | wx.ICON_INFORMATION
+				)
 		
 		except Exception as e:
 			log.error(f"Error al probar conexión: {e}", exc_info=True)
@@ -202,18 +562,32 @@ class AIImageDescriberSettingsPanel(SettingsPanel):
 		"""Guarda la configuración"""
 		# Proveedor
 		providerIndex = self.providerList.GetSelection()
-		providerMap = {0: "openai", 1: "gemini"}
+		providerMap = {0: "openai", 1: "gemini", 2: "local", 3: "compatible"}
 		config.conf["aiImageDescriber"]["apiProvider"] = providerMap.get(providerIndex, "openai")
 		
 		# API Keys
 		config.conf["aiImageDescriber"]["openaiApiKey"] = self.openaiKeyText.GetValue()
 		config.conf["aiImageDescriber"]["geminiApiKey"] = self.geminiKeyText.GetValue()
 		
+		# Servidor compatible con OpenAI
+		config.conf["aiImageDescriber"]["compatibleBaseUrl"] = self.compatibleUrlText.GetValue().strip()
+		config.conf["aiImageDescriber"]["compatibleModel"] = self.compatibleModelCombo.GetValue().strip()
+		config.conf["aiImageDescriber"]["compatibleApiKey"] = self.compatibleKeyText.GetValue().strip()
+		
+		# Modelo local
+		config.conf["aiImageDescriber"]["localModelPath"] = self.localModelPathText.GetValue().strip()
+		config.conf["aiImageDescriber"]["localForLowDetail"] = self.localLowDetailCheckbox.GetValue()
+		config.conf["aiImageDescriber"]["localQuickAnswer"] = self.localQuickCheckbox.GetValue()
+		
 		# Nivel de detalle
 		detailIndex = self.detailList.GetSelection()
-		detailMap = {0: "low", 1: "auto", 2: "high"}
+		detailMap = {0: "low", 1: "auto", 2: "high", 3: "adaptive"}
 		config.conf["aiImageDescriber"]["detailLevel"] = detailMap.get(detailIndex, "auto")
 		
+		# Razonamiento de Gemini
+		for level, spin in self.thinkingSpins.items():
+			config.conf["aiImageDescriber"][f"geminiThinking{level}"] = spin.GetValue()
+		
 		# Idioma
 		langIndex = self.languageList.GetSelection()
 		langMap = {0: "es", 1: "en", 2: "fr"}
@@ -222,6 +596,52 @@ class AIImageDescriberSettingsPanel(SettingsPanel):
 		# Anunciar procesamiento
 		config.conf["aiImageDescriber"]["announceProcessing"] = self.announceCheckbox.GetValue()
 		
+		# Peticiones de respaldo
+		config.conf["aiImageDescriber"]["hedgeRequests"] = self.hedgeCheckbox.GetValue()
+		
+		# Proceso auxiliar
+		config.conf["aiImageDescriber"]["useHelperProcess"] = self.helperCheckbox.GetValue()
+		config.conf["aiImageDescriber"]["helperPythonPath"] = self.helperPathText.GetValue().strip()
+		
+		# Vigilancia de carpetas
+		config.conf["aiImageDescriber"]["watchEnabled"] = self.watchCheckbox.GetValue()
+		config.conf["aiImageDescriber"]["watchFolders"] = self.watchFoldersText.GetValue().strip()
+		config.conf["aiImageDescriber"]["watchAnnounce"] = self.watchAnnounceCheckbox.GetValue()
+		
+		# Lotes
+		config.conf["aiImageDescriber"]["batchConcurrency"] = self.batchConcurrencySpin.GetValue()
+		config.conf["aiImageDescriber"]["batchRequestsPerMinute"] = self.batchRateSpin.GetValue()
+		
+		# Mosaico de imágenes grandes
+		config.conf["aiImageDescriber"]["tileLargeImages"] = self.tileCheckbox.GetValue()
+		
+		# Imágenes animadas y de varias páginas
+		config.conf["aiImageDescriber"]["describeFrames"] = self.framesCheckbox.GetValue()
+		
+		# Imágenes web por dirección
+		config.conf["aiImageDescriber"]["sendImageURLs"] = self.imageURLsCheckbox.GetValue()
+		
+		# Pantalla por regiones
+		config.conf["aiImageDescriber"]["decomposeScreen"] = self.decomposeCheckbox.GetValue()
+		
+		# Pantalla con texto accesible
+		config.conf["aiImageDescriber"]["screenAccessibleText"] = self.screenTextCheckbox.GetValue()
+		
+		# Respuesta estructurada
+		config.conf["aiImageDescriber"]["structuredOutput"] = self.structuredCheckbox.GetValue()
+		
+		# Vigilancia de pantalla
+		config.conf["aiImageDescriber"]["screenWatchInterval"] = self.screenWatchIntervalSpin.GetValue()
+		sensitivityValues = ["low", "medium", "high"]
+		config.conf["aiImageDescriber"]["screenWatchSensitivity"] = sensitivityValues[self.screenWatchSensitivityList.GetSelection()]
+		config.conf["aiImageDescriber"]["screenWatchMaxRegions"] = self.screenWatchRegionsSpin.GetValue()
+		config.conf["aiImageDescriber"]["screenWatchBudget"] = self.screenWatchBudgetSpin.GetValue()
+		
+		# Anticipación de imágenes
+		config.conf["aiImageDescriber"]["prefetchEnabled"] = self.prefetchCheckbox.GetValue()
+		config.conf["aiImageDescriber"]["prefetchAhead"] = self.prefetchAheadSpin.GetValue()
+		config.conf["aiImageDescriber"]["prefetchBudget"] = self.prefetchBudgetSpin.GetValue()
+		
 		# Recargar el cliente API con la nueva configuración
 		try:
 			# Importar la referencia global al plugin
@@ -40,7 +40,7 @@ Características:
 	# File name for the add-on help file.
 	"addon_docFileName": "readme.html",
 	# Minimum NVDA version supported (e.g. "2018.3")
-	"addon_minimumNVDAVersion": "2021.1",
+	"addon_minimumNVDAVersion": "2024.1",
 	# Last NVDA version supported/tested (e.g. "2018.4", ideally more recent than minimum version)
 	"addon_lastTestedNVDAVersion": "2025.3",
 	# Add-on update channel (default is None, denoting stable releases,
@@ -66,6 +66,6 @@ print("2. Haz doble clic en el archivo .nvda-addon")
 print("3. Confirma la instalación")
 print("4. Reinicia NVDA")
 print()
-print("El complemento instalará automáticamente Pillow y requests")
+print("El complemento instalará automáticamente Pillow, requests y aiohttp")
 print("cuando lo uses por primera vez.")
 print()
@@ -0,0 +1,295 @@
+# -*- coding: UTF-8 -*-
+"""
+Servidor local que imita los endpoints de lotes de OpenAI y Gemini
+Permite probar los trabajos por lotes del proveedor sin conexión y sin coste.
+
+Uso:
+	python tools/batchStubServer.py --port 8765 --delay 10
+
+y en nvda.ini, sección [aiImageDescriber]:
+	bulkOpenaiUrl = http://127.0.0.1:8765/v1
+	bulkGeminiUrl = http://127.0.0.1:8765/v1beta
+
+Los trabajos terminan a los --delay segundos de crearse y cada imagen recibe una
+descripción de prueba; con --fail-every N, una de cada N peticiones devuelve error.
+
+Este script no depende de NVDA.
+"""
+
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+	"""Archivos y trabajos creados, compartidos por todas las peticiones"""
+	
+	def __init__(self, delay, failEvery):
+		self.delay = delay
+		self.failEvery = failEvery
+		self.files = {}  # id -> bytes
+		self.batches = {}  # id -> trabajo de OpenAI
+		self.geminiBatches = {}  # nombre -> trabajo de Gemini
+		self._ids = itertools.count(1)
+		self._requests = itertools.count(1)
+		self.lock = threading.Lock()
+	
+	def nextId(self):
+		"""Siguiente número para identificadores de archivos y trabajos"""
+		with self.lock:
+			return next(self._ids)
+	
+	def answer(self, size):
+		"""
+		Descripción de prueba de una petición
+		
+		Returns:
+			tuple: (descripción o None, mensaje de error o None)
+		"""
+		with self.lock:
+			number = next(self._requests)
+		if self.failEvery and number % self.failEvery == 0:
+			return None, f"Error simulado en la petición {number}"
+		return f"Descripción de prueba {number} (petición de {size} bytes)", None
+
+
+def parseMultipart(body, contentType):
+	"""
+	Extrae los campos de un cuerpo multipart/form-data
+	
+	Returns:
+		dict: nombre del campo -> bytes
+	"""
+	match = re.search(r"boundary=([^;]+)", contentType)
+	if not match:
+		return {}
+	boundary = b"--" + match.group(1).strip('"').encode("ascii")
+	fields = {}
+	for part in body.split(boundary):
+		if b"\r\n\r\n" not in part:
+			continue
+		headers, value = part.split(b"\r\n\r\n", 1)
+		name = re.search(rb'name="([^"]+)"', headers)
+		if name:
+			fields[name.group(1).decode("ascii")] = value[:-2] if value.endswith(b"\r\n") else value
+	return fields
+
+
+class StubHandler(BaseHTTPRequestHandler):
+	"""Rutas de la Batch API de OpenAI y del modo por lotes de Gemini"""
+	
+	state = None
+	
+	def log_message(self, format, *args):
+		print("%s %s" % (self.address_string(), format % args))
+	
+	def _readBody(self):
+		length = int(self.headers.get("Content-Length") or 0)
+		return self.rfile.read(length) if length else b""
+	
+	def _send(self, status, body, contentType="application/json"):
+		data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+		self.send_response(status)
+		self.send_header("Content-Type", contentType)
+		self.send_header("Content-Length", str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+	
+	def _notFound(self):
+		self._send(404, {"error": {"message": f"Ruta no encontrada: {self.path}"}})
+	
+	def do_POST(self):
+		path = self.path.split("?")[0]
+		body = self._readBody()
+		if path == "/v1/files":
+			self._createFile(body)
+		elif path == "/v1/batches":
+			self._createBatch(json.loads(body))
+		else:
+			match = re.match(r"^/v1beta/models/([^/:]+):batchGenerateContent$", path)
+			if match:
+				self._createGeminiBatch(match.group(1), json.loads(body))
+			else:
+				self._notFound()
+	
+	def do_GET(self):
+		path = self.path.split("?")[0]
+		match = re.match(r"^/v1/batches/([^/]+)$", path)
+		if match:
+			return self._getBatch(match.group(1))
+		match = re.match(r"^/v1/files/([^/]+)/content$", path)
+		if match:
+			return self._getFileContent(match.group(1))
+		match = re.match(r"^/v1beta/(batches/[^/]+)$", path)
+		if match:
+			return self._getGeminiBatch(match.group(1))
+		self._notFound()
+	
+	# OpenAI
+	
+	def _createFile(self, body):
+		fields = parseMultipart(body, self.headers.get("Content-Type", ""))
+		if "file" not in fields:
+			return self._send(400, {"error": {"message": "Falta el campo file"}})
+		fileId = f"file-stub{self.state.nextId()}"
+		self.state.files[fileId] = fields["file"]
+		self._send(200, {"id": fileId, "object": "file", "bytes": len(fields["file"]), "purpose": "batch"})
+	
+	def _createBatch(self, request):
+		inputFileId = request.get("input_file_id")
+		if inputFileId not in self.state.files:
+			return self._send(400, {"error": {"message": f"Archivo no encontrado: {inputFileId}"}})
+		batchId = f"batch_stub{self.state.nextId()}"
+		batch = {
+			"id": batchId,
+			"object": "batch",
+			"endpoint": request.get("endpoint"),
+			"input_file_id": inputFileId,
+			"completion_window": request.get("completion_window"),
+			"status": "validating",
+			"created_at": int(time.time()),
+			"metadata": request.get("metadata"),
+		}
+		self.state.batches[batchId] = batch
+		self._send(200, batch)
+	
+	def _getBatch(self, batchId):
+		batch = self.state.batches.get(batchId)
+		if batch is None:
+			return self._notFound()
+		if batch["status"] != "completed":
+			if time.time() - batch["created_at"] < self.state.delay:
+				batch["status"] = "in_progress"
+			else:
+				self._completeBatch(batch)
+		self._send(200, batch)
+	
+	def _completeBatch(self, batch):
+		"""Genera los archivos de resultados y errores del trabajo"""
+		output = []
+		errors = []
+		for line in self.state.files[batch["input_file_id"]].decode("utf-8").splitlines():
+			if not line.strip():
+				continue
+			request = json.loads(line)
+			description, error = self.state.answer(len(line))
+			if error:
+				errors.append({
+					"id": f"batch_req_{self.state.nextId()}",
+					"custom_id": request["custom_id"],
+					"response": {"status_code": 400, "body": {"error": {"message": error, "type": "invalid_request_error"}}},
+					"error": None,
+				})
+				continue
+			output.append({
+				"id": f"batch_req_{self.state.nextId()}",
+				"custom_id": request["custom_id"],
+				"response": {
+					"status_code": 200,
+					"body": {
+						"object": "chat.completion",
+						"model": request["body"].get("model"),
+						"choices": [{
+							"index": 0,
+							"message": {"role": "assistant", "content": description},
+							"finish_reason": "stop",
+						}],
+					},
+				},
+				"error": None,
+			})
+		for key, lines in (("output_file_id", output), ("error_file_id", errors)):
+			if lines:
+				fileId = f"file-stub{self.state.nextId()}"
+				self.state.files[fileId] = "".join(json.dumps(item) + "\n" for item in lines).encode("utf-8")
+				batch[key] = fileId
+		batch["request_counts"] = {"total": len(output) + len(errors), "completed": len(output), "failed": len(errors)}
+		batch["status"] = "completed"
+	
+	def _getFileContent(self, fileId):
+		content = self.state.files.get(fileId)
+		if content is None:
+			return self._notFound()
+		self._send(200, content, "application/jsonl")
+	
+	# Gemini
+	
+	def _createGeminiBatch(self, model, request):
+		batchConfig = request.get("batch") or {}
+		requests = (((batchConfig.get("input_config") or {}).get("requests") or {}).get("requests")) or []
+		name = f"batches/stub{self.state.nextId()}"
+		self.state.geminiBatches[name] = {
+			"model": model,
+			"displayName": batchConfig.get("display_name"),
+			"requests": requests,
+			"created": time.time(),
+			"responses": None,
+		}
+		self._send(200, {"name": name, "metadata": self._geminiMetadata(name, "BATCH_STATE_PENDING")})
+	
+	def _geminiMetadata(self, name, state):
+		batch = self.state.geminiBatches[name]
+		return {
+			"@type": "type.googleapis.com/google.ai.generativelanguage.v1main.GenerateContentBatch",
+			"name": name,
+			"displayName": batch["displayName"],
+			"model": f"models/{batch['model']}",
+			"state": state,
+		}
+	
+	def _getGeminiBatch(self, name):
+		batch = self.state.geminiBatches.get(name)
+		if batch is None:
+			return self._notFound()
+		if time.time() - batch["created"] < self.state.delay:
+			return self._send(200, {"name": name, "metadata": self._geminiMetadata(name, "BATCH_STATE_RUNNING"), "done": False})
+		
+		if batch["responses"] is None:
+			responses = []
+			for item in batch["requests"]:
+				description, error = self.state.answer(len(json.dumps(item)))
+				if error:
+					response = {"error": {"code": 400, "message": error}}
+				else:
+					response = {"response": {"candidates": [{
+						"content": {"parts": [{"text": description}], "role": "model"},
+						"finishReason": "STOP",
+					}]}}
+				response["metadata"] = item.get("metadata") or {}
+				responses.append(response)
+			batch["responses"] = responses
+		self._send(200, {
+			"name": name,
+			"metadata": self._geminiMetadata(name, "BATCH_STATE_SUCCEEDED"),
+			"done": True,
+			"response": {
+				"@type": "type.googleapis.com/google.ai.generativelanguage.v1main.GenerateContentBatchOutput",
+				"inlinedResponses": {"inlinedResponses": batch["responses"]},
+			},
+		})
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Servidor local de lotes de OpenAI y Gemini para pruebas")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("--delay", type=float, default=10.0, help="Segundos hasta que un trabajo termina")
+	parser.add_argument("--fail-every", type=int, default=0, help="Una de cada N peticiones devuelve error (0 = ninguna)")
+	args = parser.parse_args()
+	
+	StubHandler.state = StubState(args.delay, args.fail_every)
+	server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+	print(f"Servidor de lotes de prueba en http://{args.host}:{args.port} (OpenAI: /v1, Gemini: /v1beta)")
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	server.server_close()
+
+
+if __name__ == "__main__":
+	main()